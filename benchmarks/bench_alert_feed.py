@@ -0,0 +1,139 @@
+"""
+Alert change feed benchmark (no network).
+
+Simulates --rounds alert polls for --sites locations with --alerts active alerts each.
+Every round a fraction (--churn) of each location's alerts expire, are replaced by an
+NWS 'Update' message, or new alerts are issued.  Changes are detected:
+
+- rescan: the consumer keeps the previous alert list and, for every alert, scans it for
+  the id (the old alert_id(i) / get_alert_idx() pattern)
+- feed  : AlertChangeFeed.update() per location
+
+Both, and a callback and an async stream() subscriber of the feed, must find the
+new/updated/expired counts the simulation produced.
+
+To Run:
+    ``poetry run python benchmarks/bench_alert_feed.py [--sites 1000] [--alerts 20]``
+
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from collections import Counter
+
+from dt_tools.misc.weather.alert_feed import EXPIRED, NEW, UPDATED, AlertChangeFeed
+
+
+def _polls(sites: int, alerts: int, rounds: int, churn: float, seed: int):
+    """[[alert properties per site] per round], expected Counter of events after round 0"""
+    rnd = random.Random(seed)
+    seq = iter(range(10 ** 9))
+    current = [[{'id': f'a{next(seq)}', 'messageType': 'Alert'} for _ in range(alerts)] for _ in range(sites)]
+    polls = [[list(site) for site in current]]
+    expected = Counter()
+    for _ in range(rounds - 1):
+        for site in current:
+            for idx in rnd.sample(range(len(site)), int(len(site) * churn)):
+                action = rnd.choice((NEW, UPDATED, EXPIRED))
+                old = site[idx]
+                if action == UPDATED:
+                    site[idx] = {'id': f'a{next(seq)}', 'messageType': 'Update', 'references': [{'identifier': old['id']}]}
+                    expected[UPDATED] += 1
+                else:
+                    site[idx] = {'id': f'a{next(seq)}', 'messageType': 'Alert'}
+                    expected[NEW] += 1
+                    expected[EXPIRED] += 1
+        polls.append([list(site) for site in current])
+    return polls, expected
+
+def _rescan(polls):
+    found = Counter()
+    previous = polls[0]
+    for poll in polls[1:]:
+        for old_site, new_site in zip(previous, poll):
+            for alert in new_site:
+                idx = next((cnt for cnt in range(len(old_site)) if old_site[cnt]['id'] == alert['id']), -1)
+                if idx < 0:
+                    found[UPDATED if alert['messageType'] == 'Update' else NEW] += 1
+            replaced = {ref['identifier'] for alert in new_site for ref in alert.get('references', [])}
+            for alert in old_site:
+                if next((cnt for cnt in range(len(new_site)) if new_site[cnt]['id'] == alert['id']), -1) < 0 \
+                        and alert['id'] not in replaced:
+                    found[EXPIRED] += 1
+        previous = poll
+    return found
+
+def _feed(polls, feed: AlertChangeFeed = None):
+    feed = AlertChangeFeed() if feed is None else feed
+    found = Counter()
+    for rnd, poll in enumerate(polls):
+        for site_idx, site in enumerate(poll):
+            changes = feed.update(site, key=str(site_idx))
+            if rnd > 0:
+                found.update(change.event for change in changes)
+    return found
+
+async def _subscribed(polls, total: int):
+    """Callback and async stream subscribers, polls run on a worker thread (as in WeatherFleet)"""
+    feed = AlertChangeFeed()
+    called, streamed = Counter(), Counter()
+    feed.subscribe(lambda change: called.update([change.event]))
+
+    async def consume():
+        async for change in feed.stream():
+            streamed[change.event] += 1
+            if sum(streamed.values()) == total:
+                break
+
+    consumer = asyncio.create_task(consume())
+    await asyncio.sleep(0)
+    await asyncio.get_running_loop().run_in_executor(None, _feed, polls, feed)
+    await asyncio.wait_for(consumer, timeout=30)
+    return called, streamed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Alert change feed benchmark')
+    parser.add_argument('--sites', type=int, default=1000, help='Number of locations')
+    parser.add_argument('--alerts', type=int, default=20, help='Active alerts per location')
+    parser.add_argument('--rounds', type=int, default=6, help='Polls')
+    parser.add_argument('--churn', type=float, default=0.1, help='Fraction of alerts changing per poll')
+    args = parser.parse_args()
+
+    polls, expected = _polls(args.sites, args.alerts, args.rounds, args.churn, seed=1)
+    start = time.perf_counter()
+    rescanned = _rescan(polls)
+    rescan_secs = time.perf_counter() - start
+    start = time.perf_counter()
+    found = _feed(polls)
+    feed_secs = time.perf_counter() - start
+    # subscribers also get round 0 (every alert NEW)
+    initial = args.sites * args.alerts
+    called, streamed = asyncio.run(_subscribed(polls, initial + sum(expected.values())))
+    called[NEW] -= initial
+    streamed[NEW] -= initial
+
+    polls_total = args.sites * (args.rounds - 1)
+    print(f'Alert feed: {args.sites} sites x {args.alerts} alerts x {args.rounds} polls, churn {args.churn:.0%}')
+    print(f'  expected: {dict(expected)}')
+    for label, secs, counts in (('rescan', rescan_secs, rescanned), ('feed', feed_secs, found)):
+        print(f'  {label:8}: {secs / polls_total * 1e6:8.1f}us/poll  {dict(counts)}')
+    print(f'  callback: {dict(called)}')
+    print(f'  stream  : {dict(streamed)}')
+
+    errors = []
+    if rescanned != expected:
+        errors.append('rescan counts differ')
+    if found != expected:
+        errors.append('feed counts differ')
+    if called != expected or streamed != expected:
+        errors.append('subscriber counts differ')
+    for error in errors:
+        print(f'  {error}')
+    print('PASSED' if len(errors) == 0 else 'FAILED')
+    return 0 if len(errors) == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
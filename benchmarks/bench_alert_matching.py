@@ -0,0 +1,102 @@
+"""
+Bulk alert matching benchmark (no network).
+
+Builds an AlertIndex from a synthetic /alerts/active feed of --polygons warning
+polygons (5 to --max-vertices vertices, 0.05-1 degree) and --zone-alerts zone based
+alerts over the CONUS, then matches --sites random sites against it:
+
+- per site: AlertIndex.alerts_for() for every site (scalar point in polygon)
+- bulk    : AlertIndex.alerts_for_sites() (grid bucketed sites, vectorized point in polygon)
+
+Both must return the same alerts for every site, the bulk match within --budget seconds.
+
+To Run:
+    ``poetry run python benchmarks/bench_alert_matching.py [--sites 10000] [--polygons 500]``
+
+"""
+import argparse
+import math
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from dt_tools.misc.weather.nws_alerts import AlertIndex
+
+LAT_RANGE = (25.0, 49.0)
+LON_RANGE = (-125.0, -67.0)
+ZONE_DEGREES = 1.0
+
+
+def _zone(lat: float, lon: float) -> str:
+    return f'TSZ{int((lat - LAT_RANGE[0]) // ZONE_DEGREES):02d}{int((lon - LON_RANGE[0]) // ZONE_DEGREES):02d}'
+
+def _feed(polygons: int, zone_alerts: int, max_vertices: int, seed: int) -> dict:
+    rnd = random.Random(seed)
+    expires = (datetime.now(timezone.utc) + timedelta(hours=2)).isoformat()
+    features = []
+    for idx in range(polygons + zone_alerts):
+        props = {'id': f'urn:oid:test.{idx}', 'event': f'Event {idx}', 'expires': expires}
+        geometry = None
+        if idx < polygons:
+            lat, lon = rnd.uniform(*LAT_RANGE), rnd.uniform(*LON_RANGE)
+            radius = rnd.uniform(0.05, 1.0)
+            angles = sorted(rnd.uniform(0, 2 * math.pi) for _ in range(rnd.randint(5, max_vertices)))
+            ring = [[lon + radius * rnd.uniform(0.3, 1.0) * math.cos(ang), lat + radius * rnd.uniform(0.3, 1.0) * math.sin(ang)]
+                    for ang in angles]
+            geometry = {'type': 'Polygon', 'coordinates': [ring + [ring[0]]]}
+            props['geocode'] = {'UGC': [_zone(lat, lon)]}
+        else:
+            props['geocode'] = {'UGC': [_zone(rnd.uniform(*LAT_RANGE), rnd.uniform(*LON_RANGE)) for _ in range(rnd.randint(1, 6))]}
+        features.append({'id': props['id'], 'geometry': geometry, 'properties': props})
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Bulk alert matching benchmark')
+    parser.add_argument('--sites', type=int, default=10000, help='Number of sites')
+    parser.add_argument('--polygons', type=int, default=500, help='Polygon alerts in the feed')
+    parser.add_argument('--max-vertices', type=int, default=24, help='Max polygon vertices')
+    parser.add_argument('--zone-alerts', type=int, default=100, help='Zone based alerts in the feed')
+    parser.add_argument('--budget', type=float, default=1.0, help='Max seconds for the bulk match')
+    args = parser.parse_args()
+
+    rnd = random.Random(2)
+    lats = [rnd.uniform(*LAT_RANGE) for _ in range(args.sites)]
+    lons = [rnd.uniform(*LON_RANGE) for _ in range(args.sites)]
+    zones = [(_zone(lat, lon),) for lat, lon in zip(lats, lons)]
+
+    start = time.perf_counter()
+    index = AlertIndex(_feed(args.polygons, args.zone_alerts, args.max_vertices, seed=1))
+    build_secs = time.perf_counter() - start
+
+    start = time.perf_counter()
+    per_site = [index.alerts_for(lat, lon, site_zones) for lat, lon, site_zones in zip(lats, lons, zones)]
+    scalar_secs = time.perf_counter() - start
+
+    index.alerts_for_sites(lats[:1], lons[:1], zones[:1])     # warm up (numpy import), not timed
+    start = time.perf_counter()
+    bulk = index.alerts_for_sites(lats, lons, zones)
+    bulk_secs = time.perf_counter() - start
+
+    matched = sum(len(alerts) for alerts in bulk)
+    print(f'Alert matching: {args.sites} sites x {len(index)} alerts ({args.polygons} polygons), '
+          f'{matched} site alerts, index built in {build_secs * 1000:.1f}ms')
+    print(f'  per site: {scalar_secs:7.3f}s')
+    print(f'  bulk    : {bulk_secs:7.3f}s  ({scalar_secs / max(bulk_secs, 1e-9):.1f}x)')
+
+    errors = []
+    mismatched = sum(1 for a, b in zip(per_site, bulk) if [x.id for x in a] != [x.id for x in b])
+    if mismatched:
+        errors.append(f'alerts differ for {mismatched} sites')
+    if matched == 0:
+        errors.append('no alerts matched')
+    if bulk_secs > args.budget:
+        errors.append(f'bulk match exceeded {args.budget}s budget')
+    for error in errors:
+        print(f'  {error}')
+    print('PASSED' if len(errors) == 0 else 'FAILED')
+    return 0 if len(errors) == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
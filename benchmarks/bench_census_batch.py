@@ -0,0 +1,166 @@
+"""
+Census batch geocoder benchmark, run against a local stand-in server.
+
+The stand-in mimics the Census geocoder endpoints used by Census_GeoLocation:
+
+- /geocoder/locations/address       single address (JSON)
+- /geocoder/locations/addressbatch  multipart CSV upload, CSV response
+
+Each request is delayed by --latency seconds to simulate the round trip.  Every 7th
+address is reported as No_Match.  The benchmark verifies batch results (count, match
+flags, coordinates) and compares throughput to single-address lookups (cache bypassed)
+and to repeat lookups served from the address result cache.  A repeated cached batch
+(No_Match rows included) must not upload anything.
+
+To Run:
+    ``poetry run python benchmarks/bench_census_batch.py [--addresses 25000] [--latency 0.05]``
+
+"""
+import argparse
+import csv
+import io
+import sys
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from loguru import logger as LOGGER
+
+from dt_tools.misc.census_geoloc import Census_GeoLocation, CensusAddress
+
+LATENCY = 0.05
+UPLOADS = 0
+
+
+def _coordinates(street: str):
+    house = int(street.split()[0])
+    return -80.0 - (house % 1000) / 1000.0, 30.0 + (house % 997) / 1000.0
+
+def _is_match(street: str) -> bool:
+    return int(street.split()[0]) % 7 != 0
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, body: bytes, content_type: str):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        time.sleep(LATENCY)
+        street = parse_qs(urlsplit(self.path).query)['street'][0]
+        matches = []
+        if _is_match(street):
+            lon, lat = _coordinates(street)
+            matches.append({'matchedAddress': street.upper(), 'coordinates': {'x': lon, 'y': lat}})
+        body = f'{{"result": {{"addressMatches": {matches}}}}}'.replace("'", '"')
+        self._send(body.encode(), 'application/json')
+
+    def do_POST(self):
+        global UPLOADS
+        UPLOADS += 1
+        time.sleep(LATENCY)
+        length = int(self.headers['Content-Length'])
+        raw = f'Content-Type: {self.headers["Content-Type"]}\r\n\r\n'.encode() + self.rfile.read(length)
+        message = BytesParser(policy=HTTP).parsebytes(raw)
+        upload = next(part for part in message.iter_parts() if part.get_param('name', header='content-disposition') == 'addressFile')
+        out = io.StringIO()
+        writer = csv.writer(out, quoting=csv.QUOTE_ALL)
+        content = upload.get_content()
+        if isinstance(content, bytes):
+            content = content.decode('UTF-8')
+        for row in csv.reader(io.StringIO(content)):
+            location_id, street, city, state, zipcd = row
+            input_address = f'{street}, {city}, {state}, {zipcd}'
+            if _is_match(street):
+                lon, lat = _coordinates(street)
+                writer.writerow([location_id, input_address, 'Match', 'Exact', input_address.upper(), f'{lon},{lat}', '1234', 'L'])
+            else:
+                writer.writerow([location_id, input_address, 'No_Match'])
+        self._send(out.getvalue().encode(), 'text/csv')
+
+
+def main() -> int:
+    global LATENCY
+    parser = argparse.ArgumentParser(description='Census batch geocoder benchmark (local stand-in server)')
+    parser.add_argument('--addresses', type=int, default=25000, help='Number of addresses')
+    parser.add_argument('--latency', type=float, default=0.05, help='Simulated per-request latency (seconds)')
+    parser.add_argument('--singles', type=int, default=100, help='Number of single-address lookups to time')
+    args = parser.parse_args()
+    LATENCY = args.latency
+
+    LOGGER.remove()
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_address[1]}/geocoder/locations'
+    Census_GeoLocation._BATCH_URL = f'{base}/addressbatch'
+    Census_GeoLocation._TARGET_URL = base + '/address?street={street}&city={city}{parms}&benchmark=Public_AR_Current&format=json'
+
+    addresses = [CensusAddress(f'{n} Main St', 'Springfield', 'IL', '62701') for n in range(1, args.addresses + 1)]
+
+    start = time.perf_counter()
+    results = list(Census_GeoLocation.lookup_addresses_batch(addresses, max_concurrency=3, use_cache=False))
+    batch_secs = time.perf_counter() - start
+
+    errors = 0
+    if len(results) != len(addresses):
+        errors += 1
+        print(f'  expected {len(addresses)} results, got {len(results)}')
+    for address, location in results:
+        expected = _is_match(address.street)
+        if expected != (location is not None):
+            errors += 1
+        elif location is not None and (location.longitude, location.latitude) != _coordinates(address.street):
+            errors += 1
+
+    start = time.perf_counter()
+    for address in addresses[:args.singles]:
+        Census_GeoLocation.lookup_address(address.street, address.city, address.state, address.zipcd, use_cache=False)
+    single_secs = (time.perf_counter() - start) / args.singles
+
+    # Same addresses, different spelling - served from the cache (populated above)
+    start = time.perf_counter()
+    for address in addresses[:args.singles]:
+        locations = Census_GeoLocation.lookup_address(address.street.upper().replace(' ST', ' Street'), address.city.lower(), 
+                                                      address.state, f'{address.zipcd}-0001')
+        if _is_match(address.street) != (len(locations) > 0):
+            errors += 1
+    cached_secs = (time.perf_counter() - start) / args.singles
+    if Census_GeoLocation.cache().stats.misses > 0:
+        errors += 1
+        print(f'  unexpected cache misses: {Census_GeoLocation.cache().stats.misses}')
+
+    # Cached batch: every answered row (No_Match too) is cached, the repeat uploads nothing
+    repeat_addresses = [CensusAddress(f'{n} Oak St', 'Springfield', 'IL', '62701') for n in range(1, 1001)]
+    first = list(Census_GeoLocation.lookup_addresses_batch(repeat_addresses, chunk_size=250))
+    uploads = UPLOADS
+    repeat = list(Census_GeoLocation.lookup_addresses_batch(repeat_addresses, chunk_size=250))
+    repeat_uploads = UPLOADS - uploads
+    first_locations = {address.street: location for address, location in first}
+    differ = sum(1 for address, location in repeat if first_locations.get(address.street) != location)
+    if repeat_uploads or len(repeat) != len(first) or differ:
+        errors += 1
+        print(f'  repeated batch: {repeat_uploads} uploads, {differ} results differ')
+
+    server.shutdown()
+    print(f'Census batch: {len(addresses)} addresses, simulated latency {args.latency*1000:.0f}ms')
+    print(f'  batch   : {batch_secs:.2f}s  ({len(addresses)/batch_secs:,.0f} addresses/sec)')
+    print(f'  single  : {single_secs*1000:.1f}ms/address  (est. {single_secs*len(addresses):.1f}s for all)')
+    print(f'  cached  : {cached_secs*1000:.3f}ms/address  ({Census_GeoLocation.cache().stats.to_string()})')
+    print(f'  repeat  : {len(repeat_addresses)} addresses ({sum(1 for _, loc in first if loc is None)} No_Match), {repeat_uploads} uploads')
+    print(f'  errors  : {errors}')
+    print('PASSED' if errors == 0 else 'FAILED')
+    return 0 if errors == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""
+Forecast memory / parse benchmark (no network).
+
+Generates NWS-shaped daily (14 periods) and hourly (--hours periods) forecast payloads
+for --sites locations and reports, per location:
+
+- raw   : the parsed JSON payloads (what Forecast used to hold per location)
+- parsed: ForecastPeriod records (daily) + HourlyTable (hourly), as held now
+
+plus the time to read ForecastDay.timeframe/temperature from a raw period dict (parsed
+on every access) and from a parsed period.  Parsed values must match the payloads.
+
+To Run:
+    ``poetry run python benchmarks/bench_forecast_memory.py [--sites 200] [--hours 156]``
+
+"""
+import argparse
+import gc
+import json
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+from dt_tools.misc.weather.forecast_periods import HourlyTable, parse_periods
+from dt_tools.misc.weather.weather_forecast_alert import ForecastDay
+
+FORECASTS = ('Sunny', 'Mostly Sunny', 'Partly Cloudy', 'Mostly Cloudy', 'Chance Showers And Thunderstorms',
+             'Slight Chance Rain Showers', 'Patchy Fog')
+DIRECTIONS = ('N', 'NE', 'E', 'SE', 'S', 'SW', 'W', 'NW')
+
+
+def _payloads(site: int, hours: int):
+    rnd = random.Random(site)
+    start = datetime(2025, 6, 1, 6, tzinfo=timezone(timedelta(hours=-4)))
+    daily = []
+    for idx in range(14):
+        begin = start + timedelta(hours=12 * idx)
+        text = ' '.join(rnd.choice(FORECASTS) for _ in range(6))
+        daily.append({'number': idx + 1, 'name': f'Period {idx}', 'startTime': begin.isoformat(),
+                      'endTime': (begin + timedelta(hours=12)).isoformat(), 'isDaytime': idx % 2 == 0,
+                      'temperature': rnd.randint(60, 95), 'temperatureUnit': 'F', 'temperatureTrend': None,
+                      'probabilityOfPrecipitation': {'unitCode': 'wmoUnit:percent', 'value': rnd.choice((None, 20, 40))},
+                      'windSpeed': f'{rnd.randint(0, 10)} to {rnd.randint(10, 20)} mph', 'windDirection': rnd.choice(DIRECTIONS),
+                      'icon': f'https://api.weather.gov/icons/land/day/tsra,{rnd.randint(20, 60)}?size=medium',
+                      'shortForecast': rnd.choice(FORECASTS), 'detailedForecast': f'{text}. High near {rnd.randint(80, 95)}.'})
+    hourly = []
+    for idx in range(hours):
+        begin = start + timedelta(hours=idx)
+        hourly.append({'number': idx + 1, 'name': '', 'startTime': begin.isoformat(),
+                       'endTime': (begin + timedelta(hours=1)).isoformat(), 'isDaytime': 6 <= begin.hour < 18,
+                       'temperature': rnd.randint(60, 95), 'temperatureUnit': 'F', 'temperatureTrend': '',
+                       'probabilityOfPrecipitation': {'unitCode': 'wmoUnit:percent', 'value': rnd.randint(0, 60)},
+                       'dewpoint': {'unitCode': 'wmoUnit:degC', 'value': rnd.uniform(15, 25)},
+                       'relativeHumidity': {'unitCode': 'wmoUnit:percent', 'value': rnd.randint(40, 100)},
+                       'windSpeed': f'{rnd.randint(0, 15)} mph', 'windDirection': rnd.choice(DIRECTIONS),
+                       'icon': 'https://api.weather.gov/icons/land/day/few?size=small',
+                       'shortForecast': rnd.choice(FORECASTS), 'detailedForecast': ''})
+    return (json.dumps({'properties': {'periods': daily}}).encode(),
+            json.dumps({'properties': {'periods': hourly}}).encode())
+
+def _retained(build):
+    gc.collect()
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    held = build()
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    return held, used
+
+def _check(raw, parsed) -> int:
+    errors = 0
+    for (daily_raw, hourly_raw), (daily, hourly) in zip(raw, parsed):
+        for period, record in zip(daily_raw['properties']['periods'], daily):
+            day = ForecastDay(0, 0, '', '', record)
+            errors += day.temperature != period['temperature'] or day.short_forecast != period['shortForecast']
+            errors += day.timeframe != ForecastDay(0, 0, '', '', period).timeframe
+        for idx, period in enumerate(hourly_raw['properties']['periods']):
+            row = hourly.period(idx).to_dict()
+            errors += any(row[key] != period[key] for key in ('startTime', 'endTime', 'temperature', 'windSpeed',
+                                                               'windDirection', 'shortForecast', 'isDaytime'))
+    return errors
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Forecast memory / parse benchmark')
+    parser.add_argument('--sites', type=int, default=200, help='Number of locations')
+    parser.add_argument('--hours', type=int, default=156, help='Hourly periods per location')
+    args = parser.parse_args()
+
+    bodies = [_payloads(site, args.hours) for site in range(args.sites)]
+    HourlyTable.from_payload(json.loads(bodies[0][1]))     # warm up (numpy import), not counted
+
+    raw, raw_bytes = _retained(lambda: [(json.loads(daily), json.loads(hourly)) for daily, hourly in bodies])
+    parsed, parsed_bytes = _retained(lambda: [(parse_periods(daily), HourlyTable.from_payload(hourly)) for daily, hourly in raw])
+    start = time.perf_counter()
+    for daily, hourly in raw:
+        parse_periods(daily), HourlyTable.from_payload(hourly)
+    parse_secs = time.perf_counter() - start
+
+    reads = 20000
+    period = raw[0][0]['properties']['periods'][0]
+    start = time.perf_counter()
+    for _ in range(reads):
+        day = ForecastDay(0, 0, '', '', period)
+        day.timeframe, day.temperature
+    raw_read = (time.perf_counter() - start) / reads
+    day = ForecastDay(0, 0, '', '', parsed[0][0][0])
+    start = time.perf_counter()
+    for _ in range(reads):
+        day.timeframe, day.temperature
+    parsed_read = (time.perf_counter() - start) / reads
+
+    body_kb = sum(len(daily) + len(hourly) for daily, hourly in bodies) / args.sites / 1024
+    print(f'Forecast memory: {args.sites} sites, 14 daily + {args.hours} hourly periods ({body_kb:.0f}KB json per site)')
+    print(f'  raw    : {raw_bytes / args.sites / 1024:7.1f}KB/site')
+    print(f'  parsed : {parsed_bytes / args.sites / 1024:7.1f}KB/site  ({raw_bytes / max(parsed_bytes, 1):.1f}x smaller, '
+          f'parse {parse_secs / args.sites * 1000:.2f}ms/site)')
+    print(f'  ForecastDay timeframe+temperature: raw {raw_read * 1e6:.1f}us  parsed {parsed_read * 1e6:.1f}us')
+
+    errors = []
+    mismatched = _check(raw, parsed)
+    if mismatched:
+        errors.append(f'{mismatched} parsed values differ from the payload')
+    if parsed_bytes * 3 > raw_bytes:
+        errors.append('parsed forecast not at least 3x smaller')
+    for error in errors:
+        print(f'  {error}')
+    print('PASSED' if len(errors) == 0 else 'FAILED')
+    return 0 if len(errors) == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+Offline gazetteer benchmark (no network).
+
+Writes a synthetic GeoNames style places file (--places places, clustered like real
+settlements, plus admin1CodesASCII.txt), compiles it with build_gazetteer() and
+reports:
+
+- build    : source file -> memory-mapped index
+- open     : Gazetteer() on the index (header only)
+- nearest  : Gazetteer.nearest() per point
+- bulk     : Gazetteer.nearest_index() for --queries points at once
+
+Nearest and bulk results must match a brute force scan of every place.
+
+To Run:
+    ``poetry run python benchmarks/bench_gazetteer.py [--places 200000] [--queries 100000]``
+
+"""
+import argparse
+import pathlib
+import random
+import sys
+import tempfile
+import time
+
+from dt_tools.misc.gazetteer import Gazetteer, build_gazetteer
+
+REGIONS = ((25.0, 49.0, -125.0, -67.0, 'US'), (36.0, 60.0, -10.0, 30.0, 'EU'), (-40.0, -12.0, 113.0, 153.0, 'AU'))
+
+
+def _write_source(folder: pathlib.Path, places: int, seed: int) -> pathlib.Path:
+    rnd = random.Random(seed)
+    source = folder / 'places.txt'
+    with source.open('w', encoding='UTF-8') as out:
+        for idx in range(places):
+            lat_lo, lat_hi, lon_lo, lon_hi, country = rnd.choice(REGIONS)
+            lat, lon = rnd.uniform(lat_lo, lat_hi), rnd.uniform(lon_lo, lon_hi)
+            tokens = [str(idx), f'Place {idx}', f'Place {idx}', '', f'{lat:.5f}', f'{lon:.5f}', 'P', 'PPL', country, '',
+                      f'{idx % 50:02d}', f'{idx % 300:03d}', '', '', str(rnd.randint(0, 50000)), '', '', '', '2024-01-01']
+            out.write('\t'.join(tokens) + '\n')
+    (folder / 'admin1CodesASCII.txt').write_text(
+        ''.join(f'{country}.{code:02d}\tState {code}\tState {code}\t0\n' for *_, country in REGIONS for code in range(50)),
+        encoding='UTF-8')
+    return source
+
+def _brute(np, gaz: Gazetteer, lats, lons, max_distance_m: float):
+    lat = np.radians(np.asarray(gaz._lat, dtype=np.float64))
+    lon = np.radians(np.asarray(gaz._lon, dtype=np.float64))
+    idx = []
+    for q_lat, q_lon in zip(np.radians(lats), np.radians(lons)):
+        hav = np.sin((lat - q_lat) / 2) ** 2 + np.cos(q_lat) * np.cos(lat) * np.sin((lon - q_lon) / 2) ** 2
+        dist = 2 * 6_371_008.8 * np.arcsin(np.minimum(1.0, np.sqrt(hav)))
+        best = int(np.argmin(dist))
+        idx.append(best if dist[best] <= max_distance_m else -1)
+    return idx
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Offline gazetteer benchmark')
+    parser.add_argument('--places', type=int, default=200000, help='Places in the gazetteer')
+    parser.add_argument('--queries', type=int, default=100000, help='Lookup points')
+    parser.add_argument('--max-distance', type=float, default=100_000.0, help='Max place distance (meters)')
+    args = parser.parse_args()
+
+    import numpy as np
+
+    rnd = random.Random(2)
+    regions = [rnd.choice(REGIONS) for _ in range(args.queries)]
+    lats = np.array([rnd.uniform(region[0] - 1, region[1] + 1) for region in regions])
+    lons = np.array([rnd.uniform(region[2] - 1, region[3] + 1) for region in regions])
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        folder = pathlib.Path(tmp_dir)
+        source = _write_source(folder, args.places, seed=1)
+        start = time.perf_counter()
+        places = build_gazetteer(source, folder / 'gazetteer.idx')
+        build_secs = time.perf_counter() - start
+        index_mb = (folder / 'gazetteer.idx').stat().st_size / 1024 / 1024
+
+        start = time.perf_counter()
+        gaz = Gazetteer(folder / 'gazetteer.idx')
+        open_secs = time.perf_counter() - start
+
+        singles = min(args.queries, 20000)
+        start = time.perf_counter()
+        nearest = [gaz.nearest(lat, lon, args.max_distance) for lat, lon in zip(lats[:singles].tolist(), lons[:singles].tolist())]
+        nearest_secs = time.perf_counter() - start
+
+        start = time.perf_counter()
+        bulk_idx, bulk_dist = gaz.nearest_index(lats, lons, args.max_distance)
+        bulk_secs = time.perf_counter() - start
+
+        checked = np.arange(0, args.queries, max(1, args.queries // 300))
+        expected = _brute(np, gaz, lats[checked], lons[checked], args.max_distance)
+        first = gaz.place(int(bulk_idx[0]), float(bulk_dist[0])) if bulk_idx[0] >= 0 else None
+        mismatched = sum(1 for pos, idx in enumerate(checked.tolist()) if int(bulk_idx[idx]) != expected[pos])
+        for pos, idx in enumerate(checked.tolist()):
+            if idx < singles:
+                place = nearest[idx]
+                mismatched += (-1 if place is None else int(bulk_idx[idx])) != expected[pos]
+                mismatched += place is not None and (place.lat, place.lon) != (float(gaz._lat[expected[pos]]), float(gaz._lon[expected[pos]]))
+        del gaz
+
+    found = int((bulk_idx >= 0).sum())
+    print(f'Gazetteer: {places} places, index {index_mb:.1f}MB (built in {build_secs:.2f}s, opened in {open_secs * 1000:.2f}ms)')
+    print(f'  nearest : {nearest_secs / singles * 1e6:7.1f}us/lookup')
+    print(f'  bulk    : {bulk_secs:7.3f}s for {args.queries} points  ({bulk_secs / args.queries * 1e6:.1f}us/point, '
+          f'{found / args.queries:.1%} within {args.max_distance / 1000:.0f}km)')
+    print(f'  example : {first}')
+
+    errors = []
+    if mismatched:
+        errors.append(f'{mismatched} lookups differ from a brute force scan')
+    if found == 0:
+        errors.append('no places found')
+    if first is not None and not (first.state or '').startswith('State'):
+        errors.append('admin1 names not applied')
+    for error in errors:
+        print(f'  {error}')
+    print('PASSED' if len(errors) == 0 else 'FAILED')
+    return 0 if len(errors) == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,280 @@
+"""
+GeoLocation forward lookup (query) cache benchmark, run against a local stand-in server.
+
+The stand-in mimics the geocode.maps.co search endpoint (q= and postalcode= queries),
+every 7th address is not found.  Each request is delayed by --latency seconds and the
+shared rate limiter is set to --rate calls/sec.  The benchmark reports:
+
+- cold     : get_location_via_address_string() for --addresses new addresses
+- repeat   : the same addresses, spelled differently (case, 'Street' vs 'St')
+- many     : GeoLocation.geocode_many() of the same addresses, each also respelled
+- zip      : get_location_via_zip() (zip index disabled), cold then repeat
+- failures : lookups during an outage (HTTP 503 / connection refused), then after recovery
+- throttle : Retry-After of a 429 sent as a lowercase 'retry-after' header, sync and async
+- stream   : geocode_many() / AsyncGeoLocation.geocode_many() of new addresses read from a generator
+
+Repeat lookups must make no API calls and return the cold results, geocode_many() must
+yield each address once, keyed by the spelling passed in first, with one query cache
+lookup per address.  A failed request
+must not be cached as 'not found', the lookup after recovery must call the API again.
+Both clients must honor the lowercase header.  Streamed lookups must yield results before the input is exhausted, with a bounded
+number of addresses read ahead of the results.
+
+To Run:
+    ``poetry run python benchmarks/bench_geoloc_query_cache.py [--addresses 200] [--latency 0.02]``
+
+"""
+import argparse
+import asyncio
+import json
+import pathlib
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from loguru import logger as LOGGER
+
+from dt_tools.misc import async_http, geoloc, http_helper, zip_index
+from dt_tools.misc.geoloc import AsyncGeoLocation, GeoLocation, LocationCache
+from dt_tools.misc.geoloc_cache import SqliteCacheBackend
+from dt_tools.misc.rate_limiter import TokenBucket
+
+LATENCY = 0.02
+OUTAGE = False
+RETRY_AFTER = 0.25
+REQUESTS = 0
+_REQUESTS_LOCK = threading.Lock()
+
+
+def _house(query: str) -> int:
+    return int(query.split()[0])
+
+def _coordinates(house: int):
+    return 30.0 + (house % 997) / 1000.0, -80.0 - (house % 1000) / 1000.0
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        global REQUESTS
+        with _REQUESTS_LOCK:
+            REQUESTS += 1
+        time.sleep(LATENCY)
+        if self.path.startswith('/throttled'):
+            self.send_response(429)
+            self.send_header('retry-after', str(RETRY_AFTER))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if OUTAGE:
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        parms = parse_qs(urlsplit(self.path).query)
+        query = parms['q'][0] if 'q' in parms else parms['postalcode'][0]
+        house = _house(query)
+        matches = []
+        if house % 7 != 0:
+            lat, lon = _coordinates(house)
+            matches.append({'lat': f'{lat:.7f}', 'lon': f'{lon:.7f}',
+                            'display_name': f'{house}, Main Street, Springfield, Sangamon County, Illinois, 62701, United States'})
+        body = json.dumps(matches).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _resolve(addresses):
+    found = {}
+    for address in addresses:
+        geo = GeoLocation()
+        found[address] = (geo.lat, geo.lon) if geo.get_location_via_address_string(address) else None
+    return found
+
+
+class _Reader:
+    # Address generator, records how far input was read ahead of the yielded results
+    def __init__(self, addresses):
+        self.addresses = addresses
+        self.read = 0
+        self.yielded = 0
+        self.first_at = None
+        self.ahead = 0
+
+    def __iter__(self):
+        for address in self.addresses:
+            self.read += 1
+            self.ahead = max(self.ahead, self.read - self.yielded)
+            yield address
+
+    def result(self):
+        self.yielded += 1
+        if self.first_at is None:
+            self.first_at = self.read
+
+def _retry_after(url: str):
+    async def run():
+        try:
+            return GeoLocation._retry_after(await async_http.get(url))
+        finally:
+            await async_http.close_session()
+    return GeoLocation._retry_after(http_helper.get(url)), asyncio.run(run())
+
+def _stream(addresses, workers: int) -> _Reader:
+    reader = _Reader(addresses)
+    for _ in GeoLocation.geocode_many(reader, max_workers=workers):
+        reader.result()
+    return reader
+
+def _stream_async(addresses, workers: int) -> _Reader:
+    async def run():
+        async for _ in AsyncGeoLocation.geocode_many(reader, max_concurrency=workers):
+            reader.result()
+        await async_http.close_session()
+    reader = _Reader(addresses)
+    asyncio.run(run())
+    return reader
+
+
+def main() -> int:
+    global LATENCY, OUTAGE
+    parser = argparse.ArgumentParser(description='GeoLocation query cache benchmark (local stand-in server)')
+    parser.add_argument('--addresses', type=int, default=200, help='Distinct addresses')
+    parser.add_argument('--zips', type=int, default=50, help='Distinct zip codes')
+    parser.add_argument('--latency', type=float, default=0.02, help='Simulated per-request latency (seconds)')
+    parser.add_argument('--rate', type=float, default=100.0, help='API calls per second (rate limiter)')
+    args = parser.parse_args()
+    LATENCY = args.latency
+
+    LOGGER.remove()
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    control = geoloc._GeoLoc_Control
+    control.BASE_URL = f'http://127.0.0.1:{server.server_address[1]}'
+    control._API_KEY, control._API_KEY_RESOLVED = 'bench', True
+    control.RATE_LIMITER = TokenBucket(rate=args.rate)
+    http_helper.HTTP_SETTINGS.MAX_RETRIES = 0
+    zip_index.set_zip_index(None)
+
+    addresses = [f'{n} Main St, Springfield, IL 62701' for n in range(1, args.addresses + 1)]
+    respelled = [address.upper().replace(' ST,', ' Street,') for address in addresses]
+    zips = [f'{n:05d}' for n in range(1001, 1001 + args.zips)]
+    errors = []
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        geoloc._LOCATION_CACHE = LocationCache(backend=SqliteCacheBackend(pathlib.Path(tmp_dir) / 'geoloc_cache.db'))
+        GeoLocation.configure_query_cache()
+
+        start = time.perf_counter()
+        cold = _resolve(addresses)
+        cold_secs = time.perf_counter() - start
+        cold_requests = REQUESTS
+
+        start = time.perf_counter()
+        repeat = _resolve(respelled)
+        repeat_secs = time.perf_counter() - start
+        repeat_requests = REQUESTS - cold_requests
+
+        stats = control.query_cache().stats
+        before = stats.hits + stats.negative_hits + stats.misses
+        start = time.perf_counter()
+        many_results = list(GeoLocation.geocode_many(addresses + [f'  {address} ' for address in respelled]))
+        many = {address: None if geo is None else (geo.lat, geo.lon) for address, geo in many_results}
+        many_secs = time.perf_counter() - start
+        many_requests = REQUESTS - cold_requests - repeat_requests
+        many_lookups = stats.hits + stats.negative_hits + stats.misses - before
+
+        geo = GeoLocation()
+        requests = REQUESTS
+        start = time.perf_counter()
+        zip_cold = [geo.get_location_via_zip(zipcd, 'US') and (geo.lat, geo.lon) for zipcd in zips]
+        zip_cold_secs = time.perf_counter() - start
+        zip_requests = REQUESTS - requests
+        start = time.perf_counter()
+        zip_repeat = [geo.get_location_via_zip(f'{zipcd}-0001', 'us') and (geo.lat, geo.lon) for zipcd in zips]
+        zip_repeat_secs = time.perf_counter() - start
+        zip_repeat_requests = REQUESTS - requests - zip_requests
+
+        # Transient failures: 503 from the server, then connection refused, then recovery
+        failed = [f'{n} Oak St, Springfield, IL 62701' for n in range(1, 4)] + ['1 Elm St, Springfield, IL 62701']
+        OUTAGE = True
+        outage_found = sum(1 for address in failed[:3] if GeoLocation().get_location_via_address_string(address))
+        outage_found += bool(GeoLocation().get_location_via_zip('99002', 'US'))
+        OUTAGE = False
+        base_url = control.BASE_URL
+        refused = ThreadingHTTPServer(('127.0.0.1', 0), _StandInHandler)
+        control.BASE_URL = f'http://127.0.0.1:{refused.server_address[1]}'
+        refused.server_close()
+        outage_found += bool(GeoLocation().get_location_via_address_string(failed[3]))
+        control.BASE_URL = base_url
+        requests = REQUESTS
+        recovered = sum(1 for address in failed if GeoLocation().get_location_via_address_string(address))
+        recovered += bool(GeoLocation().get_location_via_zip('99002', 'US'))
+        recovered_requests = REQUESTS - requests
+
+        retry_after = _retry_after(f'{control.BASE_URL}/throttled')
+
+        # Streaming: results while the input is still being read, bounded read-ahead
+        workers = 4
+        streamed = [_stream([f'{n} Pine St, Springfield, IL 62701' for n in range(1, 101)], workers),
+                    _stream_async([f'{n} Birch St, Springfield, IL 62701' for n in range(1, 101)], workers)]
+
+        stats = control.query_cache().stats
+        geoloc._LOCATION_CACHE = None
+
+    server.shutdown()
+    found = sum(1 for value in cold.values() if value is not None)
+    mismatched = sum(1 for address, value in cold.items() if value is not None
+                     and value != _coordinates(_house(address)))
+    mismatched += sum(1 for address, spelled in zip(addresses, respelled) if repeat[spelled] != cold[address])
+    mismatched += sum(1 for address in addresses if many.get(address) != cold[address])
+    mismatched += sum(1 for cold_loc, repeat_loc in zip(zip_cold, zip_repeat) if cold_loc != repeat_loc)
+
+    print(f'GeoLocation query cache: {args.addresses} addresses ({found} found), {args.zips} zips, '
+          f'simulated latency {args.latency * 1000:.0f}ms, {args.rate:.0f} calls/sec')
+    print(f'  cold    : {cold_secs / args.addresses * 1000:8.2f}ms/lookup  ({cold_requests} API calls)')
+    print(f'  repeat  : {repeat_secs / args.addresses * 1000:8.3f}ms/lookup  ({repeat_requests} API calls)')
+    print(f'  many    : {many_secs / args.addresses * 1000:8.3f}ms/lookup  ({many_requests} API calls, {many_lookups} query cache lookups)')
+    print(f'  zip     : {zip_cold_secs / args.zips * 1000:8.2f}ms cold, {zip_repeat_secs / args.zips * 1000:.3f}ms repeat  ({zip_requests} / {zip_repeat_requests} API calls)')
+    print(f'  failures: {outage_found} found during the outage, {recovered}/{len(failed) + 1} after recovery  ({recovered_requests} API calls)')
+    print(f'  throttle: retry-after {RETRY_AFTER}s -> {retry_after[0]}s sync, {retry_after[1]}s async')
+    for label, reader in zip(('stream', 'async'), streamed):
+        print(f'  {label:8s}: {reader.yielded}/{reader.read} results, first after {reader.first_at} read, max {reader.ahead} read ahead')
+    print(f'  cache   : {stats}')
+
+    if cold_requests != args.addresses:
+        errors.append(f'expected {args.addresses} cold API calls, got {cold_requests}')
+    if repeat_requests or many_requests or zip_repeat_requests:
+        errors.append(f'repeat lookups made {repeat_requests + many_requests + zip_repeat_requests} API calls')
+    if zip_requests != args.zips:
+        errors.append(f'expected {args.zips} zip API calls, got {zip_requests}')
+    if outage_found or recovered != len(failed) + 1 or recovered_requests != len(failed) + 1:
+        errors.append('a failed request was cached as not found')
+    if retry_after != (RETRY_AFTER, RETRY_AFTER):
+        errors.append('lowercase retry-after header ignored')
+    for reader in streamed:
+        if reader.yielded != reader.read or reader.first_at >= reader.read or reader.ahead > 2 * workers + 1:
+            errors.append(f'streamed lookups: first result after {reader.first_at} of {reader.read} read, {reader.ahead} read ahead')
+    if many_lookups != args.addresses:
+        errors.append(f'geocode_many made {many_lookups} query cache lookups for {args.addresses} addresses')
+    if len(many_results) != len(addresses) or set(many) != set(addresses):
+        errors.append(f'geocode_many yielded {len(many_results)} results, {len(set(many) - set(addresses))} not keyed by an input address')
+    if mismatched:
+        errors.append(f'{mismatched} cached results differ from the API results')
+    for error in errors:
+        print(f'  {error}')
+    print('PASSED' if len(errors) == 0 else 'FAILED')
+    return 0 if len(errors) == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""
+Import-time benchmark for the weather/geoloc modules.
+
+Each sample imports the target module in a fresh interpreter and measures the
+wall-clock import time.  The benchmark fails (exit code 1) if the median import time
+exceeds the budget, or if the import eagerly loaded anything that should be deferred
+to first use (location cache, TimezoneFinder, numpy, API tokens, dt_tools.net).
+
+To Run:
+    ``poetry run python benchmarks/bench_import_time.py [--budget 0.5] [--samples 5]``
+
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+TARGET_MODULE = 'dt_tools.misc.weather.weather'
+DEFAULT_BUDGET_SECS = 0.5
+
+_PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import {TARGET_MODULE}
+elapsed = time.perf_counter() - start
+import dt_tools.misc.geoloc as geoloc
+import dt_tools.misc.weather.weather as weather
+import dt_tools.misc.timezone_resolver as timezone_resolver
+eager = []
+if geoloc._LOCATION_CACHE is not None:
+    eager.append('geoloc.LOCATION_CACHE')
+if timezone_resolver._RESOLVER is not None or 'timezonefinder' in sys.modules:
+    eager.append('timezonefinder')
+if geoloc._GeoLoc_Control._API_KEY_RESOLVED:
+    eager.append('geoloc API token')
+if weather.CURRENT_WEATHER_SETTINGS._API_KEY_RESOLVED:
+    eager.append('weather API token')
+if 'numpy' in sys.modules:
+    eager.append('numpy')
+if 'dt_tools.net.net_helper' in sys.modules:
+    eager.append('dt_tools.net.net_helper')
+print(json.dumps({{'elapsed': elapsed, 'eager': eager}}))
+"""
+
+def _sample() -> dict:
+    proc = subprocess.run([sys.executable, '-c', _PROBE], capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f'Import of {TARGET_MODULE} failed:\n{proc.stderr}')
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=f'Measure import time of {TARGET_MODULE}')
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET_SECS, help='Max median import time (seconds)')
+    parser.add_argument('--samples', type=int, default=5, help='Number of fresh-interpreter samples')
+    args = parser.parse_args()
+
+    _sample()  # Warm up (pyc compile, OS file cache)
+    results = [_sample() for _ in range(args.samples)]
+    timings = [r['elapsed'] for r in results]
+    median = statistics.median(timings)
+    eager = sorted({item for r in results for item in r['eager']})
+
+    print(f'import {TARGET_MODULE}')
+    print(f'  samples : {", ".join(f"{t:.3f}" for t in timings)}')
+    print(f'  median  : {median:.3f}s  (budget {args.budget:.3f}s)')
+    print(f'  eager   : {", ".join(eager) if eager else "none"}')
+
+    if median > args.budget or eager:
+        print('FAILED')
+        return 1
+    print('PASSED')
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""
+Location cache proximity benchmark (no network).
+
+Fills a temporary SQLite location cache with --sites locations (plus a few near the
+antimeridian and the poles), adds the grid cell index (spatial=True) and reopens it,
+then looks up --queries GPS fixes of those sites with up to --jitter meters of noise:
+
+- migrate  : cell column/index added to an existing table
+- first    : open + first LocationCache.nearest() miss (short lived process)
+- exact    : cache key lookup (GeoLocation.lat_lon, 7 decimals), the previous behavior
+- nearest  : LocationCache.nearest() within --radius meters (cell range query)
+- bulk knn : LocationCache.nearest_many(k=--k) for all fixes at once (in-memory index)
+- reverse  : GeoLocation.get_location_via_lat_lon() of fixes (API disabled), proximity
+             off (the default) then PROXIMITY_RADIUS_M = --radius
+
+Nearest and bulk results must match a brute force scan, the proximity hit rate
+must be at least --min-hit-rate.  A reverse lookup served by a nearby location must
+keep the requested lat/lon.
+
+To Run:
+    ``poetry run python benchmarks/bench_location_proximity.py [--sites 20000] [--queries 20000]``
+
+"""
+import argparse
+import math
+import pathlib
+import random
+import sys
+import tempfile
+import time
+
+from loguru import logger as LOGGER
+
+from dt_tools.misc import gazetteer, geoloc
+from dt_tools.misc.geoloc import GeoLocation, LocationCache
+from dt_tools.misc.geoloc_cache import SqliteCacheBackend
+from dt_tools.misc.geoloc_proximity import haversine_m
+
+LAT_RANGE = (25.0, 49.0)
+LON_RANGE = (-125.0, -67.0)
+EDGE_SITES = ((-16.5, 179.99995), (-16.5, -179.99995), (89.99995, 45.0), (-89.99995, -120.0), (0.0, 0.0))
+EDGE_FIXES = ((-16.5, -179.99999), (-16.5, 179.99999), (89.99999, -135.0), (-89.99999, 60.0), (0.00001, -0.00001))
+
+
+def _jitter(rnd: random.Random, lat: float, lon: float, meters: float):
+    dist = rnd.uniform(0, meters)
+    ang = rnd.uniform(0, 2 * math.pi)
+    d_lat = dist * math.cos(ang) / 111_195
+    d_lon = dist * math.sin(ang) / (111_195 * math.cos(math.radians(lat)))
+    return lat + d_lat, lon + d_lon
+
+def _brute(sites, lat: float, lon: float, k: int, radius_m: float):
+    dists = sorted((haversine_m(lat, lon, s_lat, s_lon), key) for key, (s_lat, s_lon) in sites.items())
+    return [key for dist, key in dists[:k] if dist <= radius_m]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Location cache proximity benchmark')
+    parser.add_argument('--sites', type=int, default=20000, help='Cached locations')
+    parser.add_argument('--queries', type=int, default=20000, help='Jittered GPS fixes')
+    parser.add_argument('--jitter', type=float, default=10.0, help='Max GPS error (meters)')
+    parser.add_argument('--radius', type=float, default=25.0, help='Proximity radius (meters)')
+    parser.add_argument('--k', type=int, default=3, help='Neighbours for the bulk query')
+    parser.add_argument('--min-hit-rate', type=float, default=0.99, help='Required proximity hit rate')
+    args = parser.parse_args()
+    LOGGER.remove()
+
+    rnd = random.Random(1)
+    sites = {}
+    while len(sites) < args.sites:
+        lat, lon = rnd.uniform(*LAT_RANGE), rnd.uniform(*LON_RANGE)
+        sites[GeoLocation._lat_lon_key(lat, lon)] = (lat, lon)
+    for lat, lon in EDGE_SITES:
+        sites[GeoLocation._lat_lon_key(lat, lon)] = (lat, lon)
+    keys = list(sites)
+    fixes = [_jitter(rnd, *sites[rnd.choice(keys)], args.jitter) for _ in range(args.queries)]
+    fixes[:len(EDGE_FIXES)] = EDGE_FIXES
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_file = pathlib.Path(tmp_dir) / 'geoloc_cache.db'
+        backend = SqliteCacheBackend(db_file)
+        backend.put_many({key: {'lat': lat, 'lon': lon, 'display_name': key} for key, (lat, lon) in sites.items()})
+        backend.close()
+        start = time.perf_counter()
+        SqliteCacheBackend(db_file, spatial=True).close()
+        migrate_secs = time.perf_counter() - start
+
+        start = time.perf_counter()
+        cache = LocationCache(backend=SqliteCacheBackend(db_file, spatial=True))
+        open_secs = time.perf_counter() - start
+        miss_lat, miss_lon = _jitter(rnd, *sites[keys[0]], 1000.0 + args.radius)
+        start = time.perf_counter()
+        cache.nearest(miss_lat, miss_lon, args.radius)
+        first_secs = time.perf_counter() - start
+
+        start = time.perf_counter()
+        exact_hits = sum(1 for lat, lon in fixes if cache.exists(GeoLocation._lat_lon_key(lat, lon)))
+        exact_secs = time.perf_counter() - start
+
+        start = time.perf_counter()
+        nearest = [cache.nearest(lat, lon, args.radius) for lat, lon in fixes]
+        nearest_secs = time.perf_counter() - start
+
+        start = time.perf_counter()
+        cache.proximity_index
+        build_secs = time.perf_counter() - start
+
+        start = time.perf_counter()
+        bulk = cache.nearest_many([fix[0] for fix in fixes], [fix[1] for fix in fixes], k=args.k, radius_m=args.radius)
+        bulk_secs = time.perf_counter() - start
+        unbounded = cache.nearest_many([fix[0] for fix in fixes[:50]], [fix[1] for fix in fixes[:50]], k=args.k, radius_m=math.inf)
+
+        control = geoloc._GeoLoc_Control
+        control._API_KEY, control._API_KEY_RESOLVED = None, True
+        gazetteer.set_gazetteer(None)
+        geoloc._LOCATION_CACHE = cache
+        near_fixes = [fixes[idx] for idx in range(len(EDGE_FIXES), args.queries) if nearest[idx] is not None][:100]
+        reverse_off = sum(1 for fix in near_fixes if GeoLocation().get_location_via_lat_lon(*fix))
+        control.PROXIMITY_RADIUS_M = args.radius
+        reverse_moved = 0
+        for lat, lon in near_fixes:
+            geo = GeoLocation()
+            if not geo.get_location_via_lat_lon(lat, lon) or (geo.lat, geo.lon) != (lat, lon):
+                reverse_moved += 1
+        geoloc._LOCATION_CACHE = None
+        cache.close()
+
+    hits = sum(1 for near in nearest if near is not None)
+    print(f'Location proximity: {args.sites} cached sites, {args.queries} fixes with <= {args.jitter:.0f}m jitter, '
+          f'radius {args.radius:.0f}m (in-memory index built in {build_secs * 1000:.0f}ms)')
+    print(f'  migrate : {migrate_secs * 1000:6.0f}ms  (cell index added)')
+    print(f'  first   : {open_secs * 1000:6.1f}ms open + {first_secs * 1000:.1f}ms first nearest() miss')
+    print(f'  exact   : {exact_hits / args.queries:6.1%} hits  {exact_secs / args.queries * 1e6:6.1f}us/lookup')
+    print(f'  nearest : {hits / args.queries:6.1%} hits  {nearest_secs / args.queries * 1e6:6.1f}us/lookup')
+    print(f'  bulk knn: k={args.k}  {bulk_secs:.3f}s  ({bulk_secs / args.queries * 1e6:.1f}us/fix)')
+    print(f'  reverse : {reverse_off}/{len(near_fixes)} found proximity off, {len(near_fixes) - reverse_moved}/{len(near_fixes)} at the requested lat/lon proximity on')
+
+    errors = []
+    checked = [*range(len(EDGE_FIXES)), *range(0, args.queries, max(1, args.queries // 200))]
+    mismatched = sum(1 for idx in checked
+                     if [key for key, _ in bulk[idx]] != _brute(sites, *fixes[idx], args.k, args.radius)
+                     or (nearest[idx] or (None,))[0] != next(iter(_brute(sites, *fixes[idx], 1, args.radius)), None))
+    mismatched += sum(1 for idx, near in enumerate(unbounded)
+                      if [key for key, _ in near] != _brute(sites, *fixes[idx], args.k, math.inf))
+    if mismatched:
+        errors.append(f'{mismatched} lookups differ from a brute force scan')
+    if reverse_off or reverse_moved:
+        errors.append('reverse lookups served by a nearby location when disabled, or with its lat/lon')
+    if first_secs > 0.05:
+        errors.append('first nearest() miss loads the whole cache')
+    if hits / args.queries < args.min_hit_rate:
+        errors.append(f'hit rate below {args.min_hit_rate:.0%}')
+    for error in errors:
+        print(f'  {error}')
+    print('PASSED' if len(errors) == 0 else 'FAILED')
+    return 0 if len(errors) == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+"""
+NWS bulk alert benchmark, run against a local stand-in server.
+
+The stand-in divides the map into square zones (ZONE degrees, each zone is also a
+county) and mimics the api.weather.gov endpoints used by LocationAlerts:
+
+- /points/{lat},{lon}             forecastZone / county of the point, grid cells span two zones
+- /alerts/active                  every active alert (--alerts, half zone based, half polygon)
+- /alerts/active?point={lat},{lon}  alerts for one point (polygon, else zone match)
+
+Alerts for --sites locations are refreshed --rounds times, polling per location and
+from one bulk feed (AlertEngine, feed re-checked once per round), and the alert ids
+returned for each site compared.  The grid index is primed with every cell's polygon
+and the /points metadata of a point in the cell's other zone, so sites resolve by
+polygon and their zones must still be their own.
+
+To Run:
+    ``poetry run python benchmarks/bench_nws_alerts.py [--sites 200] [--rounds 3]``
+
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from loguru import logger as LOGGER
+
+from dt_tools.misc.weather import nws_alerts
+from dt_tools.misc.weather import weather_forecast_alert as wfa
+from dt_tools.misc.weather.nws_grid import GridIndex, point_in_polygon
+from dt_tools.misc.weather.weather_forecast_alert import Forecast, LocationAlerts
+
+ZONE = 0.5
+ORIGIN = (30.0, -84.0)
+SIDE = 4
+COUNTS = Counter()
+COUNTS_LOCK = threading.Lock()
+FEATURES = []
+ETAG = '"feed-1"'
+
+
+def _zone(lat: float, lon: float) -> int:
+    return int((lat - ORIGIN[0]) // ZONE) * SIDE + int((lon - ORIGIN[1]) // ZONE)
+
+def _features(count: int, seed: int):
+    rnd = random.Random(seed)
+    expires = (datetime.now(timezone.utc) + timedelta(hours=2)).isoformat()
+    features = []
+    for idx in range(count):
+        props = {'id': f'urn:oid:test.{idx}', 'event': f'Event {idx}', 'headline': f'Headline {idx} by TST',
+                 'expires': expires, 'severity': 'Moderate'}
+        geometry = None
+        if idx % 2 == 0:
+            zones = rnd.sample(range(SIDE * SIDE), rnd.randint(1, 3))
+            props['geocode'] = {'UGC': [f'TS{rnd.choice("ZC")}{zone:03d}' for zone in zones]}
+        else:
+            lat = ORIGIN[0] + rnd.uniform(0, SIDE * ZONE)
+            lon = ORIGIN[1] + rnd.uniform(0, SIDE * ZONE)
+            size = rnd.uniform(0.05, 0.4)
+            ring = [[lon, lat], [lon + size, lat + size / 3], [lon + size / 2, lat + size], [lon - size / 3, lat + size / 2], [lon, lat]]
+            geometry = {'type': 'Polygon', 'coordinates': [ring]}
+            props['geocode'] = {'UGC': [f'TSC{_zone(lat, lon):03d}']}
+        features.append({'id': props['id'], 'type': 'Feature', 'geometry': geometry, 'properties': props})
+    return features
+
+def _point_features(lat: float, lon: float):
+    zone = _zone(lat, lon)
+    codes = {f'TSZ{zone:03d}', f'TSC{zone:03d}'}
+    matched = []
+    for feature in FEATURES:
+        if feature['geometry'] is not None:
+            ring = [tuple(pt) for pt in feature['geometry']['coordinates'][0]]
+            if point_in_polygon(lat, lon, ring):
+                matched.append(feature)
+        elif codes & set(feature['properties']['geocode']['UGC']):
+            matched.append(feature)
+    return matched
+
+
+def _points_body(lat: float, lon: float) -> dict:
+    # grid cell = two zones side by side
+    zone = _zone(lat, lon)
+    return {'properties': {'gridId': 'TST', 'gridX': zone // 2, 'gridY': 0,
+                           'forecast': f'https://api.test/gridpoints/TST/{zone // 2},0/forecast',
+                           'forecastHourly': f'https://api.test/gridpoints/TST/{zone // 2},0/forecast/hourly',
+                           'forecastZone': f'https://api.test/zones/forecast/TSZ{zone:03d}',
+                           'county': f'https://api.test/zones/county/TSC{zone:03d}',
+                           'relativeLocation': {'properties': {'city': f'City {zone}', 'state': 'FL'}}}}
+
+def _prime_grid():
+    # every cell: polygon over both zones, /points metadata of a point in the cell's right hand zone
+    index = Forecast.grid_index()
+    for row in range(SIDE):
+        for pair in range(SIDE // 2):
+            lat, lon = ORIGIN[0] + row * ZONE, ORIGIN[1] + pair * 2 * ZONE
+            payload = _points_body(lat + ZONE / 2, lon + ZONE * 1.5)
+            index.add_point(lat + ZONE / 2, lon + ZONE * 1.5, payload)
+            ring = [[lon, lat], [lon + 2 * ZONE, lat], [lon + 2 * ZONE, lat + ZONE], [lon, lat + ZONE], [lon, lat]]
+            index.set_polygon(GridIndex.grid_key(payload), {'type': 'Polygon', 'coordinates': [ring]})
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        path, _, query = self.path.partition('?')
+        parts = path.strip('/').split('/')
+        if parts[0] == 'points':
+            body = _points_body(*(float(val) for val in parts[1].split(',')))
+            key = 'points'
+        elif query.startswith('point='):
+            lat, lon = (float(val) for val in query[6:].split(','))
+            body = {'type': 'FeatureCollection', 'features': _point_features(lat, lon)}
+            key = 'point alerts'
+        else:
+            body = {'type': 'FeatureCollection', 'features': FEATURES}
+            key = 'bulk alerts'
+            if self.headers.get('If-None-Match') == ETAG:
+                with COUNTS_LOCK:
+                    COUNTS['not modified'] += 1
+                self.send_response(304)
+                self.send_header('ETag', ETAG)
+                self.send_header('Cache-Control', 'max-age=0')
+                self.end_headers()
+                return
+        with COUNTS_LOCK:
+            COUNTS[key] += 1
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        if key == 'bulk alerts':
+            self.send_header('ETag', ETAG)
+        self.send_header('Content-Type', 'application/geo+json')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Cache-Control', 'max-age=0')
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def _run(sites, rounds: int, engine=None):
+    alerts = [LocationAlerts(lat, lon) for lat, lon in sites]
+    COUNTS.clear()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        if engine is not None:
+            # one feed check per round (304, index kept)
+            engine.refresh_if_needed(force=True)
+        for site in alerts:
+            site.refresh_if_needed(force=True)
+    elapsed = time.perf_counter() - start
+    ids = [sorted(site.alert_id(idx) for idx in range(site.alert_count)) for site in alerts]
+    return elapsed, dict(COUNTS), ids
+
+
+def main() -> int:
+    global FEATURES
+    parser = argparse.ArgumentParser(description='NWS bulk alert benchmark (local stand-in server)')
+    parser.add_argument('--sites', type=int, default=200, help='Number of locations')
+    parser.add_argument('--rounds', type=int, default=3, help='Refresh rounds')
+    parser.add_argument('--alerts', type=int, default=60, help='Active alerts in the feed')
+    args = parser.parse_args()
+
+    LOGGER.remove()
+    FEATURES = _features(args.alerts, seed=1)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_address[1]}'
+    wfa.URL_BASE_TEMPLATE = f'{base_url}/points/{{latitude}},{{longitude}}'
+    wfa.URL_ALERT_TEMPLATE = f'{base_url}/alerts/active?point={{latitude}},{{longitude}}'
+    nws_alerts.URL_ACTIVE_ALERTS = f'{base_url}/alerts/active'
+    rnd = random.Random(2)
+    sites = [(ORIGIN[0] + rnd.uniform(0, SIDE * ZONE), ORIGIN[1] + rnd.uniform(0, SIDE * ZONE)) for _ in range(args.sites)]
+
+    Forecast.configure_points_cache(persist=False)
+    Forecast.configure_grid(persist=False, polygon_lookup=True)
+    _prime_grid()
+    LocationAlerts.configure_alert_engine(enabled=False)
+    poll_secs, poll, poll_ids = _run(sites, args.rounds)
+    engine = LocationAlerts.configure_alert_engine()
+    bulk_secs, bulk, bulk_ids = _run(sites, args.rounds, engine)
+    server.shutdown()
+
+    refreshes = args.sites * args.rounds
+    matched = sum(len(ids) for ids in bulk_ids)
+    print(f'NWS alerts: {args.sites} sites x {args.rounds} rounds, {args.alerts} active alerts, {matched} site alerts')
+    for label, secs, counts in (('per site', poll_secs, poll), ('bulk', bulk_secs, bulk)):
+        print(f'  {label:8}: point requests {counts.get("point alerts", 0):5}  bulk requests {counts.get("bulk alerts", 0):3}  304 {counts.get("not modified", 0):3}  '
+              f'{secs / refreshes * 1000:6.2f}ms/refresh')
+    print(f'  {engine.stats.to_string()}')
+    print(f'  grid    : {Forecast.grid_index().stats}')
+
+    errors = []
+    if bulk_ids != poll_ids:
+        errors.append(f'alerts differ for {sum(1 for a, b in zip(poll_ids, bulk_ids) if a != b)} sites')
+    if matched == 0:
+        errors.append('no alerts matched')
+    if bulk.get('point alerts', 0) != 0 or bulk.get('bulk alerts', 0) + bulk.get('not modified', 0) != args.rounds:
+        errors.append('bulk mode polled per location')
+    for error in errors:
+        print(f'  {error}')
+    print('PASSED' if len(errors) == 0 else 'FAILED')
+    return 0 if len(errors) == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
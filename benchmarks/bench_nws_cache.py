@@ -0,0 +1,151 @@
+"""
+NWS response cache benchmark, run against a local stand-in server.
+
+The stand-in mimics the api.weather.gov endpoints used by Forecast:
+
+- /points/{lat},{lon}                   location metadata (forecast URLs, city, state)
+- /gridpoints/{wfo}/{x},{y}/forecast    daily forecast (~--payload-kb)
+- /gridpoints/{wfo}/{x},{y}/forecast/hourly
+
+Every response carries an ETag and Cache-Control max-age (--max-age), and requests
+with a matching If-None-Match get a 304.  Forecasts for --sites locations are refreshed
+--rounds times, the forecast payload changing every 3rd round.  Requests and bytes
+transferred are compared with the cache disabled.
+
+To Run:
+    ``poetry run python benchmarks/bench_nws_cache.py [--sites 50] [--rounds 6]``
+
+"""
+import argparse
+import hashlib
+import json
+import pathlib
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from loguru import logger as LOGGER
+
+from dt_tools.misc.weather import weather_forecast_alert as wfa
+from dt_tools.misc.weather.weather_forecast_alert import Forecast
+
+MAX_AGE = 0
+PAYLOAD_KB = 40
+STATE = {'round': 0, 'requests': 0, 'not_modified': 0, 'bytes': 0}
+STATE_LOCK = threading.Lock()
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        base = f'http://127.0.0.1:{self.server.server_address[1]}'
+        path = self.path
+        if path.startswith('/points/'):
+            lat, lon = path.split('/')[-1].split(',')
+            grid = f'{int(float(lat) * 10) % 100},{int(float(lon) * 10) % 100}'
+            body = {'properties': {'forecast': f'{base}/gridpoints/TST/{grid}/forecast',
+                                   'forecastHourly': f'{base}/gridpoints/TST/{grid}/forecast/hourly',
+                                   'relativeLocation': {'properties': {'city': f'City {grid}', 'state': 'FL'}}}}
+            version = 'v1'
+        else:
+            version = f'r{STATE["round"] // 3}'
+            periods = [{'number': idx, 'name': f'Period {idx}', 'detailedForecast': 'x' * (PAYLOAD_KB * 1024 // 14)}
+                       for idx in range(14)]
+            body = {'properties': {'updated': version, 'periods': periods}}
+        etag = '"' + hashlib.md5(f'{path}{version}'.encode()).hexdigest() + '"'
+        with STATE_LOCK:
+            STATE['requests'] += 1
+        if self.headers.get('If-None-Match') == etag:
+            with STATE_LOCK:
+                STATE['not_modified'] += 1
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', f'public, max-age={MAX_AGE}')
+            self.end_headers()
+            return
+        data = json.dumps(body).encode()
+        with STATE_LOCK:
+            STATE['bytes'] += len(data)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/geo+json')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', f'public, max-age={MAX_AGE}')
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def _run(sites, rounds: int):
+    with STATE_LOCK:
+        STATE.update({'requests': 0, 'not_modified': 0, 'bytes': 0})
+    start = time.perf_counter()
+    valid = 0
+    for rnd in range(rounds):
+        STATE['round'] = rnd
+        for lat, lon in sites:
+            forecast = Forecast(lat, lon)
+            valid += forecast._valid_payload and forecast.city is not None
+    return time.perf_counter() - start, dict(STATE), valid
+
+
+def main() -> int:
+    global MAX_AGE, PAYLOAD_KB
+    parser = argparse.ArgumentParser(description='NWS response cache benchmark (local stand-in server)')
+    parser.add_argument('--sites', type=int, default=50, help='Number of locations')
+    parser.add_argument('--rounds', type=int, default=6, help='Refresh rounds')
+    parser.add_argument('--max-age', type=int, default=0, help='Cache-Control max-age sent by the server')
+    parser.add_argument('--payload-kb', type=int, default=40, help='Forecast payload size (KB)')
+    args = parser.parse_args()
+    MAX_AGE, PAYLOAD_KB = args.max_age, args.payload_kb
+
+    LOGGER.remove()
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    wfa.URL_BASE_TEMPLATE = f'http://127.0.0.1:{server.server_address[1]}/points/{{latitude}},{{longitude}}'
+    sites = [(30.0 + idx * 0.1, -81.0 - idx * 0.1) for idx in range(args.sites)]
+
+    # Grid sharing (see bench_nws_grid.py) is disabled, every refresh goes to the HTTP layer
+    Forecast.configure_grid(max_age=0, polygon_lookup=False, persist=False)
+    Forecast.configure_http_cache(max_entries=0)
+    Forecast.configure_points_cache(ttl=0.000001, persist=False)
+    base_secs, base, base_valid = _run(sites, args.rounds)
+
+    db_file = pathlib.Path(tempfile.mkdtemp()) / 'nws_cache.db'
+    Forecast.configure_http_cache()
+    Forecast.configure_points_cache(persist=True, db_file=db_file)
+    cached_secs, cached, cached_valid = _run(sites, args.rounds)
+    cache_stats = Forecast.http_cache().stats()
+    # New process equivalent: memory caches empty, /points restored from the db
+    Forecast.configure_http_cache()
+    Forecast.configure_points_cache(persist=True, db_file=db_file)
+    _, restarted, restarted_valid = _run(sites, 1)
+    server.shutdown()
+
+    refreshes = args.sites * args.rounds
+    print(f'NWS cache: {args.sites} sites x {args.rounds} rounds, max-age {args.max_age}s, forecast {args.payload_kb}KB')
+    for label, secs, stats in (('no cache', base_secs, base), ('cached', cached_secs, cached)):
+        print(f'  {label:9}: {stats["requests"] / refreshes:4.2f} requests/refresh  {stats["not_modified"]:5} x 304  '
+              f'{stats["bytes"] / refreshes / 1024:7.1f}KB/refresh  {secs / refreshes * 1000:6.2f}ms/refresh')
+    print(f'  restart  : {restarted["requests"] / args.sites:4.2f} requests/refresh (points from {db_file.name})')
+    print(f'  {cache_stats.to_string()}')
+
+    errors = []
+    if base_valid != refreshes or cached_valid != refreshes or restarted_valid != args.sites:
+        errors.append('invalid forecasts')
+    if cached['bytes'] >= base['bytes'] / 2:
+        errors.append('cache did not reduce bytes transferred')
+    if restarted['requests'] > args.sites * 2:
+        errors.append('/points not restored from db')
+    for error in errors:
+        print(f'  {error}')
+    print('PASSED' if len(errors) == 0 else 'FAILED')
+    return 0 if len(errors) == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
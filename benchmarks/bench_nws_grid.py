@@ -0,0 +1,164 @@
+"""
+NWS grid-cell dedupe benchmark, run against a local stand-in server.
+
+The stand-in divides the map into square grid cells (--cell degrees, NWS cells are
+~2.5km) and mimics the api.weather.gov endpoints used by Forecast:
+
+- /points/{lat},{lon}                   gridId/gridX/gridY and forecast URLs of the cell
+- /gridpoints/{wfo}/{x},{y}/forecast    daily forecast with the cell polygon (geometry)
+- /gridpoints/{wfo}/{x},{y}/forecast/hourly
+
+--sites locations are scattered over --cells cells.  Forecasts are created for every
+site with the grid store disabled (one forecast per site) and enabled (one per cell),
+then for a second set of new sites in the same cells, which should resolve through the
+persisted grid index (cell polygons) without /points calls.  Finally AsyncForecasts
+are created for every site concurrently (asyncio.gather), which should also fetch
+once per cell.
+
+To Run:
+    ``poetry run python benchmarks/bench_nws_grid.py [--sites 300] [--cells 36]``
+
+"""
+import argparse
+import asyncio
+import json
+import pathlib
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from loguru import logger as LOGGER
+
+from dt_tools.misc import async_http
+from dt_tools.misc.weather import weather_forecast_alert as wfa
+from dt_tools.misc.weather.weather_forecast_alert import AsyncForecast, Forecast
+
+CELL = 0.025
+COUNTS = Counter()
+COUNTS_LOCK = threading.Lock()
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        base = f'http://127.0.0.1:{self.server.server_address[1]}'
+        parts = self.path.strip('/').split('/')
+        with COUNTS_LOCK:
+            COUNTS[parts[0]] += 1
+        if parts[0] == 'points':
+            lat, lon = (float(val) for val in parts[1].split(','))
+            x, y = int(lon // CELL), int(lat // CELL)
+            body = {'properties': {'gridId': 'TST', 'gridX': x, 'gridY': y,
+                                   'forecast': f'{base}/gridpoints/TST/{x},{y}/forecast',
+                                   'forecastHourly': f'{base}/gridpoints/TST/{x},{y}/forecast/hourly',
+                                   'relativeLocation': {'properties': {'city': f'City {x},{y}', 'state': 'FL'}}}}
+        else:
+            x, y = (int(val) for val in parts[2].split(','))
+            lon0, lat0 = x * CELL, y * CELL
+            ring = [[lon0, lat0], [lon0 + CELL, lat0], [lon0 + CELL, lat0 + CELL], [lon0, lat0 + CELL], [lon0, lat0]]
+            periods = [{'number': idx, 'name': f'Period {idx}', 'detailedForecast': 'x' * 2000} for idx in range(14)]
+            body = {'geometry': {'type': 'Polygon', 'coordinates': [ring]}, 'properties': {'periods': periods}}
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/geo+json')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Cache-Control', 'max-age=0')
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def _sites(count: int, cells: int, seed: int):
+    rnd = random.Random(seed)
+    side = max(1, int(cells ** 0.5))
+    # stay clear of cell edges, so a site's cell is unambiguous
+    return [(30.0 + (rnd.randrange(side) + rnd.uniform(0.05, 0.95)) * CELL,
+             -82.0 + (rnd.randrange(side) + rnd.uniform(0.05, 0.95)) * CELL) for _ in range(count)]
+
+def _run(sites):
+    COUNTS.clear()
+    start = time.perf_counter()
+    forecasts = [Forecast(lat, lon) for lat, lon in sites]
+    elapsed = time.perf_counter() - start
+    valid = sum(1 for forecast in forecasts if forecast._valid_payload)
+    payloads = len({id(forecast.daily_periods) for forecast in forecasts})
+    return elapsed, dict(COUNTS), valid, payloads
+
+def _run_async(sites):
+    async def create():
+        try:
+            return await asyncio.gather(*(AsyncForecast.create(lat, lon) for lat, lon in sites))
+        finally:
+            await async_http.close_session()
+
+    COUNTS.clear()
+    start = time.perf_counter()
+    forecasts = asyncio.run(create())
+    elapsed = time.perf_counter() - start
+    valid = sum(1 for forecast in forecasts if forecast._valid_payload)
+    payloads = len({id(forecast.daily_periods) for forecast in forecasts})
+    return elapsed, dict(COUNTS), valid, payloads
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='NWS grid-cell dedupe benchmark (local stand-in server)')
+    parser.add_argument('--sites', type=int, default=300, help='Number of locations')
+    parser.add_argument('--cells', type=int, default=36, help='Number of grid cells the sites fall in')
+    args = parser.parse_args()
+
+    LOGGER.remove()
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    wfa.URL_BASE_TEMPLATE = f'http://127.0.0.1:{server.server_address[1]}/points/{{latitude}},{{longitude}}'
+    sites = _sites(args.sites, args.cells, seed=1)
+    new_sites = _sites(args.sites, args.cells, seed=2)
+    cells = len({(int(lat // CELL), int(lon // CELL)) for lat, lon in sites})
+
+    db_file = pathlib.Path(tempfile.mkdtemp()) / 'nws_cache.db'
+    Forecast.configure_http_cache(max_entries=0)
+    Forecast.configure_points_cache(persist=False)
+    Forecast.configure_grid(max_age=0, polygon_lookup=False, persist=False)
+    base = _run(sites)
+
+    Forecast.configure_points_cache(persist=True, db_file=db_file)
+    Forecast.configure_grid(persist=True, db_file=db_file)
+    grid = _run(sites)
+    # New process equivalent: memory caches empty, grid index restored from the db, new sites
+    Forecast.configure_points_cache(persist=True, db_file=db_file)
+    Forecast.configure_grid(persist=True, db_file=db_file)
+    restart = _run(new_sites)
+    stats = Forecast.grid_index().stats
+    Forecast.configure_points_cache(persist=False)
+    Forecast.configure_grid(persist=False)
+    concurrent = _run_async(sites)
+    server.shutdown()
+
+    print(f'NWS grid: {args.sites} sites in {cells} cells')
+    for label, (secs, counts, valid, payloads) in (('per site', base), ('per cell', grid), ('new sites', restart), ('async', concurrent)):
+        print(f'  {label:9}: points {counts.get("points", 0):5}  forecasts {counts.get("gridpoints", 0):5}  '
+              f'distinct payloads {payloads:5}  valid {valid}  {secs:.2f}s')
+    print(f'  {stats.to_string()}')
+
+    errors = []
+    if base[2] != args.sites or grid[2] != args.sites or restart[2] != args.sites or concurrent[2] != args.sites:
+        errors.append('invalid forecasts')
+    if grid[1].get('gridpoints', 0) != 2 * cells or grid[3] != cells:
+        errors.append('forecasts not shared per cell')
+    if concurrent[1].get('gridpoints', 0) != 2 * cells or concurrent[3] != cells:
+        errors.append('concurrent async forecasts not fetched once per cell')
+    if restart[1].get('points', 0) != 0:
+        errors.append('new sites in known cells called /points')
+    for error in errors:
+        print(f'  {error}')
+    print('PASSED' if len(errors) == 0 else 'FAILED')
+    return 0 if len(errors) == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
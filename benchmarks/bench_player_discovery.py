@@ -0,0 +1,64 @@
+"""
+Audio player discovery benchmark.
+
+Compares the legacy player lookup (recursive OSHelper.find_file walk under /usr/bin,
+or %ProgramFiles% on Windows, on every Sound()) with player_discovery:
+
+- scan      : PATH lookup + startup latency measurement (first run on a machine)
+- persisted : validated result loaded from the cache file (first Sound() per process)
+- memory    : discovered player reused in-process (every later Sound())
+
+To Run:
+    ``poetry run python benchmarks/bench_player_discovery.py [--runs 20]``
+
+"""
+import argparse
+import os
+import pathlib
+import sys
+import tempfile
+import time
+
+from dt_tools.os.os_helper import OSHelper as helper
+from loguru import logger as LOGGER
+
+from dt_tools.misc.player_discovery import PlayerDiscovery
+
+
+def _legacy_lookup():
+    if helper.is_windows():
+        return helper.find_file(filenm='vlc.exe', search_path=pathlib.Path(os.environ['ProgramFiles']))
+    return helper.find_file(filenm='cvlc', search_path=pathlib.Path('/usr/bin'))
+
+def _time(fn, runs: int) -> float:
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn()
+    return (time.perf_counter() - start) / runs
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Audio player discovery benchmark')
+    parser.add_argument('--runs', type=int, default=20, help='Iterations per measurement')
+    args = parser.parse_args()
+
+    LOGGER.remove()
+    cache_file = pathlib.Path(tempfile.mkdtemp()) / 'sound_player.json'
+    scanner = PlayerDiscovery(cache_file=cache_file)
+    scan = _time(lambda: scanner.discover(refresh=True), 1)
+    found = scanner.discover()
+    persisted = _time(lambda: PlayerDiscovery(cache_file=cache_file).discover(), args.runs)
+    memory = _time(scanner.discover, args.runs)
+    legacy = _time(_legacy_lookup, args.runs)
+
+    print(f'Player: {"none found" if found is None else f"{found.name} ({found.path})"}')
+    print(f'  legacy walk : {legacy*1000:9.3f}ms per Sound()')
+    print(f'  scan        : {scan*1000:9.3f}ms (once per machine)')
+    print(f'  persisted   : {persisted*1000:9.3f}ms (once per process)')
+    print(f'  memory      : {memory*1000:9.3f}ms per Sound()')
+    passed = found is None or (found.source == 'path' and memory < legacy)
+    print('PASSED' if passed else 'FAILED')
+    return 0 if passed else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
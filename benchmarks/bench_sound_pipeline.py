@@ -0,0 +1,78 @@
+"""
+Headless speech benchmark (no audio device, no network).
+
+Speaks a long text through Sound with a NullPlayer backend (simulated play time) and
+a stand-in synthesizer (simulated gTTS latency), and reports the gap between clips:
+
+- sequential : SYNTH_LOOKAHEAD = 0, each chunk is synthesized, then played
+- pipelined  : chunk N+1 is synthesized while chunk N plays
+- cached     : same text again, clips served from the TTS cache
+
+The benchmark fails if the pipelined or cached max gap exceeds --max-gap.
+
+To Run:
+    ``poetry run python benchmarks/bench_sound_pipeline.py [--chunks 10] [--synth 0.4] [--play 0.5]``
+
+"""
+import argparse
+import sys
+import tempfile
+import time
+
+from loguru import logger as LOGGER
+
+from dt_tools.misc.sound import Sound
+from dt_tools.misc.sound_player import NullPlayer
+from dt_tools.misc.tts_cache import TTSCache
+
+
+def _run(text: str, lookahead: int, play_secs: float):
+    Sound.SYNTH_LOOKAHEAD = lookahead
+    player = NullPlayer(delay=play_secs)
+    Sound.set_player(player)
+    start = time.perf_counter()
+    ok = Sound.speak(text)
+    elapsed = time.perf_counter() - start
+    log = player.play_log
+    gaps = [log[idx + 1][0] - log[idx][1] for idx in range(len(log) - 1)]
+    first = log[0][0] - start if log else 0.0
+    return ok, elapsed, first, max(gaps, default=0.0), len(log)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Headless Sound pipeline benchmark')
+    parser.add_argument('--chunks', type=int, default=10, help='Number of sentence chunks')
+    parser.add_argument('--synth', type=float, default=0.4, help='Simulated synthesis latency (seconds)')
+    parser.add_argument('--play', type=float, default=0.5, help='Simulated play time per chunk (seconds)')
+    parser.add_argument('--max-gap', type=float, default=0.05, help='Max allowed gap between clips (seconds)')
+    args = parser.parse_args()
+
+    LOGGER.remove()
+    sentence = 'This is a sentence of a long weather announcement, padded out so each chunk holds one sentence'
+    text = ' '.join(f'{sentence} number {idx}.' * 2 for idx in range(args.chunks))
+
+    def synthesize(text: str, lang: str, tld: str) -> bytes:
+        time.sleep(args.synth)
+        return text.encode()
+
+    results = {}
+    for label, lookahead, cache_dir in (('sequential', 0, tempfile.mkdtemp()), ('pipelined', 2, tempfile.mkdtemp()), ('cached', 2, None)):
+        if cache_dir is not None:
+            Sound._TTS_CACHE = TTSCache(cache_dir, synthesize=synthesize)
+        results[label] = _run(text, lookahead, args.play)
+    Sound.set_player(None)
+
+    print(f'Sound pipeline: {results["pipelined"][4]} chunks, synth {args.synth*1000:.0f}ms, play {args.play*1000:.0f}ms per chunk')
+    errors = 0
+    for label, (ok, elapsed, first, max_gap, clips) in results.items():
+        print(f'  {label:10}: total {elapsed:.2f}s  first clip {first*1000:6.1f}ms  max gap {max_gap*1000:6.1f}ms')
+        errors += int(not ok)
+    for label in ('pipelined', 'cached'):
+        if results[label][3] > args.max_gap:
+            errors += 1
+            print(f'  {label} gap exceeds {args.max_gap*1000:.0f}ms')
+    print('PASSED' if errors == 0 else 'FAILED')
+    return 0 if errors == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
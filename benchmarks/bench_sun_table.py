@@ -0,0 +1,85 @@
+"""
+SunTable (vectorized) vs. looping over Sun benchmark.
+
+Builds a sunrise/sunset table for --sites random locations (including polar sites)
+x --days days.  The Sun loop is timed on a sample of sites and extrapolated.  Every
+sampled SunTable value is verified against Sun (same minute, or NaT where Sun raises
+SunTimeException).  The polar day/night masks must be set exactly on the days with
+neither a sunrise nor a sunset.
+
+To Run:
+    ``poetry run python benchmarks/bench_sun_table.py [--sites 5000] [--days 365]``
+
+"""
+import argparse
+import datetime
+import sys
+import time
+
+import numpy as np
+from loguru import logger as LOGGER
+
+from dt_tools.misc.sun import Sun, SunTimeException
+from dt_tools.misc.sun_table import SunTable
+
+
+def _sun_value(sun: Sun, date: datetime.date, rise: bool):
+    try:
+        dt = sun.get_sunrise_time(date) if rise else sun.get_sunset_time(date)
+    except SunTimeException:
+        return 'polar'
+    except ValueError:
+        return None  # Sun can not represent this time (out of range minute), skip
+    return np.datetime64(dt.replace(tzinfo=None), 'ns')
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='SunTable vs Sun benchmark')
+    parser.add_argument('--sites', type=int, default=5000, help='Number of locations')
+    parser.add_argument('--days', type=int, default=365, help='Number of days')
+    parser.add_argument('--sample', type=int, default=50, help='Sites looped via Sun (timed and verified)')
+    args = parser.parse_args()
+
+    LOGGER.remove()
+    rng = np.random.default_rng(42)
+    lats = np.concatenate([rng.uniform(-60, 60, args.sites - args.sites // 10), rng.uniform(66, 85, args.sites // 10) * rng.choice([-1, 1], args.sites // 10)])
+    lons = rng.uniform(-180, 180, args.sites)
+    start_date = datetime.date(2025, 1, 1)
+
+    start = time.perf_counter()
+    table = SunTable(lats, lons, start_date=start_date, days=args.days)
+    table_secs = time.perf_counter() - start
+
+    sample = np.unique(np.concatenate([np.arange(0, args.sites, max(1, args.sites // args.sample)), [args.sites - 1]]))
+    dates = table.dates.astype(datetime.date)
+    errors = 0
+    skipped = 0
+    start = time.perf_counter()
+    for idx in sample:
+        sun = Sun(lats[idx], lons[idx], tz_name='UTC')
+        for d_idx, date in enumerate(dates):
+            polar = 0
+            for rise, times in ((True, table.sunrise), (False, table.sunset)):
+                expected = _sun_value(sun, date, rise)
+                if expected is None:
+                    skipped += 1
+                elif expected == 'polar':
+                    polar += 1
+                    errors += int(not np.isnat(times[idx, d_idx]))
+                elif times[idx, d_idx] != expected:
+                    errors += 1
+            errors += int((polar == 2) != bool(table.polar_day[idx, d_idx] or table.polar_night[idx, d_idx]))
+    loop_secs = (time.perf_counter() - start) / len(sample) * args.sites
+
+    cells = args.sites * args.days
+    print(f'SunTable: {args.sites} sites x {args.days} days ({cells:,} sunrise/sunset pairs)')
+    print(f'  SunTable : {table_secs:.3f}s')
+    print(f'  Sun loop : {loop_secs:.1f}s (extrapolated from {len(sample)} sites)')
+    print(f'  speedup  : {loop_secs/table_secs:,.0f}x')
+    print(f'  polar    : {int(table.polar_day.sum()):,} polar day, {int(table.polar_night.sum()):,} polar night')
+    print(f'  verified : {len(sample) * args.days * 2:,} values, {errors} mismatches, {skipped} skipped')
+    print('PASSED' if errors == 0 else 'FAILED')
+    return 0 if errors == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+WeatherFleet scheduler benchmark (no network).
+
+Tracks --locations sites (10% duplicates, which must share feeds) with stand-in
+fetchers that sleep --latency seconds, using short refresh intervals so several
+refresh cycles run in a few seconds.  Meanwhile a reader thread takes snapshots
+continuously and checks each one is internally consistent (the payload of every
+location belongs to that location and its version never goes backwards).
+
+Verifies:
+- every feed refreshed, duplicates coalesced (one feed per unique site and kind)
+- in-flight refreshes never exceed --workers
+- snapshot reads never block on refreshes (max read time well under --latency)
+
+To Run:
+    ``poetry run python benchmarks/bench_weather_fleet.py [--locations 2000] [--workers 16] [--latency 0.01]``
+
+"""
+import argparse
+import sys
+import threading
+import time
+from dataclasses import dataclass
+
+from loguru import logger as LOGGER
+
+from dt_tools.misc.weather.weather_fleet import ALERTS, FORECAST, WeatherFleet
+
+
+@dataclass(frozen=True)
+class _Payload():
+    location_id: str
+    version: int
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='WeatherFleet scheduler benchmark')
+    parser.add_argument('--locations', type=int, default=2000, help='Number of sites')
+    parser.add_argument('--workers', type=int, default=16, help='Worker pool size')
+    parser.add_argument('--latency', type=float, default=0.01, help='Simulated refresh latency (seconds)')
+    parser.add_argument('--seconds', type=float, default=6.0, help='Run time (seconds)')
+    args = parser.parse_args()
+
+    LOGGER.remove()
+    versions = {}
+    versions_lock = threading.Lock()
+
+    def fetch(state):
+        time.sleep(args.latency)
+        with versions_lock:
+            versions[state.location_id] = versions.get(state.location_id, 0) + 1
+            return _Payload(state.location_id, versions[state.location_id])
+
+    unique = int(args.locations * 0.9)
+    sites = [(25.0 + (idx % 200) * 0.1, -120.0 + (idx // 200) * 0.1) for idx in range(unique)]
+    sites += sites[:args.locations - unique]
+    # refresh interval sized so each feed refreshes several times during the run
+    interval = max(1.0, 2 * unique * 2 * args.latency / args.workers)
+    fleet = WeatherFleet(max_workers=args.workers, intervals={FORECAST: interval, ALERTS: interval},
+                         initial_spread=1.0, fetchers={FORECAST: fetch, ALERTS: fetch})
+    ids = fleet.add_locations(sites, kinds=(FORECAST, ALERTS))
+
+    stop = threading.Event()
+    reads = {'count': 0, 'max': 0.0, 'errors': 0}
+
+    def reader():
+        last_version = -1
+        while not stop.is_set():
+            start = time.perf_counter()
+            snapshot = fleet.snapshot()
+            state = snapshot.get(ids[reads['count'] % len(ids)])
+            reads['max'] = max(reads['max'], time.perf_counter() - start)
+            reads['count'] += 1
+            if snapshot.version < last_version or (state.forecast is not None and state.forecast.location_id != state.location_id):
+                reads['errors'] += 1
+            last_version = snapshot.version
+            time.sleep(0.0005)
+
+    reader_thread = threading.Thread(target=reader, daemon=True)
+    reader_thread.start()
+    start = time.perf_counter()
+    fleet.start()
+    time.sleep(args.seconds)
+    fleet.stop()
+    stop.set()
+    reader_thread.join()
+    elapsed = time.perf_counter() - start
+
+    metrics = fleet.metrics()
+    snapshot = fleet.snapshot()
+    refreshed = sum(1 for state in snapshot if state.forecast is not None and state.alerts is not None)
+    print(f'WeatherFleet: {args.locations} sites ({unique} unique), {args.workers} workers, '
+          f'latency {args.latency*1000:.0f}ms, interval {interval:.1f}s, {elapsed:.1f}s')
+    print(f'  {metrics.to_string()}')
+    print(f'  throughput     : {metrics.refreshes / elapsed:8.1f} refreshes/sec (pool limit {args.workers / args.latency:.0f})')
+    print(f'  snapshot reads : {reads["count"]}  max {reads["max"]*1000:.3f}ms  inconsistent: {reads["errors"]}')
+
+    errors = []
+    if metrics.feeds != unique * 2:
+        errors.append(f'feeds {metrics.feeds} != {unique * 2}')
+    if refreshed != unique:
+        errors.append(f'{unique - refreshed} locations not refreshed')
+    if metrics.max_in_flight > args.workers:
+        errors.append(f'in flight {metrics.max_in_flight} > {args.workers}')
+    if reads['errors'] > 0 or reads['max'] > args.latency:
+        errors.append('snapshot reads inconsistent or blocked')
+    for error in errors:
+        print(f'  {error}')
+    print('PASSED' if len(errors) == 0 else 'FAILED')
+    return 0 if len(errors) == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""
+Offline zip code index benchmark (no network).
+
+Writes a synthetic GeoNames style postal code file (--zips US codes plus Canadian
+codes, several place names per code like the real dump), compiles it with
+build_zip_index() and reports:
+
+- lookup   : ZipIndex.lookup() per code (US zip+4 included)
+- bulk     : ZipIndex.lookup_index() for --queries codes at once (--unknown fraction not in the index)
+- geoloc   : GeoLocation.get_location_via_zip() with the geocode API disabled
+
+Every known code must resolve to the coordinates in the source file, unknown codes
+to None.  GeoLocation fields must be in the geocode API's format (state and country
+names, 'County' suffix), and a Census ZCTA index (no place names) must only be used
+when the API is disabled.
+
+To Run:
+    ``poetry run python benchmarks/bench_zip_index.py [--zips 40000] [--queries 100000]``
+
+"""
+import argparse
+import pathlib
+import socket
+import random
+import sys
+import tempfile
+import time
+
+from loguru import logger as LOGGER
+
+from dt_tools.misc import geoloc, http_helper, zip_index
+from dt_tools.misc.zip_index import ZipIndex, build_zip_index
+
+
+def _write_source(folder: pathlib.Path, zips: int, seed: int):
+    """source file, {(zip, country): (lat, lon)} of the first entry of each code"""
+    rnd = random.Random(seed)
+    codes = {}
+    source = folder / 'allCountries.txt'
+    with source.open('w', encoding='UTF-8') as out:
+        us_codes = rnd.sample(range(501, 99951), zips)
+        ca_codes = {f'{rnd.choice("ABCEGHJKLMNPRSTVXY")}{rnd.randint(0, 9)}{rnd.choice("ABCEGHJKLMNPRSTVWXYZ")}' for _ in range(zips // 20)}
+        entries = [('US', f'{code:05d}', rnd.uniform(25, 49), rnd.uniform(-125, -67)) for code in us_codes]
+        entries += [('CA', code, rnd.uniform(42, 60), rnd.uniform(-130, -55)) for code in ca_codes]
+        for country, code, lat, lon in entries:
+            for place in range(rnd.randint(1, 3)):
+                tokens = [country, code, f'Place {code} {place}', f'State {code[:2]}', code[:2], f'County {code[:3]}', code[:3],
+                          '', '', f'{lat + place * 0.01:.4f}', f'{lon:.4f}', '4']
+                out.write('\t'.join(tokens) + '\n')
+            codes[(code, country)] = (round(lat, 4), round(lon, 4))
+        # GeoNames rows as published: admin name1/code1, county without suffix, one without a state name
+        out.write('US\t32081\tPonte Vedra\tFlorida\tFL\tSt. Johns\t109\t\t\t30.1202\t-81.4128\t4\n')
+        out.write('US\t70112\tNew Orleans\t\tLA\tOrleans Parish\t071\t\t\t29.9569\t-90.0767\t4\n')
+        codes[('32081', 'US')] = (30.1202, -81.4128)
+        codes[('70112', 'US')] = (29.9569, -90.0767)
+    return source, codes
+
+def _check_api_format(errors: list):
+    geo = geoloc.GeoLocation()
+    geo.get_location_via_zip('32081')
+    expected = ('Ponte Vedra', 'St. Johns County', 'Florida', 'United States', 'Ponte Vedra, St. Johns County, Florida, 32081, United States')
+    if (geo.city, geo.county, geo.state, geo.country, geo.display_name) != expected:
+        errors.append(f'32081 not in API format: {geo.display_name}')
+    geo.get_location_via_zip('70112')
+    if (geo.county, geo.state) != ('Orleans Parish', 'Louisiana'):
+        errors.append(f'70112 not in API format: {geo.display_name}')
+
+def _check_zcta(folder: pathlib.Path, errors: list):
+    source = folder / '2020_Gaz_zcta_national.txt'
+    source.write_text('GEOID\tALAND\tAWATER\tALAND_SQMI\tAWATER_SQMI\tINTPTLAT\tINTPTLONG\n'
+                      '32081\t1\t1\t1\t1\t30.120\t-81.413\n', encoding='UTF-8')
+    build_zip_index(source, folder / 'zcta.idx')
+    zip_index.set_zip_index(folder / 'zcta.idx')
+    geo = geoloc.GeoLocation()
+    if not geo.get_location_via_zip('32081') or (round(geo.lat, 3), round(geo.lon, 3)) != (30.12, -81.413):
+        errors.append('ZCTA centroid not used with the API disabled')
+    # API enabled (unreachable stand-in), entries without names must go to the API
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    control = geoloc._GeoLoc_Control
+    base_url, retries = control.BASE_URL, http_helper.HTTP_SETTINGS.MAX_RETRIES
+    control.BASE_URL, control._API_KEY = f'http://127.0.0.1:{port}', 'bench'
+    http_helper.HTTP_SETTINGS.MAX_RETRIES = 0
+    if geo.get_location_via_zip('32081'):
+        errors.append('ZCTA entry without place names used with the API enabled')
+    control.BASE_URL, control._API_KEY = base_url, None
+    http_helper.HTTP_SETTINGS.MAX_RETRIES = retries
+    zip_index.set_zip_index(None)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Offline zip code index benchmark')
+    parser.add_argument('--zips', type=int, default=40000, help='US zip codes in the index')
+    parser.add_argument('--queries', type=int, default=100000, help='Bulk lookups')
+    parser.add_argument('--unknown', type=float, default=0.05, help='Fraction of lookups not in the index')
+    args = parser.parse_args()
+    LOGGER.remove()
+
+    import numpy as np
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        folder = pathlib.Path(tmp_dir)
+        source, codes = _write_source(folder, args.zips, seed=1)
+        start = time.perf_counter()
+        indexed = build_zip_index(source, folder / 'zip_index.idx')
+        build_secs = time.perf_counter() - start
+        index_kb = (folder / 'zip_index.idx').stat().st_size / 1024
+
+        start = time.perf_counter()
+        zips = ZipIndex(folder / 'zip_index.idx')
+        open_secs = time.perf_counter() - start
+
+        rnd = random.Random(2)
+        known = list(codes)
+        queries = [rnd.choice(known) if rnd.random() >= args.unknown else (f'{rnd.randint(0, 99999):05d}', 'ZZ')
+                   for _ in range(args.queries)]
+        us_queries = [(code, country) for code, country in queries if country == 'US']
+
+        singles = min(len(queries), 20000)
+        start = time.perf_counter()
+        single = [zips.lookup(code, country) for code, country in queries[:singles]]
+        lookup_secs = time.perf_counter() - start
+        zip4 = [zips.lookup(f'{code}-1234') for code, _ in us_queries[:100]]
+
+        start = time.perf_counter()
+        bulk_idx = np.concatenate([zips.lookup_index([code for code, cc in queries if cc == country], country)
+                                   for country in ('US', 'CA', 'ZZ')])
+        bulk_secs = time.perf_counter() - start
+        bulk_queries = [query for country in ('US', 'CA', 'ZZ') for query in queries if query[1] == country]
+
+        # GeoLocation, API disabled: every known code must resolve offline
+        geoloc._GeoLoc_Control._API_KEY, geoloc._GeoLoc_Control._API_KEY_RESOLVED = None, True
+        zip_index.set_zip_index(zips)
+        geo_codes = us_queries[:1000]
+        geo = geoloc.GeoLocation()
+        geo.get_location_via_zip(*geo_codes[0])        # timezone resolver warm up
+        start = time.perf_counter()
+        geo_found = sum(1 for code, country in geo_codes if geo.get_location_via_zip(code, country))
+        geo_secs = time.perf_counter() - start
+        errors = []
+        _check_api_format(errors)
+        zip_index.set_zip_index(None)
+        _check_zcta(folder, errors)
+
+        mismatched = 0
+        for (code, country), place in zip(queries[:singles], single):
+            expected = codes.get((code, country))
+            mismatched += (place is None) != (expected is None)
+            mismatched += place is not None and (round(place.lat, 4), round(place.lon, 4)) != expected
+        for (code, country), idx in zip(bulk_queries, bulk_idx.tolist()):
+            expected = codes.get((code, country))
+            mismatched += (idx < 0) != (expected is None)
+            mismatched += idx >= 0 and zips.place(idx).zip != code
+        mismatched += sum(1 for (code, _), place in zip(us_queries, zip4) if place is None or place.zip != code)
+        del zips
+
+    print(f'Zip index: {indexed} codes, index {index_kb:.0f}KB (built in {build_secs:.2f}s, opened in {open_secs * 1000:.2f}ms)')
+    print(f'  lookup  : {lookup_secs / singles * 1e6:6.2f}us/code')
+    print(f'  bulk    : {bulk_secs:.3f}s for {args.queries} codes  ({bulk_secs / args.queries * 1e6:.2f}us/code)')
+    print(f'  geoloc  : {geo_found}/{len(geo_codes)} resolved offline  ({geo_secs / len(geo_codes) * 1e6:.0f}us/call)')
+    if mismatched:
+        errors.append(f'{mismatched} lookups differ from the source file')
+    if geo_found != len(geo_codes):
+        errors.append('GeoLocation did not resolve every known zip offline')
+    for error in errors:
+        print(f'  {error}')
+    print('PASSED' if len(errors) == 0 else 'FAILED')
+    return 0 if len(errors) == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""
+Address normalization, used to build cache keys for geocode lookups.
+
+Normalization:
+
+- case folded, punctuation (except '-' and '/') removed, whitespace collapsed
+- street suffixes and directionals abbreviated (USPS style, ie. 'Street' -> 'st', 'North' -> 'n')
+- unit designators abbreviated ('Apartment' -> 'apt', 'Suite' -> 'ste')
+- zip+4 trimmed to the 5 digit zip
+
+Example::
+
+    from dt_tools.misc.address_helper import normalize_address
+
+    normalize_address('4600 Silver Hill Road', 'Washington', 'DC', '20233-0001')
+    # '4600 silver hill rd|washington|dc|20233'
+
+"""
+import re
+from typing import Dict
+
+_STREET_SUFFIXES: Dict[str, str] = {
+    'alley': 'aly', 'avenue': 'ave', 'av': 'ave', 'boulevard': 'blvd', 'circle': 'cir', 'court': 'ct',
+    'cove': 'cv', 'crescent': 'cres', 'crossing': 'xing', 'drive': 'dr', 'expressway': 'expy',
+    'freeway': 'fwy', 'highway': 'hwy', 'lane': 'ln', 'loop': 'loop', 'parkway': 'pkwy', 'place': 'pl',
+    'plaza': 'plz', 'point': 'pt', 'road': 'rd', 'route': 'rte', 'square': 'sq', 'street': 'st',
+    'str': 'st', 'terrace': 'ter', 'trail': 'trl', 'turnpike': 'tpke', 'way': 'way',
+}
+_DIRECTIONALS: Dict[str, str] = {
+    'north': 'n', 'south': 's', 'east': 'e', 'west': 'w',
+    'northeast': 'ne', 'northwest': 'nw', 'southeast': 'se', 'southwest': 'sw',
+}
+_UNITS: Dict[str, str] = {
+    'apartment': 'apt', 'building': 'bldg', 'floor': 'fl', 'room': 'rm', 'suite': 'ste', 'unit': 'unit',
+}
+_TOKEN_MAP: Dict[str, str] = {**_STREET_SUFFIXES, **_DIRECTIONALS, **_UNITS}
+
+_PUNCTUATION = re.compile(r"[^\w\s/-]")
+_ZIP = re.compile(r'^(\d{5})(?:-?\d{4})?$')
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize free-form text: case, punctuation and whitespace.
+
+    Args:
+        text (str): Input text (None is treated as '').
+
+    Returns:
+        str: Lower case text, single spaced.
+    """
+    if not text:
+        return ''
+    return ' '.join(_PUNCTUATION.sub(' ', str(text).lower()).split())
+
+def normalize_street(street: str) -> str:
+    """
+    Normalize a street line, abbreviating suffixes, directionals and unit designators.
+
+    Args:
+        street (str): ie. '4600 Silver Hill Road, Suite 100'
+
+    Returns:
+        str: ie. '4600 silver hill rd ste 100'
+    """
+    return ' '.join(_TOKEN_MAP.get(token, token) for token in normalize_text(street).split())
+
+def normalize_zip(zipcd: str) -> str:
+    """
+    Normalize a US zip code, zip+4 is trimmed to 5 digits.
+
+    Args:
+        zipcd (str): ie. '20233-0001'
+
+    Returns:
+        str: ie. '20233', non-US formats are returned text-normalized.
+    """
+    if zipcd is None:
+        return ''
+    text = str(zipcd).strip()
+    match = _ZIP.match(text)
+    return match.group(1) if match else normalize_text(text)
+
+def normalize_address(street: str, city: str = None, state: str = None, zipcd: str = None) -> str:
+    """
+    Build a normalized key for an address.
+
+    Equivalent addresses (ie. '4600 Silver Hill Road' and '4600 SILVER HILL RD.') produce the same key.
+
+    Args:
+        street (str): Street line.
+        city (str, optional): Defaults to None.
+        state (str, optional): Defaults to None.
+        zipcd (str, optional): Defaults to None.
+
+    Returns:
+        str: street|city|state|zip
+    """
+    return '|'.join([normalize_street(street), normalize_text(city), normalize_text(state), normalize_zip(zipcd)])
@@ -0,0 +1,152 @@
+"""
+Shared asyncio HTTP client used by the Async* geolocation and weather classes.
+
+All async clients share one aiohttp ClientSession (connection pool) per event loop,
+so hundreds of concurrent lookups reuse a bounded set of keep-alive connections.
+Timeouts and the retry policy come from http_helper.HTTP_SETTINGS, and calls are
+counted in the shared per-host stats (see http_helper.host_stats()).
+
+NOTE:
+
+    Requires the optional aiohttp package::
+
+        pip install dt-misc[async]
+
+Example::
+
+    import asyncio
+    from dt_tools.misc import async_http
+
+    async def main():
+        resp = await async_http.get('https://api.weather.gov/points/30.0694,-81.5515')
+        print(resp.status_code, resp.json()['properties']['forecast'])
+        await async_http.close_session()
+
+    asyncio.run(main())
+
+"""
+import asyncio
+import json
+import time
+import weakref
+from dataclasses import dataclass, field
+from typing import Any, Dict
+
+from loguru import logger as LOGGER
+
+from dt_tools.misc import http_helper
+from dt_tools.misc.http_helper import HTTP_SETTINGS
+
+
+# ============================================================================================
+class ASYNC_HTTP_SETTINGS:
+    TOTAL_TIMEOUT = 60.0     # seconds, per attempt (connect/read timeouts from HTTP_SETTINGS)
+    POOL_SIZE = 100          # Max open connections (all hosts)
+    POOL_SIZE_PER_HOST = 20  # Max open connections per host
+
+
+# ============================================================================================
+@dataclass
+class AsyncResponse():
+    """
+    Response from an async GET.  Body is fully read, so it can be used after the
+    connection is released (mirrors requests.Response: status_code, headers, text, json()).
+    Header names are lowercase, ie. headers.get('retry-after').
+    """
+    url: str
+    status_code: int
+    headers: Dict[str, str] = field(default_factory=dict)
+    content: bytes = b''
+
+    @property
+    def text(self) -> str:
+        return self.content.decode('UTF-8', errors='replace')
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+
+# ============================================================================================
+_SESSIONS: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]' = weakref.WeakKeyDictionary()
+
+def _aiohttp():
+    try:
+        import aiohttp
+    except ImportError as ex:
+        raise ImportError('aiohttp is required for async clients, install with "pip install dt-misc[async]"') from ex
+    return aiohttp
+
+async def get_session():
+    """
+    Return the shared aiohttp ClientSession for the running event loop (created on first use).
+    """
+    aiohttp = _aiohttp()
+    loop = asyncio.get_running_loop()
+    session = _SESSIONS.get(loop)
+    if session is None or session.closed:
+        timeout = aiohttp.ClientTimeout(total=ASYNC_HTTP_SETTINGS.TOTAL_TIMEOUT,
+                                        sock_connect=HTTP_SETTINGS.CONNECT_TIMEOUT,
+                                        sock_read=HTTP_SETTINGS.READ_TIMEOUT)
+        connector = aiohttp.TCPConnector(limit=ASYNC_HTTP_SETTINGS.POOL_SIZE,
+                                         limit_per_host=ASYNC_HTTP_SETTINGS.POOL_SIZE_PER_HOST)
+        session = aiohttp.ClientSession(timeout=timeout, connector=connector,
+                                        headers={'User-Agent': HTTP_SETTINGS.USER_AGENT})
+        _SESSIONS[loop] = session
+        LOGGER.trace('Async http session created.')
+    return session
+
+async def get(url: str, headers: Dict[str, str] = None, retries: int = None) -> AsyncResponse:
+    """
+    GET url via the shared session.
+
+    Connection errors, timeouts and HTTP_SETTINGS.RETRY_STATUS responses are retried
+    with exponential backoff (asyncio.sleep, the event loop is not blocked).
+
+    Args:
+        url (str): Target URL.
+        headers (Dict[str, str], optional): Additional request headers. Defaults to None.
+        retries (int, optional): Max retries. Defaults to HTTP_SETTINGS.MAX_RETRIES.
+
+    Raises:
+        aiohttp.ClientError, asyncio.TimeoutError: When the final attempt fails.
+
+    Returns:
+        AsyncResponse: Response with body read.
+    """
+    aiohttp = _aiohttp()
+    session = await get_session()
+    transport = http_helper.get_transport()
+    retries = HTTP_SETTINGS.MAX_RETRIES if retries is None else retries
+    attempt = 0
+    while True:
+        LOGGER.trace(f'async GET {url}')
+        start = time.perf_counter()
+        try:
+            async with session.get(url, headers=headers) as resp:
+                content = await resp.read()
+                resp_headers = {name.lower(): value for name, value in resp.headers.items()}
+                response = AsyncResponse(url=url, status_code=resp.status, headers=resp_headers, content=content)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as ex:
+            transport.record(url, latency=time.perf_counter() - start, error=True)
+            if attempt >= retries:
+                raise
+            LOGGER.debug(f'GET {url} failed ({repr(ex)}), retrying')
+        else:
+            transport.record(url, latency=time.perf_counter() - start)
+            if response.status_code not in HTTP_SETTINGS.RETRY_STATUS or attempt >= retries:
+                return response
+            LOGGER.debug(f'GET {url} returned {response.status_code}, retrying')
+
+        attempt += 1
+        transport.record(url, retry=True)
+        await asyncio.sleep(http_helper.backoff_delay(attempt))
+
+async def close_session():
+    """
+    Close the shared session for the running event loop.  Call before the loop exits.
+    """
+    loop = asyncio.get_running_loop()
+    session = _SESSIONS.pop(loop, None)
+    if session is not None and not session.closed:
+        await session.close()
+        LOGGER.trace('Async http session closed.')
@@ -3,13 +3,27 @@ Retrieve United States GPS Location data based on address.
 
 Leverages census data API from https://geocoding.geo.census.gov/geocoder/
 
+Lookup results (including 'no match') are cached in memory, keyed by the normalized
+address (see dt_tools.misc.address_helper).  Use Census_GeoLocation.configure_cache()
+to change size/TTL or persist the cache to disk.
+
 """
+import csv
+import dataclasses
+import io
+import pathlib
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from dataclasses import dataclass
-from typing import List
+from itertools import islice
+from typing import Iterable, Iterator, List, Tuple, Union
 
-import requests
 from loguru import logger as LOGGER
 import dt_tools.logger.logging_helper as lh
+from dt_tools.misc import async_http, http_helper
+from dt_tools.misc.address_helper import normalize_address
+from dt_tools.misc.geoloc_cache import SqliteCacheBackend
+from dt_tools.misc.ttl_cache import TTLCache
 
 class GeoLocationException(Exception):
     def __init__(self, message):
@@ -31,6 +45,26 @@ class GeoLocationAddress():
         
         return output
 
+@dataclass
+class CensusAddress():
+    """
+    Input record for Census_GeoLocation.lookup_addresses_batch()
+    """
+    street: str
+    city: str = None
+    state: str = None
+    zipcd: str = None
+
+    @classmethod
+    def from_record(cls, record: Union['CensusAddress', dict, tuple, list]) -> 'CensusAddress':
+        """Build from a CensusAddress, dict (street, city, state, zipcd|zip) or (street, city, state, zip) sequence"""
+        if isinstance(record, CensusAddress):
+            return record
+        if isinstance(record, dict):
+            return cls(street=record.get('street'), city=record.get('city'), state=record.get('state'),
+                       zipcd=record.get('zipcd', record.get('zip')))
+        return cls(*record)
+
 class Census_GeoLocation():
     """
     GeoLocation helper class to help identify lat, long for addresses
@@ -38,10 +72,74 @@ class Census_GeoLocation():
     """
     
     _TARGET_URL="https://geocoding.geo.census.gov/geocoder/locations/address?street={street}&city={city}{parms}&benchmark=Public_AR_Current&format=json"
+    _BATCH_URL="https://geocoding.geo.census.gov/geocoder/locations/addressbatch"
+    _BATCH_BENCHMARK="Public_AR_Current"
+    BATCH_MAX_SIZE = 10000      # Census limit, addresses per upload
+    BATCH_READ_TIMEOUT = 600.0  # seconds, large batches take minutes to process
+    CACHE_MAX_SIZE = 10000                 # addresses held in memory
+    CACHE_TTL = 30 * 86400.0               # seconds, matched addresses
+    CACHE_NEGATIVE_TTL = 86400.0           # seconds, addresses with no match
+    CACHE_DB = pathlib.Path('~').expanduser().absolute() / ".IpHelper" / "census_cache.db"
+    _CACHE: TTLCache = None
+    _CACHE_LOCK = threading.Lock()
     
     def __init__(self):
         pass
 
+    # ---------------------------------------------------------------------------------
+    @classmethod
+    def cache(cls) -> TTLCache:
+        """Return the (shared) address result cache, created in-memory on first use"""
+        if Census_GeoLocation._CACHE is None:
+            with Census_GeoLocation._CACHE_LOCK:
+                if Census_GeoLocation._CACHE is None:
+                    Census_GeoLocation._CACHE = TTLCache(max_size=cls.CACHE_MAX_SIZE, ttl=cls.CACHE_TTL, negative_ttl=cls.CACHE_NEGATIVE_TTL)
+        return Census_GeoLocation._CACHE
+
+    @classmethod
+    def configure_cache(cls, max_size: int = None, ttl: float = None, negative_ttl: float = None, 
+                        persist: bool = False, db_file: Union[str, pathlib.Path] = None) -> TTLCache:
+        """
+        Replace the address result cache.
+
+        Args:
+            max_size (int, optional): Max in-memory entries. Defaults to CACHE_MAX_SIZE.
+            ttl (float, optional): Seconds a match is cached. Defaults to CACHE_TTL.
+            negative_ttl (float, optional): Seconds a 'no match' is cached. Defaults to CACHE_NEGATIVE_TTL.
+            persist (bool, optional): Persist entries to a sqlite db. Defaults to False.
+            db_file (str|Path, optional): sqlite file when persisting. Defaults to CACHE_DB.
+
+        Returns:
+            TTLCache: The new cache.
+        """
+        backend = None
+        if persist:
+            backend = SqliteCacheBackend(db_file or cls.CACHE_DB, table='census_cache')
+        cache = TTLCache(max_size=cls.CACHE_MAX_SIZE if max_size is None else max_size,
+                         ttl=cls.CACHE_TTL if ttl is None else ttl,
+                         negative_ttl=cls.CACHE_NEGATIVE_TTL if negative_ttl is None else negative_ttl,
+                         backend=backend)
+        if backend is not None:
+            LOGGER.debug(f'Census cache: {backend.location}, {cache.purge_expired()} expired entries removed')
+        with Census_GeoLocation._CACHE_LOCK:
+            Census_GeoLocation._CACHE = cache
+        return cache
+
+    @classmethod
+    def _cache_lookup(cls, key: str) -> Tuple[bool, List[GeoLocationAddress]]:
+        hit, value = cls.cache().lookup(key)
+        if not hit:
+            return False, []
+        LOGGER.debug(f'Census cache hit: {key}')
+        return True, [GeoLocationAddress(**entry) for entry in value or []]
+
+    @classmethod
+    def _cache_store(cls, key: str, locations: List[GeoLocationAddress]):
+        if len(locations) == 0:
+            cls.cache().put_negative(key)
+        else:
+            cls.cache().put(key, [dataclasses.asdict(loc) for loc in locations])
+
     @classmethod
     def _get_url(cls, street, city, state, zipcode) -> str:
         url = cls._TARGET_URL.replace("{street}", street)
@@ -90,20 +188,36 @@ class Census_GeoLocation():
     # }}
 
     @classmethod
-    def lookup_address(cls, street:str, city:str = None, state:str = None, zipcd:str = None) -> List[GeoLocationAddress]:
+    def lookup_address(cls, street:str, city:str = None, state:str = None, zipcd:str = None, use_cache: bool = True) -> List[GeoLocationAddress]:
+        url = cls._validate_and_get_url(street, city, state, zipcd)
+        key = normalize_address(street, city, state, zipcd)
+        if use_cache:
+            hit, locations = cls._cache_lookup(key)
+            if hit:
+                return locations
+        resp = http_helper.get(url)
+        locations = cls._parse_response(url, resp)
+        cls._cache_store(key, locations)
+        return locations
+
+    @classmethod
+    def _validate_and_get_url(cls, street:str, city:str = None, state:str = None, zipcd:str = None) -> str:
         valid_parameters = True if street is not None and (zipcd is not None or (city is not None and state is not None)) else False
         if not valid_parameters:
             raise ValueError('Must supply street and zip or street, city and state')
-        url = cls._get_url(street, city, state, zipcd)
-        resp = requests.get(url)
+        return cls._get_url(street, city, state, zipcd)
+
+    @classmethod
+    def _parse_response(cls, url: str, resp) -> List[GeoLocationAddress]:
         if resp.status_code != 200:
             msg = f"url: {url}\nInvalid Geolocation response code: {resp.status_code}"
             LOGGER.error(msg)
             raise GeoLocationException(msg)
 
-        LOGGER.debug("Result:\n{}\n".format(resp.json()))
+        resp_json = resp.json()
+        LOGGER.debug("Result:\n{}\n".format(resp_json))
         location_list = []
-        addr_matches = resp.json()['result']['addressMatches']
+        addr_matches = resp_json['result']['addressMatches']
         for fnd_address in addr_matches:
             addr = fnd_address['matchedAddress']
             latitude = float(fnd_address['coordinates']['y'])
@@ -114,6 +228,150 @@ class Census_GeoLocation():
         LOGGER.debug(f'{len(location_list)} addresses identified.')
         return location_list
 
+    # ---------------------------------------------------------------------------------
+    @classmethod
+    def lookup_addresses_batch(cls, addresses: Iterable[Union[CensusAddress, dict, tuple]], 
+                               chunk_size: int = BATCH_MAX_SIZE, max_concurrency: int = 2, use_cache: bool = True) -> Iterator[Tuple[CensusAddress, Union[GeoLocationAddress, None]]]:
+        """
+        Geocode many addresses via the Census batch (CSV upload) endpoint.
+
+        Addresses are split into chunks of up to chunk_size (max 10,000), each chunk is
+        uploaded in one request and the CSV response is parsed as it streams in.  Up to
+        max_concurrency chunks are processed in parallel.  Results for a chunk are
+        yielded when that chunk completes.  Cached addresses are yielded without being
+        uploaded.  Matches and No_Match results are added to the cache (addresses missing
+        from a response, or in a failed upload, are not).
+
+        Args:
+            addresses (Iterable): CensusAddress, dict (street, city, state, zipcd) or 
+                (street, city, state, zip) tuples.
+            chunk_size (int, optional): Addresses per upload. Defaults to 10000.
+            max_concurrency (int, optional): Max chunks in flight. Defaults to 2.
+            use_cache (bool, optional): Use the address result cache. Defaults to True.
+
+        Raises:
+            GeoLocationException: If a batch upload fails.
+
+        Yields:
+            Tuple[CensusAddress, GeoLocationAddress]: (input address, location) or (input address, None) if no match.
+        """
+        chunk_size = max(1, min(chunk_size, cls.BATCH_MAX_SIZE))
+        records = (CensusAddress.from_record(rec) for rec in addresses)
+        cached: List[Tuple[CensusAddress, Union[GeoLocationAddress, None]]] = []
+        if use_cache:
+            records = cls._uncached_records(records, cached)
+        executor = ThreadPoolExecutor(max_workers=max(1, max_concurrency), thread_name_prefix='census')
+        in_flight = set()
+        try:
+            while True:
+                while len(in_flight) < max(1, max_concurrency):
+                    chunk = list(islice(records, chunk_size))
+                    if len(chunk) == 0:
+                        break
+                    in_flight.add(executor.submit(cls._lookup_batch_chunk, chunk))
+                yield from cached
+                cached.clear()
+                if len(in_flight) == 0:
+                    break
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    for address, location, answered in future.result():
+                        if use_cache and answered:
+                            cls._cache_store(normalize_address(address.street, address.city, address.state, address.zipcd), 
+                                             [] if location is None else [location])
+                        yield address, location
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    @classmethod
+    def _uncached_records(cls, records: Iterable[CensusAddress], cached: list) -> Iterator[CensusAddress]:
+        # Cache hits are appended to cached (first match or None), misses are passed through
+        for rec in records:
+            hit, locations = cls._cache_lookup(normalize_address(rec.street, rec.city, rec.state, rec.zipcd))
+            if hit:
+                cached.append((rec, locations[0] if locations else None))
+            else:
+                yield rec
+
+    @classmethod
+    def _lookup_batch_chunk(cls, chunk: List[CensusAddress]) -> List[Tuple[CensusAddress, Union[GeoLocationAddress, None], bool]]:
+        # (address, location, answered), answered is False for addresses missing from the response
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for idx, rec in enumerate(chunk):
+            writer.writerow([idx, rec.street or '', rec.city or '', rec.state or '', rec.zipcd or ''])
+
+        LOGGER.debug(f'Census batch upload: {len(chunk)} addresses')
+        resp = http_helper.post(cls._BATCH_URL,
+                                data={'benchmark': cls._BATCH_BENCHMARK},
+                                files={'addressFile': ('addresses.csv', buffer.getvalue(), 'text/csv')},
+                                timeout=(http_helper.HTTP_SETTINGS.CONNECT_TIMEOUT, cls.BATCH_READ_TIMEOUT),
+                                retries=http_helper.HTTP_SETTINGS.MAX_RETRIES,
+                                stream=True)
+        if resp.status_code != 200:
+            msg = f"url: {cls._BATCH_URL}\nInvalid batch response code: {resp.status_code}"
+            LOGGER.error(msg)
+            resp.close()
+            raise GeoLocationException(msg)
+
+        results: List[Union[GeoLocationAddress, None]] = [None] * len(chunk)
+        answered = [False] * len(chunk)
+        with resp:
+            for location_id, location in cls._parse_batch_lines(resp.iter_lines(decode_unicode=True)):
+                if 0 <= location_id < len(chunk):
+                    results[location_id] = location
+                    answered[location_id] = True
+
+        LOGGER.debug(f'Census batch complete: {sum(1 for r in results if r is not None)} of {len(chunk)} matched')
+        return list(zip(chunk, results, answered))
+
+    @staticmethod
+    def _parse_batch_lines(lines: Iterable[str]) -> Iterator[Tuple[int, Union[GeoLocationAddress, None]]]:
+        # Response row: id, input address, Match|No_Match|Tie, Exact|Non_Exact, matched address, "lon,lat", tigerline id, side
+        for row in csv.reader(line for line in lines if line):
+            try:
+                location_id = int(row[0])
+            except (ValueError, IndexError):
+                LOGGER.trace(f'Skipping batch row: {row}')
+                continue
+            location = None
+            if len(row) >= 6 and row[2] == 'Match':
+                try:
+                    longitude, latitude = (float(token) for token in row[5].split(','))
+                    payload = {'input_address': row[1], 'match': row[2], 'match_type': row[3],
+                               'matched_address': row[4], 'coordinates': {'x': longitude, 'y': latitude},
+                               'tigerLine': {'tigerLineId': row[6] if len(row) > 6 else None,
+                                             'side': row[7] if len(row) > 7 else None}}
+                    location = GeoLocationAddress(address=row[4], latitude=latitude, longitude=longitude, _json_payload=payload)
+                except ValueError:
+                    LOGGER.warning(f'Invalid coordinates in batch row: {row}')
+                    continue
+            yield location_id, location
+
+
+class AsyncCensusGeoLocation(Census_GeoLocation):
+    """
+    asyncio version of Census_GeoLocation, uses the shared async http session
+    (see dt_tools.misc.async_http).  Requires aiohttp.
+
+    Example::
+
+        locations = await AsyncCensusGeoLocation.lookup_address('4600 Silver Hill Rd', zipcd='20233')
+
+    """
+    @classmethod
+    async def lookup_address(cls, street:str, city:str = None, state:str = None, zipcd:str = None, use_cache: bool = True) -> List[GeoLocationAddress]:
+        url = cls._validate_and_get_url(street, city, state, zipcd)
+        key = normalize_address(street, city, state, zipcd)
+        if use_cache:
+            hit, locations = cls._cache_lookup(key)
+            if hit:
+                return locations
+        resp = await async_http.get(url)
+        locations = cls._parse_response(url, resp)
+        cls._cache_store(key, locations)
+        return locations
+
 if __name__ == "__main__":
     lh.configure_logger(log_level="INFO")
     geo = Census_GeoLocation()
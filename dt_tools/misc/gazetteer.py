@@ -0,0 +1,412 @@
+"""
+Offline reverse geocoding (lat/lon -> nearest place) from a local gazetteer.
+
+A gazetteer source file is compiled once (build_gazetteer) into a compact binary
+index, which Gazetteer memory-maps: opening it reads only the header, the OS pages
+in what lookups touch.  Places are sorted by a CELL_DEGREES grid cell key, so a
+lookup only reads the cells around the point.
+
+Supported sources:
+
+- GeoNames cities / allCountries dump (tab separated, ie. cities500.txt).  County
+  and state names are read from admin2Codes.txt / admin1CodesASCII.txt when found
+  next to the source, otherwise the admin codes are used.
+- US Census Gazetteer places / counties file (tab separated, with header).
+- CSV with a header of name, lat, lon and optionally state, county, country, population.
+
+Example::
+
+    from dt_tools.misc import gazetteer
+
+    gazetteer.build_gazetteer('~/Downloads/cities500.txt')   # -> ~/.IpHelper/gazetteer.idx
+    gaz = gazetteer.get_gazetteer()
+    place = gaz.nearest(30.0691, -81.5513)                   # Place(name='Ponte Vedra', ...)
+    places = gaz.nearest_many(lats, lons)                    # vectorized
+
+GeoLocation.get_location_via_lat_lon uses the shared gazetteer (if an index exists)
+when the geocode API is not available.
+"""
+import csv
+import json
+import math
+import pathlib
+import threading
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Sequence, Tuple, Union
+
+from loguru import logger as LOGGER
+
+from dt_tools.misc.geoloc_proximity import EARTH_RADIUS_M, grid_cell_keys, grid_nearest
+
+if TYPE_CHECKING:
+    import numpy as np
+
+DEFAULT_INDEX = pathlib.Path('~').expanduser().absolute() / ".IpHelper" / 'gazetteer.idx'
+CELL_DEGREES = 0.1                              # ~11km north/south
+MAX_DISTANCE_M = 100_000.0                      # no place within -> None
+
+_MAGIC = b'DTGAZ01\n'
+_ALIGN = 64
+_COLUMNS = {'cell_key': '<i8', 'lat': '<f4', 'lon': '<f4', 'population': '<i4',
+            'name': '<i4', 'county': '<i4', 'state': '<i4', 'country': '<i4'}
+
+
+# ============================================================================================
+@dataclass(frozen=True)
+class Place():
+    """Gazetteer place nearest to a lookup point"""
+    name: str
+    county: str
+    state: str
+    country: str                    # ISO country code
+    lat: float
+    lon: float
+    population: int
+    distance_m: float               # from the lookup point
+
+
+# ============================================================================================
+class Gazetteer:
+    """
+    Memory-mapped gazetteer index (see build_gazetteer).
+
+    Args:
+        index_file (str|Path, optional): Index file. Defaults to DEFAULT_INDEX.
+
+    Raises:
+        ValueError: index_file is not a gazetteer index.
+    """
+    def __init__(self, index_file: Union[str, pathlib.Path] = None):
+        self.index_file = pathlib.Path(index_file or DEFAULT_INDEX).expanduser()
+        self._header, arrays = read_array_index(self.index_file, _MAGIC)
+        self._cell_keys: 'np.ndarray' = arrays['cell_key']
+        self._lat: 'np.ndarray' = arrays['lat']
+        self._lon: 'np.ndarray' = arrays['lon']
+        self._population: 'np.ndarray' = arrays['population']
+        self._name: 'np.ndarray' = arrays['name']
+        self._county: 'np.ndarray' = arrays['county']
+        self._state: 'np.ndarray' = arrays['state']
+        self._country: 'np.ndarray' = arrays['country']
+        self._strings = StringTable(arrays['text'], arrays['text_offsets'])
+        self.cell_degrees: float = self._header['cell_degrees']
+        self._lon_cells = int(round(360 / self.cell_degrees))
+        self._cell_m = EARTH_RADIUS_M * math.radians(self.cell_degrees)
+        LOGGER.trace(f'Gazetteer opened with {len(self)} places [{self.index_file}]')
+
+    def __len__(self) -> int:
+        return int(self._cell_keys.size)
+
+    @property
+    def source(self) -> str:
+        return self._header.get('source', '')
+
+    def nearest(self, lat: float, lon: float, max_distance_m: float = MAX_DISTANCE_M) -> Union[Place, None]:
+        """
+        Place nearest to (lat, lon).
+
+        Args:
+            lat (float): Latitude.
+            lon (float): Longitude.
+            max_distance_m (float, optional): Max distance in meters. Defaults to MAX_DISTANCE_M.
+
+        Returns:
+            Place: Nearest place, None if there is none within max_distance_m.
+        """
+        lat, lon = float(lat), float(lon)
+        max_ring = min(math.ceil(max_distance_m / self._cell_m), int(round(180 / self.cell_degrees)))
+        ring = 1
+        while True:
+            # the box of ring cells around the point's cell covers ring * cell height in every direction
+            ring = min(ring, max_ring)
+            best = self._nearest_in_box(lat, lon, ring)
+            if ring >= max_ring or (best is not None and best[1] <= ring * self._cell_m):
+                break
+            ring *= 2
+        if best is None or best[1] > max_distance_m:
+            return None
+        return self.place(best[0], best[1])
+
+    def nearest_index(self, lats: Sequence[float], lons: Sequence[float],
+                      max_distance_m: float = MAX_DISTANCE_M) -> Tuple['np.ndarray', 'np.ndarray']:
+        """
+        Nearest place of many points (vectorized).
+
+        Args:
+            lats (Sequence[float]): Latitudes.
+            lons (Sequence[float]): Longitudes, same length as lats.
+            max_distance_m (float, optional): Max distance in meters. Defaults to MAX_DISTANCE_M.
+
+        Raises:
+            ValueError: lats and lons differ in length.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Place index (-1 if none within max_distance_m)
+            and distance in meters (nan if none) of each point, see place().
+        """
+        import numpy as np
+
+        lats = np.asarray(lats, dtype=np.float64).ravel()
+        lons = np.asarray(lons, dtype=np.float64).ravel()
+        idx = np.full(lats.size, -1, dtype=np.int64)
+        dist = np.full(lats.size, np.nan)
+        # most points have a place within a cell or two, grow the radius only for the rest
+        pending = np.arange(lats.size)
+        radius_m = min(self._cell_m, max_distance_m)
+        while True:
+            rows, points, dists = grid_nearest(self._cell_keys, self._lat, self._lon, lats[pending], lons[pending], k=1,
+                                               radius_m=radius_m, cell_degrees=self.cell_degrees)
+            idx[pending[rows]] = points
+            dist[pending[rows]] = dists
+            pending = pending[idx[pending] < 0]
+            if pending.size == 0 or radius_m >= max_distance_m:
+                break
+            radius_m = min(radius_m * 2, max_distance_m)
+        return idx, dist
+
+    def nearest_many(self, lats: Sequence[float], lons: Sequence[float],
+                     max_distance_m: float = MAX_DISTANCE_M) -> List[Union[Place, None]]:
+        """Nearest Place (or None) of many points, see nearest_index()"""
+        idx, dist = self.nearest_index(lats, lons, max_distance_m)
+        return [None if place_idx < 0 else self.place(place_idx, place_dist)
+                for place_idx, place_dist in zip(idx.tolist(), dist.tolist())]
+
+    def place(self, idx: int, distance_m: float = 0.0) -> Place:
+        """Place at index idx (see nearest_index)"""
+        return Place(name=self._strings[self._name[idx]], county=self._strings[self._county[idx]],
+                     state=self._strings[self._state[idx]], country=self._strings[self._country[idx]],
+                     lat=float(self._lat[idx]), lon=float(self._lon[idx]),
+                     population=int(self._population[idx]), distance_m=distance_m)
+
+    # ---------------------------------------------------------------------------------
+    def _nearest_in_box(self, lat: float, lon: float, ring: int) -> Union[Tuple[int, float], None]:
+        cell_lat = math.floor(lat / self.cell_degrees)
+        cell_lon = math.floor(lon / self.cell_degrees) % self._lon_cells
+        reach = abs(lat) + (ring + 1) * self.cell_degrees
+        lon_ring = self._lon_cells if reach >= 90.0 else math.ceil(ring / math.cos(math.radians(reach)))
+        if 2 * lon_ring + 1 >= self._lon_cells:
+            spans = [(0, self._lon_cells - 1)]
+        else:
+            first, last = (cell_lon - lon_ring) % self._lon_cells, (cell_lon + lon_ring) % self._lon_cells
+            spans = [(first, last)] if first <= last else [(first, self._lon_cells - 1), (0, last)]
+        # compare haversine terms (monotonic with distance), distance only for the best
+        phi, lmb = math.radians(lat), math.radians(lon)
+        cos_phi = math.cos(phi)
+        best, best_hav = None, 2.0
+        for row in range(cell_lat - ring, cell_lat + ring + 1):
+            for lo, hi in spans:
+                start = int(self._cell_keys.searchsorted(row * self._lon_cells + lo))
+                stop = int(self._cell_keys.searchsorted(row * self._lon_cells + hi, side='right'))
+                if stop <= start:
+                    continue
+                for offset, (place_lat, place_lon) in enumerate(zip(self._lat[start:stop].tolist(), self._lon[start:stop].tolist())):
+                    place_phi = math.radians(place_lat)
+                    hav = math.sin((place_phi - phi) / 2) ** 2 + cos_phi * math.cos(place_phi) * math.sin((math.radians(place_lon) - lmb) / 2) ** 2
+                    if hav < best_hav:
+                        best, best_hav = start + offset, hav
+        if best is None:
+            return None
+        return best, 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(best_hav)))
+
+
+# ============================================================================================
+class StringTable:
+    """Read-only strings of an array index (see string_arrays), decoded on first use"""
+    def __init__(self, text: 'np.ndarray', offsets: 'np.ndarray'):
+        self._text = text
+        self._offsets = offsets
+        self._decoded: Dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return int(self._offsets.size) - 1
+
+    def __getitem__(self, idx: int) -> Union[str, None]:
+        """String idx, None for -1 (no value)"""
+        idx = int(idx)
+        if idx < 0:
+            return None
+        text = self._decoded.get(idx)
+        if text is None:
+            text = bytes(self._text[self._offsets[idx]:self._offsets[idx + 1]]).decode('UTF-8')
+            self._decoded[idx] = text
+        return text
+
+def string_arrays(strings: Iterable[str]) -> Dict[str, 'np.ndarray']:
+    """'text' (UTF-8 bytes) and 'text_offsets' arrays of strings, for write_array_index / StringTable"""
+    import numpy as np
+
+    encoded = [text.encode('UTF-8') for text in strings]
+    return {'text': np.frombuffer(b''.join(encoded), dtype=np.uint8),
+            'text_offsets': np.concatenate([[0], np.cumsum([len(text) for text in encoded], dtype=np.int64)]).astype('<i8')}
+
+def write_array_index(index_file: pathlib.Path, magic: bytes, header: dict, arrays: Dict[str, 'np.ndarray']):
+    """
+    Write 1-d arrays as a memory-mappable index file (see read_array_index).
+
+    Layout: magic, header length (u8), JSON header (header + array dtype/size/offset),
+    then the arrays, each aligned so a mapped view needs no copy.  The file is written
+    to a temp file and renamed, readers never see a partial index.
+    """
+    import numpy as np
+
+    layout, offset = {}, 0
+    for name, values in arrays.items():
+        layout[name] = [values.dtype.str, int(values.size), offset]
+        offset += -(-values.nbytes // _ALIGN) * _ALIGN
+    header = {**header, 'arrays': layout}
+    header_len = len(json.dumps(header).encode('UTF-8'))
+    data_start = -(-(len(magic) + 8 + header_len + 256) // _ALIGN) * _ALIGN      # room for the offsets growing
+    for entry in layout.values():
+        entry[2] += data_start
+    header_bytes = json.dumps(header).encode('UTF-8')
+
+    index_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = index_file.with_name(f'{index_file.name}.tmp')
+    with tmp_file.open('wb') as out:
+        out.write(magic + np.uint64(len(header_bytes)).astype('<u8').tobytes() + header_bytes)
+        for name, values in arrays.items():
+            out.seek(layout[name][2])
+            out.write(values.tobytes())
+        out.truncate(max(out.tell(), data_start))
+    tmp_file.replace(index_file)
+
+def read_array_index(index_file: pathlib.Path, magic: bytes) -> Tuple[dict, Dict[str, 'np.ndarray']]:
+    """
+    Memory-map an index written by write_array_index.
+
+    Raises:
+        ValueError: index_file does not start with magic.
+
+    Returns:
+        Tuple[dict, Dict[str, np.ndarray]]: header, read-only arrays by name.
+    """
+    import numpy as np
+
+    raw = np.memmap(index_file, dtype=np.uint8, mode='r')
+    if bytes(raw[:len(magic)]) != magic:
+        raise ValueError(f'{index_file} is not a {magic.decode(errors="replace").strip()} index')
+    start = len(magic) + 8
+    header_len = int(raw[len(magic):start].view('<u8')[0])
+    header = json.loads(bytes(raw[start:start + header_len]).decode('UTF-8'))
+    # plain ndarray views of the mapping (memmap slices are slow to create), they keep the mapping open
+    arrays = {name: np.ndarray((count,), dtype=dtype, buffer=raw, offset=offset)
+              for name, (dtype, count, offset) in header['arrays'].items()}
+    return header, arrays
+
+
+# ============================================================================================
+def _read_admin_names(file_name: pathlib.Path) -> Dict[str, str]:
+    names = {}
+    if file_name is not None and file_name.exists():
+        with file_name.open(encoding='UTF-8', errors='replace') as source:
+            for line in source:
+                tokens = line.rstrip('\n').split('\t')
+                if len(tokens) >= 2:
+                    names[tokens[0]] = tokens[1]
+    return names
+
+def _geonames_rows(source, first_line: str, admin1: Dict[str, str], admin2: Dict[str, str]) -> Iterator[tuple]:
+    for line in (first_line, *source):
+        tokens = line.rstrip('\n').split('\t')
+        if len(tokens) < 15:
+            continue
+        country, admin1_cd, admin2_cd = tokens[8], tokens[10], tokens[11]
+        state = admin1.get(f'{country}.{admin1_cd}', admin1_cd) or None
+        county = admin2.get(f'{country}.{admin1_cd}.{admin2_cd}', admin2_cd) or None
+        yield tokens[1], float(tokens[4]), float(tokens[5]), county, state, country, int(tokens[14] or 0)
+
+def _census_rows(source, first_line: str) -> Iterator[tuple]:
+    columns = [col.strip() for col in first_line.rstrip('\n').split('\t')]
+    for line in source:
+        row = dict(zip(columns, (token.strip() for token in line.rstrip('\n').split('\t'))))
+        yield row['NAME'], float(row['INTPTLAT']), float(row['INTPTLONG']), None, row.get('USPS'), 'US', 0
+
+def _csv_rows(source, first_line: str) -> Iterator[tuple]:
+    for row in csv.DictReader((first_line, *source)):
+        row = {key.strip().lower(): (value or '').strip() for key, value in row.items() if key}
+        yield (row['name'], float(row['lat']), float(row['lon']), row.get('county') or None, row.get('state') or None,
+               row.get('country') or None, int(row.get('population') or 0))
+
+def _source_rows(source_file: pathlib.Path, admin1: Dict[str, str], admin2: Dict[str, str]) -> Iterator[tuple]:
+    with source_file.open(encoding='UTF-8', errors='replace', newline='') as source:
+        first_line = source.readline()
+        if 'INTPTLAT' in first_line:
+            yield from _census_rows(source, first_line)
+        elif '\t' not in first_line and 'lat' in first_line.lower():
+            yield from _csv_rows(source, first_line)
+        else:
+            yield from _geonames_rows(source, first_line, admin1, admin2)
+
+def build_gazetteer(source_file: Union[str, pathlib.Path], index_file: Union[str, pathlib.Path] = None,
+                    min_population: int = 0, admin1_file: Union[str, pathlib.Path] = None,
+                    admin2_file: Union[str, pathlib.Path] = None) -> int:
+    """
+    Compile a gazetteer source file into a binary index (see module doc for formats).
+
+    Args:
+        source_file (str|Path): GeoNames, Census Gazetteer or CSV places file.
+        index_file (str|Path, optional): Index to write. Defaults to DEFAULT_INDEX.
+        min_population (int, optional): Skip smaller places (GeoNames/CSV). Defaults to 0.
+        admin1_file (str|Path, optional): GeoNames admin1CodesASCII.txt. Defaults to the one next to source_file.
+        admin2_file (str|Path, optional): GeoNames admin2Codes.txt. Defaults to the one next to source_file.
+
+    Returns:
+        int: Number of places indexed.
+    """
+    import numpy as np
+
+    source_file = pathlib.Path(source_file).expanduser()
+    index_file = pathlib.Path(index_file or DEFAULT_INDEX).expanduser()
+    admin1 = _read_admin_names(pathlib.Path(admin1_file).expanduser() if admin1_file else source_file.with_name('admin1CodesASCII.txt'))
+    admin2 = _read_admin_names(pathlib.Path(admin2_file).expanduser() if admin2_file else source_file.with_name('admin2Codes.txt'))
+
+    strings: Dict[str, int] = {}
+
+    def string_id(text: str) -> int:
+        return -1 if not text else strings.setdefault(text, len(strings))
+
+    columns = {name: [] for name in _COLUMNS if name != 'cell_key'}
+    for name, lat, lon, county, state, country, population in _source_rows(source_file, admin1, admin2):
+        if population < min_population or not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+            continue
+        for column, value in (('lat', lat), ('lon', lon), ('population', population), ('name', string_id(name)),
+                              ('county', string_id(county)), ('state', string_id(state)), ('country', string_id(country))):
+            columns[column].append(value)
+
+    arrays = {name: np.asarray(columns[name], dtype=dtype) for name, dtype in _COLUMNS.items() if name != 'cell_key'}
+    cell_keys = grid_cell_keys(arrays['lat'], arrays['lon'], CELL_DEGREES)
+    order = np.argsort(cell_keys, kind='stable')
+    arrays = {'cell_key': cell_keys[order].astype(_COLUMNS['cell_key']), **{name: values[order] for name, values in arrays.items()}}
+    arrays.update(string_arrays(strings))
+    write_array_index(index_file, _MAGIC, {'source': str(source_file), 'cell_degrees': CELL_DEGREES,
+                                           'places': int(cell_keys.size)}, arrays)
+    LOGGER.info(f'Gazetteer index {index_file}: {cell_keys.size} places from {source_file}')
+    return int(cell_keys.size)
+
+
+# ============================================================================================
+_GAZETTEER: Gazetteer = None
+_GAZETTEER_LOADED = False
+_GAZETTEER_LOCK = threading.Lock()
+
+def get_gazetteer() -> Union[Gazetteer, None]:
+    """Return the shared gazetteer (DEFAULT_INDEX, opened on first use), None if there is no index"""
+    global _GAZETTEER, _GAZETTEER_LOADED
+    if not _GAZETTEER_LOADED:
+        with _GAZETTEER_LOCK:
+            if not _GAZETTEER_LOADED:
+                if DEFAULT_INDEX.exists():
+                    try:
+                        _GAZETTEER = Gazetteer(DEFAULT_INDEX)
+                    except Exception as ex:
+                        LOGGER.warning(f'Unable to open gazetteer {DEFAULT_INDEX} - {repr(ex)}')
+                _GAZETTEER_LOADED = True
+    return _GAZETTEER
+
+def set_gazetteer(gazetteer: Union[Gazetteer, str, pathlib.Path, None]):
+    """Replace the shared gazetteer (a Gazetteer, an index file, or None to disable)"""
+    global _GAZETTEER, _GAZETTEER_LOADED
+    if gazetteer is not None and not isinstance(gazetteer, Gazetteer):
+        gazetteer = Gazetteer(gazetteer)
+    with _GAZETTEER_LOCK:
+        _GAZETTEER = gazetteer
+        _GAZETTEER_LOADED = True
@@ -11,85 +11,239 @@ Requires a FREE API Key from https://geocode.maps.co
 
 See set_api_tokens.exe (dt-cli-tools) for caching the token.
 """
-import json
+import asyncio
 import pathlib
-from dataclasses import dataclass, field
-from datetime import datetime
-from time import sleep
-from typing import Dict, Tuple
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Tuple, Union
 
-import requests
 from loguru import logger as LOGGER
-from timezonefinder import TimezoneFinder
 
 import dt_tools.logger.logging_helper as lh
+from dt_tools.misc import async_http, gazetteer, http_helper, timezone_resolver, zip_index
+from dt_tools.misc.address_helper import normalize_street, normalize_zip
 from dt_tools.misc.helpers import ApiTokenHelper as api_helper
+from dt_tools.misc.geoloc_cache import CacheBackend, SqliteCacheBackend, migrate_json_cache
+from dt_tools.misc.geoloc_proximity import ProximityIndex, nearest_key
+from dt_tools.misc.rate_limiter import TokenBucket
+from dt_tools.misc.ttl_cache import TTLCache
 
 
 # ============================================================================================
 class _GeoLoc_Control:
-    API_KEY = api_helper.get_api_token('geocode.maps.co')
-    API_ENABLED = API_KEY is not None
+    # API token is resolved on first use (see api_key())
+    _API_KEY: str = None
+    _API_KEY_RESOLVED: bool = False
     BASE_URL = 'https://geocode.maps.co'
+    # Provider limit is 1 call per second, shared by all GeoLocation instances/threads
+    RATE_LIMITER = TokenBucket(rate=1.0)
+    THROTTLE_PENALTY = 1.1
+    MAX_THROTTLE_RETRIES = 5
     ADDRESS_URI = 'search'
     LAT_LON_URI = 'reverse'
+    IP_URL = 'http://ip-api.com/json/'
     GEOLOC_CACHE_FILENM = pathlib.Path('~').expanduser().absolute() / ".IpHelper" / 'geoloc_cache.json'
+    GEOLOC_CACHE_DB = pathlib.Path('~').expanduser().absolute() / ".IpHelper" / 'geoloc_cache.db'
+    # Reverse lookups within this distance (meters) of a cached location are served from cache (house and
+    # street are those of the cached location), 0 to disable.  ie. 25.0 for fleets of jittery GPS fixes.
+    PROXIMITY_RADIUS_M = 0.0
+    # Reverse lookups use the offline gazetteer (city level, see dt_tools.misc.gazetteer) when the API
+    # is not enabled or finds nothing.  True to use it before calling the API.
+    GAZETTEER_FIRST = False
+    # Forward lookups (address, landmark, zip) -> location cache key, see GeoLocation.configure_query_cache()
+    QUERY_CACHE_MAX_SIZE = 10000               # queries held in memory
+    QUERY_CACHE_TTL = 30 * 86400.0             # seconds, resolved queries
+    QUERY_CACHE_NEGATIVE_TTL = 3600.0          # seconds, queries not found
+    _QUERY_CACHE: TTLCache = None
+    _QUERY_CACHE_LOCK = threading.Lock()
+
+    @classmethod
+    def query_cache(cls) -> TTLCache:
+        if cls._QUERY_CACHE is None:
+            with cls._QUERY_CACHE_LOCK:
+                if cls._QUERY_CACHE is None:
+                    cls._QUERY_CACHE = TTLCache(max_size=cls.QUERY_CACHE_MAX_SIZE, ttl=cls.QUERY_CACHE_TTL, 
+                                                negative_ttl=cls.QUERY_CACHE_NEGATIVE_TTL)
+        return cls._QUERY_CACHE
+
+    @classmethod
+    def api_key(cls) -> str:
+        if not cls._API_KEY_RESOLVED:
+            cls._API_KEY = api_helper.get_api_token('geocode.maps.co')
+            cls._API_KEY_RESOLVED = True
+        return cls._API_KEY
+
+    @classmethod
+    def api_enabled(cls) -> bool:
+        return cls.api_key() is not None
+
+    @classmethod
+    def lat_lon_url(cls, lat: float, lon: float) -> str:
+        return f"{cls.BASE_URL}/{cls.LAT_LON_URI}?api_key={cls.api_key()}&lat={lat}&lon={lon}"
+
+    @classmethod
+    def address_url(cls, address: str) -> str:
+        return f"{cls.BASE_URL}/{cls.ADDRESS_URI}?api_key={cls.api_key()}&q={address}"
+
+    @classmethod
+    def zip_url(cls, zip: str, country_cd: str = None) -> str:
+        url = f"{cls.BASE_URL}/{cls.ADDRESS_URI}?api_key={cls.api_key()}&postalcode={zip}"
+        if country_cd is not None:
+            url = f'{url}&country={country_cd}'
+        return url
+
+    @classmethod
+    def ip_url(cls, ip: str = None) -> str:
+        return cls.IP_URL if ip is None else f'{cls.IP_URL}{ip}'
 
 # ============================================================================================
-@dataclass
 class LocationCache:
-    cache: Dict[str, dict] = field(default_factory=dict)
-    valid_cache: bool = True
+    """
+    GeoLocation cache, keyed by lat/lon string (see GeoLocation.lat_lon).
+
+    Storage is delegated to a CacheBackend, by default an indexed SQLite database
+    (GEOLOC_CACHE_DB).  If a legacy JSON cache (GEOLOC_CACHE_FILENM) exists, it is
+    migrated into the new database the first time the cache is opened.
+
+    nearest() finds the closest cached location to a point with a cell range query
+    against the backend (see CacheBackend.keys_near), so nothing is loaded up front.
+    nearest_many() (and nearest() on backends without a spatial index) use an in-memory
+    ProximityIndex, built from the cache keys on first use.
 
-    def __post_init__(self):
-        if not _GeoLoc_Control.API_ENABLED:
+    Args:
+        backend (CacheBackend, optional): Cache storage. Defaults to SqliteCacheBackend.
+    """
+    def __init__(self, backend: CacheBackend = None):
+        self.valid_cache: bool = True
+        if not _GeoLoc_Control.api_enabled():
             LOGGER.trace('GeoLoc API key not defined, cache lookup only.')
 
-        self.load()
-        if self.valid_cache:
-            LOGGER.trace(f'Location cache loaded with {len(self.cache)} entries.')
-        else:
-            LOGGER.trace('Cache does not exist and could not be created.')
+        try:
+            if backend is None:
+                backend = SqliteCacheBackend(_GeoLoc_Control.GEOLOC_CACHE_DB, spatial=True)
+                if len(backend) == 0:
+                    migrate_json_cache(_GeoLoc_Control.GEOLOC_CACHE_FILENM, backend)
+            self._backend: CacheBackend = backend
+            self._proximity: ProximityIndex = None
+            self._proximity_lock = threading.Lock()
+            LOGGER.trace(f'Location cache opened with {len(self._backend)} entries [{self._backend.location}].')
+        except Exception as ex:
+            LOGGER.trace(f'Cache does not exist and could not be created - {repr(ex)}')
+            self._backend = None
+            self.valid_cache = False
 
     def __del__(self):
-        if self.valid_cache:
-            self.save()
-            LOGGER.debug(f'Location cache saved with {len(self.cache)} entries to {_GeoLoc_Control.GEOLOC_CACHE_FILENM}')
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._backend) if self.valid_cache else 0
+
+    @property
+    def backend(self) -> CacheBackend:
+        return self._backend
 
     def save(self):
         if self.valid_cache:
-            cache_file = _GeoLoc_Control.GEOLOC_CACHE_FILENM
-            cache_file.write_text(json.dumps(self.cache,indent=2), encoding='UTF-8')
-
-    def load(self):
-        cache_file = _GeoLoc_Control.GEOLOC_CACHE_FILENM
-        if cache_file.exists():
-            self.cache = json.loads(cache_file.read_text(encoding='UTF-8'))
-        elif cache_file.parent.exists():
-            self.cache = {}
-        else:
-            cache_file.parent.mkdir(parents=True)
+            self._backend.flush()
+
+    def close(self):
+        if getattr(self, 'valid_cache', False):
+            self._backend.close()
+            LOGGER.debug(f'Location cache closed [{self._backend.location}]')
+            self.valid_cache = False
 
     @lh.logger_wraps()
     def clear(self):
-        cache_file = pathlib.Path(_GeoLoc_Control.GEOLOC_CACHE_FILENM)
-        if cache_file.exists():
-            LOGGER.warning(f'{len(self.cache)} GeoLoc cache entries cleared.')
-            cache_file.unlink(missing_ok=True)
-            self.cache = {}
+        if self.valid_cache:
+            LOGGER.warning(f'{len(self._backend)} GeoLoc cache entries cleared.')
+            self._backend.clear()
+            self._proximity = None
 
     def exists(self, key) -> bool:
-        return key in self.cache.keys()
+        return self.valid_cache and self._backend.exists(key)
     
     def get(self, key) -> dict:
-        return self.cache.get(key, None)
+        return self._backend.get(key) if self.valid_cache else None
     
     def add(self, key, data):
+        if not self.valid_cache:
+            return
         if self.exists(key):
             LOGGER.error(f'{key} - ALREADY EXISTS IN CACHE')
-        self.cache[key] = data
+        self._backend.put(key, data)
+        if self._proximity is not None:
+            self._proximity.add(key)
+
+    @property
+    def proximity_index(self) -> ProximityIndex:
+        """Spatial index over the cached lat/lon keys (built on first use)"""
+        if self._proximity is None:
+            with self._proximity_lock:
+                if self._proximity is None:
+                    index = ProximityIndex(self._backend.keys() if self.valid_cache else ())
+                    LOGGER.trace(f'Location cache proximity index built with {len(index)} entries.')
+                    self._proximity = index
+        return self._proximity
 
-LOCATION_CACHE: LocationCache = LocationCache()
+    def nearest(self, lat: float, lon: float, radius_m: float = None) -> Union[Tuple[str, float], None]:
+        """
+        Closest cached location within radius_m of (lat, lon).
+
+        Args:
+            lat (float): Latitude.
+            lon (float): Longitude.
+            radius_m (float, optional): Max distance in meters. Defaults to PROXIMITY_RADIUS_M.
+
+        Returns:
+            Tuple[str, float]: (cache key, distance in meters) or None if none within radius_m.
+        """
+        if not self.valid_cache:
+            return None
+        radius_m = _GeoLoc_Control.PROXIMITY_RADIUS_M if radius_m is None else radius_m
+        if radius_m is None or radius_m <= 0:
+            return None
+        candidates = self._backend.keys_near(lat, lon, radius_m)
+        if candidates is None:
+            return self.proximity_index.nearest(lat, lon, radius_m)
+        return nearest_key(lat, lon, candidates, radius_m)
+
+    def nearest_many(self, lats: Iterable[float], lons: Iterable[float], k: int = 1, radius_m: float = None) -> List[List[Tuple[str, float]]]:
+        """
+        k nearest cached locations of many points (see ProximityIndex.nearest_many).
+
+        Args:
+            lats (Iterable[float]): Latitudes.
+            lons (Iterable[float]): Longitudes.
+            k (int, optional): Max neighbours per point. Defaults to 1.
+            radius_m (float, optional): Max distance in meters, math.inf for unbounded.
+                Defaults to PROXIMITY_RADIUS_M.
+
+        Returns:
+            List[List[Tuple[str, float]]]: Per point, up to k (cache key, distance in meters), closest first.
+        """
+        lats, lons = list(lats), list(lons)
+        if not self.valid_cache:
+            return [[] for _ in lats]
+        radius_m = _GeoLoc_Control.PROXIMITY_RADIUS_M if radius_m is None else radius_m
+        return self.proximity_index.nearest_many(lats, lons, k=k, radius_m=radius_m)
+
+_LOCATION_CACHE: LocationCache = None
+_LOCATION_CACHE_LOCK = threading.Lock()
+
+def _location_cache() -> LocationCache:
+    '''Return the module location cache, opened on first use'''
+    global _LOCATION_CACHE
+    if _LOCATION_CACHE is None:
+        with _LOCATION_CACHE_LOCK:
+            if _LOCATION_CACHE is None:
+                _LOCATION_CACHE = LocationCache()
+    return _LOCATION_CACHE
+
+def __getattr__(name: str):
+    # LOCATION_CACHE is created lazily, so importing this module does no file I/O
+    if name == 'LOCATION_CACHE':
+        return _location_cache()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
 # ============================================================================================
 class GeoLocation:
@@ -114,9 +268,7 @@ class GeoLocation:
     ip: str = None
     tz_name: str = None
 
-    _tf: TimezoneFinder = TimezoneFinder()
     _json_payload: dict = None
-    _last_call: datetime = datetime.now()
 
     @property
     def address(self) -> str:
@@ -148,7 +300,7 @@ class GeoLocation:
         """Return latitude longitude as a comma seperated string"""
         if self.lat is None or self.lon is None:
             return ''
-        return f'{float(self.lat):.7f},{float(self.lon):.7f}'
+        return self._lat_lon_key(self.lat, self.lon)
 
     @lh.logger_wraps()
     def _clear_location_data(self):
@@ -169,8 +321,8 @@ class GeoLocation:
 
     @lh.logger_wraps()
     def _load_location_data_from_cache(self, key: str) -> bool:
-        if LOCATION_CACHE.exists(key):        
-            loc_dict = LOCATION_CACHE.get(key)
+        loc_dict = _location_cache().get(key)
+        if loc_dict is not None:
             self.lat = loc_dict.get('lat')
             self.lon = loc_dict.get('lon')
             self.display_name = loc_dict.get('display_name')
@@ -183,10 +335,131 @@ class GeoLocation:
             self.country = loc_dict.get('country')
             self.ip = loc_dict.get('ip')
             self.tz_name = loc_dict.get('tz_name')
+            self._json_payload = loc_dict
             LOGGER.debug(f'({self.lat_lon}) retrieved from cache')
             return True
         
         return False
+
+    def _load_nearby_location_data(self, lat: float, lon: float) -> bool:
+        '''Load the closest cached location within PROXIMITY_RADIUS_M (GPS jitter), lat/lon are left as requested'''
+        near = _location_cache().nearest(lat, lon)
+        if near is None or not self._load_location_data_from_cache(near[0]):
+            return False
+        LOGGER.debug(f'({lat},{lon}) is {near[1]:.1f}m from cached {near[0]}')
+        self.lat = lat
+        self.lon = lon
+        return True
+
+    def _load_location_data_from_gazetteer(self, lat: float, lon: float) -> bool:
+        '''Load the nearest gazetteer place (offline, city level), lat/lon are left as requested'''
+        gaz = gazetteer.get_gazetteer()
+        place = None if gaz is None else gaz.nearest(lat, lon)
+        if place is None:
+            return False
+        address = {'city': place.name, 'county': place.county, 'state': place.state,
+                   'country_code': None if place.country is None else place.country.lower()}
+        self._json_payload = {'lat': lat, 'lon': lon, 'display_name': ', '.join(token for token in (place.name, place.county, place.state, place.country) if token),
+                              'address': address, 'tz_name': timezone_resolver.timezone_at(lat, lon),
+                              'source': 'gazetteer', 'distance_m': place.distance_m}
+        self.tz_name = self._json_payload['tz_name']
+        LOGGER.debug(f'({lat},{lon}) resolved offline to {place.name}, {place.distance_m / 1000:.1f}km')
+        return True
+
+    def _load_location_data_from_zip_index(self, zip: str, country_cd: str = None) -> bool:
+        '''
+        Load a zip code centroid from the offline zip index, fields as the API would return them.
+        Entries without place names (ie. Census ZCTA source) are only used when the API is not enabled.
+        '''
+        index = zip_index.get_zip_index()
+        place = None if index is None else index.lookup(zip, country_cd)
+        if place is None:
+            return False
+        if not place.has_names and _GeoLoc_Control.api_enabled():
+            LOGGER.debug(f'({zip}) zip index entry has no place names, using the geocode API')
+            return False
+        self.lat = place.lat
+        self.lon = place.lon
+        self.city = place.city
+        self.county = place.county
+        self.state = place.state
+        self.zip = place.zip
+        self.country = place.country_name
+        self.tz_name = timezone_resolver.timezone_at(place.lat, place.lon)
+        self.display_name = ', '.join(token for token in (place.city, place.county, place.state, place.zip, self.country) if token)
+        self._json_payload = {'lat': place.lat, 'lon': place.lon, 'display_name': self.display_name,
+                              'tz_name': self.tz_name, 'source': 'zip_index'}
+        LOGGER.debug(f'({zip}) resolved from zip index')
+        return True
+
+    @classmethod
+    def _is_cached(cls, lat: float, lon: float) -> bool:
+        return _location_cache().exists(cls._lat_lon_key(lat, lon)) or _location_cache().nearest(lat, lon) is not None
+
+    # ---------------------------------------------------------------------------------
+    @classmethod
+    def configure_query_cache(cls, max_size: int = None, ttl: float = None, negative_ttl: float = None, 
+                              persist: bool = False, db_file: Union[str, pathlib.Path] = None) -> TTLCache:
+        """
+        Replace the forward lookup (address, landmark, zip) cache.
+
+        Entries map a normalized query to the location cache key of its result (or 'not found'),
+        so a repeat query is served without an API call.
+
+        Args:
+            max_size (int, optional): Max in-memory entries. Defaults to QUERY_CACHE_MAX_SIZE.
+            ttl (float, optional): Seconds a result is cached. Defaults to QUERY_CACHE_TTL.
+            negative_ttl (float, optional): Seconds a 'not found' is cached. Defaults to QUERY_CACHE_NEGATIVE_TTL.
+            persist (bool, optional): Persist entries to a sqlite db. Defaults to False.
+            db_file (str|Path, optional): sqlite file when persisting. Defaults to GEOLOC_CACHE_DB.
+
+        Returns:
+            TTLCache: The new cache.
+        """
+        backend = None
+        if persist:
+            backend = SqliteCacheBackend(db_file or _GeoLoc_Control.GEOLOC_CACHE_DB, table='geoloc_query_cache')
+        cache = TTLCache(max_size=_GeoLoc_Control.QUERY_CACHE_MAX_SIZE if max_size is None else max_size,
+                         ttl=_GeoLoc_Control.QUERY_CACHE_TTL if ttl is None else ttl,
+                         negative_ttl=_GeoLoc_Control.QUERY_CACHE_NEGATIVE_TTL if negative_ttl is None else negative_ttl,
+                         backend=backend)
+        if backend is not None:
+            LOGGER.debug(f'GeoLocation query cache: {backend.location}, {cache.purge_expired()} expired entries removed')
+        with _GeoLoc_Control._QUERY_CACHE_LOCK:
+            _GeoLoc_Control._QUERY_CACHE = cache
+        return cache
+
+    @staticmethod
+    def _address_query_key(address: str) -> str:
+        return f'q|{normalize_street(address)}'
+
+    @staticmethod
+    def _zip_query_key(zip: str, country_cd: str = None) -> str:
+        return f'zip|{(country_cd or "").strip().upper()}|{normalize_zip(zip)}'
+
+    @staticmethod
+    def _query_cache_lookup(query_key: str) -> Tuple[bool, Union[dict, None]]:
+        '''(hit, payload), a cached 'not found' is (True, None)'''
+        hit, key = _GeoLoc_Control.query_cache().lookup(query_key)
+        if not hit:
+            return False, None
+        if key is None:
+            LOGGER.debug(f'({query_key}) cached as not found')
+            return True, None
+        loc_dict = _location_cache().get(key)
+        if loc_dict is None:
+            # location cache entry is gone (or cache unavailable), resolve again
+            return False, None
+        LOGGER.debug(f'({query_key}) -> ({key}) retrieved from query cache')
+        return True, loc_dict
+
+    @classmethod
+    def _query_cache_store(cls, query_key: str, loc_dict: dict, answered: bool):
+        '''Cache the result of a query, 'not found' only if the API answered (not a failed request)'''
+        if loc_dict:
+            _GeoLoc_Control.query_cache().put(query_key, cls._lat_lon_key(loc_dict['lat'], loc_dict['lon']))
+        elif answered:
+            _GeoLoc_Control.query_cache().put_negative(query_key)
     
     @lh.logger_wraps()
     def get_location_via_lat_lon(self, lat: float, lon: float) -> bool:
@@ -195,15 +468,29 @@ class GeoLocation:
         self.lat = lat
         self.lon = lon
         loc_dict = None
-        if self._load_location_data_from_cache(self.lat_lon):
+        query_key = self.lat_lon
+        if self._load_location_data_from_cache(query_key) or self._load_nearby_location_data(lat, lon):
             LOGGER.debug('-> Loaded from cache.')
-        elif not _GeoLoc_Control.API_ENABLED:
+            loc_dict = self._json_payload
+        elif (_GeoLoc_Control.GAZETTEER_FIRST or not _GeoLoc_Control.api_enabled()) and self._load_location_data_from_gazetteer(lat, lon):
+            loc_dict = self._json_payload
+        elif not _GeoLoc_Control.api_enabled():
             return False
         else:
-            url = f"{_GeoLoc_Control.BASE_URL}/{_GeoLoc_Control.LAT_LON_URI}?api_key={_GeoLoc_Control.API_KEY}&lat={self.lat}&lon={self.lon}"
-            LOGGER.trace(f'GEOLOC url: {url}')
-            loc_dict = self._api_call(url)
+            url = _GeoLoc_Control.lat_lon_url(self.lat, self.lon)
+            loc_dict, _ = self._api_call(url)
+            self._cache_query_key(query_key, loc_dict)
+            if not loc_dict and self._load_location_data_from_gazetteer(lat, lon):
+                loc_dict = self._json_payload
+
+        return self._populate_via_lat_lon_payload(loc_dict)
 
+    def _cache_query_key(self, query_key: str, loc_dict: dict):
+        if loc_dict and query_key != self.lat_lon:
+            # Also cache under the requested coordinates, so a repeat lookup is a hit
+            _location_cache().add(query_key, loc_dict)
+
+    def _populate_via_lat_lon_payload(self, loc_dict: dict) -> bool:
         if loc_dict:
             addr_dict: dict = loc_dict.get('address', {})
             self.display_name = loc_dict['display_name']
@@ -238,14 +525,19 @@ class GeoLocation:
         Returns:
             bool: True if location identified, False if not found.
         """
-        if not _GeoLoc_Control.API_ENABLED:
+        query_key = self._address_query_key(address)
+        hit, loc_dict = self._query_cache_lookup(query_key)
+        if not hit and not _GeoLoc_Control.api_enabled():
             return False
 
         if clear_existing:
             self._clear_location_data()
-        url = f"{_GeoLoc_Control.BASE_URL}/{_GeoLoc_Control.ADDRESS_URI}?api_key={_GeoLoc_Control.API_KEY}&q={address}"
-        LOGGER.trace(f'GEOLOC url: {url}')
-        loc_dict = self._api_call(url)
+        if hit:
+            self._load_api_payload(loc_dict)
+        else:
+            url = _GeoLoc_Control.address_url(address)
+            loc_dict, answered = self._api_call(url)
+            self._query_cache_store(query_key, loc_dict, answered)
         self._populate_via_payload(loc_dict)
         return loc_dict is not None # Found
         
@@ -259,9 +551,6 @@ class GeoLocation:
         Returns:
             bool: True if location identified, False if not found.
         """
-        if not _GeoLoc_Control.API_ENABLED:
-            return False
-        
         return self.get_location_via_address_string(address=landmark)
         
     @lh.logger_wraps()
@@ -279,9 +568,6 @@ class GeoLocation:
             bool: True if location identified, False if not found.
         """
         self._clear_location_data()
-        if not _GeoLoc_Control.API_ENABLED:
-            return False
-        
         # Load fields so self.address populates
         self.house = house
         self.street = street
@@ -293,16 +579,28 @@ class GeoLocation:
     
     @lh.logger_wraps()
     def get_location_via_zip(self, zip: str, country_cd: str = None) -> bool:
-        """Retrieve location based on zip code"""
+        """
+        Retrieve location based on zip code.
+
+        The offline zip index (see dt_tools.misc.zip_index) is checked first, then the query
+        cache and the geocode API.  Zip index results are the code's centroid with city, county,
+        state and country names in the API's format.  Index entries without place names (Census
+        ZCTA source) are skipped when the API is enabled, without an API key they set lat/lon only.
+        """
         self._clear_location_data()
         self.zip = zip
-        if not _GeoLoc_Control.API_ENABLED:
+        if self._load_location_data_from_zip_index(zip, country_cd):
+            return True
+        query_key = self._zip_query_key(zip, country_cd)
+        hit, loc_dict = self._query_cache_lookup(query_key)
+        if hit:
+            self._load_api_payload(loc_dict)
+        elif not _GeoLoc_Control.api_enabled():
             return False
-
-        url = f"{_GeoLoc_Control.BASE_URL}/{_GeoLoc_Control.ADDRESS_URI}?api_key={_GeoLoc_Control.API_KEY}&postalcode={self.zip}"
-        if country_cd is not None:
-            url = f'{url}&country={country_cd}'
-        loc_dict = self._api_call(url)
+        else:
+            url = _GeoLoc_Control.zip_url(self.zip, country_cd)
+            loc_dict, answered = self._api_call(url)
+            self._query_cache_store(query_key, loc_dict, answered)
         if loc_dict:
             self._populate_via_payload(loc_dict)
             return True
@@ -310,12 +608,22 @@ class GeoLocation:
         return False
     
     @lh.logger_wraps()
-    def get_location_via_ip(self) -> bool:
-        """Retrieve location info based on IP address"""
+    def get_location_via_ip(self, ip: str = None) -> bool:
+        """
+        Retrieve location info based on IP address
+
+        Args:
+            ip (str, optional): Public IP address.  Defaults to None (this device's public IP).
+
+        Returns:
+            bool: True if location identified, False if not found.
+        """
         self._clear_location_data()
         # Retrieve public IP address
-        resp = requests.get('http://ip-api.com/json/')
-        resp_json = resp.json()
+        resp = http_helper.get(_GeoLoc_Control.ip_url(ip))
+        return self._populate_via_ip_payload(resp.json())
+
+    def _populate_via_ip_payload(self, resp_json: dict) -> bool:
         if resp_json.get('status') == "success":
             ip = resp_json.get('query')
             self.lat = resp_json.get('lat')
@@ -336,53 +644,214 @@ class GeoLocation:
         return False
 
     # ---------------------------------------------------------------------------------
-    @lh.logger_wraps()
-    def _api_call(self, url) -> Dict:
-        while (datetime.now() - self._last_call).total_seconds() < 1.1:
-            LOGGER.trace('throttle.')
-            sleep(.1)
+    @classmethod
+    def geocode_many(cls, addresses: Iterable[str], max_workers: int = 4) -> Iterator[Tuple[str, Union['GeoLocation', None]]]:
+        """
+        Resolve many address strings (or landmarks).
 
-        LOGGER.trace(f'GEOLOC url: {url}')
-        loc_dict: dict = None
-        throttle = True
-        while throttle:
-            try:
-                resp = requests.get(url)
-                if resp.status_code == 200:
-                    json_data = resp.json()                
-                    LOGGER.trace(resp.json())
-                    throttle = False
-                    if isinstance(json_data, dict):
-                        loc_dict = json_data
-                    elif isinstance(json_data, list):
-                        if len(json_data) > 0:
-                            loc_dict = json_data[0]
-                        else:
-                            LOGGER.warning(f'GEOLOC not found for {url}')
-                    else:
-                        LOGGER.error(f'Unknown response: {url} - {json_data}')
-                elif resp.status_code == 429:
-                    LOGGER.warning('GEOLOC throttle...')
-                    sleep(1.1)
+        Duplicate addresses (same normalized address) are resolved once and yielded with
+        the first spelling passed in, previously resolved addresses come from the
+        query cache (see configure_query_cache()).  Lookups are dispatched concurrently and
+        throttled by the shared rate limiter, so throughput tracks the provider's
+        allowed rate.  Results are yielded as they complete (NOT in input order).
+
+        Args:
+            addresses (Iterable[str]): Address strings, ie. 'house street, city, state, zip'
+            max_workers (int, optional): Max concurrent requests. Defaults to 4.
+
+        Yields:
+            Tuple[str, GeoLocation]: (address, GeoLocation) or (address, None) if not found.
+        """
+        def resolve(address: str) -> Union[GeoLocation, None]:
+            geo = cls()
+            return geo if geo.get_location_via_address_string(address) else None
+
+        def from_cache(address: str) -> Tuple[bool, Union[GeoLocation, None]]:
+            hit, loc_dict = cls._query_cache_lookup(cls._address_query_key(address))
+            return hit, cls._from_payload(loc_dict)
+
+        yield from cls._dispatch_many(cls._unique(addresses, cls._address_query_key), resolve, from_cache, max_workers)
+
+    @classmethod
+    def reverse_geocode_many(cls, coordinates: Iterable[Tuple[float, float]], max_workers: int = 4) -> Iterator[Tuple[Tuple[float, float], Union['GeoLocation', None]]]:
+        """
+        Resolve addresses for many (lat, lon) coordinates.
+
+        Duplicate coordinates (same to 7 decimals) are resolved once and cached locations are yielded
+        immediately.  Cache misses are dispatched concurrently and throttled by the
+        shared rate limiter.  Results are yielded as they complete (NOT in input order).
+
+        Args:
+            coordinates (Iterable[Tuple[float, float]]): (lat, lon) pairs.
+            max_workers (int, optional): Max concurrent requests. Defaults to 4.
+
+        Yields:
+            Tuple[Tuple[float, float], GeoLocation]: ((lat, lon), GeoLocation) or ((lat, lon), None) if not found.
+        """
+        def resolve(lat_lon: Tuple[float, float]) -> Union[GeoLocation, None]:
+            geo = cls()
+            return geo if geo.get_location_via_lat_lon(*lat_lon) else None
+
+        def from_cache(lat_lon: Tuple[float, float]) -> Tuple[bool, Union[GeoLocation, None]]:
+            if cls._is_cached(*lat_lon) or not _GeoLoc_Control.api_enabled():
+                return True, resolve(lat_lon)     # cache or offline gazetteer, no network call
+            return False, None
+
+        yield from cls._dispatch_many(cls._unique(coordinates, lambda lat_lon: cls._lat_lon_key(*lat_lon)), resolve, from_cache, max_workers)
+
+    @classmethod
+    def _from_payload(cls, loc_dict: dict) -> Union['GeoLocation', None]:
+        '''Location for a cached forward lookup payload (None for a cached 'not found')'''
+        if loc_dict is None:
+            return None
+        geo = cls()
+        geo._clear_location_data()
+        geo._load_api_payload(loc_dict)
+        geo._populate_via_payload(loc_dict)
+        return geo
+
+    @staticmethod
+    def _unique(items: Iterable, key) -> Iterator:
+        '''Items as passed in (input order), later items with the same key(item) are dropped'''
+        seen = set()
+        for item in items:
+            item_key = key(item)
+            if item_key not in seen:
+                seen.add(item_key)
+                yield item
+
+    @classmethod
+    def _dispatch_many(cls, items: Iterable, resolve, from_cache, max_workers: int) -> Iterator[Tuple[object, Union['GeoLocation', None]]]:
+        # At most 2 * max_workers lookups in flight, completed lookups are yielded while input is still being read
+        window = 2 * max(1, max_workers)
+        executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='geoloc')
+        in_flight = {}
+        try:
+            for item in items:
+                hit, geo = from_cache(item)
+                if hit:
+                    yield item, geo
+                elif not _GeoLoc_Control.api_enabled():
+                    yield item, None
                 else:
-                    throttle = False
-                    LOGGER.warning(f'URL: {url}  RC: {resp.status_code} - {resp.text}')            
+                    in_flight[executor.submit(resolve, item)] = item
+                if len(in_flight) >= window:
+                    done = wait(in_flight, return_when=FIRST_COMPLETED)[0]
+                else:
+                    done = [future for future in in_flight if future.done()]
+                yield from cls._completed(done, in_flight)
+            while in_flight:
+                yield from cls._completed(wait(in_flight, return_when=FIRST_COMPLETED)[0], in_flight)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
 
+    @staticmethod
+    def _completed(done: Iterable, in_flight: dict) -> Iterator[Tuple[object, Union['GeoLocation', None]]]:
+        for future in done:
+            item = in_flight.pop(future)
+            try:
+                geo = future.result()
             except Exception as ex:
-                LOGGER.exception(f'Unable to get geoloc: {url} - {repr(ex)}')
+                LOGGER.error(f'Unable to resolve {item} - {repr(ex)}')
+                geo = None
+            yield item, geo
+
+    # ---------------------------------------------------------------------------------
+    @lh.logger_wraps()
+    def _api_call(self, url) -> Tuple[Dict, bool]:
+        loc_dict, answered = self._fetch(url)
+        self._load_api_payload(loc_dict)
+        return loc_dict, answered
 
+    def _load_api_payload(self, loc_dict: dict):
         if loc_dict:
             self._json_payload = loc_dict
             self.lat = float(loc_dict['lat'])
             self.lon = float(loc_dict['lon'])
-            self.tz_name = self._tf.timezone_at(lat=self.lat, lng=self.lon)
-            loc_dict['tz_name'] = self.tz_name
-            if not LOCATION_CACHE.exists(self.lat_lon):
-                LOCATION_CACHE.add(self.lat_lon, loc_dict)
-                LOGGER.debug(f'({self.lat_lon}) added to cache, {len(LOCATION_CACHE.cache)} total entries.')
+            self.tz_name = loc_dict.get('tz_name')
+
+    @classmethod
+    def _fetch(cls, url: str) -> Tuple[Dict, bool]:
+        """
+        Call the geocode API (throttled via the shared rate limiter) and cache the result.
+
+        Safe to call from multiple threads.  On HTTP 429 all callers are paused (honoring
+        Retry-After if supplied) and the call is retried up to MAX_THROTTLE_RETRIES times.
+
+        Returns:
+            Tuple[Dict, bool]: (location payload (with tz_name) or None, answered).  answered is 
+            False when the request failed (error, HTTP status, throttled), so a None payload
+            only means 'not found' when answered is True.
+        """
+        LOGGER.trace(f'GEOLOC url: {url}')
+        loc_dict: dict = None
+        answered = False
+        for _ in range(_GeoLoc_Control.MAX_THROTTLE_RETRIES + 1):
+            _GeoLoc_Control.RATE_LIMITER.acquire()
+            try:
+                resp = http_helper.get(url)
+            except Exception as ex:
+                LOGGER.exception(f'Unable to get geoloc: {url} - {repr(ex)}')
+                break
+
+            if resp.status_code == 429:
+                LOGGER.warning('GEOLOC throttle...')
+                _GeoLoc_Control.RATE_LIMITER.penalize(cls._retry_after(resp))
+                continue
+
+            loc_dict, answered = cls._parse_response(url, resp)
+            break
+
+        return cls._cache_payload(loc_dict), answered
+
+    @staticmethod
+    def _parse_response(url: str, resp) -> Tuple[Dict, bool]:
+        '''(payload or None, answered), answered is False unless the API returned a result set'''
+        loc_dict: dict = None
+        answered = False
+        if resp.status_code == 200:
+            json_data = resp.json()                
+            LOGGER.trace(json_data)
+            if isinstance(json_data, dict):
+                loc_dict = json_data
+                answered = True
+            elif isinstance(json_data, list):
+                answered = True
+                if len(json_data) > 0:
+                    loc_dict = json_data[0]
+                else:
+                    LOGGER.warning(f'GEOLOC not found for {url}')
+            else:
+                LOGGER.error(f'Unknown response: {url} - {json_data}')
+        else:
+            LOGGER.warning(f'URL: {url}  RC: {resp.status_code} - {resp.text}')            
+        return loc_dict, answered
+
+    @classmethod
+    def _cache_payload(cls, loc_dict: dict) -> Dict:
+        '''Add timezone to the payload and save in the location cache'''
+        if loc_dict:
+            lat = float(loc_dict['lat'])
+            lon = float(loc_dict['lon'])
+            loc_dict['tz_name'] = timezone_resolver.timezone_at(lat, lon)
+            key = cls._lat_lon_key(lat, lon)
+            if not _location_cache().exists(key):
+                _location_cache().add(key, loc_dict)
+                LOGGER.debug(f'({key}) added to cache, {len(_location_cache())} total entries.')
         
         return loc_dict
 
+    @staticmethod
+    def _retry_after(resp) -> float:
+        try:
+            return float(resp.headers.get('retry-after', _GeoLoc_Control.THROTTLE_PENALTY))
+        except ValueError:
+            return _GeoLoc_Control.THROTTLE_PENALTY
+
+    @staticmethod
+    def _lat_lon_key(lat: float, lon: float) -> str:
+        return f'{float(lat):.7f},{float(lon):.7f}'
+
     @lh.logger_wraps()
     def _populate_via_payload(self, payload: dict):
         if payload is None:
@@ -449,6 +918,273 @@ class GeoLocation:
         
         return output
 
+# ============================================================================================
+class AsyncGeoLocation(GeoLocation):
+    """
+    asyncio version of GeoLocation.
+
+    Lookup methods are coroutines.  Network calls go through the shared async http
+    session (see dt_tools.misc.async_http) and are throttled, without blocking the
+    event loop, by the same rate limiter used by GeoLocation.  Requires aiohttp.
+
+    Example::
+
+        async def main():
+            geo = AsyncGeoLocation()
+            if await geo.get_location_via_address_string('Statue of Liberty'):
+                print(geo.lat_lon)
+
+            async for (lat, lon), loc in AsyncGeoLocation.reverse_geocode_many(coords):
+                print(lat, lon, None if loc is None else loc.display_name)
+
+            await async_http.close_session()
+
+    """
+    async def get_location_via_lat_lon(self, lat: float, lon: float) -> bool:
+        """Retrieve address location based on lat/lon coordinates"""
+        self._clear_location_data()
+        self.lat = lat
+        self.lon = lon
+        loc_dict = None
+        query_key = self.lat_lon
+        if self._load_location_data_from_cache(query_key) or self._load_nearby_location_data(lat, lon):
+            LOGGER.debug('-> Loaded from cache.')
+            loc_dict = self._json_payload
+        elif (_GeoLoc_Control.GAZETTEER_FIRST or not _GeoLoc_Control.api_enabled()) and self._load_location_data_from_gazetteer(lat, lon):
+            loc_dict = self._json_payload
+        elif not _GeoLoc_Control.api_enabled():
+            return False
+        else:
+            loc_dict, _ = await self._api_call(_GeoLoc_Control.lat_lon_url(self.lat, self.lon))
+            self._cache_query_key(query_key, loc_dict)
+            if not loc_dict and self._load_location_data_from_gazetteer(lat, lon):
+                loc_dict = self._json_payload
+
+        return self._populate_via_lat_lon_payload(loc_dict)
+
+    async def get_location_via_address_string(self, address: str, clear_existing: bool = True) -> bool:
+        """
+        Retrieve location based on street address
+
+        Required:
+            address : typically house street, city, state, zip
+
+        Returns:
+            bool: True if location identified, False if not found.
+        """
+        query_key = self._address_query_key(address)
+        hit, loc_dict = self._query_cache_lookup(query_key)
+        if not hit and not _GeoLoc_Control.api_enabled():
+            return False
+
+        if clear_existing:
+            self._clear_location_data()
+        if hit:
+            self._load_api_payload(loc_dict)
+        else:
+            loc_dict, answered = await self._api_call(_GeoLoc_Control.address_url(address))
+            self._query_cache_store(query_key, loc_dict, answered)
+        self._populate_via_payload(loc_dict)
+        return loc_dict is not None # Found
+
+    async def get_location_via_landmark(self, landmark: str) -> bool:
+        """
+        Retrieve location based on landmark name.
+
+        Required:
+            landmark (str): Landmark name (ie. Statue of Liberty)
+
+        Returns:
+            bool: True if location identified, False if not found.
+        """
+        return await self.get_location_via_address_string(address=landmark)
+
+    async def get_location_via_address(self, city: str, state: str, house: int=None, street: str=None, zip: int=None) -> bool:
+        """
+        Retrieve location based on street address
+        
+        Required:
+            city, state
+
+        Optional:
+            house, street, zip
+
+        Returns:
+            bool: True if location identified, False if not found.
+        """
+        self._clear_location_data()
+        self.house = house
+        self.street = street
+        self.city = city
+        self.state = state
+        self.zip = zip
+        return await self.get_location_via_address_string(self.address, clear_existing=False)
+
+    async def get_location_via_zip(self, zip: str, country_cd: str = None) -> bool:
+        """
+        Retrieve location based on zip code.
+
+        The offline zip index (see dt_tools.misc.zip_index) is checked first, then the query
+        cache and the geocode API.  Zip index results are the code's centroid with city, county,
+        state and country names in the API's format.  Index entries without place names (Census
+        ZCTA source) are skipped when the API is enabled, without an API key they set lat/lon only.
+        """
+        self._clear_location_data()
+        self.zip = zip
+        if self._load_location_data_from_zip_index(zip, country_cd):
+            return True
+        query_key = self._zip_query_key(zip, country_cd)
+        hit, loc_dict = self._query_cache_lookup(query_key)
+        if hit:
+            self._load_api_payload(loc_dict)
+        elif not _GeoLoc_Control.api_enabled():
+            return False
+        else:
+            loc_dict, answered = await self._api_call(_GeoLoc_Control.zip_url(self.zip, country_cd))
+            self._query_cache_store(query_key, loc_dict, answered)
+        if loc_dict:
+            self._populate_via_payload(loc_dict)
+            return True
+        
+        return False
+
+    async def get_location_via_ip(self, ip: str = None) -> bool:
+        """
+        Retrieve location info based on IP address
+
+        Args:
+            ip (str, optional): Public IP address.  Defaults to None (this device's public IP).
+
+        Returns:
+            bool: True if location identified, False if not found.
+        """
+        self._clear_location_data()
+        resp = await async_http.get(_GeoLoc_Control.ip_url(ip))
+        return self._populate_via_ip_payload(resp.json())
+
+    # ---------------------------------------------------------------------------------
+    @classmethod
+    async def geocode_many(cls, addresses: Iterable[str], max_concurrency: int = 8) -> AsyncIterator[Tuple[str, Union['AsyncGeoLocation', None]]]:
+        """
+        Resolve many address strings (or landmarks) concurrently.
+
+        See GeoLocation.geocode_many().  Results are yielded as they complete.
+
+        Args:
+            addresses (Iterable[str]): Address strings.
+            max_concurrency (int, optional): Max in-flight requests. Defaults to 8.
+
+        Yields:
+            Tuple[str, AsyncGeoLocation]: (address, AsyncGeoLocation) or (address, None) if not found.
+        """
+        async def resolve(address: str) -> Union[AsyncGeoLocation, None]:
+            geo = cls()
+            return geo if await geo.get_location_via_address_string(address) else None
+
+        async def from_cache(address: str) -> Tuple[bool, Union[AsyncGeoLocation, None]]:
+            hit, loc_dict = cls._query_cache_lookup(cls._address_query_key(address))
+            return hit, cls._from_payload(loc_dict)
+
+        async for result in cls._dispatch_many_async(cls._unique(addresses, cls._address_query_key), resolve, from_cache, max_concurrency):
+            yield result
+
+    @classmethod
+    async def reverse_geocode_many(cls, coordinates: Iterable[Tuple[float, float]], max_concurrency: int = 8) -> AsyncIterator[Tuple[Tuple[float, float], Union['AsyncGeoLocation', None]]]:
+        """
+        Resolve addresses for many (lat, lon) coordinates concurrently.
+
+        See GeoLocation.reverse_geocode_many().  Cached locations are yielded
+        immediately, others as they complete.
+
+        Args:
+            coordinates (Iterable[Tuple[float, float]]): (lat, lon) pairs.
+            max_concurrency (int, optional): Max in-flight requests. Defaults to 8.
+
+        Yields:
+            Tuple[Tuple[float, float], AsyncGeoLocation]: ((lat, lon), AsyncGeoLocation) or ((lat, lon), None) if not found.
+        """
+        async def resolve(lat_lon: Tuple[float, float]) -> Union[AsyncGeoLocation, None]:
+            geo = cls()
+            return geo if await geo.get_location_via_lat_lon(*lat_lon) else None
+
+        async def from_cache(lat_lon: Tuple[float, float]) -> Tuple[bool, Union[AsyncGeoLocation, None]]:
+            if cls._is_cached(*lat_lon) or not _GeoLoc_Control.api_enabled():
+                return True, await resolve(lat_lon)
+            return False, None
+
+        async for result in cls._dispatch_many_async(cls._unique(coordinates, lambda lat_lon: cls._lat_lon_key(*lat_lon)), resolve, from_cache, max_concurrency):
+            yield result
+
+    @classmethod
+    async def _dispatch_many_async(cls, items: Iterable, resolve, from_cache, max_concurrency: int) -> AsyncIterator[Tuple[object, Union['AsyncGeoLocation', None]]]:
+        # At most max_concurrency lookups in flight, completed lookups are yielded while input is still being read
+        window = max(1, max_concurrency)
+
+        async def guarded(item) -> Tuple[object, Union[AsyncGeoLocation, None]]:
+            try:
+                return item, await resolve(item)
+            except Exception as ex:
+                LOGGER.error(f'Unable to resolve {item} - {repr(ex)}')
+                return item, None
+
+        tasks = set()
+        try:
+            for item in items:
+                hit, geo = await from_cache(item)
+                if hit:
+                    yield item, geo
+                elif not _GeoLoc_Control.api_enabled():
+                    yield item, None
+                else:
+                    tasks.add(asyncio.ensure_future(guarded(item)))
+                if len(tasks) >= window:
+                    done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                else:
+                    done = {task for task in tasks if task.done()}
+                    tasks -= done
+                for task in done:
+                    yield task.result()
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    # ---------------------------------------------------------------------------------
+    async def _api_call(self, url) -> Tuple[Dict, bool]:
+        loc_dict, answered = await self._fetch_async(url)
+        self._load_api_payload(loc_dict)
+        return loc_dict, answered
+
+    @classmethod
+    async def _fetch_async(cls, url: str) -> Tuple[Dict, bool]:
+        """
+        Async version of GeoLocation._fetch(), throttled without blocking the event loop.
+        """
+        LOGGER.trace(f'GEOLOC url: {url}')
+        loc_dict: dict = None
+        answered = False
+        for _ in range(_GeoLoc_Control.MAX_THROTTLE_RETRIES + 1):
+            await _GeoLoc_Control.RATE_LIMITER.acquire_async()
+            try:
+                resp = await async_http.get(url)
+            except Exception as ex:
+                LOGGER.error(f'Unable to get geoloc: {url} - {repr(ex)}')
+                break
+
+            if resp.status_code == 429:
+                LOGGER.warning('GEOLOC throttle...')
+                _GeoLoc_Control.RATE_LIMITER.penalize(cls._retry_after(resp))
+                continue
+
+            loc_dict, answered = cls._parse_response(url, resp)
+            break
+
+        return cls._cache_payload(loc_dict), answered
+
+
 def _print_object(obj):
     for line in obj.to_string().splitlines():
         LOGGER.info(f'  {line}')
@@ -463,7 +1199,7 @@ if __name__ == "__main__":
 
     lh.configure_logger(log_level='INFO', brightness=False)
     if '-c' in sys.argv:
-        LOCATION_CACHE.clear()
+        _location_cache().clear()
         
     helper = GeoLocation()
 
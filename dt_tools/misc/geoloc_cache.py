@@ -0,0 +1,322 @@
+"""
+Storage backends for the GeoLocation cache.
+
+The location cache is keyed by a lat/lon string (see GeoLocation.lat_lon) and stores
+the raw geocode payload (dict) for that location.
+
+Backends:
+
+- SqliteCacheBackend: (default) indexed on-disk store.  Point lookups read a single
+  row, inserts are committed incrementally, nothing is loaded at startup.  With
+  spatial=True, keys are also indexed by grid cell so keys_near() is a range query.
+- JsonCacheBackend: legacy whole-file JSON store.  Entire file is loaded on open and
+  re-written on flush.
+
+Example::
+
+    from dt_tools.misc.geoloc_cache import SqliteCacheBackend, migrate_json_cache
+
+    backend = SqliteCacheBackend('~/.IpHelper/geoloc_cache.db')
+    migrate_json_cache('~/.IpHelper/geoloc_cache.json', backend)
+    payload = backend.get('30.0691570,-81.5513870')
+
+"""
+import json
+import pathlib
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Iterator, List, Union
+
+from loguru import logger as LOGGER
+
+from dt_tools.misc.geoloc_proximity import cell_key, cell_key_ranges, parse_lat_lon_key
+
+
+# ============================================================================================
+class CacheBackend(ABC):
+    """
+    Abstract location cache storage.
+
+    Concrete backends must implement get, put, delete, clear, keys and __len__.
+    """
+    @property
+    @abstractmethod
+    def location(self) -> str:
+        """Description of where the cache is stored (ie. filename)"""
+
+    @abstractmethod
+    def get(self, key: str) -> Union[dict, None]:
+        """Return payload for key, None if not cached"""
+
+    @abstractmethod
+    def put(self, key: str, data: dict):
+        """Add (or replace) payload for key"""
+
+    @abstractmethod
+    def delete(self, key: str) -> bool:
+        """Remove key, return True if it existed"""
+
+    @abstractmethod
+    def clear(self):
+        """Remove all entries"""
+
+    @abstractmethod
+    def keys(self) -> Iterator[str]:
+        """Iterate over all keys"""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        pass
+
+    def exists(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def keys_near(self, lat: float, lon: float, radius_m: float) -> Union[List[str], None]:
+        """
+        Candidate 'lat,lon' keys within radius_m of (lat, lon) (a superset, callers check the distance).
+
+        Returns:
+            List[str]: Candidate keys, None if the backend has no spatial index (callers scan keys()).
+        """
+        return None
+
+    def put_many(self, items: Dict[str, dict]) -> int:
+        """Add multiple entries, return number of entries added"""
+        for key, data in items.items():
+            self.put(key, data)
+        return len(items)
+
+    def flush(self):
+        """Persist any pending changes"""
+        pass
+
+    def close(self):
+        """Flush and release resources"""
+        self.flush()
+
+
+# ============================================================================================
+class SqliteCacheBackend(CacheBackend):
+    """
+    SQLite location cache.
+
+    Entries are stored one row per key (primary key index), so lookups do not require
+    loading the cache, and each insert is committed as it happens (no re-write on exit).
+    The connection is shared across threads and serialized with a lock.
+
+    With spatial=True, 'lat,lon' keys are also stored with their grid cell (see
+    geoloc_proximity.cell_key) in an indexed column, existing rows are filled in
+    the first time the table is opened that way.
+
+    Args:
+        db_file (str|Path): Database filename, created if it does not exist.
+        table (str, optional): Table name. Defaults to 'location_cache'.
+        spatial (bool, optional): Index 'lat,lon' keys by grid cell (see keys_near). Defaults to False.
+    """
+    def __init__(self, db_file: Union[str, pathlib.Path], table: str = 'location_cache', spatial: bool = False):
+        self._db_file = pathlib.Path(db_file).expanduser().absolute()
+        self._table = table
+        self._spatial = spatial
+        self._lock = threading.RLock()
+        self._db_file.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self._db_file, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(f'CREATE TABLE IF NOT EXISTS {self._table} '
+                           '(key TEXT PRIMARY KEY, data TEXT NOT NULL, created REAL NOT NULL)')
+        if spatial:
+            self._add_cell_column()
+        LOGGER.trace(f'SqliteCacheBackend opened: {self._db_file}')
+
+    def _add_cell_column(self):
+        columns = [row[1] for row in self._conn.execute(f'PRAGMA table_info({self._table})')]
+        if 'cell' in columns:
+            return
+        self._conn.execute('BEGIN')
+        try:
+            self._conn.execute(f'ALTER TABLE {self._table} ADD COLUMN cell INTEGER')
+            rows = [(self._cell(key), key) for (key,) in self._conn.execute(f'SELECT key FROM {self._table}')]
+            self._conn.executemany(f'UPDATE {self._table} SET cell = ? WHERE key = ?', [row for row in rows if row[0] is not None])
+            self._conn.execute(f'CREATE INDEX IF NOT EXISTS {self._table}_cell ON {self._table} (cell)')
+            self._conn.execute('COMMIT')
+        except Exception:
+            self._conn.execute('ROLLBACK')
+            raise
+        LOGGER.debug(f'{self._table}: cell index added for {len(rows)} entries [{self._db_file}]')
+
+    @staticmethod
+    def _cell(key: str) -> Union[int, None]:
+        lat_lon = parse_lat_lon_key(key)
+        return None if lat_lon is None else cell_key(*lat_lon)
+
+    @property
+    def spatial(self) -> bool:
+        return self._spatial
+
+    @property
+    def location(self) -> str:
+        return str(self._db_file)
+
+    def get(self, key: str) -> Union[dict, None]:
+        with self._lock:
+            row = self._conn.execute(f'SELECT data FROM {self._table} WHERE key = ?', (key,)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def exists(self, key: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(f'SELECT 1 FROM {self._table} WHERE key = ?', (key,)).fetchone()
+        return row is not None
+
+    def put(self, key: str, data: dict):
+        with self._lock:
+            if self._spatial:
+                self._conn.execute(f'INSERT OR REPLACE INTO {self._table} (key, data, created, cell) VALUES (?, ?, ?, ?)',
+                                   (key, json.dumps(data), time.time(), self._cell(key)))
+            else:
+                self._conn.execute(f'INSERT OR REPLACE INTO {self._table} (key, data, created) VALUES (?, ?, ?)',
+                                   (key, json.dumps(data), time.time()))
+
+    def put_many(self, items: Dict[str, dict]) -> int:
+        now = time.time()
+        if self._spatial:
+            sql = f'INSERT OR REPLACE INTO {self._table} (key, data, created, cell) VALUES (?, ?, ?, ?)'
+            rows = [(key, json.dumps(data), now, self._cell(key)) for key, data in items.items()]
+        else:
+            sql = f'INSERT OR REPLACE INTO {self._table} (key, data, created) VALUES (?, ?, ?)'
+            rows = [(key, json.dumps(data), now) for key, data in items.items()]
+        with self._lock:
+            self._conn.execute('BEGIN')
+            try:
+                self._conn.executemany(sql, rows)
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return len(rows)
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(f'DELETE FROM {self._table} WHERE key = ?', (key,))
+        return cursor.rowcount > 0
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute(f'DELETE FROM {self._table}')
+
+    def keys(self) -> Iterator[str]:
+        with self._lock:
+            rows = self._conn.execute(f'SELECT key FROM {self._table}').fetchall()
+        for row in rows:
+            yield row[0]
+
+    def keys_near(self, lat: float, lon: float, radius_m: float) -> Union[List[str], None]:
+        if not self._spatial:
+            return None
+        ranges = cell_key_ranges(lat, lon, radius_m)
+        if ranges is None:
+            return None
+        where = ' OR '.join(['cell BETWEEN ? AND ?'] * len(ranges))
+        with self._lock:
+            rows = self._conn.execute(f'SELECT key FROM {self._table} WHERE {where}',
+                                      [bound for cells in ranges for bound in cells]).fetchall()
+        return [row[0] for row in rows]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(f'SELECT COUNT(*) FROM {self._table}').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# ============================================================================================
+class JsonCacheBackend(CacheBackend):
+    """
+    Legacy JSON location cache.
+
+    The whole file is loaded when the backend is created and re-written on flush().
+
+    Args:
+        json_file (str|Path): JSON cache filename.
+    """
+    def __init__(self, json_file: Union[str, pathlib.Path]):
+        self._json_file = pathlib.Path(json_file).expanduser().absolute()
+        self._cache: Dict[str, dict] = {}
+        self._dirty = False
+        self._lock = threading.RLock()
+        if self._json_file.exists():
+            self._cache = json.loads(self._json_file.read_text(encoding='UTF-8'))
+        else:
+            self._json_file.parent.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def location(self) -> str:
+        return str(self._json_file)
+
+    def get(self, key: str) -> Union[dict, None]:
+        return self._cache.get(key, None)
+
+    def put(self, key: str, data: dict):
+        with self._lock:
+            self._cache[key] = data
+            self._dirty = True
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            found = self._cache.pop(key, None) is not None
+            self._dirty = self._dirty or found
+        return found
+
+    def clear(self):
+        with self._lock:
+            self._cache = {}
+            self._json_file.unlink(missing_ok=True)
+            self._dirty = False
+
+    def keys(self) -> Iterator[str]:
+        return iter(list(self._cache.keys()))
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def flush(self):
+        with self._lock:
+            if self._dirty:
+                self._json_file.write_text(json.dumps(self._cache, indent=2), encoding='UTF-8')
+                self._dirty = False
+
+
+# ============================================================================================
+def migrate_json_cache(json_file: Union[str, pathlib.Path], backend: CacheBackend, rename_source: bool = True) -> int:
+    """
+    Load entries from a legacy JSON cache file into backend.
+
+    Args:
+        json_file (str|Path): Legacy JSON cache filename.
+        backend (CacheBackend): Target cache backend.
+        rename_source (bool, optional): Rename json_file to *.migrated when complete, so
+            it will not be migrated again. Defaults to True.
+
+    Returns:
+        int: Number of entries migrated (0 if json_file does not exist).
+    """
+    source = pathlib.Path(json_file).expanduser().absolute()
+    if not source.exists():
+        return 0
+
+    try:
+        entries: Dict[str, dict] = json.loads(source.read_text(encoding='UTF-8'))
+    except Exception as ex:
+        LOGGER.error(f'Unable to migrate {source} - {repr(ex)}')
+        return 0
+
+    cnt = backend.put_many(entries)
+    LOGGER.info(f'{cnt} location cache entries migrated from {source} to {backend.location}')
+    if rename_source:
+        source.rename(source.with_name(f'{source.name}.migrated'))
+    return cnt
@@ -0,0 +1,334 @@
+"""
+Proximity index for the GeoLocation cache.
+
+The location cache is keyed by a lat/lon string formatted to 7 decimals, so a GPS fix
+a few centimetres off the cached one misses the cache.  ProximityIndex keeps the
+coordinates of the cached keys in a grid of CELL_DEGREES cells (geohash like), so:
+
+- nearest(lat, lon, radius_m) finds the closest cached key within radius_m by
+  checking only the cells that overlap the radius (no numpy, no I/O)
+- nearest_many(lats, lons, k, radius_m) answers k-nearest queries for many points at
+  once, vectorized (numpy)
+
+Distances are great circle (haversine) distances in meters.
+
+Example::
+
+    from dt_tools.misc.geoloc_proximity import ProximityIndex
+
+    index = ProximityIndex(['30.0691570,-81.5513870', '40.6892494,-74.0445004'])
+    index.nearest(30.06916, -81.55139, radius_m=25)      # ('30.0691570,-81.5513870', 1.2)
+    index.nearest_many([30.0691, 40.689], [-81.5513, -74.0445], k=1, radius_m=500)
+
+"""
+import math
+import threading
+from typing import TYPE_CHECKING, Dict, Iterable, List, Sequence, Tuple, Union
+
+if TYPE_CHECKING:
+    import numpy as np
+
+EARTH_RADIUS_M = 6_371_008.8
+CELL_DEGREES = 0.01                                     # ~1.1km north/south
+_CELL_M = EARTH_RADIUS_M * math.radians(CELL_DEGREES)
+_MAX_RING = 25                                          # larger radius -> scan every point
+_MAX_PAIRS = 2_000_000                                  # (point, candidate) pairs per vectorized chunk
+_LON_CELLS = int(round(360 / CELL_DEGREES))
+
+
+def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great circle distance in meters"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    hav = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(hav)))
+
+def parse_lat_lon_key(key: str) -> Union[Tuple[float, float], None]:
+    """(lat, lon) of a 'lat,lon' cache key, None if key is not a coordinate"""
+    try:
+        lat, lon = (float(token) for token in key.split(','))
+    except (AttributeError, ValueError):
+        return None
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+        return None
+    return lat, lon
+
+def _cell(lat: float, lon: float) -> Tuple[int, int]:
+    return math.floor(lat / CELL_DEGREES), math.floor(lon / CELL_DEGREES) % _LON_CELLS
+
+def cell_key(lat: float, lon: float) -> int:
+    """Grid cell key of a point (row major, same as grid_cell_keys)"""
+    cell_lat, cell_lon = _cell(lat, lon)
+    return cell_lat * _LON_CELLS + cell_lon
+
+def cell_key_ranges(lat: float, lon: float, radius_m: float) -> Union[List[Tuple[int, int]], None]:
+    """
+    Cell key ranges (inclusive) of the cells overlapping radius_m of (lat, lon).
+
+    One or two ranges per grid row (two when the radius crosses the antimeridian), so
+    a store indexed by cell_key() answers a radius query with a few range scans.
+
+    Returns:
+        List[Tuple[int, int]]: (first, last) cell keys, None if radius_m spans too many grid rows (scan everything).
+    """
+    lat_ring, lon_ring = _rings(lat, radius_m)
+    if lat_ring > _MAX_RING:
+        return None
+    cell_lat, cell_lon = _cell(lat, lon)
+    ranges = []
+    for row in range(cell_lat - lat_ring, cell_lat + lat_ring + 1):
+        base = row * _LON_CELLS
+        first, last = cell_lon - lon_ring, cell_lon + lon_ring
+        if last - first + 1 >= _LON_CELLS:
+            ranges.append((base, base + _LON_CELLS - 1))
+        elif first < 0:
+            ranges += [(base, base + last), (base + first + _LON_CELLS, base + _LON_CELLS - 1)]
+        elif last >= _LON_CELLS:
+            ranges += [(base + first, base + _LON_CELLS - 1), (base, base + last - _LON_CELLS)]
+        else:
+            ranges.append((base + first, base + last))
+    return ranges
+
+def nearest_key(lat: float, lon: float, keys: Iterable[str], radius_m: float) -> Union[Tuple[str, float], None]:
+    """Closest 'lat,lon' key within radius_m of (lat, lon), (key, distance in meters) or None"""
+    best = None
+    for key in keys:
+        lat_lon = parse_lat_lon_key(key)
+        if lat_lon is None:
+            continue
+        dist = haversine_m(lat, lon, *lat_lon)
+        if dist <= radius_m and (best is None or dist < best[1]):
+            best = (key, dist)
+    return best
+
+def _rings(lat: float, radius_m: float) -> Tuple[int, int]:
+    """Number of cells (lat, lon) either side of a point's cell that overlap radius_m"""
+    lat_ring = math.ceil(radius_m / _CELL_M)
+    reach = abs(lat) + (lat_ring + 1) * CELL_DEGREES
+    if reach >= 90.0:
+        return lat_ring, _LON_CELLS          # radius reaches the pole, every longitude
+    return lat_ring, math.ceil(radius_m / (_CELL_M * math.cos(math.radians(reach))))
+
+
+# ============================================================================================
+class ProximityIndex:
+    """
+    Spatial index over 'lat,lon' cache keys.
+
+    Keys that are not coordinates are ignored.  Thread safe: lookups do not lock, a
+    cell's entries are replaced (not mutated) when a key is added.
+
+    Args:
+        keys (Iterable[str], optional): Initial cache keys. Defaults to None.
+    """
+    def __init__(self, keys: Iterable[str] = None):
+        self._cells: Dict[Tuple[int, int], Tuple[Tuple[float, float, str], ...]] = {}
+        self._count = 0
+        self._arrays = None
+        self._lock = threading.Lock()
+        for key in keys or ():
+            self.add(key)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, key: str) -> bool:
+        """Index a cache key, returns False if key is not a coordinate"""
+        lat_lon = parse_lat_lon_key(key)
+        if lat_lon is None:
+            return False
+        cell = _cell(*lat_lon)
+        with self._lock:
+            entries = self._cells.get(cell, ())
+            if any(entry[2] == key for entry in entries):
+                return True
+            self._cells[cell] = entries + ((*lat_lon, key),)
+            self._count += 1
+            self._arrays = None
+        return True
+
+    def nearest(self, lat: float, lon: float, radius_m: float) -> Union[Tuple[str, float], None]:
+        """
+        Closest indexed key within radius_m of (lat, lon).
+
+        Returns:
+            Tuple[str, float]: (key, distance in meters) or None if none within radius_m.
+        """
+        if radius_m is None or radius_m <= 0 or self._count == 0:
+            return None
+        lat_ring, lon_ring = _rings(lat, radius_m)
+        if lat_ring > _MAX_RING or lon_ring > _MAX_RING:
+            candidates = (entry for entries in list(self._cells.values()) for entry in entries)
+        else:
+            cell_lat, cell_lon = _cell(lat, lon)
+            candidates = (entry
+                          for d_lat in range(-lat_ring, lat_ring + 1)
+                          for d_lon in range(-lon_ring, lon_ring + 1)
+                          for entry in self._cells.get((cell_lat + d_lat, (cell_lon + d_lon) % _LON_CELLS), ()))
+        best = None
+        for entry_lat, entry_lon, key in candidates:
+            dist = haversine_m(lat, lon, entry_lat, entry_lon)
+            if dist <= radius_m and (best is None or dist < best[1]):
+                best = (key, dist)
+        return best
+
+    def nearest_many(self, lats: Sequence[float], lons: Sequence[float], k: int = 1,
+                     radius_m: float = math.inf) -> List[List[Tuple[str, float]]]:
+        """
+        k nearest indexed keys of many points.
+
+        See grid_nearest(), with an unbounded (or very large) radius every key is a candidate.
+
+        Args:
+            lats (Sequence[float]): Latitudes.
+            lons (Sequence[float]): Longitudes, same length as lats.
+            k (int, optional): Max neighbours per point. Defaults to 1.
+            radius_m (float, optional): Max distance in meters. Defaults to unbounded.
+
+        Raises:
+            ValueError: lats and lons differ in length.
+
+        Returns:
+            List[List[Tuple[str, float]]]: Per point, up to k (key, distance in meters),
+            closest first.
+        """
+        import numpy as np
+
+        lats = np.asarray(lats, dtype=np.float64).ravel()
+        results: List[List[Tuple[str, float]]] = [[] for _ in range(lats.size)]
+        keys, point_lats, point_lons, cell_keys = self._snapshot()
+        rows, idxs, dists = grid_nearest(cell_keys, point_lats, point_lons, lats, lons, k=k, radius_m=radius_m)
+        for row, idx, dist in zip(rows.tolist(), idxs.tolist(), dists.tolist()):
+            results[row].append((keys[idx], dist))
+        return results
+
+    # ---------------------------------------------------------------------------------
+    def _snapshot(self):
+        """(keys, lat array, lon array, sorted cell key array) of the indexed keys"""
+        arrays = self._arrays
+        if arrays is None:
+            import numpy as np
+
+            entries = [entry for cell in sorted(self._cells) for entry in self._cells[cell]]
+            keys = [entry[2] for entry in entries]
+            point_lats = np.array([entry[0] for entry in entries], dtype=np.float64)
+            point_lons = np.array([entry[1] for entry in entries], dtype=np.float64)
+            arrays = (keys, point_lats, point_lons, grid_cell_keys(point_lats, point_lons))
+            self._arrays = arrays
+        return arrays
+
+
+# ============================================================================================
+def _length_error(lats, lons):
+    raise ValueError(f'lats ({len(lats)}) and lons ({len(lons)}) differ in length')
+
+def grid_cell_keys(lats: 'np.ndarray', lons: 'np.ndarray', cell_degrees: float = CELL_DEGREES) -> 'np.ndarray':
+    """Grid cell key (row major, int64) of each point, points sorted by cell key are grouped by cell"""
+    import numpy as np
+
+    lon_cells = int(round(360 / cell_degrees))
+    return (np.floor(np.asarray(lats, dtype=np.float64) / cell_degrees).astype(np.int64) * lon_cells
+            + np.floor(np.asarray(lons, dtype=np.float64) / cell_degrees).astype(np.int64) % lon_cells)
+
+def grid_nearest(cell_keys: 'np.ndarray', point_lats: 'np.ndarray', point_lons: 'np.ndarray', lats: Sequence[float],
+                 lons: Sequence[float], k: int = 1, radius_m: float = math.inf,
+                 cell_degrees: float = CELL_DEGREES) -> Tuple['np.ndarray', 'np.ndarray', 'np.ndarray']:
+    """
+    k nearest indexed points of many query points (vectorized).
+
+    The indexed points must be sorted by grid_cell_keys(point_lats, point_lons, cell_degrees).
+    Each query is matched against the points of the cells overlapping radius_m, with an
+    unbounded (or very large) radius every indexed point is a candidate.
+
+    Args:
+        cell_keys (np.ndarray): Sorted cell keys of the indexed points.
+        point_lats (np.ndarray): Indexed point latitudes (degrees), in cell_keys order.
+        point_lons (np.ndarray): Indexed point longitudes (degrees), in cell_keys order.
+        lats (Sequence[float]): Query latitudes.
+        lons (Sequence[float]): Query longitudes, same length as lats.
+        k (int, optional): Max neighbours per query. Defaults to 1.
+        radius_m (float, optional): Max distance in meters. Defaults to unbounded.
+        cell_degrees (float, optional): Grid cell size of cell_keys. Defaults to CELL_DEGREES.
+
+    Raises:
+        ValueError: lats and lons differ in length.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: (query index, indexed point index, distance
+        in meters) of each match, ordered by query then distance.
+    """
+    import numpy as np
+
+    lats = np.asarray(lats, dtype=np.float64).ravel()
+    lons = np.asarray(lons, dtype=np.float64).ravel()
+    if lats.shape != lons.shape:
+        _length_error(lats, lons)
+    matches = [(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64))]
+    if lats.size == 0 or len(cell_keys) == 0 or k < 1 or radius_m <= 0:
+        return matches[0]
+
+    cell_m = EARTH_RADIUS_M * math.radians(cell_degrees)
+    lon_cells = int(round(360 / cell_degrees))
+    lat_ring = math.ceil(radius_m / cell_m) if math.isfinite(radius_m) else _MAX_RING + 1
+    if lat_ring > _MAX_RING:
+        chunk = max(1, _MAX_PAIRS // len(cell_keys))
+        for begin in range(0, lats.size, chunk):
+            rows = np.arange(begin, min(lats.size, begin + chunk))
+            matches.append(_nearest_pairs(np.repeat(rows, len(cell_keys)), np.tile(np.arange(len(cell_keys)), rows.size),
+                                          point_lats, point_lons, lats, lons, k, radius_m))
+        return tuple(np.concatenate(arrays) for arrays in zip(*matches))
+
+    # candidates of each query: per cell row within lat_ring, one span of cells (two if it
+    # wraps at the antimeridian) within the query's lon ring, sliced from the sorted cell keys
+    q_lat = np.floor(lats / cell_degrees).astype(np.int64)
+    q_lon = np.floor(lons / cell_degrees).astype(np.int64) % lon_cells
+    reach = np.abs(lats) + (lat_ring + 1) * cell_degrees
+    cos_lat = np.cos(np.radians(np.minimum(89.999, reach)))
+    lon_ring = np.ceil(radius_m / (cell_m * cos_lat)).astype(np.int64)
+    whole = (reach >= 90.0) | (2 * lon_ring + 1 >= lon_cells)
+    first = np.where(whole, 0, (q_lon - lon_ring) % lon_cells)
+    last = np.where(whole, lon_cells - 1, (q_lon + lon_ring) % lon_cells)
+    wraps = first > last
+    starts, stops = [], []
+    for d_lat in range(-lat_ring, lat_ring + 1):
+        row = (q_lat + d_lat) * lon_cells
+        starts += [np.searchsorted(cell_keys, row + first), np.searchsorted(cell_keys, row)]
+        stops += [np.searchsorted(cell_keys, row + np.where(wraps, lon_cells - 1, last), side='right'),
+                  np.where(wraps, np.searchsorted(cell_keys, row + last, side='right'), starts[-1])]
+    starts = np.stack(starts, axis=1)
+    counts = np.maximum(np.stack(stops, axis=1) - starts, 0)
+
+    # chunk the queries, so the (query, candidate) pairs stay bounded
+    totals = np.cumsum(counts.sum(axis=1))
+    begin = 0
+    while begin < lats.size:
+        end = max(begin + 1, int(np.searchsorted(totals, (totals[begin - 1] if begin else 0) + _MAX_PAIRS, side='right')))
+        span_counts = counts[begin:end].ravel()
+        total = int(span_counts.sum())
+        if total:
+            span_rows = np.repeat(np.arange(begin, end), starts.shape[1])
+            span_begin = np.cumsum(span_counts) - span_counts
+            pair_points = np.repeat(starts[begin:end].ravel(), span_counts) + np.arange(total) - np.repeat(span_begin, span_counts)
+            matches.append(_nearest_pairs(np.repeat(span_rows, span_counts), pair_points,
+                                          point_lats, point_lons, lats, lons, k, radius_m))
+        begin = end
+    return tuple(np.concatenate(arrays) for arrays in zip(*matches))
+
+def _nearest_pairs(pair_rows: 'np.ndarray', pair_points: 'np.ndarray', point_lats: 'np.ndarray', point_lons: 'np.ndarray',
+                   lats: 'np.ndarray', lons: 'np.ndarray', k: int, radius_m: float):
+    """(query, point, distance) of the k closest (query, point) pairs within radius_m per query"""
+    import numpy as np
+
+    phi = np.radians(lats[pair_rows])
+    cand_lat = np.radians(np.asarray(point_lats[pair_points], dtype=np.float64))
+    d_lon = np.radians(np.asarray(point_lons[pair_points], dtype=np.float64)) - np.radians(lons[pair_rows])
+    hav = np.sin((cand_lat - phi) / 2) ** 2 + np.cos(phi) * np.cos(cand_lat) * np.sin(d_lon / 2) ** 2
+    dist = 2 * EARTH_RADIUS_M * np.arcsin(np.minimum(1.0, np.sqrt(hav)))
+
+    within = dist <= radius_m
+    pair_rows, pair_points, dist = pair_rows[within], pair_points[within], dist[within]
+    order = np.lexsort((pair_points, dist, pair_rows))
+    pair_rows, pair_points, dist = pair_rows[order], pair_points[order], dist[order]
+    keep = np.arange(pair_rows.size) - np.searchsorted(pair_rows, pair_rows, side='left') < k
+    return pair_rows[keep], pair_points[keep], dist[keep]
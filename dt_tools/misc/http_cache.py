@@ -0,0 +1,280 @@
+"""
+In-memory HTTP response cache with conditional requests (RFC 9111 subset), used by
+the NWS weather endpoints.
+
+- Responses are fresh for Cache-Control max-age (less Age), else until Expires.
+  no-store responses are not cached, no-cache responses are always revalidated.
+- Once stale, the cached response is revalidated with If-None-Match (ETag) and/or
+  If-Modified-Since (Last-Modified).  A 304 reply refreshes the entry's lifetime and
+  the cached body is reused (no payload transfer, and no JSON re-parse unless the
+  cache is created with retain_json=False).
+- If revalidation fails (connection error or 5xx) the stale response is served.
+- Least recently used entries are evicted beyond max_entries.
+
+Requests go through the shared transport (http_helper) or, for get_async(), the
+shared async session (async_http).
+
+Example::
+
+    from dt_tools.misc.http_cache import HttpCache
+
+    cache = HttpCache()
+    resp = cache.get('https://api.weather.gov/gridpoints/JAX/66,53/forecast')
+    print(resp.status_code, resp.from_cache, cache.stats().to_string())
+
+"""
+import email.utils
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Mapping, Union
+
+from loguru import logger as LOGGER
+
+from dt_tools.misc import http_helper
+from dt_tools.misc.http_helper import HTTP_SETTINGS
+
+
+# ============================================================================================
+@dataclass
+class CachedResponse():
+    """
+    Cached 200 response (mirrors requests.Response: status_code, headers, content, text, json()).
+
+    json() is parsed once and, if the cache retains json, shared by every caller: treat
+    it as read-only.
+    """
+    url: str
+    status_code: int
+    headers: Dict[str, str] = field(default_factory=dict)   # lower case names
+    content: bytes = b''
+    expires: float = 0.0        # time.time() the response goes stale
+    from_cache: bool = False    # served without a payload transfer (fresh or 304)
+    _parsed: list = field(default_factory=list, repr=False)   # [json], shared by copies of the entry
+
+    @property
+    def etag(self) -> Union[str, None]:
+        return self.headers.get('etag')
+
+    @property
+    def last_modified(self) -> Union[str, None]:
+        return self.headers.get('last-modified')
+
+    @property
+    def text(self) -> str:
+        return self.content.decode('UTF-8', errors='replace')
+
+    def json(self) -> Any:
+        if len(self._parsed) == 0:
+            self._parsed.append(json.loads(self.content))
+        return self._parsed[0]
+
+    def is_fresh(self, now: float = None) -> bool:
+        return (time.time() if now is None else now) < self.expires
+
+    def can_revalidate(self) -> bool:
+        return self.etag is not None or self.last_modified is not None
+
+
+@dataclass
+class HttpCacheStats():
+    """Cache counters"""
+    hits: int = 0           # fresh, no request
+    revalidated: int = 0    # 304, body reused
+    misses: int = 0         # full response
+    stale: int = 0          # stale response served after a failed revalidation
+    uncacheable: int = 0    # no-store or non-200
+
+    def to_string(self) -> str:
+        return (f'hits: {self.hits}  revalidated: {self.revalidated}  misses: {self.misses}  '
+                f'stale: {self.stale}  uncacheable: {self.uncacheable}')
+
+
+# ============================================================================================
+def _served(entry: CachedResponse, share_json: bool = True) -> CachedResponse:
+    # Copy handed to the caller, shares content (and parsed json) with the cache entry
+    served = {**vars(entry), 'from_cache': True}
+    if not share_json:
+        served['_parsed'] = []
+    return CachedResponse(**served)
+
+def cache_control(headers: Mapping[str, str]) -> Dict[str, Union[str, None]]:
+    """Parse the Cache-Control header into {directive: value}"""
+    directives = {}
+    for token in headers.get('cache-control', '').split(','):
+        name, _, value = token.strip().partition('=')
+        if name:
+            directives[name.lower()] = value.strip('"') if value else None
+    return directives
+
+def freshness_lifetime(headers: Mapping[str, str]) -> Union[float, None]:
+    """
+    Seconds a response stays fresh (from headers with lower case names).
+
+    Returns:
+        float: Lifetime (0 = revalidate on every use), None if the response must not be stored.
+    """
+    directives = cache_control(headers)
+    if 'no-store' in directives:
+        return None
+    if 'no-cache' in directives:
+        return 0.0
+    age = _int(headers.get('age'), 0)
+    max_age = _int(directives.get('max-age'), None)
+    if max_age is not None:
+        return max(0.0, float(max_age - age))
+    expires = _http_date(headers.get('expires'))
+    if expires is not None:
+        date = _http_date(headers.get('date')) or time.time()
+        return max(0.0, expires - date)
+    return 0.0
+
+def _int(value: Union[str, None], default: Union[int, None]) -> Union[int, None]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+def _http_date(value: Union[str, None]) -> Union[float, None]:
+    if not value:
+        return None
+    try:
+        return email.utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+# ============================================================================================
+class HttpCache:
+    """
+    In-memory HTTP GET cache with conditional revalidation.
+
+    Args:
+        max_entries (int, optional): Max cached responses, 0 disables caching. Defaults to 1000.
+        retain_json (bool, optional): Keep the parsed json of cached responses (no re-parse on a
+            hit or 304, more memory). Defaults to True.
+    """
+    def __init__(self, max_entries: int = 1000, retain_json: bool = True):
+        self.max_entries = max_entries
+        self.retain_json = retain_json
+        self._entries: 'OrderedDict[str, CachedResponse]' = OrderedDict()
+        self._stats = HttpCacheStats()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, url: str, headers: Dict[str, str] = None):
+        """
+        GET url, served from cache when fresh, else a (conditional) request.
+
+        Returns:
+            CachedResponse for 200/304 responses, else the transport response.
+        """
+        entry, request_headers = self._prepare(url, headers)
+        if entry is not None and entry.is_fresh():
+            return entry
+        try:
+            resp = http_helper.get(url, headers=request_headers)
+        except Exception:
+            if entry is None:
+                raise
+            return self._serve_stale(entry)
+        return self._update(url, entry, resp.status_code, resp.headers, resp.content, resp)
+
+    async def get_async(self, url: str, headers: Dict[str, str] = None):
+        """
+        asyncio version of get() (see async_http.get).
+        """
+        from dt_tools.misc import async_http
+        entry, request_headers = self._prepare(url, headers)
+        if entry is not None and entry.is_fresh():
+            return entry
+        try:
+            resp = await async_http.get(url, headers=request_headers)
+        except Exception:
+            if entry is None:
+                raise
+            return self._serve_stale(entry)
+        return self._update(url, entry, resp.status_code, resp.headers, resp.content, resp)
+
+    def lookup(self, url: str) -> Union[CachedResponse, None]:
+        """Cached response for url (fresh or stale), None if not cached"""
+        with self._lock:
+            return self._entries.get(url)
+
+    def invalidate(self, url: str) -> bool:
+        with self._lock:
+            return self._entries.pop(url, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> HttpCacheStats:
+        """Return a copy of the cache counters"""
+        with self._lock:
+            return HttpCacheStats(**vars(self._stats))
+
+    # ---------------------------------------------------------------------------------
+    def _prepare(self, url: str, headers: Dict[str, str]):
+        request_headers = dict(headers or {})
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None:
+                return None, request_headers
+            self._entries.move_to_end(url)
+            if entry.is_fresh():
+                self._stats.hits += 1
+                entry = _served(entry, self.retain_json)
+                return entry, request_headers
+        if entry.etag is not None:
+            request_headers['If-None-Match'] = entry.etag
+        if entry.last_modified is not None:
+            request_headers['If-Modified-Since'] = entry.last_modified
+        return entry, request_headers
+
+    def _update(self, url: str, entry: CachedResponse, status_code: int, headers: Mapping[str, str], content: bytes, resp):
+        headers = {name.lower(): value for name, value in headers.items()}
+        now = time.time()
+        if status_code == 304 and entry is not None:
+            merged = {**entry.headers, **headers}
+            lifetime = freshness_lifetime(merged)
+            with self._lock:
+                self._stats.revalidated += 1
+                entry.headers = merged
+                entry.expires = now + (lifetime or 0.0)
+            LOGGER.trace(f'HTTP cache revalidated: {url}')
+            return _served(entry, self.retain_json)
+
+        if status_code in HTTP_SETTINGS.RETRY_STATUS and entry is not None:
+            return self._serve_stale(entry)
+
+        lifetime = freshness_lifetime(headers) if status_code == 200 else None
+        if lifetime is None or self.max_entries <= 0:
+            with self._lock:
+                self._stats.uncacheable += 1
+                if status_code != 200:
+                    self._entries.pop(url, None)
+            return resp
+
+        entry = CachedResponse(url=url, status_code=200, headers=headers, content=content, expires=now + lifetime)
+        with self._lock:
+            self._stats.misses += 1
+            if lifetime > 0 or entry.can_revalidate():
+                self._entries[url] = entry
+                self._entries.move_to_end(url)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        if not self.retain_json:
+            # the caller's copy parses on demand, the cache entry keeps the body only
+            return CachedResponse(**{**vars(entry), '_parsed': []})
+        return entry
+
+    def _serve_stale(self, entry: CachedResponse) -> CachedResponse:
+        LOGGER.debug(f'HTTP cache revalidation failed, serving stale response: {entry.url}')
+        with self._lock:
+            self._stats.stale += 1
+        return _served(entry, self.retain_json)
@@ -0,0 +1,227 @@
+"""
+Shared HTTP transport used by the geolocation and weather modules.
+
+Features:
+
+- One pooled, keep-alive requests.Session per host (scheme://host:port).
+- Connect and read timeouts on every call (a stalled server can not hang a worker).
+- Bounded exponential-backoff retries on connection errors, timeouts and 5xx responses.
+- Per-host counters (requests, retries, errors, latency).
+
+Settings are class attributes of HTTP_SETTINGS and may be changed at startup, or a
+custom HttpTransport may be installed via set_transport().
+
+Example::
+
+    from dt_tools.misc import http_helper
+
+    resp = http_helper.get('https://api.weather.gov/points/30.0694,-81.5515')
+    print(resp.status_code)
+    for host, stats in http_helper.host_stats().items():
+        print(host, stats.to_string())
+
+"""
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Tuple, Union
+from urllib.parse import urlsplit
+
+import requests
+from loguru import logger as LOGGER
+from requests.adapters import HTTPAdapter
+
+
+# ============================================================================================
+class HTTP_SETTINGS:
+    CONNECT_TIMEOUT = 5.0       # seconds
+    READ_TIMEOUT = 15.0         # seconds
+    POOL_SIZE_PER_HOST = 10     # Max keep-alive connections per host
+    MAX_RETRIES = 3             # Retries after the initial attempt (GET)
+    BACKOFF_FACTOR = 0.5        # Retry n waits BACKOFF_FACTOR * 2**(n-1) seconds (+ jitter)
+    BACKOFF_MAX = 8.0           # Max wait between retries (seconds)
+    RETRY_STATUS = (500, 502, 503, 504)
+    USER_AGENT = 'dt-misc (https://github.com/JavaWiz1/dt-misc)'
+
+
+# ============================================================================================
+@dataclass
+class HostStats():
+    """
+    Counters for calls to a single host.
+    """
+    host: str
+    requests: int = 0
+    retries: int = 0
+    errors: int = 0
+    total_latency: float = 0.0
+    max_latency: float = 0.0
+
+    @property
+    def avg_latency(self) -> float:
+        return 0.0 if self.requests == 0 else self.total_latency / self.requests
+
+    def to_string(self) -> str:
+        return (f'requests: {self.requests}  retries: {self.retries}  errors: {self.errors}  '
+                f'latency avg: {self.avg_latency*1000:.1f}ms  max: {self.max_latency*1000:.1f}ms')
+
+
+# ============================================================================================
+def host_key(url: str) -> str:
+    """Return scheme://netloc for url"""
+    parts = urlsplit(url)
+    return f'{parts.scheme}://{parts.netloc}'
+
+def backoff_delay(attempt: int) -> float:
+    """Delay (seconds) before retry number attempt (1..n)"""
+    delay = min(HTTP_SETTINGS.BACKOFF_MAX, HTTP_SETTINGS.BACKOFF_FACTOR * (2 ** (attempt - 1)))
+    return delay * random.uniform(0.8, 1.2)
+
+
+class HttpTransport:
+    """
+    Pooled HTTP transport with timeouts, retries and per-host stats.
+
+    Args:
+        connect_timeout (float, optional): Defaults to HTTP_SETTINGS.CONNECT_TIMEOUT.
+        read_timeout (float, optional): Defaults to HTTP_SETTINGS.READ_TIMEOUT.
+        max_retries (int, optional): Defaults to HTTP_SETTINGS.MAX_RETRIES.
+        pool_size (int, optional): Connections per host. Defaults to HTTP_SETTINGS.POOL_SIZE_PER_HOST.
+    """
+    def __init__(self, connect_timeout: float = None, read_timeout: float = None, max_retries: int = None, pool_size: int = None):
+        self.connect_timeout = HTTP_SETTINGS.CONNECT_TIMEOUT if connect_timeout is None else connect_timeout
+        self.read_timeout = HTTP_SETTINGS.READ_TIMEOUT if read_timeout is None else read_timeout
+        self.max_retries = HTTP_SETTINGS.MAX_RETRIES if max_retries is None else max_retries
+        self.pool_size = HTTP_SETTINGS.POOL_SIZE_PER_HOST if pool_size is None else pool_size
+        self._sessions: Dict[str, requests.Session] = {}
+        self._stats: Dict[str, HostStats] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        return (self.connect_timeout, self.read_timeout)
+
+    def session(self, url: str) -> requests.Session:
+        """Return the (pooled) session for the url's host"""
+        host = host_key(url)
+        session = self._sessions.get(host)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(host)
+                if session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+                    session.mount(f'{urlsplit(url).scheme}://', adapter)
+                    session.headers['User-Agent'] = HTTP_SETTINGS.USER_AGENT
+                    self._sessions[host] = session
+                    LOGGER.trace(f'HTTP session created for {host}')
+        return session
+
+    def record(self, url: str, latency: float = None, retry: bool = False, error: bool = False):
+        """Update counters for the url's host"""
+        host = host_key(url)
+        with self._lock:
+            stats = self._stats.get(host)
+            if stats is None:
+                stats = HostStats(host)
+                self._stats[host] = stats
+            if latency is not None:
+                stats.requests += 1
+                stats.total_latency += latency
+                stats.max_latency = max(stats.max_latency, latency)
+            if retry:
+                stats.retries += 1
+            if error:
+                stats.errors += 1
+
+    def request(self, method: str, url: str, retries: int = None, **kwargs) -> requests.Response:
+        """
+        Issue an HTTP request with timeout and retry policy.
+
+        Args:
+            method (str): GET, POST, ...
+            url (str): Target URL
+            retries (int, optional): Max retries. Defaults to max_retries for GET, 0 otherwise.
+            kwargs: Passed to requests (headers, params, data, files, timeout, ...)
+
+        Raises:
+            requests.RequestException: When the final attempt fails.
+
+        Returns:
+            requests.Response: Response (possibly a 5xx if retries are exhausted).
+        """
+        if retries is None:
+            retries = self.max_retries if method.upper() == 'GET' else 0
+        kwargs.setdefault('timeout', self.timeout)
+        session = self.session(url)
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                resp = session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as ex:
+                self.record(url, latency=time.perf_counter() - start, error=True)
+                if attempt >= retries:
+                    raise
+                LOGGER.debug(f'{method} {url} failed ({repr(ex)}), retrying')
+            else:
+                self.record(url, latency=time.perf_counter() - start)
+                if resp.status_code not in HTTP_SETTINGS.RETRY_STATUS or attempt >= retries:
+                    return resp
+                LOGGER.debug(f'{method} {url} returned {resp.status_code}, retrying')
+
+            attempt += 1
+            self.record(url, retry=True)
+            time.sleep(backoff_delay(attempt))
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def stats(self) -> Dict[str, HostStats]:
+        """Return a copy of the per-host counters"""
+        with self._lock:
+            return {host: HostStats(**vars(stats)) for host, stats in self._stats.items()}
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions = {}
+
+
+# ============================================================================================
+_TRANSPORT: HttpTransport = None
+_TRANSPORT_LOCK = threading.Lock()
+
+def get_transport() -> HttpTransport:
+    """Return the shared transport (created on first use)"""
+    global _TRANSPORT
+    if _TRANSPORT is None:
+        with _TRANSPORT_LOCK:
+            if _TRANSPORT is None:
+                _TRANSPORT = HttpTransport()
+    return _TRANSPORT
+
+def set_transport(transport: Union[HttpTransport, None]):
+    """Replace the shared transport (None resets to defaults on next use)"""
+    global _TRANSPORT
+    with _TRANSPORT_LOCK:
+        if _TRANSPORT is not None and _TRANSPORT is not transport:
+            _TRANSPORT.close()
+        _TRANSPORT = transport
+
+def get(url: str, **kwargs) -> requests.Response:
+    """GET url via the shared transport (see HttpTransport.request)"""
+    return get_transport().get(url, **kwargs)
+
+def post(url: str, **kwargs) -> requests.Response:
+    """POST to url via the shared transport (see HttpTransport.request)"""
+    return get_transport().post(url, **kwargs)
+
+def host_stats() -> Dict[str, HostStats]:
+    """Per-host counters for the shared transport"""
+    return get_transport().stats()
@@ -0,0 +1,271 @@
+"""
+Locate an audio player for Sound without searching the filesystem.
+
+Discovery order:
+
+1. Override, via configure(player=...) or the DT_SOUND_PLAYER environment variable.
+   The value is a player name (ie. 'mpg123') or the path to a player executable.
+2. Persisted result (~/.IpHelper/sound_player.json), used only if the executable still
+   exists with the same size and modification time.
+3. PATH lookup (shutil.which) for each auto-selectable player, plus the standard VLC
+   install folder on Windows.  When more than one player is found, the one with the
+   lowest measured startup latency is chosen, and the result is persisted.
+
+The result is kept for the life of the process, so after the first call discovery
+costs nothing.
+
+Supported players: cvlc (VLC), mpg123, ffplay, paplay.  paplay has no speed control and
+older versions (libsndfile < 1.1) can not decode MP3 (gTTS output), so it is only used
+when selected via the override.
+
+Example::
+
+    from dt_tools.misc import player_discovery
+
+    found = player_discovery.discover()
+    print(found.name, found.path, f'{found.latency*1000:.0f}ms')
+    backend = found.backend()   # ProcessPlayer
+
+"""
+import json
+import os
+import pathlib
+import shutil
+import subprocess
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List, Union
+
+from loguru import logger as LOGGER
+
+from dt_tools.misc.sound_player import ProcessPlayer
+
+ENV_OVERRIDE = 'DT_SOUND_PLAYER'
+
+
+@dataclass(frozen=True)
+class PlayerSpec():
+    """Supported player: executable names (per platform), version probe and backend factory"""
+    name: str
+    executables: tuple
+    windows_executables: tuple
+    probe_args: tuple
+    factory: Callable[[str], ProcessPlayer]
+    preference: int
+    auto: bool = True                # plays MP3 with speed control, eligible for discovery (else override only)
+
+
+def _vlc(exe: str) -> ProcessPlayer:
+    return ProcessPlayer.vlc(exe, windows=os.name == 'nt')
+
+PLAYERS: Dict[str, PlayerSpec] = {spec.name: spec for spec in (
+    PlayerSpec('vlc', ('cvlc',), ('vlc.exe',), ('--version',), _vlc, 0),
+    PlayerSpec('mpg123', ('mpg123',), ('mpg123.exe',), ('--version',), ProcessPlayer.mpg123, 1),
+    PlayerSpec('ffplay', ('ffplay',), ('ffplay.exe',), ('-version',), ProcessPlayer.ffplay, 2),
+    PlayerSpec('paplay', ('paplay',), (), ('--version',), ProcessPlayer.paplay, 3, auto=False),
+)}
+
+
+@dataclass
+class DiscoveredPlayer():
+    """Discovery result"""
+    name: str
+    path: str
+    latency: float = 0.0     # measured startup time (seconds), 0 if not measured
+    size: int = 0
+    mtime: float = 0.0
+    source: str = 'path'     # override, persisted or path
+
+    def backend(self) -> ProcessPlayer:
+        """ProcessPlayer for this executable"""
+        return PLAYERS[self.name].factory(self.path)
+
+    def is_valid(self) -> bool:
+        """True if the executable is unchanged since discovery"""
+        stat = _stat(self.path)
+        return stat is not None and (stat.st_size, stat.st_mtime) == (self.size, self.mtime)
+
+
+class PlayerDiscovery:
+    """
+    Audio player discovery with an override and a persisted result.
+
+    Args:
+        cache_file (str|Path, optional): Persisted result. Defaults to ~/.IpHelper/sound_player.json.
+        players (List[str], optional): Candidate player names. Defaults to all supported players.
+    """
+    CACHE_FILE = pathlib.Path('~').expanduser().absolute() / ".IpHelper" / "sound_player.json"
+    PROBE_TIMEOUT = 5.0
+
+    def __init__(self, cache_file: Union[str, pathlib.Path] = None, players: List[str] = None):
+        self.cache_file = pathlib.Path(cache_file or self.CACHE_FILE).expanduser()
+        self.players = list(players or PLAYERS)
+        self.override: str = None
+        self._found: DiscoveredPlayer = None
+        self._lock = threading.Lock()
+
+    def configure(self, player: str = None):
+        """
+        Set the override (player name or executable path), None reverts to discovery.
+        """
+        with self._lock:
+            self.override = player
+            self._found = None
+
+    def discover(self, refresh: bool = False) -> Union[DiscoveredPlayer, None]:
+        """
+        Return the player to use, None if no supported player is installed.
+
+        Args:
+            refresh (bool, optional): Ignore the persisted result and re-scan PATH. Defaults to False.
+        """
+        if self._found is not None and not refresh:
+            return self._found
+        with self._lock:
+            if self._found is None or refresh:
+                self._found = self._discover(refresh)
+        return self._found
+
+    def candidates(self) -> List[DiscoveredPlayer]:
+        """Auto-selectable players on PATH (latency not measured)"""
+        found = []
+        for name in (name for name in self.players if PLAYERS[name].auto):
+            path = self._which(PLAYERS[name])
+            if path is not None:
+                found.append(_discovered(name, path, source='path'))
+        return found
+
+    def measure(self, player: DiscoveredPlayer, runs: int = 2) -> float:
+        """Startup latency of the player (best of runs), seconds.  inf if it fails to start"""
+        best = float('inf')
+        cmd = [player.path, *PLAYERS[player.name].probe_args]
+        for _ in range(max(1, runs)):
+            start = time.perf_counter()
+            try:
+                subprocess.run(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL, timeout=self.PROBE_TIMEOUT, check=False)
+            except (OSError, subprocess.TimeoutExpired) as ex:
+                LOGGER.debug(f'{player.name} probe failed - {repr(ex)}')
+                return best
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    def clear(self):
+        """Forget the discovered player (memory and persisted)"""
+        with self._lock:
+            self._found = None
+            self.cache_file.unlink(missing_ok=True)
+
+    # ---------------------------------------------------------------------------------
+    def _discover(self, refresh: bool) -> Union[DiscoveredPlayer, None]:
+        override = self.override or os.environ.get(ENV_OVERRIDE)
+        if override:
+            found = self._from_override(override)
+            if found is not None:
+                return found
+            LOGGER.warning(f'Sound player override [{override}] not found, using discovery.')
+
+        if not refresh:
+            found = self._load()
+            if found is not None:
+                return found
+
+        candidates = self.candidates()
+        if len(candidates) == 0:
+            LOGGER.debug(f'No sound player found on PATH (tried: {", ".join(self.players)})')
+            return None
+        if len(candidates) > 1:
+            for candidate in candidates:
+                candidate.latency = self.measure(candidate)
+                LOGGER.debug(f'- {candidate.name:7} {candidate.latency*1000:7.1f}ms  {candidate.path}')
+        found = min(candidates, key=lambda item: (item.latency, PLAYERS[item.name].preference))
+        LOGGER.debug(f'Sound player: {found.name} ({found.path})')
+        self._save(found)
+        return found
+
+    def _from_override(self, override: str) -> Union[DiscoveredPlayer, None]:
+        if override in PLAYERS:
+            path = self._which(PLAYERS[override])
+            return None if path is None else _discovered(override, path, source='override')
+        path = shutil.which(override)
+        if path is None:
+            return None
+        stem = pathlib.Path(path).stem.lower()
+        for spec in PLAYERS.values():
+            if stem in (pathlib.Path(exe).stem for exe in (*spec.executables, *spec.windows_executables)):
+                return _discovered(spec.name, path, source='override')
+        LOGGER.warning(f'Sound player override [{override}] is not a supported player ({", ".join(PLAYERS)})')
+        return None
+
+    @staticmethod
+    def _which(spec: PlayerSpec) -> Union[str, None]:
+        executables = spec.windows_executables if os.name == 'nt' else spec.executables
+        for exe in executables:
+            path = shutil.which(exe)
+            if path is not None:
+                return path
+        if os.name == 'nt' and spec.name == 'vlc':
+            # VLC's installer does not add itself to PATH, check the standard install folders
+            for env_var in ('ProgramFiles', 'ProgramFiles(x86)'):
+                if os.environ.get(env_var):
+                    path = pathlib.Path(os.environ[env_var]) / 'VideoLAN' / 'VLC' / 'vlc.exe'
+                    if path.is_file():
+                        return str(path)
+        return None
+
+    def _load(self) -> Union[DiscoveredPlayer, None]:
+        try:
+            data = json.loads(self.cache_file.read_text(encoding='UTF-8'))
+            found = DiscoveredPlayer(**data)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, TypeError) as ex:
+            LOGGER.debug(f'Ignoring {self.cache_file} - {repr(ex)}')
+            return None
+        if found.name not in self.players or not PLAYERS[found.name].auto or not found.is_valid():
+            LOGGER.debug(f'Persisted sound player [{found.name}: {found.path}] is stale.')
+            return None
+        found.source = 'persisted'
+        return found
+
+    def _save(self, found: DiscoveredPlayer):
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            self.cache_file.write_text(json.dumps(asdict(found), indent=2), encoding='UTF-8')
+        except OSError as ex:
+            LOGGER.debug(f'Unable to save {self.cache_file} - {repr(ex)}')
+
+
+def _stat(path: str) -> Union[os.stat_result, None]:
+    try:
+        return os.stat(path)
+    except OSError:
+        return None
+
+def _discovered(name: str, path: str, source: str) -> DiscoveredPlayer:
+    stat = _stat(path)
+    size, mtime = (stat.st_size, stat.st_mtime) if stat is not None else (0, 0.0)
+    return DiscoveredPlayer(name=name, path=path, size=size, mtime=mtime, source=source)
+
+
+# ============================================================================================
+_DISCOVERY: PlayerDiscovery = None
+_DISCOVERY_LOCK = threading.Lock()
+
+def get_discovery() -> PlayerDiscovery:
+    """Return the shared discovery (created on first use)"""
+    global _DISCOVERY
+    if _DISCOVERY is None:
+        with _DISCOVERY_LOCK:
+            if _DISCOVERY is None:
+                _DISCOVERY = PlayerDiscovery()
+    return _DISCOVERY
+
+def discover(refresh: bool = False) -> Union[DiscoveredPlayer, None]:
+    """Player to use via the shared discovery (see PlayerDiscovery.discover)"""
+    return get_discovery().discover(refresh)
+
+def configure(player: str = None):
+    """Set the player override (name or executable path) on the shared discovery"""
+    get_discovery().configure(player)
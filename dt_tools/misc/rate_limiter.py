@@ -0,0 +1,123 @@
+"""
+Token bucket rate limiter, used to throttle calls to rate limited 3rd party APIs.
+
+The bucket refills at `rate` tokens per second up to `capacity` (burst size).  Each
+call to acquire() reserves a token and waits until the reservation is due, so
+concurrent callers are spaced evenly at the allowed rate rather than polling.
+
+When the provider pushes back (ie. HTTP 429), penalize() pauses all callers for the
+requested time.
+
+Example::
+
+    from dt_tools.misc.rate_limiter import TokenBucket
+
+    bucket = TokenBucket(rate=1.0)   # 1 call per second
+    for url in urls:
+        bucket.acquire()
+        resp = requests.get(url)
+        if resp.status_code == 429:
+            bucket.penalize(float(resp.headers.get('Retry-After', 1)))
+
+"""
+import asyncio
+import threading
+import time
+
+from loguru import logger as LOGGER
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    Args:
+        rate (float): Tokens added per second (ie. allowed calls per second).
+        capacity (float, optional): Max tokens held (burst size). Defaults to 1.0.
+    """
+    def __init__(self, rate: float, capacity: float = 1.0):
+        if rate <= 0:
+            raise ValueError('rate must be > 0')
+        if capacity < 1:
+            raise ValueError('capacity must be >= 1')
+        self._rate = rate
+        self._capacity = capacity
+        self._interval = 1.0 / rate
+        self._burst = (capacity - 1.0) * self._interval
+        self._lock = threading.Lock()
+        self._next_due: float = 0.0      # theoretical time the next token is available
+        self._blocked_until: float = 0.0
+        self.acquired: int = 0
+        self.penalties: int = 0
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    def _reserve(self) -> float:
+        '''Reserve the next token, return number of seconds until it may be used'''
+        with self._lock:
+            now = time.monotonic()
+            next_due = max(self._next_due, now)
+            start = max(next_due - self._burst, self._blocked_until, now)
+            self._next_due = max(next_due, start) + self._interval
+            self.acquired += 1
+            return start - now
+
+    def _is_blocked(self) -> bool:
+        with self._lock:
+            return self._blocked_until > time.monotonic()
+
+    def acquire(self) -> float:
+        """
+        Block until a token is available.
+
+        Returns:
+            float: Seconds spent waiting.
+        """
+        waited = 0.0
+        while True:
+            delay = self._reserve()
+            if delay > 0:
+                LOGGER.trace(f'throttle {delay:.3f}s')
+                time.sleep(delay)
+                waited += delay
+            if not self._is_blocked():
+                return waited
+            # penalize() was called while waiting, get back in line.
+            with self._lock:
+                self.acquired -= 1
+
+    async def acquire_async(self) -> float:
+        """
+        Wait (without blocking the event loop) until a token is available.
+
+        Returns:
+            float: Seconds spent waiting.
+        """
+        waited = 0.0
+        while True:
+            delay = self._reserve()
+            if delay > 0:
+                LOGGER.trace(f'throttle {delay:.3f}s')
+                await asyncio.sleep(delay)
+                waited += delay
+            if not self._is_blocked():
+                return waited
+            with self._lock:
+                self.acquired -= 1
+
+    def penalize(self, seconds: float):
+        """
+        Pause all callers for the specified number of seconds (ie. on HTTP 429).
+
+        Args:
+            seconds (float): Pause duration.
+        """
+        with self._lock:
+            until = time.monotonic() + max(seconds, self._interval)
+            if until > self._blocked_until:
+                self._blocked_until = until
+                self._next_due = max(self._next_due, until)
+            self.penalties += 1
+        LOGGER.debug(f'Rate limit penalty {seconds:.2f}s')
@@ -1,7 +1,9 @@
 """
 Speak a string of text or speak the contents of a text file.
 
-Currently, these routines expect VLC to be installed.
+A supported audio player (VLC, mpg123 or ffplay, or paplay via the override) must be
+installed, see dt_tools.misc.player_discovery for how the player is located (and how to
+override it).
 
 Example::
     from dt_tools.os.sound import Accent, Sound
@@ -10,22 +12,44 @@ Example::
     obj.speak('This is a test')
     obj.speak('This is a test, with an australian accent.', accent=Accent.Australia)
 
-ToDo:
+Synthesized speech is cached on disk (see dt_tools.misc.tts_cache), repeated phrases
+play without a network round trip.  Use Sound.warm_cache() to pre-synthesize phrases.
 
-    Update to be cross platform without relying on VLC
+Long text (ie. a text file) is split into sentence chunks, chunk N+1 is synthesized
+while chunk N plays, so there is no synthesis gap between chunks.
+
+Playback goes through a pluggable player backend (see dt_tools.misc.sound_player),
+the default starts the discovered player per clip.  Sound.set_player() selects another backend, ie. a
+long-running mpg123 process, or NullPlayer for headless use.  When the player accepts
+in-memory audio and the TTS cache is bypassed, clips never touch the disk.
+
+Speech and sound files are played one at a time by a single worker thread (see
+dt_tools.misc.speech_queue).  Requests are prioritized, an urgent request can
+pre-empt the current one, and enqueue()/enqueue_play() return futures::
+
+    future = Sound.enqueue('Tornado warning', priority=Priority.ALERT, preempt=True)
+    future.result()
+    print(Sound.metrics().to_string())
 
 """
-import os
 import pathlib
+import re
 import textwrap
 import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from enum import Enum
-from time import sleep
+from typing import Iterable, Iterator, Union
 
 from dt_tools.os.os_helper import OSHelper as helper
 from gtts import gTTS
 from loguru import logger as LOGGER
 
+from dt_tools.misc import player_discovery
+from dt_tools.misc.sound_player import PlayerBackend
+from dt_tools.misc.speech_queue import Priority, QueueMetrics, SpeechJob, SpeechQueue
+from dt_tools.misc.tts_cache import TTSCache, gtts_synthesize
+
 class Accent(Enum):
     """Accent codes for speaking"""
     Australia = "com.au"
@@ -42,33 +66,41 @@ class Sound(object):
     """
     Class to speak a string of text (or contents of a text file).
 
-    This class relies on VLC being installed, it works on both Windows and Linux.
+    This class relies on a supported audio player being installed (see player_discovery),
+    it works on both Windows and Linux.
 
     Raises:
-        FileNotFoundError: If file is not found.
+        FileNotFoundError: If no supported audio player is found.
 
     """
-    _locked: bool = False
-    _speak_thread_id: int = None
-    _VLC: str = None
+    _PLAYER: PlayerBackend = None
+    _TTS_CACHE: TTSCache = None
+    _TTS_CACHE_LOCK = threading.Lock()
+    _QUEUE = SpeechQueue(name='sound')
+    CHUNK_MAX_CHARS = 250   # Max text per synthesized chunk (long text is split on sentences)
+    SYNTH_LOOKAHEAD = 2     # Chunks synthesized ahead of the one playing (0 = synthesize, then play)
+    _NO_PLAYER_MSG = (f'An audio player ({", ".join(player_discovery.PLAYERS)}) is required to use this module.  '
+                      f'Install one, or set {player_discovery.ENV_OVERRIDE} to the player executable.')
+    _SENTENCE_END = re.compile(r'(?<=[.!?;:])\s+|\n\s*\n')
 
     def __new__(cls):
         # Make this class a singleton
         if not hasattr(cls, '_instance'):
             cls._instance = super(Sound, cls).__new__(cls)
 
-        if not cls._is_VLC_installed():
-            raise FileNotFoundError('VLC is required to use this module.  Unable to locate VLC module')
+        if Sound._PLAYER is None and player_discovery.discover() is None:
+            raise FileNotFoundError(cls._NO_PLAYER_MSG)
         return cls._instance
 
 
     # -- Public Functions -------------------------------------------------------------------------------------------
     @classmethod
-    def speak(cls, in_token: str, speed: float = 1.0, accent: Accent = Accent.UnitedStates, ignore_in_progress: bool = False, wait: bool = True, delete_mp3:bool = True) -> bool:
+    def speak(cls, in_token: str, speed: float = 1.0, accent: Accent = Accent.UnitedStates, ignore_in_progress: bool = False, wait: bool = True, 
+              delete_mp3:bool = True, use_cache: bool = True, priority: Priority = Priority.NORMAL, preempt: bool = False) -> bool:
         """
         Speak the text string or contents of the file
 
-        NOTE: Speech will block until done if already speaking.
+        NOTE: Requests are queued, speech starts when earlier (or higher priority) requests are done.
 
         Args:
             in_token (str): File or string of text to be spoken
@@ -76,118 +108,269 @@ class Sound(object):
             accent (Accent, optional): Accent of speaker. Defaults to Accent.UnitedStates.
             ignore_in_progress: (bool, optional): Ignore request if speech is already in progress. Defaults to False
             wait: (bool, optional): Wait for speech to finish before returning. Defaults to True.
-            delete_mp3 (bool, optional): Remove generate mp3 file. Defaults to True
+            delete_mp3 (bool, optional): Remove generate mp3 file (when not cached). Defaults to True
+            use_cache (bool, optional): Use (and populate) the TTS clip cache. Defaults to True.
+            priority (Priority, optional): Queue priority. Defaults to Priority.NORMAL.
+            preempt (bool, optional): Interrupt current speech if it is lower priority. Defaults to False.
 
         Returns:
-            bool: True if successful else False
+            bool: True if successful (or queued when wait is False) else False
         """
         if cls.is_speaking() and ignore_in_progress:
-            LOGGER.warning(f'Speak thread [{cls._speak_thread_id}] in process... Ignoring request.')
+            LOGGER.warning('Speech in process... Ignoring request.')
             return False
-        
-        if cls.is_speaking():
-            LOGGER.debug(f'Waiting to speak... {in_token}')
-            while cls.is_speaking():
-                sleep(.25)
 
-        cls._locked = True
-        text = pathlib.Path(in_token).read_text() if cls._is_file(in_token) else in_token
+        future = cls.enqueue(in_token, speed=speed, accent=accent, delete_mp3=delete_mp3, use_cache=use_cache, priority=priority, preempt=preempt)
+        if not wait:
+            return True
+        return future.result()
 
-        kwargs = {'text': text, 'speed': speed, 'accent': accent, 'delete_mp3': delete_mp3}
-        t = threading.Thread(target=cls._speak, kwargs=kwargs)
-        t.start()
-        cls._speak_thread_id = t.native_id
-        
-        if wait:
-            while cls.is_speaking():
-                sleep(.25)
+    @classmethod
+    def enqueue(cls, in_token: str, speed: float = 1.0, accent: Accent = Accent.UnitedStates, delete_mp3: bool = True, 
+                use_cache: bool = True, priority: Priority = Priority.NORMAL, preempt: bool = False) -> Future:
+        """
+        Queue text (or contents of a file) to be spoken, see speak().
+
+        Returns:
+            Future: Resolves to True if spoken completely, False on failure or if pre-empted.
+        """
+        text = pathlib.Path(in_token).read_text() if cls._is_file(in_token) else in_token
+        kwargs = {'text': text, 'speed': speed, 'accent': accent, 'delete_mp3': delete_mp3, 'use_cache': use_cache}
+        return cls._QUEUE.submit(lambda job: cls._speak(job=job, **kwargs), priority=priority, preempt=preempt, 
+                                 description=f'speak: {text[:40]}')
 
     @classmethod
     def is_speaking(cls) -> bool:
         """
-        Is speech in progress...
+        Is speech (or sound) in progress or queued...
 
         Returns:
             bool: True if speech is occuring, else False
         """
-        return True if cls._speak_thread_id is not None or cls._locked else False
+        return cls._QUEUE.is_busy()
+
+    @classmethod
+    def wait_until_done(cls, timeout: float = None) -> bool:
+        """
+        Block until queued speech/sound is done.
+
+        Args:
+            timeout (float, optional): Max seconds to wait. Defaults to None (no limit).
+
+        Returns:
+            bool: True if done, False on timeout.
+        """
+        return cls._QUEUE.wait_idle(timeout)
+
+    @classmethod
+    def stop(cls):
+        """Stop current speech/sound and discard queued requests"""
+        cls._QUEUE.stop()
+
+    @classmethod
+    def metrics(cls) -> QueueMetrics:
+        """Queue depth, wait and play time counters"""
+        return cls._QUEUE.metrics()
     
     @classmethod
-    def play(cls, sound_file: str, speed: float = 1.0) -> int:
+    def play(cls, sound_file: str, speed: float = 1.0, priority: Priority = Priority.NORMAL, preempt: bool = False, wait: bool = True) -> int:
         """
         Play a sound file.
 
         Args:
             sound_file (str): Filename
             speed (float, optional): Speed (cadence) of voice. Defaults to 1.0.
+            priority (Priority, optional): Queue priority. Defaults to Priority.NORMAL.
+            preempt (bool, optional): Interrupt current speech if it is lower priority. Defaults to False.
+            wait: (bool, optional): Wait for playback to finish before returning. Defaults to True.
+
+        Returns:
+            int: 0 if successful (or queued when wait is False) else non-zero
+        """
+        future = cls.enqueue_play(sound_file, speed=speed, priority=priority, preempt=preempt)
+        if not wait:
+            return 0
+        return future.result()
+
+    @classmethod
+    def enqueue_play(cls, sound_file: str, speed: float = 1.0, priority: Priority = Priority.NORMAL, preempt: bool = False) -> Future:
+        """
+        Queue a sound file to be played, see play().
+
+        Returns:
+            Future: Resolves to the player return code (0 if successful).
+        """
+        return cls._QUEUE.submit(lambda job: cls._play(sound_file, speed, job=job), priority=priority, preempt=preempt,
+                                 description=f'play: {sound_file}')
+
+    @classmethod
+    def player(cls) -> PlayerBackend:
+        """Return the player backend (discovered player per clip, unless set via set_player())"""
+        if Sound._PLAYER is None:
+            found = player_discovery.discover()
+            if found is None:
+                raise FileNotFoundError(cls._NO_PLAYER_MSG)
+            Sound._PLAYER = found.backend()
+        return Sound._PLAYER
+
+    @classmethod
+    def set_player(cls, player: Union[PlayerBackend, None]):
+        """
+        Set the player backend (None resets to the discovered player).
+
+        Args:
+            player (PlayerBackend): ie. Mpg123RemotePlayer(), NullPlayer()
+        """
+        previous = Sound._PLAYER
+        Sound._PLAYER = player
+        if previous is not None and previous is not player:
+            previous.close()
+
+    @classmethod
+    def tts_cache(cls) -> TTSCache:
+        """Return the TTS clip cache (created on first use)"""
+        if Sound._TTS_CACHE is None:
+            with Sound._TTS_CACHE_LOCK:
+                if Sound._TTS_CACHE is None:
+                    Sound._TTS_CACHE = TTSCache()
+        return Sound._TTS_CACHE
+
+    @classmethod
+    def configure_tts_cache(cls, cache_dir: str = None, max_bytes: int = 200 * 1024 * 1024) -> TTSCache:
+        """
+        Replace the TTS clip cache.
+
+        Args:
+            cache_dir (str, optional): Clip directory. Defaults to ~/.IpHelper/tts_cache.
+            max_bytes (int, optional): Max total size of cached clips. Defaults to 200MB.
+
+        Returns:
+            TTSCache: The new cache.
+        """
+        with Sound._TTS_CACHE_LOCK:
+            Sound._TTS_CACHE = TTSCache(cache_dir=cache_dir, max_bytes=max_bytes)
+        return Sound._TTS_CACHE
+
+    @classmethod
+    def warm_cache(cls, phrases: Iterable[str], accent: Accent = Accent.UnitedStates) -> int:
+        """
+        Pre-synthesize phrases, so speaking them later starts playback immediately.
+
+        Args:
+            phrases (Iterable[str]): Phrases (ie. alert headlines, hourly time checks).
+            accent (Accent, optional): Accent of speaker. Defaults to Accent.UnitedStates.
 
         Returns:
-            int: 0 if successful else non-zero
-        """
-        while cls.is_speaking():
-            LOGGER.trace('waiting..')
-            sleep(1)
-        cls._locked = True
-        result = cls._play(sound_file, speed)
-        cls._locked = False
-        return result
+            int: Number of phrases newly synthesized.
+        """
+        return cls.tts_cache().warm(phrases, lang='en', tld=accent.value)
     
     # -- Private Functions -------------------------------------------------------------------------------------------
     @classmethod
-    def _speak(cls, text: str, speed: float, accent: Accent, delete_mp3) -> int:
-        sound_file = helper.get_temp_filename(prefix='dt-', dotted_suffix='.mp3')
-        LOGGER.debug(f'Speak thread {cls._speak_thread_id} started.')
+    def _speak(cls, text: str, speed: float, accent: Accent, delete_mp3, use_cache: bool = True, job: SpeechJob = None) -> bool:
+        # Chunks are synthesized on a background thread, up to SYNTH_LOOKAHEAD ahead of playback
+        chunks = cls._text_chunks(text, cls.CHUNK_MAX_CHARS)
+        pending = deque()
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='tts-synth')
+        delete = (not use_cache) and delete_mp3
+
+        def synthesize_next():
+            chunk = next(chunks, None)
+            if chunk is not None:
+                pending.append((chunk, executor.submit(cls._synthesize, chunk, accent, use_cache)))
+
+        spoken = True
+        try:
+            for _ in range(1 + max(0, cls.SYNTH_LOOKAHEAD)):
+                synthesize_next()
+            while pending:
+                chunk, future = pending.popleft()
+                clip = future.result()
+                if cls.SYNTH_LOOKAHEAD > 0:
+                    synthesize_next()
+                ret = -1
+                if job is None or not job.interrupted:
+                    display_text = textwrap.wrap(text=chunk, width=100, initial_indent='- Speak: ', subsequent_indent='         ')
+                    for line in display_text:
+                        LOGGER.trace(line)
+                    ret = cls._play_clip(clip, speed, job=job)
+                if delete:
+                    cls._delete_file(clip)
+                if ret != 0:
+                    spoken = False
+                    break
+                if cls.SYNTH_LOOKAHEAD <= 0:
+                    synthesize_next()
+        except Exception as ex:
+            LOGGER.error(f'Unable to speak - {repr(ex)}')
+            spoken = False
+        finally:
+            for _, future in pending:
+                if not future.cancel() and delete:
+                    future.add_done_callback(lambda f: f.exception() is None and cls._delete_file(f.result()))
+            executor.shutdown(wait=False)
+
+        return spoken and (job is None or not job.interrupted)
+
+    @classmethod
+    def _synthesize(cls, text: str, accent: Accent, use_cache: bool) -> Union[str, bytes]:
+        '''Return clip filename or (player accepts in-memory audio) mp3 bytes'''
         # tld top level domain for English
         # com.au (Australian), co.uk (United Kingdom), us (United States),    ca (Canada), 
         # co.in (India),       ie (Ireland),           co.za (South Africa),  com.ng (Nigeria)
+        if use_cache:
+            return str(cls.tts_cache().get_or_synthesize(text, lang='en', tld=accent.value))
+        if cls.player().supports_bytes:
+            return gtts_synthesize(text, lang='en', tld=accent.value)
+
+        sound_file = helper.get_temp_filename(prefix='dt-', dotted_suffix='.mp3')
         tts_obj = gTTS(text=text, lang='en', tld=accent.value, slow=False)
         LOGGER.debug(f'save {sound_file}')
         tts_obj.save(sound_file)
-        
-        display_text = textwrap.wrap(text=text, width=100, initial_indent='- Speak: ', subsequent_indent='         ')
-        for line in display_text:
-            LOGGER.trace(line)
-        ret = cls._play(sound_file, speed)
+        return sound_file
+
+    @classmethod
+    def _text_chunks(cls, text: str, max_chars: int) -> Iterator[str]:
+        '''Split text into chunks of whole sentences (up to max_chars), long sentences are wrapped'''
+        chunk = ''
+        for sentence in cls._SENTENCE_END.split(text):
+            sentence = ' '.join(sentence.split())
+            if not sentence:
+                continue
+            pieces = [sentence] if len(sentence) <= max_chars else textwrap.wrap(sentence, width=max_chars)
+            for piece in pieces:
+                if chunk and len(chunk) + len(piece) + 1 > max_chars:
+                    yield chunk
+                    chunk = ''
+                chunk = f'{chunk} {piece}' if chunk else piece
+        if chunk:
+            yield chunk
+
+    @staticmethod
+    def _delete_file(sound_file: Union[str, bytes]):
+        if isinstance(sound_file, bytes):
+            return
         try:
-            pathlib.Path(sound_file).unlink()
+            pathlib.Path(sound_file).unlink(missing_ok=True)
         except Exception as ex:
             LOGGER.error(f'Unable to delete sound file [{sound_file}] - {repr(ex)}')
 
-        LOGGER.debug(f'Speak thread {cls._speak_thread_id} ended.')
-        cls._speak_thread_id = None
-        cls._locked = False
-        return ret
-
     @classmethod
-    def _play(cls, sound_file: str, speed: float = 1.0) -> int:
-        '''Play the sound file'''
+    def _play(cls, sound_file: str, speed: float = 1.0, job: SpeechJob = None) -> int:
+        '''Play the sound file, playback is stopped if job is interrupted'''
         check_file = pathlib.Path(sound_file)
         if not check_file.is_file():
             msg = f'Sorry, sound file {sound_file} does not exist.'
             LOGGER.warning(msg)
             return -1
-        
-        LOGGER.debug(f'Playing file: {cls._VLC} --intf dummy --rate {speed} --play-and-exit {sound_file}')
-        if helper.is_windows():
-            ret = os.system(f'"{cls._VLC}" --intf dummy --rate {speed} --play-and-exit {sound_file}')
-        else:
-            ret = os.system(f'{cls._VLC} --rate {speed} --play-and-exit {sound_file}')
-
-        return  ret
-
-    @classmethod
-    def _is_VLC_installed(cls) -> bool:
-        if helper.is_windows():
-            start_path = pathlib.Path(os.environ['ProgramFiles'])
-            exe = "vlc.exe"
-        else:
-            start_path = pathlib.Path('/usr/bin')
-            exe = 'cvlc'
-        LOGGER.debug(f'- Searching for {exe} starting at {start_path}')
-
-        cls._VLC = helper.find_file(filenm=exe, search_path=start_path)
-        return cls._VLC is not None
-    
+        return cls.player().play_file(str(sound_file), speed, job=job)
+
+    @classmethod
+    def _play_clip(cls, clip: Union[str, bytes], speed: float, job: SpeechJob = None) -> int:
+        if isinstance(clip, bytes):
+            return cls.player().play_bytes(clip, speed, job=job)
+        return cls._play(clip, speed, job=job)
+
     @classmethod
     def _is_file(cls, token: str) -> bool:
         check_file = pathlib.Path(token)
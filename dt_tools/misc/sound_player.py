@@ -0,0 +1,249 @@
+"""
+Audio player backends for Sound.
+
+Backends:
+
+- ProcessPlayer: starts a player process per clip (VLC, mpg123, ffplay).  Clips held
+  in memory are piped to the player's stdin (no temp file).
+- Mpg123RemotePlayer: one long-running ``mpg123 -R`` (remote control) process, clips are
+  loaded over stdin and end-of-clip is reported by the player, so there is no process
+  start cost per clip (significant on a Raspberry Pi).
+- NullPlayer: plays nothing (optionally simulates play time and/or saves clips to a
+  directory), used for headless runs and benchmarks.
+
+Example::
+
+    from dt_tools.misc.sound import Sound
+    from dt_tools.misc.sound_player import Mpg123RemotePlayer
+
+    Sound.set_player(Mpg123RemotePlayer())
+    Sound.speak('Using a long running player process')
+
+"""
+import itertools
+import pathlib
+import queue
+import subprocess
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import List, Union
+
+from loguru import logger as LOGGER
+
+from dt_tools.misc.speech_queue import SpeechJob
+
+
+class PlayerBackend(ABC):
+    """
+    Abstract audio player.
+
+    Concrete players implement play_file.  Players that can play clip bytes without
+    a temp file set supports_bytes and override play_bytes.
+    """
+    name: str = 'player'
+    supports_bytes: bool = False
+
+    @abstractmethod
+    def play_file(self, sound_file: str, speed: float = 1.0, job: SpeechJob = None) -> int:
+        """
+        Play sound_file, returning when playback ends (or job is interrupted).
+
+        Returns:
+            int: 0 if successful else non-zero
+        """
+
+    def play_bytes(self, data: bytes, speed: float = 1.0, job: SpeechJob = None, suffix: str = '.mp3') -> int:
+        """Play an in-memory clip (default: via a temp file)"""
+        with tempfile.NamedTemporaryFile(prefix='dt-', suffix=suffix, delete=False) as tmp_file:
+            tmp_file.write(data)
+        try:
+            return self.play_file(tmp_file.name, speed, job)
+        finally:
+            pathlib.Path(tmp_file.name).unlink(missing_ok=True)
+
+    def close(self):
+        """Release player resources (ie. stop long-running process)"""
+
+
+# ============================================================================================
+class ProcessPlayer(PlayerBackend):
+    """
+    Start a player process per clip.
+
+    Command templates are argument lists, tokens {file}, {speed} and {pitch} (speed - 1) are substituted.
+
+    Args:
+        command (List[str]): Play a file, ie. ['mpg123', '-q', '{file}']
+        stdin_command (List[str], optional): Play from stdin, ie. ['mpg123', '-q', '-']. Defaults to None.
+        name (str, optional): Defaults to the executable name.
+    """
+    def __init__(self, command: List[str], stdin_command: List[str] = None, name: str = None):
+        self.command = command
+        self.stdin_command = stdin_command
+        self.name = name or pathlib.Path(command[0]).stem
+        self.supports_bytes = stdin_command is not None
+
+    @classmethod
+    def vlc(cls, exe: str = 'cvlc', windows: bool = False) -> 'ProcessPlayer':
+        intf = ['--intf', 'dummy'] if windows else []
+        return cls([exe, *intf, '--rate', '{speed}', '--play-and-exit', '{file}'],
+                   [exe, *intf, '--rate', '{speed}', '--play-and-exit', '-'], name='vlc')
+
+    @classmethod
+    def mpg123(cls, exe: str = 'mpg123') -> 'ProcessPlayer':
+        return cls([exe, '-q', '--pitch', '{pitch}', '{file}'], [exe, '-q', '--pitch', '{pitch}', '-'], name='mpg123')
+
+    @classmethod
+    def ffplay(cls, exe: str = 'ffplay') -> 'ProcessPlayer':
+        opts = ['-nodisp', '-autoexit', '-loglevel', 'quiet', '-af', 'atempo={speed}']
+        return cls([exe, *opts, '{file}'], [exe, *opts, '-i', 'pipe:0'], name='ffplay')
+
+    @classmethod
+    def paplay(cls, exe: str = 'paplay') -> 'ProcessPlayer':
+        # PulseAudio client, no speed control, stdin expects raw samples so clips go via a file
+        return cls([exe, '{file}'], name='paplay')
+
+    def play_file(self, sound_file: str, speed: float = 1.0, job: SpeechJob = None) -> int:
+        proc = self._start(self.command, sound_file, speed, stdin=subprocess.DEVNULL, job=job)
+        return proc.wait()
+
+    def play_bytes(self, data: bytes, speed: float = 1.0, job: SpeechJob = None, suffix: str = '.mp3') -> int:
+        if self.stdin_command is None:
+            return super().play_bytes(data, speed, job, suffix)
+        proc = self._start(self.stdin_command, '-', speed, stdin=subprocess.PIPE, job=job)
+        try:
+            proc.communicate(input=data)
+        except (BrokenPipeError, OSError) as ex:
+            LOGGER.debug(f'{self.name} stdin closed - {repr(ex)}')
+        return proc.wait()
+
+    def _start(self, template: List[str], sound_file: str, speed: float, stdin, job: SpeechJob) -> subprocess.Popen:
+        values = {'file': str(sound_file), 'speed': f'{speed:g}', 'pitch': f'{speed - 1:g}'}
+        cmd = [token.format(**values) for token in template]
+        LOGGER.debug(f'Playing: {" ".join(cmd)}')
+        proc = subprocess.Popen(cmd, stdin=stdin, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        if job is not None:
+            job.on_interrupt(proc.terminate)
+        return proc
+
+
+# ============================================================================================
+class Mpg123RemotePlayer(PlayerBackend):
+    """
+    Long-running ``mpg123 -R`` process, clips are sent as LOAD commands.
+
+    The process is started on first use and restarted if it exits.
+
+    Args:
+        exe (str, optional): mpg123 executable. Defaults to 'mpg123'.
+    """
+    name = 'mpg123-remote'
+
+    def __init__(self, exe: str = 'mpg123'):
+        self.exe = exe
+        self._proc: subprocess.Popen = None
+        self._events: 'queue.Queue[Union[str, None]]' = queue.Queue()
+        self._lock = threading.Lock()
+
+    def play_file(self, sound_file: str, speed: float = 1.0, job: SpeechJob = None) -> int:
+        with self._lock:
+            self._start()
+            self._drain()
+            self._send(f'PITCH {speed - 1:g}')
+            self._send(f'LOAD {sound_file}')
+            if job is not None:
+                job.on_interrupt(lambda: self._send('STOP'))
+            while True:
+                event = self._events.get()
+                if event is None:
+                    LOGGER.warning(f'{self.name} process ended unexpectedly')
+                    return -1
+                if event.startswith('@E'):
+                    LOGGER.warning(f'{self.name}: {event[3:]}')
+                    return 1
+                if event == '@P 0':  # playback stopped (end of clip or STOP)
+                    return 0
+
+    def close(self):
+        with self._lock:
+            if self._proc is not None and self._proc.poll() is None:
+                self._send('QUIT')
+                try:
+                    self._proc.wait(timeout=2)
+                except subprocess.TimeoutExpired:
+                    self._proc.kill()
+            self._proc = None
+
+    def _start(self):
+        if self._proc is not None and self._proc.poll() is None:
+            return
+        self._events = queue.Queue()
+        self._proc = subprocess.Popen([self.exe, '-R'], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                      stderr=subprocess.DEVNULL, text=True, bufsize=1)
+        threading.Thread(target=self._read_events, args=(self._proc, self._events), name=self.name, daemon=True).start()
+        self._send('SILENCE')  # no per-frame status messages
+        LOGGER.debug(f'{self.name} process started (pid {self._proc.pid})')
+
+    def _send(self, command: str):
+        try:
+            self._proc.stdin.write(f'{command}\n')
+            self._proc.stdin.flush()
+        except (BrokenPipeError, OSError, AttributeError, ValueError) as ex:
+            LOGGER.debug(f'{self.name} command [{command}] failed - {repr(ex)}')
+
+    def _drain(self):
+        # Discard stale events (ie. from a STOP)
+        while not self._events.empty():
+            self._events.get_nowait()
+
+    @staticmethod
+    def _read_events(proc: subprocess.Popen, events: queue.Queue):
+        for line in proc.stdout:
+            line = line.strip()
+            if line.startswith('@P') or line.startswith('@E'):
+                events.put(line)
+        events.put(None)
+
+
+# ============================================================================================
+class NullPlayer(PlayerBackend):
+    """
+    Headless player, for benchmarks/tests.
+
+    Args:
+        delay (float, optional): Simulated play time per clip (seconds). Defaults to 0.
+        record_dir (str|Path, optional): Save each clip to this directory. Defaults to None.
+    """
+    name = 'null'
+    supports_bytes = True
+
+    def __init__(self, delay: float = 0.0, record_dir: Union[str, pathlib.Path] = None):
+        self.delay = delay
+        self.record_dir = None if record_dir is None else pathlib.Path(record_dir)
+        self.clips = 0
+        self.bytes = 0
+        self.play_log: List[tuple] = []  # (start, end) perf_counter per clip
+        self._seq = itertools.count(1)
+
+    def play_file(self, sound_file: str, speed: float = 1.0, job: SpeechJob = None) -> int:
+        path = pathlib.Path(sound_file)
+        if not path.is_file():
+            return -1
+        return self.play_bytes(path.read_bytes(), speed, job, path.suffix)
+
+    def play_bytes(self, data: bytes, speed: float = 1.0, job: SpeechJob = None, suffix: str = '.mp3') -> int:
+        start = time.perf_counter()
+        self.clips += 1
+        self.bytes += len(data)
+        if self.record_dir is not None:
+            self.record_dir.mkdir(parents=True, exist_ok=True)
+            (self.record_dir / f'clip-{next(self._seq):05d}{suffix}').write_bytes(data)
+        if self.delay > 0:
+            stopped = threading.Event()
+            if job is not None:
+                job.on_interrupt(stopped.set)
+            stopped.wait(self.delay / max(speed, 0.01))
+        self.play_log.append((start, time.perf_counter()))
+        return 0
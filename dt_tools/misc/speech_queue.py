@@ -0,0 +1,240 @@
+"""
+Prioritized job queue with a single long-lived worker thread, used by Sound to
+serialize speech and sound playback.
+
+- Jobs run one at a time, highest priority (lowest Priority value) first, FIFO within a priority.
+- submit() returns a concurrent.futures.Future (use asyncio.wrap_future() from async code).
+- A job submitted with preempt=True interrupts a running job of lower priority.  The
+  running job is signalled (SpeechJob.interrupted, on_interrupt callbacks, ie. terminate
+  the player process) and is not resumed.
+- Queue depth, wait time and play (run) time are available via metrics().
+- Queued jobs are finished before the interpreter exits (as with non-daemon threads).
+
+Example::
+
+    from dt_tools.misc.speech_queue import Priority, SpeechQueue
+
+    queue = SpeechQueue()
+    future = queue.submit(lambda job: play_clip('alert.mp3', job), priority=Priority.ALERT, preempt=True)
+    future.result()
+    print(queue.metrics().to_string())
+
+"""
+import atexit
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Callable, List
+
+from loguru import logger as LOGGER
+
+
+class Priority(IntEnum):
+    """Job priority, lower value runs first"""
+    ALERT = 0
+    HIGH = 10
+    NORMAL = 20
+    LOW = 30
+
+
+@dataclass
+class QueueMetrics():
+    """
+    Speech queue counters (times in seconds).
+    """
+    depth: int = 0
+    submitted: int = 0
+    completed: int = 0
+    failed: int = 0
+    preempted: int = 0
+    cancelled: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+    total_play: float = 0.0
+    max_play: float = 0.0
+
+    @property
+    def started(self) -> int:
+        return self.completed + self.failed
+
+    @property
+    def avg_wait(self) -> float:
+        return 0.0 if self.started == 0 else self.total_wait / self.started
+
+    @property
+    def avg_play(self) -> float:
+        return 0.0 if self.started == 0 else self.total_play / self.started
+
+    def to_string(self) -> str:
+        return (f'depth: {self.depth}  submitted: {self.submitted}  completed: {self.completed}  failed: {self.failed}  '
+                f'preempted: {self.preempted}  cancelled: {self.cancelled}  '
+                f'wait avg: {self.avg_wait*1000:.1f}ms  max: {self.max_wait*1000:.1f}ms  '
+                f'play avg: {self.avg_play:.2f}s  max: {self.max_play:.2f}s')
+
+
+@dataclass(order=True)
+class SpeechJob():
+    """
+    Queued unit of work.  fn(job) is called on the worker thread, its return value is
+    the future's result.
+    """
+    priority: int
+    seq: int
+    fn: Callable[['SpeechJob'], Any] = field(compare=False)
+    description: str = field(default='', compare=False)
+    submitted: float = field(default_factory=time.perf_counter, compare=False)
+    future: Future = field(default_factory=Future, compare=False, repr=False)
+    _interrupted: threading.Event = field(default_factory=threading.Event, compare=False, repr=False)
+    _callbacks: List[Callable[[], Any]] = field(default_factory=list, compare=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, compare=False, repr=False)
+
+    @property
+    def interrupted(self) -> bool:
+        return self._interrupted.is_set()
+
+    def interrupt(self):
+        """Signal the job to stop (pre-empted or queue stopped)"""
+        with self._lock:
+            self._interrupted.set()
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            self._call(callback)
+
+    def on_interrupt(self, callback: Callable[[], Any]):
+        """Register callback (ie. process terminate), called immediately if already interrupted"""
+        with self._lock:
+            self._callbacks.append(callback)
+            interrupted = self._interrupted.is_set()
+        if interrupted:
+            self._call(callback)
+
+    def _call(self, callback: Callable[[], Any]):
+        try:
+            callback()
+        except Exception as ex:
+            LOGGER.debug(f'Interrupt callback failed for [{self.description}] - {repr(ex)}')
+
+
+class SpeechQueue:
+    """
+    Priority queue serviced by a single worker thread (started on first submit).
+
+    Args:
+        name (str, optional): Worker thread name. Defaults to 'speech'.
+    """
+    def __init__(self, name: str = 'speech'):
+        self.name = name
+        self._heap: List[SpeechJob] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._current: SpeechJob = None
+        self._worker: threading.Thread = None
+        self._metrics = QueueMetrics()
+
+    def submit(self, fn: Callable[[SpeechJob], Any], priority: int = Priority.NORMAL,
+               preempt: bool = False, description: str = '') -> Future:
+        """
+        Queue fn(job) for execution on the worker thread.
+
+        Args:
+            fn (Callable[[SpeechJob], Any]): Work to run, should honor job.interrupted.
+            priority (int, optional): Lower runs first. Defaults to Priority.NORMAL.
+            preempt (bool, optional): Interrupt a running job of lower priority. Defaults to False.
+            description (str, optional): For logging. Defaults to ''.
+
+        Returns:
+            Future: Resolves to fn's return value (or exception).
+        """
+        job = SpeechJob(priority=int(priority), seq=next(self._seq), fn=fn, description=description)
+        with self._cond:
+            heapq.heappush(self._heap, job)
+            self._metrics.submitted += 1
+            self._start_worker()
+            current = self._current
+            if preempt and current is not None and job.priority < current.priority:
+                LOGGER.debug(f'Pre-empting [{current.description}] for [{description}]')
+                current.interrupt()
+            self._cond.notify_all()
+        return job.future
+
+    def is_busy(self) -> bool:
+        """True if a job is running or queued"""
+        with self._cond:
+            return self._current is not None or len(self._heap) > 0
+
+    def wait_idle(self, timeout: float = None) -> bool:
+        """
+        Block until all queued jobs are done.
+
+        Returns:
+            bool: True if idle, False on timeout.
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: self._current is None and len(self._heap) == 0, timeout)
+
+    def stop(self):
+        """Cancel queued jobs and interrupt the running job"""
+        with self._cond:
+            pending, self._heap = self._heap, []
+            for job in pending:
+                if job.future.cancel():
+                    self._metrics.cancelled += 1
+            if self._current is not None:
+                self._current.interrupt()
+            self._cond.notify_all()
+
+    def metrics(self) -> QueueMetrics:
+        """Return a copy of the queue counters"""
+        with self._cond:
+            metrics = QueueMetrics(**vars(self._metrics))
+            metrics.depth = len(self._heap)
+        return metrics
+
+    # ---------------------------------------------------------------------------------
+    def _start_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            if self._worker is None:
+                atexit.register(self.wait_idle)
+            self._worker = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._worker.start()
+            LOGGER.trace(f'{self.name} worker started.')
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: len(self._heap) > 0)
+                job = heapq.heappop(self._heap)
+                if not job.future.set_running_or_notify_cancel():
+                    self._metrics.cancelled += 1
+                    self._cond.notify_all()
+                    continue
+                self._current = job
+
+            start = time.perf_counter()
+            failed = False
+            try:
+                result = job.fn(job)
+            except Exception as ex:
+                LOGGER.error(f'{self.name} job [{job.description}] failed - {repr(ex)}')
+                job.future.set_exception(ex)
+                failed = True
+            else:
+                job.future.set_result(result)
+            play = time.perf_counter() - start
+
+            with self._cond:
+                self._current = None
+                wait = start - job.submitted
+                metrics = self._metrics
+                metrics.failed += failed
+                metrics.completed += not failed
+                metrics.preempted += job.interrupted
+                metrics.total_wait += wait
+                metrics.max_wait = max(metrics.max_wait, wait)
+                metrics.total_play += play
+                metrics.max_play = max(metrics.max_play, play)
+                self._cond.notify_all()
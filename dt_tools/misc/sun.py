@@ -5,6 +5,8 @@ Example:
 
     sun = Sun()
     print('Sunrise: {sun.sunrise}  Sunset: {sun.sunset}')
+
+For many locations and/or dates, see dt_tools.misc.sun_table.SunTable (vectorized).
 """
 import calendar
 import datetime
@@ -12,12 +14,9 @@ import math
 
 from dateutil import tz
 from loguru import logger as LOGGER
-from zoneinfo import ZoneInfo
-
-from dt_tools.misc.geoloc import GeoLocation
 
+from dt_tools.misc import timezone_resolver
 
-GEO = GeoLocation()
 
 class SunTimeException(Exception):
     def __init__(self, message):
@@ -28,16 +27,18 @@ class Sun:
     Approximated calculation of sunrise and sunset datetimes. Adapted from:
     https://stackoverflow.com/questions/19615350/calculate-sunrise-and-sunset-times-for-a-given-gps-coordinate-within-postgresql
     """
-    def __init__(self, lat, lon):
+    def __init__(self, lat, lon, tz_name: str = None):
         """
         Sun object located at lat, lon
 
         Args:
             lat (_type_): latitude
             lon (_type_): longitude
+            tz_name (str, optional): Timezone name at lat/lon, if None it is resolved (offline) on first use.
         """
         self._lat = float(lat)
         self._lon = float(lon)
+        self._tz: str = tz_name
         LOGGER.debug(f'Sun({lat},{lon})')
 
     def time_now_at(self) -> datetime.datetime:
@@ -47,10 +48,8 @@ class Sun:
         Returns:
             datetime.datetime: current date time in GPS coordinate local time.
         """
-        # geo = GeoLocation()
-        GEO.get_location_via_lat_lon(self._lat, self._lon)
         utc_now = datetime.datetime.now(datetime.timezone.utc)
-        gps_now = utc_now.astimezone(ZoneInfo(GEO.tz_name))
+        gps_now = utc_now.astimezone(timezone_resolver.zone_info(self._tz_name()))
         return gps_now
 
     def get_sunrise_time(self, date:datetime.date=None) -> datetime.datetime:
@@ -136,17 +135,24 @@ class Sun:
     def get_gps_sunrise(self, date=None) -> datetime.datetime:
         utc_sunrise = self.get_sunrise_time(date)
         LOGGER.trace(f'UTC: {utc_sunrise}')
-        GEO.get_location_via_lat_lon(self._lat, self._lon)
-
-        gps_sunrise = utc_sunrise.astimezone(ZoneInfo(GEO.tz_name))
-        LOGGER.trace(f'GPS: {gps_sunrise} {GEO.tz_name}')
+        tz_name = self._tz_name()
+        gps_sunrise = utc_sunrise.astimezone(timezone_resolver.zone_info(tz_name))
+        LOGGER.trace(f'GPS: {gps_sunrise} {tz_name}')
         return gps_sunrise
     
     def get_gps_sunset(self, date=None) -> datetime.datetime:
         utc_sunset = self.get_sunset_time(date)
-        gps_sunset = utc_sunset.astimezone(ZoneInfo(GEO.tz_name))
+        gps_sunset = utc_sunset.astimezone(timezone_resolver.zone_info(self._tz_name()))
         return gps_sunset
 
+    def _tz_name(self) -> str:
+        # Resolved offline (timezonefinder), once per Sun
+        if self._tz is None:
+            self._tz = timezone_resolver.timezone_at(self._lat, self._lon)
+            if self._tz is None:
+                raise SunTimeException(f'Unable to determine timezone for {self._lat}, {self._lon}')
+        return self._tz
+
 
     def _calc_sun_time(self, date, isRiseTime=True, zenith=90.8) -> datetime.datetime:
         """
@@ -261,9 +267,10 @@ class Sun:
 
 
 def __display_sun_data(lat, lon, show_americas: bool = False):
+    from dt_tools.misc.geoloc import GeoLocation
     datetime_format="%a %m/%d %I:%M %p"
 
-    # geo = GeoLocation()
+    GEO = GeoLocation()
     GEO.get_location_via_lat_lon(lat=lat,lon=lon)
     LOGGER.debug('== geo ===============================')
     for line in GEO.to_string().splitlines():
@@ -311,8 +318,10 @@ if __name__ == "__main__":
 
     import dt_tools.logger.logging_helper as lh
 
+    from dt_tools.misc.geoloc import GeoLocation
+
     lh.configure_logger(log_level="INFO", log_format=lh.DEFAULT_DEBUG_LOGFMT, brightness=False)
-    geo = GeoLocation()
+    GEO = GeoLocation()
 
     # gps = (30.069344, -81.551315)
     # LOGGER.info(f'By Lat/Lon: {gps[0]}, {gps[1]}')
@@ -0,0 +1,201 @@
+"""
+Vectorized sunrise/sunset tables for many locations and dates.
+
+SunTable computes sunrise and sunset for every (location, date) pair in one NumPy
+pass, using the same approximation as Sun (results match Sun to the minute).  Times
+are UTC, returned as datetime64[ns] arrays shaped (locations, dates).
+
+Polar day (sun never sets) and polar night (sun never rises) are returned as boolean
+masks, the corresponding sunrise/sunset entries are NaT.  On transition days only one
+of the events may be missing (ie. the sun sets but does not rise again), that entry is
+NaT and neither mask is set.
+
+Example::
+
+    import datetime
+    from dt_tools.misc.sun_table import SunTable
+
+    table = SunTable(lats=[30.07, 47.29, 78.22], lons=[-81.55, -122.46, 15.65],
+                     start_date=datetime.date(2025, 1, 1), days=365)
+    print(table.sunrise[0, :3])          # first 3 days, first location (UTC)
+    print(table.polar_night.sum(axis=1)) # days of polar night per location
+    records = table.to_records()         # flat structured array
+
+"""
+import datetime
+from typing import Sequence, Union
+
+import numpy as np
+
+from dt_tools.misc import timezone_resolver
+
+ArrayLike = Union[Sequence[float], np.ndarray]
+DateLike = Union[datetime.date, np.datetime64, str]
+
+_TO_RAD = np.pi / 180.0
+
+RECORD_DTYPE = np.dtype([('lat', 'f8'), ('lon', 'f8'), ('date', 'M8[D]'),
+                         ('sunrise', 'M8[ns]'), ('sunset', 'M8[ns]'),
+                         ('polar_day', '?'), ('polar_night', '?')])
+
+
+class SunTable:
+    """
+    Sunrise/sunset for arrays of locations over a date range.
+
+    Args:
+        lats (ArrayLike): Latitudes (n).
+        lons (ArrayLike): Longitudes (n), same length as lats.
+        start_date (DateLike, optional): First date. Defaults to today.
+        end_date (DateLike, optional): Last date (inclusive). Defaults to None.
+        days (int, optional): Number of days (used when end_date is None). Defaults to 1.
+        zenith (float, optional): Sun reference zenith. Defaults to 90.8.
+
+    Attributes:
+        lats, lons: float64 arrays (n)
+        dates: datetime64[D] array (m)
+        sunrise, sunset: UTC datetime64[ns] arrays (n, m), NaT when the event does not occur
+        polar_day: bool array (n, m), True when the sun never sets (no sunrise and no sunset)
+        polar_night: bool array (n, m), True when the sun never rises (no sunrise and no sunset)
+
+    Raises:
+        ValueError: When lats and lons differ in length or the date range is empty.
+    """
+    def __init__(self, lats: ArrayLike, lons: ArrayLike, start_date: DateLike = None,
+                 end_date: DateLike = None, days: int = None, zenith: float = 90.8):
+        self.lats = np.atleast_1d(np.asarray(lats, dtype=np.float64))
+        self.lons = np.atleast_1d(np.asarray(lons, dtype=np.float64))
+        if self.lats.shape != self.lons.shape or self.lats.ndim != 1:
+            raise ValueError('lats and lons must be 1-d and the same length')
+
+        start = np.datetime64(datetime.date.today() if start_date is None else start_date, 'D')
+        if end_date is not None:
+            end = np.datetime64(end_date, 'D') + 1
+        else:
+            end = start + (1 if days is None else int(days))
+        if end <= start:
+            raise ValueError('Date range is empty')
+        self.dates = np.arange(start, end, dtype='datetime64[D]')
+        self.zenith = zenith
+
+        self.sunrise, rise_cos_h = self._calc_sun_times(True)
+        self.sunset, set_cos_h = self._calc_sun_times(False)
+        # cosH is evaluated at (approximate) rise and set times, either may fall outside [-1, 1],
+        # polar only when both do (a transition day has one of the two events)
+        self.polar_night = (rise_cos_h > 1) & (set_cos_h > 1)
+        self.polar_day = (rise_cos_h < -1) & (set_cos_h < -1)
+
+    @property
+    def shape(self):
+        """(locations, dates)"""
+        return (len(self.lats), len(self.dates))
+
+    @property
+    def day_length(self) -> np.ndarray:
+        """Time from sunrise to sunset (timedelta64[ns]), NaT for polar day/night"""
+        # As Sun, both times fall on the (UTC) date, so sunset may precede sunrise
+        length = self.sunset - self.sunrise
+        return np.where(length < np.timedelta64(0, 'ns'), length + np.timedelta64(1, 'D'), length)
+
+    def localize(self, times: np.ndarray, tz_names: Sequence[str] = None) -> np.ndarray:
+        """
+        Convert a UTC result array (ie. sunrise) to local wall-clock time per location.
+
+        The UTC offset is evaluated once per (timezone, date) at 12:00 UTC.
+
+        Args:
+            times (np.ndarray): datetime64[ns] array shaped (n, m).
+            tz_names (Sequence[str], optional): Timezone name per location (n). Defaults to 
+                None (resolved offline, see dt_tools.misc.timezone_resolver).
+
+        Returns:
+            np.ndarray: datetime64[ns] (naive local time) array shaped (n, m).
+        """
+        if tz_names is None:
+            tz_names = timezone_resolver.timezones_for(self.lats, self.lons)
+        tz_names = np.asarray(tz_names, dtype=object)
+        if tz_names.shape != self.lats.shape:
+            raise ValueError('tz_names must have one entry per location')
+        noon_utc = [datetime.datetime.combine(d, datetime.time(12), tzinfo=datetime.timezone.utc)
+                    for d in self.dates.astype(datetime.date)]
+        offsets = np.zeros(self.shape, dtype='timedelta64[s]')  # UTC where timezone is unknown
+        for tz_name in set(tz_names) - {None}:
+            zone = timezone_resolver.zone_info(tz_name)
+            tz_offsets = np.array([int(noon.astimezone(zone).utcoffset().total_seconds()) for noon in noon_utc], dtype='timedelta64[s]')
+            offsets[tz_names == tz_name] = tz_offsets
+        return times + offsets
+
+    def to_records(self) -> np.ndarray:
+        """
+        Flatten to a structured array (location major), see RECORD_DTYPE.
+
+        Returns:
+            np.ndarray: n * m records (lat, lon, date, sunrise, sunset, polar_day, polar_night)
+        """
+        n, m = self.shape
+        records = np.empty(n * m, dtype=RECORD_DTYPE)
+        records['lat'] = np.repeat(self.lats, m)
+        records['lon'] = np.repeat(self.lons, m)
+        records['date'] = np.tile(self.dates, n)
+        records['sunrise'] = self.sunrise.ravel()
+        records['sunset'] = self.sunset.ravel()
+        records['polar_day'] = self.polar_day.ravel()
+        records['polar_night'] = self.polar_night.ravel()
+        return records
+
+    # ---------------------------------------------------------------------------------
+    def _calc_sun_times(self, is_rise_time: bool):
+        """Vectorized Sun._calc_sun_time, returns (utc datetime64[ns] (n, m), cosH (n, m))"""
+        months = self.dates.astype('datetime64[M]')
+        year = months.astype('datetime64[Y]').astype(np.int64) + 1970
+        month = months.astype(np.int64) % 12 + 1
+        day = (self.dates - months).astype(np.int64) + 1
+
+        # 1. day of the year (m)
+        n1 = np.floor(275 * month / 9)
+        n2 = np.floor((month + 9) / 12)
+        n3 = 1 + np.floor((year - 4 * np.floor(year / 4) + 2) / 3)
+        day_of_the_year = n1 - (n2 * n3) + day - 30
+
+        # 2. longitude hour (n, 1) and approximate time (n, m)
+        lon_hour = (self.lons / 15)[:, np.newaxis]
+        t = day_of_the_year[np.newaxis, :] + (((6 if is_rise_time else 18) - lon_hour) / 24)
+
+        # 3-4. mean anomaly, true longitude
+        mean_anomaly = (0.9856 * t) - 3.289
+        true_longitude = _force_range(mean_anomaly + (1.916 * np.sin(_TO_RAD * mean_anomaly)) +
+                                      (0.020 * np.sin(_TO_RAD * 2 * mean_anomaly)) + 282.634, 360)
+
+        # 5. right ascension, same quadrant as true longitude, in hours
+        right_ascension = _force_range((1 / _TO_RAD) * np.arctan(0.91764 * np.tan(_TO_RAD * true_longitude)), 360)
+        right_ascension += np.floor(true_longitude / 90) * 90 - np.floor(right_ascension / 90) * 90
+        right_ascension /= 15
+
+        # 6. declination
+        sin_dec = 0.39782 * np.sin(_TO_RAD * true_longitude)
+        cos_dec = np.cos(np.arcsin(sin_dec))
+
+        # 7. local hour angle (cosH outside [-1, 1] is polar night/day)
+        lat = (_TO_RAD * self.lats)[:, np.newaxis]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cos_h = (np.cos(_TO_RAD * self.zenith) - (sin_dec * np.sin(lat))) / (cos_dec * np.cos(lat))
+        valid = (cos_h >= -1) & (cos_h <= 1)
+        hours = (1 / _TO_RAD) * np.arccos(np.where(valid, cos_h, 0.0))
+        if is_rise_time:
+            hours = 360 - hours
+        hours /= 15
+
+        # 8-9. local mean time, adjusted to UTC hours [0, 24)
+        utc_time = np.mod(hours + right_ascension - (0.06571 * t) - 6.622 - lon_hour, 24)
+
+        # 10. round to the minute (as Sun), 24:00 rolls into the next day
+        hr = np.floor(utc_time)
+        minutes = hr * 60 + np.round((utc_time - hr) * 60)
+        times = self.dates.astype('datetime64[ns]')[np.newaxis, :] + (minutes.astype(np.int64) * np.timedelta64(60, 's')).astype('timedelta64[ns]')
+        times[~valid] = np.datetime64('NaT')
+        return times, cos_h
+
+
+def _force_range(v: np.ndarray, max: float) -> np.ndarray:
+    # force v to be >= 0 and < max (single adjustment, as Sun._force_range)
+    return np.where(v < 0, v + max, np.where(v >= max, v - max, v))
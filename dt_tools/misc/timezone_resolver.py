@@ -0,0 +1,250 @@
+"""
+Offline timezone resolution for GPS coordinates.
+
+Wraps timezonefinder (no network calls) with:
+
+- A quantized lat/lon grid cache (LRU).  A grid cell is cached only when timezonefinder
+  reports the surrounding area as a single timezone.  Points near a timezone
+  boundary are resolved exactly and cached by point (~1m).
+- Shared ZoneInfo objects (one per timezone name).
+- A bulk API, timezones_for(lats, lons), which resolves each grid cell once.
+
+TimezoneFinder (and numpy, for the bulk API) is loaded on first use.
+
+Example::
+
+    from dt_tools.misc import timezone_resolver
+
+    tz_name = timezone_resolver.timezone_at(30.0691, -81.5513)   # 'America/New_York'
+    zone = timezone_resolver.zone_at(30.0691, -81.5513)           # ZoneInfo
+    names = timezone_resolver.timezones_for([30.07, 47.29], [-81.55, -122.46])
+
+"""
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, Sequence, Tuple, Union
+from zoneinfo import ZoneInfo
+
+from loguru import logger as LOGGER
+
+if TYPE_CHECKING:
+    import numpy as np
+    from timezonefinder import TimezoneFinder
+
+ArrayLike = Union[Sequence[float], 'np.ndarray']
+
+
+class TimezoneResolver:
+    """
+    Offline lat/lon -> timezone name resolver with a grid cache.
+
+    Args:
+        resolution (float, optional): Grid cell size (degrees). Defaults to 0.01 (~1km).
+        max_size (int, optional): Max cached grid cells (and boundary points), least recently 
+            used are evicted. Defaults to 200000.
+    """
+    POINT_RESOLUTION = 0.00001  # degrees, key for points near a timezone boundary
+
+    def __init__(self, resolution: float = 0.01, max_size: int = 200000):
+        self.resolution = resolution
+        self.max_size = max(1, max_size)
+        self.hits = 0
+        self.misses = 0
+        self._cells: 'OrderedDict[Tuple[int, int], str]' = OrderedDict()
+        self._points: 'OrderedDict[Tuple[int, int], str]' = OrderedDict()
+        self._zones: Dict[str, ZoneInfo] = {}
+        self._tf: 'TimezoneFinder' = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._cells) + len(self._points)
+
+    def timezone_at(self, lat: float, lon: float) -> Union[str, None]:
+        """
+        Timezone name at lat/lon.
+
+        Args:
+            lat (float): Latitude
+            lon (float): Longitude
+
+        Returns:
+            str: Timezone name (ie. 'America/New_York'), None if it can not be determined.
+        """
+        cell = self._cell(lat, lon)
+        tz_name = self._get(self._cells, cell)
+        if tz_name is None:
+            tz_name = self._get(self._points, self._point(lat, lon))
+        if tz_name is not None:
+            self.hits += 1
+            return tz_name
+        self.misses += 1
+        return self._resolve(cell, float(lat), float(lon))
+
+    def zone_info(self, tz_name: str) -> ZoneInfo:
+        """Shared ZoneInfo for tz_name"""
+        zone = self._zones.get(tz_name)
+        if zone is None:
+            zone = ZoneInfo(tz_name)
+            self._zones[tz_name] = zone
+        return zone
+
+    def zone_at(self, lat: float, lon: float) -> Union[ZoneInfo, None]:
+        """
+        ZoneInfo at lat/lon.
+
+        Returns:
+            ZoneInfo: Timezone, None if it can not be determined.
+        """
+        tz_name = self.timezone_at(lat, lon)
+        return None if tz_name is None else self.zone_info(tz_name)
+
+    def timezones_for(self, lats: ArrayLike, lons: ArrayLike) -> 'np.ndarray':
+        """
+        Bulk timezone lookup, each grid cell is resolved once.
+
+        Args:
+            lats (ArrayLike): Latitudes (n)
+            lons (ArrayLike): Longitudes (n)
+
+        Raises:
+            ValueError: When lats and lons differ in shape.
+
+        Returns:
+            np.ndarray: Timezone names (object array, n), None where it can not be determined.
+        """
+        import numpy as np
+
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        if lats.shape != lons.shape:
+            raise ValueError('lats and lons must be the same shape')
+        if lats.size == 0:
+            return np.empty(lats.shape, dtype=object)
+
+        flat_lats = lats.ravel()
+        flat_lons = lons.ravel()
+        cells = np.stack([np.round(flat_lats / self.resolution), np.round(flat_lons / self.resolution)], axis=1).astype(np.int64)
+        unique_cells, first_idx, inverse = np.unique(cells, axis=0, return_index=True, return_inverse=True)
+        inverse = inverse.ravel()
+        cell_names = np.empty(len(unique_cells), dtype=object)
+        ambiguous = []
+        for cell_idx, (cell, idx) in enumerate(zip(map(tuple, unique_cells.tolist()), first_idx)):
+            tz_name = self._get(self._cells, cell)
+            if tz_name is None and self._point(flat_lats[idx], flat_lons[idx]) in self._points:
+                ambiguous.append(cell_idx)  # known boundary cell
+            elif tz_name is None:
+                tz_name, unique = self._lookup(float(flat_lats[idx]), float(flat_lons[idx]))
+                self.misses += 1
+                if unique and tz_name is not None:
+                    self._store(self._cells, cell, tz_name)
+                else:
+                    ambiguous.append(cell_idx)
+            else:
+                self.hits += 1
+            cell_names[cell_idx] = tz_name
+
+        flat_result = cell_names[inverse]
+        # Cells near a timezone boundary, resolve every point
+        if ambiguous:
+            for idx in np.flatnonzero(np.isin(inverse, ambiguous)):
+                flat_result[idx] = self._point_timezone(float(flat_lats[idx]), float(flat_lons[idx]))
+        return flat_result.reshape(lats.shape)
+
+    def clear(self):
+        with self._lock:
+            self._cells.clear()
+            self._points.clear()
+            self.hits = 0
+            self.misses = 0
+
+    # ---------------------------------------------------------------------------------
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return (int(round(lat / self.resolution)), int(round(lon / self.resolution)))
+
+    def _point(self, lat: float, lon: float) -> Tuple[int, int]:
+        return (int(round(lat / self.POINT_RESOLUTION)), int(round(lon / self.POINT_RESOLUTION)))
+
+    def _resolve(self, cell: Tuple[int, int], lat: float, lon: float) -> Union[str, None]:
+        tz_name, unique = self._lookup(lat, lon)
+        if tz_name is not None:
+            if unique:
+                self._store(self._cells, cell, tz_name)
+            else:
+                self._store(self._points, self._point(lat, lon), tz_name)
+        return tz_name
+
+    def _point_timezone(self, lat: float, lon: float) -> Union[str, None]:
+        point = self._point(lat, lon)
+        tz_name = self._get(self._points, point)
+        if tz_name is not None:
+            self.hits += 1
+            return tz_name
+        self.misses += 1
+        tz_name = self._lookup(lat, lon)[0]
+        if tz_name is not None:
+            self._store(self._points, point, tz_name)
+        return tz_name
+
+    @staticmethod
+    def _get(cache: 'OrderedDict[Tuple[int, int], str]', key: Tuple[int, int]) -> Union[str, None]:
+        tz_name = cache.get(key)
+        if tz_name is not None:
+            try:
+                cache.move_to_end(key)
+            except KeyError:
+                pass    # evicted by another thread
+        return tz_name
+
+    def _store(self, cache: 'OrderedDict[Tuple[int, int], str]', key: Tuple[int, int], tz_name: str):
+        with self._lock:
+            cache[key] = tz_name
+            cache.move_to_end(key)
+            while len(cache) > self.max_size:
+                cache.popitem(last=False)  # least recently used
+
+    def _lookup(self, lat: float, lon: float) -> Tuple[Union[str, None], bool]:
+        # Returns (tz_name, True if the surrounding area is a single timezone)
+        with self._lock:
+            tf = self._timezone_finder()
+            tz_name = tf.unique_timezone_at(lat=lat, lng=lon)
+            if tz_name is not None:
+                return tz_name, True
+            return tf.timezone_at(lat=lat, lng=lon), False
+
+    def _timezone_finder(self) -> 'TimezoneFinder':
+        # TimezoneFinder is expensive to import/construct, defer until first needed
+        if self._tf is None:
+            from timezonefinder import TimezoneFinder
+            self._tf = TimezoneFinder()
+            LOGGER.trace('TimezoneFinder loaded.')
+        return self._tf
+
+
+# ============================================================================================
+_RESOLVER: TimezoneResolver = None
+_RESOLVER_LOCK = threading.Lock()
+
+def get_resolver() -> TimezoneResolver:
+    """Return the shared resolver (created on first use)"""
+    global _RESOLVER
+    if _RESOLVER is None:
+        with _RESOLVER_LOCK:
+            if _RESOLVER is None:
+                _RESOLVER = TimezoneResolver()
+    return _RESOLVER
+
+def timezone_at(lat: float, lon: float) -> Union[str, None]:
+    """Timezone name at lat/lon via the shared resolver (see TimezoneResolver.timezone_at)"""
+    return get_resolver().timezone_at(lat, lon)
+
+def zone_at(lat: float, lon: float) -> Union[ZoneInfo, None]:
+    """ZoneInfo at lat/lon via the shared resolver"""
+    return get_resolver().zone_at(lat, lon)
+
+def zone_info(tz_name: str) -> ZoneInfo:
+    """Shared ZoneInfo for tz_name"""
+    return get_resolver().zone_info(tz_name)
+
+def timezones_for(lats: ArrayLike, lons: ArrayLike) -> 'np.ndarray':
+    """Bulk timezone names via the shared resolver (see TimezoneResolver.timezones_for)"""
+    return get_resolver().timezones_for(lats, lons)
@@ -0,0 +1,184 @@
+"""
+Size bounded LRU cache with per-entry time-to-live (TTL) and negative caching.
+
+Entries are held in memory (least recently used entries are evicted once max_size is
+reached).  Optionally, entries are written through to a CacheBackend (see
+dt_tools.misc.geoloc_cache) so they survive restarts.  Persisted values must be JSON
+serializable.
+
+Negative caching: put_negative(key) records that a lookup found nothing, so repeated
+lookups for bad keys do not go back to the network.  lookup() distinguishes a
+negative hit from a miss.
+
+Example::
+
+    from dt_tools.misc.ttl_cache import TTLCache
+
+    cache = TTLCache(max_size=1000, ttl=3600, negative_ttl=300)
+    hit, value = cache.lookup(key)
+    if not hit:
+        value = expensive_call(key)
+        if value is None:
+            cache.put_negative(key)
+        else:
+            cache.put(key, value)
+
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Hashable, Tuple
+
+from loguru import logger as LOGGER
+
+from dt_tools.misc.geoloc_cache import CacheBackend
+
+
+@dataclass
+class CacheStats():
+    hits: int = 0
+    negative_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+    def to_string(self) -> str:
+        return (f'hits: {self.hits}  negative hits: {self.negative_hits}  misses: {self.misses}  '
+                f'evictions: {self.evictions}  expirations: {self.expirations}')
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache with TTL and negative caching.
+
+    Args:
+        max_size (int, optional): Max in-memory entries. Defaults to 10000.
+        ttl (float, optional): Seconds an entry is valid. Defaults to 1 day.
+        negative_ttl (float, optional): Seconds a negative entry is valid. Defaults to 1 hour.
+        backend (CacheBackend, optional): Persistent store (write-through). Defaults to None (memory only).
+    """
+    _NEGATIVE = None
+
+    def __init__(self, max_size: int = 10000, ttl: float = 86400.0, negative_ttl: float = 3600.0, backend: CacheBackend = None):
+        self.max_size = max(1, max_size)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.stats = CacheStats()
+        self._backend = backend
+        self._entries: 'OrderedDict[Hashable, Tuple[float, Any]]' = OrderedDict()  # key: (expires, value)
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.lookup(key, count=False)[0]
+
+    def lookup(self, key: Hashable, count: bool = True) -> Tuple[bool, Any]:
+        """
+        Lookup key.
+
+        Args:
+            key (Hashable): Cache key (str if persisted).
+            count (bool, optional): Update hit/miss stats. Defaults to True.
+
+        Returns:
+            Tuple[bool, Any]: (True, value) on hit, (True, None) on a negative hit, (False, None) on miss.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self._backend is not None:
+                entry = self._load(key)
+            if entry is not None and entry[0] <= now:
+                self._remove(key)
+                self.stats.expirations += count
+                entry = None
+            if entry is None:
+                self.stats.misses += count
+                return False, None
+            self._entries.move_to_end(key)
+            if entry[1] is self._NEGATIVE:
+                self.stats.negative_hits += count
+            else:
+                self.stats.hits += count
+            return True, entry[1]
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return cached value, default on miss or negative hit"""
+        hit, value = self.lookup(key)
+        return value if hit and value is not None else default
+
+    def put(self, key: Hashable, value: Any, ttl: float = None):
+        """
+        Add (or replace) key.
+
+        Args:
+            key (Hashable): Cache key (str if persisted).
+            value (Any): Value, None is stored as a negative entry.
+            ttl (float, optional): Override default TTL (seconds). Defaults to None.
+        """
+        if ttl is None:
+            ttl = self.negative_ttl if value is self._NEGATIVE else self.ttl
+        expires = time.time() + ttl
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            if self._backend is not None:
+                self._backend.put(key, {'expires': expires, 'value': value})
+            while len(self._entries) > self.max_size:
+                evicted, _ = self._entries.popitem(last=False)
+                self.stats.evictions += 1
+                LOGGER.trace(f'Cache evicted: {evicted}')
+
+    def put_negative(self, key: Hashable, ttl: float = None):
+        """Record that key has no value (ie. lookup returned 'not found')"""
+        self.put(key, self._NEGATIVE, ttl)
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._backend is not None:
+                self._backend.clear()
+
+    def purge_expired(self) -> int:
+        """
+        Remove expired entries (memory and backend).
+
+        Returns:
+            int: Number of entries removed.
+        """
+        now = time.time()
+        removed = 0
+        with self._lock:
+            for key in [key for key, (expires, _) in self._entries.items() if expires <= now]:
+                del self._entries[key]
+                removed += 1
+            if self._backend is not None:
+                for key in list(self._backend.keys()):
+                    entry = self._backend.get(key)
+                    if entry is None or entry.get('expires', 0) <= now:
+                        self._backend.delete(key)
+                        removed += 1
+        return removed
+
+    def _load(self, key: Hashable) -> Tuple[float, Any]:
+        data = self._backend.get(key)
+        if data is None:
+            return None
+        entry = (data.get('expires', 0), data.get('value'))
+        self._entries[key] = entry
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+        return entry
+
+    def _remove(self, key: Hashable):
+        self._entries.pop(key, None)
+        if self._backend is not None:
+            self._backend.delete(key)
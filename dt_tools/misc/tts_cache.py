@@ -0,0 +1,218 @@
+"""
+Persistent (on-disk) cache of synthesized speech (text-to-speech mp3 clips).
+
+Clips are content-addressed: the file name is a hash of the text, language and
+accent, so the same phrase is synthesized (gTTS network round trip) only once.
+Playback speed is applied by the player, so one clip serves every speed.
+
+The cache is bounded by total size, least recently used clips are evicted first
+(last use is tracked via the file modification time).
+
+Example::
+
+    from dt_tools.misc.tts_cache import TTSCache
+
+    cache = TTSCache()
+    cache.warm(['Severe thunderstorm warning', 'The time is 10 oclock'])
+    mp3_file = cache.get_or_synthesize('Severe thunderstorm warning')   # cache hit
+
+"""
+import hashlib
+import os
+import pathlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, Tuple, Union
+
+from loguru import logger as LOGGER
+
+SynthesizeFn = Callable[[str, str, str], bytes]
+
+
+def gtts_synthesize(text: str, lang: str = 'en', tld: str = 'us') -> bytes:
+    """Synthesize text via gTTS (Google Translate TTS), return mp3 bytes"""
+    import io
+
+    from gtts import gTTS
+    buffer = io.BytesIO()
+    gTTS(text=text, lang=lang, tld=tld, slow=False).write_to_fp(buffer)
+    return buffer.getvalue()
+
+
+class TTSCache:
+    """
+    Content-addressed mp3 cache with LRU size bound.
+
+    Args:
+        cache_dir (str|Path, optional): Clip directory. Defaults to ~/.IpHelper/tts_cache.
+        max_bytes (int, optional): Max total size of cached clips. Defaults to 200MB.
+        synthesize (SynthesizeFn, optional): fn(text, lang, tld) -> mp3 bytes. Defaults to gTTS.
+    """
+    DEFAULT_DIR = pathlib.Path('~').expanduser().absolute() / ".IpHelper" / "tts_cache"
+    SUFFIX = '.mp3'
+
+    def __init__(self, cache_dir: Union[str, pathlib.Path] = None, max_bytes: int = 200 * 1024 * 1024,
+                 synthesize: SynthesizeFn = None):
+        self.cache_dir = pathlib.Path(cache_dir or self.DEFAULT_DIR).expanduser()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._synthesize = synthesize or gtts_synthesize
+        self._index: Dict[str, Tuple[int, float]] = None  # key: (size, last used)
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def key(text: str, lang: str = 'en', tld: str = 'us') -> str:
+        """Content address (sha256 hex) for the clip"""
+        return hashlib.sha256(f'{lang}\x00{tld}\x00{text}'.encode('UTF-8')).hexdigest()
+
+    def __len__(self) -> int:
+        return len(self._load_index())
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(size for size, _ in self._load_index().values())
+
+    def path_for(self, text: str, lang: str = 'en', tld: str = 'us') -> Union[pathlib.Path, None]:
+        """
+        Cached clip for text (marks it as recently used).
+
+        Returns:
+            Path: mp3 file, None if not cached.
+        """
+        key = self.key(text, lang, tld)
+        with self._lock:
+            entry = self._load_index().get(key)
+            if entry is None:
+                return None
+            clip = self._clip_path(key)
+            now = time.time()
+            try:
+                os.utime(clip, (now, now))
+            except FileNotFoundError:
+                del self._index[key]  # removed outside of the cache
+                return None
+            self._index[key] = (entry[0], now)
+        return clip
+
+    def get_or_synthesize(self, text: str, lang: str = 'en', tld: str = 'us') -> pathlib.Path:
+        """
+        Return the cached clip for text, synthesizing (and caching) it on a miss.
+
+        Concurrent requests for the same text synthesize once.
+
+        Raises:
+            Exception: Synthesis errors (ie. gTTSError) are passed through.
+
+        Returns:
+            Path: mp3 file.
+        """
+        clip = self.path_for(text, lang, tld)
+        if clip is not None:
+            self.hits += 1
+            return clip
+
+        key = self.key(text, lang, tld)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            clip = self.path_for(text, lang, tld)
+            if clip is not None:
+                self.hits += 1
+                return clip
+            self.misses += 1
+            LOGGER.debug(f'TTS cache miss, synthesizing: {text[:50]}')
+            clip = self.put(key, self._synthesize(text, lang, tld))
+        with self._lock:
+            self._key_locks.pop(key, None)
+        return clip
+
+    def put(self, key: str, data: bytes) -> pathlib.Path:
+        """Store clip bytes under key (atomic write), evicting old clips as needed"""
+        clip = self._clip_path(key)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_file = clip.with_suffix(f'.{threading.get_ident()}.tmp')
+        tmp_file.write_bytes(data)
+        os.replace(tmp_file, clip)
+        with self._lock:
+            self._load_index()[key] = (len(data), time.time())
+            self._evict(keep=key)
+        return clip
+
+    def warm(self, phrases: Iterable[str], lang: str = 'en', tld: str = 'us', max_workers: int = 4) -> int:
+        """
+        Pre-synthesize phrases (ie. alert headlines, time checks) into the cache.
+
+        Args:
+            phrases (Iterable[str]): Text to synthesize.
+            lang (str, optional): Language. Defaults to 'en'.
+            tld (str, optional): Accent (gTTS top level domain). Defaults to 'us'.
+            max_workers (int, optional): Concurrent synthesis requests. Defaults to 4.
+
+        Returns:
+            int: Number of phrases newly synthesized.
+        """
+        pending = [phrase for phrase in dict.fromkeys(phrases) if self.path_for(phrase, lang, tld) is None]
+        if len(pending) == 0:
+            return 0
+        synthesized = 0
+        with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='tts-warm') as executor:
+            futures = {executor.submit(self.get_or_synthesize, phrase, lang, tld): phrase for phrase in pending}
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                    synthesized += 1
+                except Exception as ex:
+                    LOGGER.warning(f'Unable to synthesize [{futures[future][:50]}] - {repr(ex)}')
+        LOGGER.debug(f'TTS cache warmed: {synthesized} of {len(pending)} phrases synthesized.')
+        return synthesized
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._load_index()):
+                self._remove(key)
+
+    # ---------------------------------------------------------------------------------
+    def _clip_path(self, key: str) -> pathlib.Path:
+        return self.cache_dir / f'{key}{self.SUFFIX}'
+
+    def _load_index(self) -> Dict[str, Tuple[int, float]]:
+        # Directory is scanned once, on first use
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    index = {}
+                    if self.cache_dir.is_dir():
+                        for clip in self.cache_dir.glob(f'*{self.SUFFIX}'):
+                            try:
+                                stat = clip.stat()
+                            except FileNotFoundError:
+                                continue
+                            index[clip.stem] = (stat.st_size, stat.st_mtime)
+                    self._index = index
+                    LOGGER.trace(f'TTS cache {self.cache_dir}: {len(index)} clips')
+        return self._index
+
+    def _evict(self, keep: str = None):
+        total = self.total_bytes
+        if total <= self.max_bytes:
+            return
+        for key, (size, _) in sorted(self._index.items(), key=lambda item: item[1][1]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            self._remove(key)
+            total -= size
+            LOGGER.trace(f'TTS cache evicted {key}')
+
+    def _remove(self, key: str):
+        self._index.pop(key, None)
+        try:
+            self._clip_path(key).unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as ex:
+            LOGGER.warning(f'Unable to delete cached clip [{key}] - {repr(ex)}')
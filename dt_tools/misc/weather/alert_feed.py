@@ -0,0 +1,178 @@
+"""
+alert_feed.py - Alert change feed (new / updated / expired) over successive alert polls
+
+AlertChangeFeed keeps, per location key, the alerts (by id) of the previous poll and
+turns each new poll into change events:
+
+- NEW       alert id not seen before for the location
+- UPDATED   NWS 'Update' message, replaces the alert(s) it references
+- EXPIRED   alert no longer active, or cancelled by an NWS 'Cancel' message
+
+Subscribers get each change as a callback (on the polling thread) or through an async
+iterator (stream()), instead of re-reading and comparing the whole alert list each poll.
+One feed serves many locations: LocationAlerts share one feed by default (see
+LocationAlerts.alert_change_feed()), so a location re-created on every poll (ie. by
+WeatherFleet) is still diffed against its previous poll.
+
+Example::
+
+    from dt_tools.misc.weather.alert_feed import AlertChangeFeed
+    from dt_tools.misc.weather.weather_forecast_alert import LocationAlerts
+
+    feed = AlertChangeFeed()
+    feed.subscribe(lambda change: print(change.event, change.key, change.headline))
+    alerts = LocationAlerts(30.0694, -81.5515, change_feed=feed)   # NEW events
+    alerts.refresh_if_needed()                                      # events for what changed
+
+    async for change in feed.stream():
+        ...
+
+"""
+import asyncio
+import threading
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Tuple
+
+from loguru import logger as LOGGER
+
+NEW = 'new'
+UPDATED = 'updated'
+EXPIRED = 'expired'
+
+
+# =========================================================================================================
+@dataclass(frozen=True)
+class AlertChange():
+    """Alert change event, properties are the alert's NWS properties (read-only)"""
+    event: str                              # NEW, UPDATED, EXPIRED
+    key: str                                # location key (see AlertChangeFeed.update)
+    alert_id: str
+    properties: dict = field(repr=False, compare=False)
+    replaces: Tuple[str, ...] = ()          # UPDATED: ids of the alerts replaced
+
+    @property
+    def event_name(self) -> str:
+        return self.properties.get('event')
+
+    @property
+    def headline(self) -> str:
+        return self.properties.get('headline')
+
+
+def _references(props: dict) -> List[str]:
+    return [ref.get('identifier', ref.get('@id')) for ref in props.get('references', []) or []]
+
+
+# =========================================================================================================
+class AlertChangeFeed:
+    """
+    Change feed over alert polls, for any number of locations.
+
+    Args:
+        on_change (Callable[[AlertChange], Any], optional): Subscriber, same as subscribe(). Defaults to None.
+    """
+    def __init__(self, on_change: Callable[[AlertChange], None] = None):
+        self._alerts: Dict[str, Dict[str, dict]] = {}
+        self._subscribers: List[Callable[[AlertChange], None]] = []
+        self._lock = threading.Lock()
+        if on_change is not None:
+            self.subscribe(on_change)
+
+    def alerts(self, key: str = '') -> Dict[str, dict]:
+        """Current alerts (id -> properties) for a location key"""
+        with self._lock:
+            return dict(self._alerts.get(key, {}))
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            return list(self._alerts.keys())
+
+    def update(self, alerts: Iterable[dict], key: str = '') -> List[AlertChange]:
+        """
+        Record a poll and notify subscribers of what changed since the previous poll of key.
+
+        Args:
+            alerts (Iterable[dict]): Active alerts (NWS feature properties, with 'id').
+            key (str, optional): Location key. Defaults to ''.
+
+        Returns:
+            List[AlertChange]: New/updated alerts (poll order), then expired alerts.
+        """
+        current = {}
+        for props in alerts:
+            current.setdefault(props.get('id'), props)
+        changes = []
+        gone = set()
+        with self._lock:
+            previous = self._alerts.get(key, {})
+            self._alerts[key] = current
+            for alert_id, props in current.items():
+                if alert_id in previous:
+                    continue
+                refs = _references(props)
+                known = tuple(ref for ref in refs if ref in previous)
+                message_type = props.get('messageType')
+                if message_type == 'Cancel':
+                    for ref in known:
+                        if ref not in gone:
+                            changes.append(AlertChange(EXPIRED, key, ref, previous[ref]))
+                    gone.update(known)
+                elif message_type == 'Update' and len(known) > 0:
+                    changes.append(AlertChange(UPDATED, key, alert_id, props, replaces=known))
+                    gone.update(known)
+                else:
+                    changes.append(AlertChange(NEW, key, alert_id, props))
+            for alert_id, props in previous.items():
+                if alert_id not in current and alert_id not in gone:
+                    changes.append(AlertChange(EXPIRED, key, alert_id, props))
+        self._notify(changes)
+        return changes
+
+    def forget(self, key: str = '') -> List[AlertChange]:
+        """Drop a location, its alerts are reported EXPIRED"""
+        if key not in self._alerts:
+            return []
+        changes = self.update([], key)
+        with self._lock:
+            self._alerts.pop(key, None)
+        return changes
+
+    # ---------------------------------------------------------------------------------
+    def subscribe(self, callback: Callable[[AlertChange], None]) -> Callable[[], None]:
+        """
+        Call callback(change) for every change (on the thread calling update()).
+
+        Returns:
+            Callable: Unsubscribe function.
+        """
+        with self._lock:
+            self._subscribers.append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+        return unsubscribe
+
+    async def stream(self) -> AsyncIterator[AlertChange]:
+        """Async iterator over changes from now on (update() may be called from any thread)"""
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        unsubscribe = self.subscribe(lambda change: loop.call_soon_threadsafe(queue.put_nowait, change))
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            unsubscribe()
+
+    def _notify(self, changes: List[AlertChange]):
+        if len(changes) == 0:
+            return
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for change in changes:
+            for callback in subscribers:
+                try:
+                    callback(change)
+                except Exception as ex:
+                    LOGGER.warning(f'AlertChangeFeed subscriber failed - {repr(ex)}')
@@ -0,0 +1,266 @@
+"""
+forecast_periods.py - Parse-once, compact NWS forecast period model
+
+NWS forecast payloads are GeoJSON with one dict per period (14 daily, ~156 hourly).
+Instead of holding the payloads and re-reading (and re-parsing) the dicts on every
+property access, periods are parsed once into:
+
+- ForecastPeriod: a __slots__ record (datetimes parsed, repeated strings interned),
+  used for the daily forecast.
+- HourlyTable: a columnar (struct-of-arrays, NumPy) table of the hourly forecast,
+  repeated strings stored as category codes.  Rows are materialized as ForecastPeriod
+  on request.
+
+Example::
+
+    from dt_tools.misc.weather.forecast_periods import HourlyTable, parse_periods
+
+    daily = parse_periods(daily_payload)             # (ForecastPeriod, ...)
+    print(daily[0].name, daily[0].start, daily[0].temperature)
+
+    hourly = HourlyTable.from_payload(hourly_payload)
+    print(hourly.temperature.max(), hourly.short_forecast[:3])
+    print(hourly.period(hourly.index_at(datetime.now(timezone.utc))).to_string())
+
+"""
+import re
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Dict, List, Sequence, Tuple, Union
+
+if TYPE_CHECKING:
+    import numpy as np
+
+_NUMBER = re.compile(r'\d+(?:\.\d+)?')
+_TIMEZONES: Dict[int, timezone] = {}
+
+
+def _timezone(offset: timedelta) -> timezone:
+    # One tzinfo object per UTC offset, shared by every parsed datetime
+    seconds = int(offset.total_seconds())
+    tz = _TIMEZONES.get(seconds)
+    if tz is None:
+        tz = _TIMEZONES.setdefault(seconds, timezone(timedelta(seconds=seconds)))
+    return tz
+
+def _datetime(value: Union[str, None]) -> Union[datetime, None]:
+    if not value:
+        return None
+    try:
+        stamp = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if stamp.tzinfo is not None:
+        stamp = stamp.replace(tzinfo=_timezone(stamp.utcoffset()))
+    return stamp
+
+def _intern(value: Union[str, None]) -> Union[str, None]:
+    return sys.intern(value) if isinstance(value, str) else value
+
+def _value(payload: dict, key: str):
+    # NWS quantitative values: {'unitCode': 'wmoUnit:percent', 'value': 20}
+    entry = payload.get(key)
+    return entry.get('value') if isinstance(entry, dict) else entry
+
+def wind_speed_value(wind_speed: Union[str, None]) -> Union[float, None]:
+    """Upper bound of an NWS wind speed ('10 mph', '5 to 10 mph'), None if not present"""
+    numbers = _NUMBER.findall(wind_speed or '')
+    return max(float(num) for num in numbers) if numbers else None
+
+
+# =========================================================================================================
+class ForecastPeriod:
+    """Parsed NWS forecast period (read-only)"""
+    __slots__ = ('number', 'name', 'start', 'end', 'is_daytime', 'temperature', 'temperature_unit',
+                 'temperature_trend', 'precipitation_pct', 'dewpoint', 'humidity', 'wind_speed',
+                 'wind_direction', 'icon', 'short_forecast', 'detailed_forecast')
+
+    def __init__(self, number: int = None, name: str = None, start: datetime = None, end: datetime = None,
+                 is_daytime: bool = None, temperature: float = None, temperature_unit: str = None,
+                 temperature_trend: str = None, precipitation_pct: float = None, dewpoint: float = None,
+                 humidity: float = None, wind_speed: str = None, wind_direction: str = None, icon: str = None,
+                 short_forecast: str = None, detailed_forecast: str = None):
+        self.number = number
+        self.name = name
+        self.start = start
+        self.end = end
+        self.is_daytime = is_daytime
+        self.temperature = temperature
+        self.temperature_unit = temperature_unit
+        self.temperature_trend = temperature_trend
+        self.precipitation_pct = precipitation_pct
+        self.dewpoint = dewpoint
+        self.humidity = humidity
+        self.wind_speed = wind_speed
+        self.wind_direction = wind_direction
+        self.icon = icon
+        self.short_forecast = short_forecast
+        self.detailed_forecast = detailed_forecast
+
+    def __repr__(self) -> str:
+        return f'ForecastPeriod(number={self.number}, name={self.name!r}, start={self.start}, temperature={self.temperature})'
+
+    @classmethod
+    def from_payload(cls, period: dict) -> 'ForecastPeriod':
+        return cls(number=period.get('number'), name=_intern(period.get('name')),
+                   start=_datetime(period.get('startTime')), end=_datetime(period.get('endTime')),
+                   is_daytime=period.get('isDaytime'), temperature=_value(period, 'temperature'),
+                   temperature_unit=_intern(period.get('temperatureUnit')),
+                   temperature_trend=_intern(period.get('temperatureTrend')),
+                   precipitation_pct=_value(period, 'probabilityOfPrecipitation'),
+                   dewpoint=_value(period, 'dewpoint'), humidity=_value(period, 'relativeHumidity'),
+                   wind_speed=_intern(period.get('windSpeed')), wind_direction=_intern(period.get('windDirection')),
+                   icon=_intern(period.get('icon')), short_forecast=_intern(period.get('shortForecast')),
+                   detailed_forecast=period.get('detailedForecast'))
+
+    def to_dict(self) -> dict:
+        """NWS shaped period dict (the raw payload keys)"""
+        return {'number': self.number, 'name': self.name,
+                'startTime': None if self.start is None else self.start.isoformat(),
+                'endTime': None if self.end is None else self.end.isoformat(),
+                'isDaytime': self.is_daytime, 'temperature': self.temperature,
+                'temperatureUnit': self.temperature_unit, 'temperatureTrend': self.temperature_trend,
+                'probabilityOfPrecipitation': {'unitCode': 'wmoUnit:percent', 'value': self.precipitation_pct},
+                'dewpoint': {'unitCode': 'wmoUnit:degC', 'value': self.dewpoint},
+                'relativeHumidity': {'unitCode': 'wmoUnit:percent', 'value': self.humidity},
+                'windSpeed': self.wind_speed, 'windDirection': self.wind_direction, 'icon': self.icon,
+                'shortForecast': self.short_forecast, 'detailedForecast': self.detailed_forecast}
+
+
+def parse_periods(payload: dict) -> Tuple[ForecastPeriod, ...]:
+    """ForecastPeriods of an NWS forecast payload (properties.periods)"""
+    return tuple(ForecastPeriod.from_payload(period) for period in payload.get('properties', {}).get('periods', []))
+
+
+# =========================================================================================================
+class HourlyTable:
+    """
+    Columnar hourly forecast (one NumPy array per field, n periods).
+
+    Columns: start / end (datetime64[s], UTC), is_daytime, temperature, precipitation_pct,
+    dewpoint (degC), humidity, wind_speed (upper bound, payload unit) as float32 (NaN if
+    missing), and wind_direction, short_forecast, icon (category codes, expanded on access).
+    """
+    __slots__ = ('start', 'end', 'utc_offset', 'is_daytime', 'temperature', 'temperature_unit',
+                 'precipitation_pct', 'dewpoint', 'humidity', 'wind_speed', '_wind_speed_text',
+                 '_categories', '_codes')
+
+    CATEGORIES = ('wind_direction', 'short_forecast', 'icon')
+
+    def __init__(self, periods: Sequence[dict] = ()):
+        import numpy as np
+
+        count = len(periods)
+        starts = [_datetime(period.get('startTime')) for period in periods]
+        ends = [_datetime(period.get('endTime')) for period in periods]
+        self.start = np.array([_epoch(stamp) for stamp in starts], dtype='datetime64[s]').reshape(count)
+        self.end = np.array([_epoch(stamp) for stamp in ends], dtype='datetime64[s]').reshape(count)
+        self.utc_offset = int(starts[0].utcoffset().total_seconds()) if count and starts[0] and starts[0].tzinfo else 0
+        self.is_daytime = np.array([bool(period.get('isDaytime')) for period in periods], dtype=bool).reshape(count)
+        self.temperature = _floats([_value(period, 'temperature') for period in periods])
+        self.temperature_unit = _intern(periods[0].get('temperatureUnit')) if count else None
+        self.precipitation_pct = _floats([_value(period, 'probabilityOfPrecipitation') for period in periods])
+        self.dewpoint = _floats([_value(period, 'dewpoint') for period in periods])
+        self.humidity = _floats([_value(period, 'relativeHumidity') for period in periods])
+        speeds = [period.get('windSpeed') for period in periods]
+        self.wind_speed = _floats([wind_speed_value(speed) for speed in speeds])
+        self._wind_speed_text = _encode(speeds)
+        self._categories: Dict[str, Tuple[str, ...]] = {}
+        self._codes: Dict[str, 'np.ndarray'] = {}
+        for name in self.CATEGORIES:
+            key = {'wind_direction': 'windDirection', 'short_forecast': 'shortForecast', 'icon': 'icon'}[name]
+            self._categories[name], self._codes[name] = _encode([period.get(key) for period in periods])
+
+    @classmethod
+    def from_payload(cls, payload: dict) -> 'HourlyTable':
+        return cls(payload.get('properties', {}).get('periods', []))
+
+    def __len__(self) -> int:
+        return int(self.start.size)
+
+    @property
+    def wind_direction(self) -> 'np.ndarray':
+        return self._decode('wind_direction')
+
+    @property
+    def short_forecast(self) -> 'np.ndarray':
+        return self._decode('short_forecast')
+
+    @property
+    def icon(self) -> 'np.ndarray':
+        return self._decode('icon')
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the column arrays and category labels"""
+        arrays = [self.start, self.end, self.is_daytime, self.temperature, self.precipitation_pct, self.dewpoint,
+                  self.humidity, self.wind_speed, self._wind_speed_text[1], *self._codes.values()]
+        labels = [*self._wind_speed_text[0], *(label for labels in self._categories.values() for label in labels)]
+        return sum(arr.nbytes for arr in arrays) + sum(sys.getsizeof(label) for label in labels if label is not None)
+
+    def index_at(self, when: datetime) -> int:
+        """Index of the period containing when (aware datetime, naive = UTC), -1 if outside the table"""
+        import numpy as np
+
+        if when.tzinfo is not None:
+            when = when.astimezone(timezone.utc).replace(tzinfo=None)
+        stamp = np.datetime64(when, 's')
+        idx = int(np.searchsorted(self.start, stamp, side='right')) - 1
+        if idx < 0 or stamp >= self.end[idx]:
+            return -1
+        return idx
+
+    def period(self, idx: int) -> ForecastPeriod:
+        """Row idx as a ForecastPeriod (local time datetimes)"""
+        tz = _timezone(timedelta(seconds=self.utc_offset))
+        labels, codes = self._wind_speed_text
+        return ForecastPeriod(number=idx + 1, name='', start=_aware(self.start[idx], tz), end=_aware(self.end[idx], tz),
+                              is_daytime=bool(self.is_daytime[idx]), temperature=_number(self.temperature[idx]),
+                              temperature_unit=self.temperature_unit, precipitation_pct=_number(self.precipitation_pct[idx]),
+                              dewpoint=_number(self.dewpoint[idx], integer=False), humidity=_number(self.humidity[idx]),
+                              wind_speed=labels[codes[idx]], wind_direction=self._label('wind_direction', idx),
+                              icon=self._label('icon', idx), short_forecast=self._label('short_forecast', idx),
+                              detailed_forecast='')
+
+    def periods(self) -> List[ForecastPeriod]:
+        return [self.period(idx) for idx in range(len(self))]
+
+    # ---------------------------------------------------------------------------------
+    def _label(self, name: str, idx: int) -> Union[str, None]:
+        return self._categories[name][self._codes[name][idx]]
+
+    def _decode(self, name: str) -> 'np.ndarray':
+        import numpy as np
+        return np.asarray(self._categories[name], dtype=object)[self._codes[name]]
+
+
+def _epoch(stamp: Union[datetime, None]):
+    # datetime64[s] value (UTC), NaT if missing
+    if stamp is None:
+        return 'NaT'
+    if stamp.tzinfo is not None:
+        stamp = stamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return stamp
+
+def _aware(value, tz: timezone) -> Union[datetime, None]:
+    import numpy as np
+    if np.isnat(value):
+        return None
+    return datetime.fromtimestamp(int(value.astype('datetime64[s]').astype(np.int64)), tz)
+
+def _floats(values: List[Union[float, None]]) -> 'np.ndarray':
+    import numpy as np
+    return np.array([np.nan if val is None else val for val in values], dtype=np.float32).reshape(len(values))
+
+def _number(value, integer: bool = True):
+    import numpy as np
+    if np.isnan(value):
+        return None
+    return int(value) if integer and float(value).is_integer() else float(value)
+
+def _encode(values: List[Union[str, None]]) -> Tuple[Tuple[Union[str, None], ...], 'np.ndarray']:
+    # (labels, uint16 codes), labels interned
+    import numpy as np
+    labels: Dict[Union[str, None], int] = {}
+    codes = [labels.setdefault(_intern(val), len(labels)) for val in values]
+    return tuple(labels.keys()), np.array(codes, dtype=np.uint16).reshape(len(codes))
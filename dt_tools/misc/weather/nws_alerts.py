@@ -0,0 +1,454 @@
+"""
+nws_alerts.py - Bulk NWS alert ingestion, indexed by zone (UGC code) and polygon
+
+LocationAlerts polls /alerts/active?point=lat,lon for every location.  AlertEngine
+instead pulls /alerts/active once for an area (state/marine codes) or the whole
+country and indexes the active alerts:
+
+- by UGC code (geocode.UGC and affectedZones, ie. 'FLZ025' forecast zone, 'FLC031' county)
+- by polygon (alerts with a geometry, bucketed by bounding box)
+
+"Alerts for location X" is then answered from the index, using the location's forecast
+zone / county from its (cached) /points metadata.  As api.weather.gov does for a point
+query, an alert with a polygon matches points inside the polygon, an alert without one
+matches points in its zones.  The bulk payload goes through an HttpCache, so an
+unchanged feed (304) re-uses the current index.
+
+For many sites, SiteIndex matches site coordinates against the alert polygons in bulk:
+sites are bucketed on a uniform grid, each polygon is tested only against the sites in
+the buckets its bounding box covers, with a vectorized (NumPy) point in polygon test.
+
+Example::
+
+    from dt_tools.misc.weather.nws_alerts import AlertEngine, location_zones
+
+    engine = AlertEngine(area='FL')
+    zones = location_zones(points_payload)      # /points payload of the location
+    for alert in engine.alerts_for(30.0694, -81.5515, zones):
+        print(alert.event, alert.headline)
+
+    per_site = engine.alerts_for_sites(lats, lons, site_zones)   # [[AlertRecord, ...], ...]
+
+"""
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, Iterable, List, Sequence, Tuple, Union
+
+from loguru import logger as LOGGER
+
+from dt_tools.misc.http_cache import HttpCache
+from dt_tools.misc.weather.nws_grid import point_in_polygon
+
+if TYPE_CHECKING:
+    import numpy as np
+
+URL_ACTIVE_ALERTS = 'https://api.weather.gov/alerts/active'
+_PIP_CHUNK_ELEMENTS = 1_000_000     # max edges x points per vectorized point in polygon step
+ArrayLike = Union[Sequence[float], 'np.ndarray']
+
+
+# =========================================================================================================
+def location_zones(points_payload: dict) -> Tuple[str, ...]:
+    """UGC codes (forecast zone, county, fire weather zone) from a /points payload"""
+    props = points_payload.get('properties', {}) if points_payload else {}
+    zones = []
+    for key in ('forecastZone', 'county', 'fireWeatherZone'):
+        url = props.get(key)
+        if url:
+            zone = url.rstrip('/').rsplit('/', 1)[-1]
+            if zone not in zones:
+                zones.append(zone)
+    return tuple(zones)
+
+def _timestamp(value: Union[str, None]) -> Union[float, None]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+def _polygons(geometry: Union[dict, None]) -> List[List[Tuple[float, float]]]:
+    # Outer rings only, [(lon, lat), ...]
+    if not geometry or not geometry.get('coordinates'):
+        return []
+    if geometry.get('type') == 'Polygon':
+        polygons = [geometry['coordinates']]
+    elif geometry.get('type') == 'MultiPolygon':
+        polygons = geometry['coordinates']
+    else:
+        return []
+    return [[(float(lon), float(lat)) for lon, lat, *_ in polygon[0]] for polygon in polygons if polygon and polygon[0]]
+
+def points_in_polygon(lats: ArrayLike, lons: ArrayLike, ring: List[Tuple[float, float]]) -> 'np.ndarray':
+    """
+    Vectorized point_in_polygon() (same ray casting, same results).
+
+    Args:
+        lats (ArrayLike): Latitudes (n).
+        lons (ArrayLike): Longitudes (n).
+        ring (List[Tuple[float, float]]): Polygon as [(lon, lat), ...].
+
+    Returns:
+        np.ndarray: Boolean mask (n), True where the point is inside.
+    """
+    import numpy as np
+
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    edges = np.asarray(ring, dtype=np.float64)
+    cur_lon, cur_lat = edges[:, 0:1], edges[:, 1:2]           # (edges, 1)
+    prev_lon = np.concatenate((cur_lon[-1:], cur_lon[:-1]))
+    prev_lat = np.concatenate((cur_lat[-1:], cur_lat[:-1]))
+    inside = np.zeros(lats.shape, dtype=bool)
+    # edges x points matrices, chunked so large polygons do not allocate huge temporaries
+    chunk = max(1, _PIP_CHUNK_ELEMENTS // max(1, len(edges)))
+    for start in range(0, lats.size, chunk):
+        lat = lats[start:start + chunk][np.newaxis, :]
+        lon = lons[start:start + chunk][np.newaxis, :]
+        spans = (cur_lat > lat) != (prev_lat > lat)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cross = (prev_lon - cur_lon) * (lat - cur_lat) / (prev_lat - cur_lat) + cur_lon
+        inside[start:start + chunk] = np.count_nonzero(spans & (lon < cross), axis=0) % 2 == 1
+    return inside
+
+
+# =========================================================================================================
+@dataclass
+class AlertRecord():
+    """Active alert, properties pre-extracted from the feed feature (read-only)"""
+    id: str
+    event: str
+    headline: str
+    ugc: Tuple[str, ...]
+    expires: Union[float, None]            # time.time() the alert ends (ends, else expires)
+    polygons: List[List[Tuple[float, float]]] = field(repr=False, default_factory=list)
+    bbox: Union[Tuple[float, float, float, float], None] = field(repr=False, default=None)  # lat/lon min, lat/lon max
+    feature: dict = field(repr=False, default_factory=dict)
+
+    @property
+    def properties(self) -> dict:
+        return self.feature.get('properties', {})
+
+    @classmethod
+    def from_feature(cls, feature: dict) -> 'AlertRecord':
+        props = feature.get('properties', {})
+        ugc = list(props.get('geocode', {}).get('UGC', []))
+        for url in props.get('affectedZones', []):
+            zone = url.rstrip('/').rsplit('/', 1)[-1]
+            if zone not in ugc:
+                ugc.append(zone)
+        polygons = _polygons(feature.get('geometry'))
+        bbox = None
+        if polygons:
+            lons = [pt[0] for polygon in polygons for pt in polygon]
+            lats = [pt[1] for polygon in polygons for pt in polygon]
+            bbox = (min(lats), min(lons), max(lats), max(lons))
+        return cls(id=props.get('id', feature.get('id')), event=props.get('event'), headline=props.get('headline'),
+                   ugc=tuple(ugc), expires=_timestamp(props.get('ends')) or _timestamp(props.get('expires')),
+                   polygons=polygons, bbox=bbox, feature=feature)
+
+    def is_active(self, now: float = None) -> bool:
+        return self.expires is None or self.expires > (time.time() if now is None else now)
+
+    def contains(self, lat: float, lon: float) -> bool:
+        """Point in the alert polygon(s), False if the alert has no polygon"""
+        if self.bbox is None:
+            return False
+        lat_lo, lon_lo, lat_hi, lon_hi = self.bbox
+        if not (lat_lo <= lat <= lat_hi and lon_lo <= lon <= lon_hi):
+            return False
+        return any(point_in_polygon(lat, lon, polygon) for polygon in self.polygons)
+
+
+@dataclass
+class AlertStats():
+    fetches: int = 0        # bulk requests
+    reused: int = 0         # feed unchanged (fresh or 304), index kept
+    rebuilds: int = 0       # index built from a new feed
+    lookups: int = 0
+    zone_hits: int = 0
+    polygon_hits: int = 0
+
+    def to_string(self) -> str:
+        return (f'fetches: {self.fetches}  reused: {self.reused}  rebuilds: {self.rebuilds}  lookups: {self.lookups}  '
+                f'zone hits: {self.zone_hits}  polygon hits: {self.polygon_hits}')
+
+
+# =========================================================================================================
+class AlertIndex:
+    """
+    Immutable index of one /alerts/active feed (swapped as a whole on refresh).
+
+    Args:
+        payload (dict): /alerts/active GeoJSON payload.
+    """
+    BUCKET_DEGREES = 0.25    # polygon candidate buckets (~25km)
+
+    def __init__(self, payload: dict):
+        self.payload = payload
+        self.built = time.time()
+        self.alerts: List[AlertRecord] = []
+        self._by_id: Dict[str, int] = {}
+        self._by_ugc: Dict[str, List[int]] = {}
+        self._buckets: Dict[Tuple[int, int], List[int]] = {}
+        for feature in payload.get('features', []):
+            alert = AlertRecord.from_feature(feature)
+            if alert.id in self._by_id:
+                continue
+            idx = len(self.alerts)
+            self.alerts.append(alert)
+            self._by_id[alert.id] = idx
+            if alert.bbox is None:
+                for zone in alert.ugc:
+                    self._by_ugc.setdefault(zone, []).append(idx)
+            else:
+                for bucket in self._bbox_buckets(alert.bbox):
+                    self._buckets.setdefault(bucket, []).append(idx)
+
+    def __len__(self) -> int:
+        return len(self.alerts)
+
+    def get(self, alert_id: str) -> Union[AlertRecord, None]:
+        idx = self._by_id.get(alert_id)
+        return None if idx is None else self.alerts[idx]
+
+    def zone_alerts(self, zone: str) -> List[AlertRecord]:
+        """Zone based (no polygon) alerts for a UGC code"""
+        return [self.alerts[idx] for idx in self._by_ugc.get(zone, [])]
+
+    def alerts_for(self, lat: float, lon: float, zones: Iterable[str] = (), stats: AlertStats = None) -> List[AlertRecord]:
+        """
+        Active alerts for a location, in feed order.
+
+        Args:
+            lat (float): Latitude.
+            lon (float): Longitude.
+            zones (Iterable[str], optional): UGC codes of the location (see location_zones()).
+                Without zones, only polygon alerts can match.  Defaults to ().
+
+        Returns:
+            List[AlertRecord]: Matching alerts.
+        """
+        now = time.time()
+        matched = set()
+        for idx in self._buckets.get(self._bucket(lat, lon), ()):
+            if idx not in matched and self.alerts[idx].contains(lat, lon):
+                matched.add(idx)
+                if stats is not None:
+                    stats.polygon_hits += 1
+        for zone in zones:
+            for idx in self._by_ugc.get(zone, ()):
+                if idx not in matched:
+                    matched.add(idx)
+                    if stats is not None:
+                        stats.zone_hits += 1
+        return [self.alerts[idx] for idx in sorted(matched) if self.alerts[idx].is_active(now)]
+
+    def alerts_for_sites(self, lats: ArrayLike, lons: ArrayLike, zones: Sequence[Iterable[str]] = None) -> List[List[AlertRecord]]:
+        """
+        Bulk alerts_for(): active alerts per site, in feed order (see SiteIndex).
+
+        Args:
+            lats (ArrayLike): Site latitudes (n).
+            lons (ArrayLike): Site longitudes (n).
+            zones (Sequence[Iterable[str]], optional): UGC codes per site. Defaults to None.
+
+        Returns:
+            List[List[AlertRecord]]: Alerts for each site (n).
+        """
+        now = time.time()
+        return SiteIndex(lats, lons, zones).match(alert for alert in self.alerts if alert.is_active(now))
+
+    # ---------------------------------------------------------------------------------
+    def _bucket(self, lat: float, lon: float) -> Tuple[int, int]:
+        return int(lat // self.BUCKET_DEGREES), int(lon // self.BUCKET_DEGREES)
+
+    def _bbox_buckets(self, bbox: Tuple[float, float, float, float]) -> List[Tuple[int, int]]:
+        lat_lo, lon_lo = self._bucket(bbox[0], bbox[1])
+        lat_hi, lon_hi = self._bucket(bbox[2], bbox[3])
+        return [(lat_b, lon_b) for lat_b in range(lat_lo, lat_hi + 1) for lon_b in range(lon_lo, lon_hi + 1)]
+
+
+# =========================================================================================================
+class SiteIndex:
+    """
+    Bulk site matcher: site coordinates bucketed on a uniform grid (NumPy).
+
+    Args:
+        lats (ArrayLike): Site latitudes (n).
+        lons (ArrayLike): Site longitudes (n).
+        zones (Sequence[Iterable[str]], optional): UGC codes per site (see location_zones()).
+            Without zones, only polygon alerts can match.  Defaults to None.
+        bucket_degrees (float, optional): Grid size. Defaults to 1 degree.
+
+    Raises:
+        ValueError: When lats, lons (and zones) differ in length.
+    """
+    BUCKET_DEGREES = 1.0     # coarser than AlertIndex, the bounding box test is vectorized
+
+    def __init__(self, lats: ArrayLike, lons: ArrayLike, zones: Sequence[Iterable[str]] = None,
+                 bucket_degrees: float = None):
+        import numpy as np
+
+        self.lats = np.atleast_1d(np.asarray(lats, dtype=np.float64)).ravel()
+        self.lons = np.atleast_1d(np.asarray(lons, dtype=np.float64)).ravel()
+        if self.lats.shape != self.lons.shape or (zones is not None and len(zones) != self.lats.size):
+            raise ValueError('lats, lons and zones must be the same length')
+        self.bucket_degrees = self.BUCKET_DEGREES if bucket_degrees is None else bucket_degrees
+        self._buckets: Dict[Tuple[int, int], 'np.ndarray'] = {}
+        if self.lats.size > 0:
+            lat_b = np.floor(self.lats / self.bucket_degrees).astype(np.int64)
+            lon_b = np.floor(self.lons / self.bucket_degrees).astype(np.int64)
+            # one sort on a combined cell key, each bucket is a slice of the sorted site indices
+            width = int(lon_b.max() - lon_b.min()) + 1
+            keys = (lat_b - lat_b.min()) * width + (lon_b - lon_b.min())
+            order = np.argsort(keys, kind='stable')
+            sorted_keys = keys[order]
+            starts = np.flatnonzero(np.diff(sorted_keys, prepend=-1))
+            ends = np.append(starts[1:], sorted_keys.size)
+            for start, end in zip(starts.tolist(), ends.tolist()):
+                site = order[start]
+                self._buckets[(int(lat_b[site]), int(lon_b[site]))] = order[start:end]
+        self._zones: Dict[str, List[int]] = {}
+        for idx, site_zones in enumerate(zones or []):
+            for zone in site_zones or ():
+                self._zones.setdefault(zone, []).append(idx)
+
+    def __len__(self) -> int:
+        return int(self.lats.size)
+
+    def sites_affected_by(self, alert: AlertRecord) -> 'np.ndarray':
+        """
+        Sites inside the alert polygon(s), or for an alert without polygon, sites in its zones.
+
+        Returns:
+            np.ndarray: Site indices (sorted, int64).
+        """
+        import numpy as np
+
+        if alert.bbox is None:
+            sites = {idx for zone in alert.ugc for idx in self._zones.get(zone, ())}
+            return np.array(sorted(sites), dtype=np.int64)
+        lat_lo, lon_lo, lat_hi, lon_hi = alert.bbox
+        lat_b_lo, lat_b_hi = int(lat_lo // self.bucket_degrees), int(lat_hi // self.bucket_degrees)
+        lon_b_lo, lon_b_hi = int(lon_lo // self.bucket_degrees), int(lon_hi // self.bucket_degrees)
+        if (lat_b_hi - lat_b_lo + 1) * (lon_b_hi - lon_b_lo + 1) > len(self._buckets):
+            candidates = [members for (lat_b, lon_b), members in self._buckets.items()
+                          if lat_b_lo <= lat_b <= lat_b_hi and lon_b_lo <= lon_b <= lon_b_hi]
+        else:
+            candidates = [self._buckets[(lat_b, lon_b)] for lat_b in range(lat_b_lo, lat_b_hi + 1)
+                          for lon_b in range(lon_b_lo, lon_b_hi + 1) if (lat_b, lon_b) in self._buckets]
+        if len(candidates) == 0:
+            return np.empty(0, dtype=np.int64)
+        sites = np.concatenate(candidates)
+        lats, lons = self.lats[sites], self.lons[sites]
+        in_bbox = (lats >= lat_lo) & (lats <= lat_hi) & (lons >= lon_lo) & (lons <= lon_hi)
+        sites, lats, lons = sites[in_bbox], lats[in_bbox], lons[in_bbox]
+        hits = np.zeros(sites.shape, dtype=bool)
+        for polygon in alert.polygons:
+            hits[~hits] = points_in_polygon(lats[~hits], lons[~hits], polygon)
+        return np.sort(sites[hits])
+
+    def match(self, alerts: Iterable[AlertRecord]) -> List[List[AlertRecord]]:
+        """Alerts per site (in alerts order) for the given alerts"""
+        per_site: List[List[AlertRecord]] = [[] for _ in range(len(self))]
+        for alert in alerts:
+            for idx in self.sites_affected_by(alert).tolist():
+                per_site[idx].append(alert)
+        return per_site
+
+
+# =========================================================================================================
+class AlertEngine:
+    """
+    Bulk alert source: one /alerts/active request per refresh, answered per location from an AlertIndex.
+
+    Args:
+        area (str | Iterable[str], optional): State/marine area code(s), ie. 'FL' or ['FL', 'GA'].
+            Defaults to None (whole country).
+        max_age (float, optional): Seconds the index is used before the feed is re-checked. Defaults to 60.
+        http_cache (HttpCache, optional): Response cache for the feed. Defaults to a private cache.
+    """
+    def __init__(self, area: Union[str, Iterable[str]] = None, max_age: float = 60.0, http_cache: HttpCache = None):
+        if isinstance(area, str):
+            area = [area]
+        self.area: Tuple[str, ...] = tuple(code.upper() for code in area) if area else ()
+        self.max_age = max_age
+        self.stats = AlertStats()
+        self._url = URL_ACTIVE_ALERTS if not self.area else f'{URL_ACTIVE_ALERTS}?area={",".join(self.area)}'
+        self._http_cache = http_cache if http_cache is not None else HttpCache(max_entries=4)
+        self._index: AlertIndex = None
+        self._content: bytes = None
+        self._checked: float = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return self._url
+
+    @property
+    def loaded(self) -> bool:
+        """True if a feed has been loaded (no refresh)"""
+        return self._index is not None
+
+    @property
+    def index(self) -> Union[AlertIndex, None]:
+        """Current index (refreshed if due), None if the feed has never been loaded"""
+        self.refresh_if_needed()
+        return self._index
+
+    def refresh_if_needed(self, force: bool = False) -> bool:
+        """
+        Re-check the feed if max_age has passed (or force).
+
+        Returns:
+            bool: True if a usable index is loaded.
+        """
+        if not force and self._index is not None and time.time() - self._checked <= self.max_age:
+            return True
+        with self._lock:
+            # another thread may have refreshed while this one waited
+            if not force and self._index is not None and time.time() - self._checked <= self.max_age:
+                return True
+            try:
+                resp = self._http_cache.get(self._url)
+                self.stats.fetches += 1
+            except Exception as ex:
+                LOGGER.warning(f'Unable to retrieve {self._url} - {repr(ex)}')
+                return self._index is not None
+            self._checked = time.time()
+            if resp.status_code != 200:
+                LOGGER.warning(f'{self._url} returned {resp.status_code}')
+                return self._index is not None
+            # unchanged feed (fresh or 304): same cached body, keep the index without parsing
+            if self._index is not None and resp.content is self._content:
+                self.stats.reused += 1
+            else:
+                self._index = AlertIndex(resp.json())
+                self._content = resp.content
+                self.stats.rebuilds += 1
+                LOGGER.debug(f'NWS alert index {self._url}: {len(self._index)} alerts')
+            return True
+
+    def alerts_for(self, lat: float, lon: float, zones: Iterable[str] = ()) -> List[AlertRecord]:
+        """Active alerts for a location (see AlertIndex.alerts_for), [] if the feed is unavailable"""
+        index = self.index
+        if index is None:
+            return []
+        self.stats.lookups += 1
+        return index.alerts_for(lat, lon, zones, self.stats)
+
+    def alerts_for_sites(self, lats: ArrayLike, lons: ArrayLike, zones: Sequence[Iterable[str]] = None) -> List[List[AlertRecord]]:
+        """Active alerts per site (see AlertIndex.alerts_for_sites), [] per site if the feed is unavailable"""
+        index = self.index
+        if index is None:
+            return [[] for _ in range(len(lats))]
+        self.stats.lookups += 1
+        return index.alerts_for_sites(lats, lons, zones)
+
+    def features_for(self, lat: float, lon: float, zones: Iterable[str] = ()) -> List[dict]:
+        """Raw GeoJSON features of alerts_for(), as /alerts/active?point= would return them"""
+        return [alert.feature for alert in self.alerts_for(lat, lon, zones)]
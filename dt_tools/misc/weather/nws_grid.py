@@ -0,0 +1,338 @@
+"""
+nws_grid.py - NWS grid cell index and grid-keyed forecast store
+
+NWS forecasts are issued per grid cell (office/gridX,gridY, ~2.5km), which the /points
+endpoint returns for a lat/lon.  Nearby locations frequently fall in the same cell.
+
+- GridIndex maps points to grid cells and keeps, per cell, the forecast URLs, the
+  cell-level /points metadata of the first point seen in the cell (see cell_payload,
+  zones belong to a point and are not kept), and the cell polygon (from the forecast
+  geometry).  A new point inside a known cell polygon resolves without a /points call.
+  The index is optionally persisted (CacheBackend).
+- GridForecastStore holds one parsed daily/hourly forecast per grid cell (see
+  forecast_periods), shared by every Forecast in the cell, so requests and memory
+  scale with cells, not locations.
+
+Example::
+
+    from dt_tools.misc.weather.nws_grid import GridIndex
+
+    index = GridIndex()
+    index.add_point(30.0694, -81.5515, points_payload)
+    index.set_polygon('JAX/66,53', forecast_payload['geometry'])
+    cell = index.resolve(30.0701, -81.5509)     # same cell, no /points call
+    print(cell.grid, cell.forecast_url)
+
+"""
+import asyncio
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Set, Tuple, Union
+
+from loguru import logger as LOGGER
+
+from dt_tools.misc.geoloc_cache import CacheBackend
+from dt_tools.misc.weather.forecast_periods import ForecastPeriod, HourlyTable
+
+
+# /points properties of the point itself, not its grid cell (a cell can span zone/county lines)
+POINT_FIELDS = ('forecastZone', 'county', 'fireWeatherZone')
+
+
+# =========================================================================================================
+def cell_payload(points_payload: dict) -> dict:
+    """/points payload without the point's own fields (POINT_FIELDS), valid for any point of the cell"""
+    props = {key: value for key, value in points_payload.get('properties', {}).items() if key not in POINT_FIELDS}
+    return {**points_payload, 'properties': props}
+
+def point_in_polygon(lat: float, lon: float, ring: List[Tuple[float, float]]) -> bool:
+    """Point in polygon (ray casting), ring as [(lon, lat), ...] (GeoJSON order)"""
+    inside = False
+    prev_lon, prev_lat = ring[-1]
+    for cur_lon, cur_lat in ring:
+        if (cur_lat > lat) != (prev_lat > lat):
+            cross = (prev_lon - cur_lon) * (lat - cur_lat) / (prev_lat - cur_lat) + cur_lon
+            if lon < cross:
+                inside = not inside
+        prev_lon, prev_lat = cur_lon, cur_lat
+    return inside
+
+
+@dataclass
+class GridCell():
+    """NWS grid cell (forecast URLs, /points metadata, polygon as [(lon, lat), ...])"""
+    grid: str
+    forecast_url: str
+    hourly_url: str
+    base: dict = field(repr=False, default_factory=dict)
+    polygon: List[Tuple[float, float]] = None
+    stored: float = field(default_factory=time.time)
+
+    def contains(self, lat: float, lon: float) -> bool:
+        """Point in polygon, False if the polygon is not known"""
+        return bool(self.polygon) and point_in_polygon(lat, lon, self.polygon)
+
+    def to_dict(self) -> dict:
+        return {'grid': self.grid, 'forecast_url': self.forecast_url, 'hourly_url': self.hourly_url,
+                'base': self.base, 'polygon': self.polygon, 'stored': self.stored}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'GridCell':
+        polygon = data.get('polygon')
+        return cls(grid=data['grid'], forecast_url=data['forecast_url'], hourly_url=data['hourly_url'],
+                   base=data.get('base', {}), polygon=None if polygon is None else [tuple(pt) for pt in polygon],
+                   stored=data.get('stored', time.time()))
+
+
+@dataclass
+class GridStats():
+    point_hits: int = 0
+    polygon_hits: int = 0
+    misses: int = 0
+    shared: int = 0     # forecasts served from the grid store
+    fetched: int = 0    # forecasts fetched for a cell
+
+    def to_string(self) -> str:
+        return (f'point hits: {self.point_hits}  polygon hits: {self.polygon_hits}  misses: {self.misses}  '
+                f'forecasts shared: {self.shared}  fetched: {self.fetched}')
+
+
+# =========================================================================================================
+class GridIndex:
+    """
+    Point -> NWS grid cell index.
+
+    Args:
+        backend (CacheBackend, optional): Persistent store. Defaults to None (memory only).
+        ttl (float, optional): Seconds an entry is valid. Defaults to 30 days.
+        polygon_lookup (bool, optional): Resolve unknown points by cell polygon. Defaults to True.
+    """
+    BUCKET_DEGREES = 0.05    # polygon candidate buckets (~5km)
+    PRECISION = 4            # point key decimals
+
+    def __init__(self, backend: CacheBackend = None, ttl: float = 30 * 86400.0, polygon_lookup: bool = True):
+        self.ttl = ttl
+        self.polygon_lookup = polygon_lookup
+        self.stats = GridStats()
+        self._backend = backend
+        self._cells: Dict[str, GridCell] = {}
+        self._points: Dict[str, str] = {}
+        self._buckets: Dict[Tuple[int, int], Set[str]] = {}
+        self._loaded = backend is None
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        self._load()
+        return len(self._cells)
+
+    @staticmethod
+    def grid_key(points_payload: dict) -> Union[str, None]:
+        """'office/x,y' from a /points payload, None if not present"""
+        props = points_payload.get('properties', {})
+        if props.get('gridId') is None or props.get('gridX') is None or props.get('gridY') is None:
+            return None
+        return f'{props["gridId"]}/{props["gridX"]},{props["gridY"]}'
+
+    @classmethod
+    def point_key(cls, lat: float, lon: float) -> str:
+        return f'{round(float(lat), cls.PRECISION)},{round(float(lon), cls.PRECISION)}'
+
+    def resolve(self, lat: float, lon: float) -> Union[GridCell, None]:
+        """
+        Grid cell for lat/lon: a point seen before, else a known cell whose polygon contains it.
+
+        Returns:
+            GridCell: Cell, None if unknown (call /points).
+        """
+        self._load()
+        point = self.point_key(lat, lon)
+        with self._lock:
+            grid = self._points.get(point)
+            cell = None if grid is None else self._live_cell(grid)
+            if cell is not None:
+                self.stats.point_hits += 1
+                return cell
+            if self.polygon_lookup:
+                for grid in self._buckets.get(self._bucket(lat, lon), ()):
+                    cell = self._live_cell(grid)
+                    if cell is not None and cell.contains(lat, lon):
+                        self.stats.polygon_hits += 1
+                        self._points[point] = grid
+                        self._persist(f'point:{point}', {'grid': grid, 'stored': time.time()})
+                        return cell
+            self.stats.misses += 1
+        return None
+
+    def add_point(self, lat: float, lon: float, points_payload: dict) -> Union[GridCell, None]:
+        """Record the /points result for lat/lon, return its grid cell (None if payload has no grid)"""
+        grid = self.grid_key(points_payload)
+        if grid is None:
+            return None
+        self._load()
+        props = points_payload['properties']
+        point = self.point_key(lat, lon)
+        with self._lock:
+            cell = self._live_cell(grid)
+            if cell is None or cell.forecast_url != props.get('forecast'):
+                cell = GridCell(grid, props.get('forecast'), props.get('forecastHourly'), base=cell_payload(points_payload))
+                self._cells[grid] = cell
+                self._persist(f'cell:{grid}', cell.to_dict())
+            self._points[point] = grid
+            self._persist(f'point:{point}', {'grid': grid, 'stored': time.time()})
+        return cell
+
+    def set_polygon(self, grid: str, geometry: dict):
+        """Record the cell polygon from a forecast payload's GeoJSON geometry"""
+        if not geometry or geometry.get('type') != 'Polygon' or not geometry.get('coordinates'):
+            return
+        with self._lock:
+            cell = self._cells.get(grid)
+            if cell is None or cell.polygon:
+                return
+            cell.polygon = [(float(lon), float(lat)) for lon, lat in geometry['coordinates'][0][:64]]
+            self._index_polygon(cell)
+            self._persist(f'cell:{grid}', cell.to_dict())
+
+    def drop(self, grid: str):
+        """Forget a cell (ie. forecast URL returned 404), points in it re-resolve via /points"""
+        with self._lock:
+            cell = self._cells.pop(grid, None)
+            if cell is None:
+                return
+            for bucket in self._polygon_buckets(cell):
+                self._buckets.get(bucket, set()).discard(grid)
+            if self._backend is not None:
+                self._backend.delete(f'cell:{grid}')
+
+    # ---------------------------------------------------------------------------------
+    def _live_cell(self, grid: str) -> Union[GridCell, None]:
+        cell = self._cells.get(grid)
+        if cell is not None and time.time() - cell.stored > self.ttl:
+            self.drop(grid)
+            return None
+        return cell
+
+    def _bucket(self, lat: float, lon: float) -> Tuple[int, int]:
+        return int(lat // self.BUCKET_DEGREES), int(lon // self.BUCKET_DEGREES)
+
+    def _polygon_buckets(self, cell: GridCell) -> List[Tuple[int, int]]:
+        if not cell.polygon:
+            return []
+        lons = [pt[0] for pt in cell.polygon]
+        lats = [pt[1] for pt in cell.polygon]
+        lat_lo, lon_lo = self._bucket(min(lats), min(lons))
+        lat_hi, lon_hi = self._bucket(max(lats), max(lons))
+        return [(lat_b, lon_b) for lat_b in range(lat_lo, lat_hi + 1) for lon_b in range(lon_lo, lon_hi + 1)]
+
+    def _index_polygon(self, cell: GridCell):
+        for bucket in self._polygon_buckets(cell):
+            self._buckets.setdefault(bucket, set()).add(cell.grid)
+
+    def _persist(self, key: str, data: dict):
+        if self._backend is not None:
+            try:
+                self._backend.put(key, data)
+            except Exception as ex:
+                LOGGER.debug(f'Unable to persist grid index entry {key} - {repr(ex)}')
+
+    def _load(self):
+        # Persisted cells/points are loaded on first use (polygon lookup needs all cells in memory)
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            now = time.time()
+            expired = []
+            for key in self._backend.keys():
+                data = self._backend.get(key)
+                if data is None:
+                    continue
+                if now - data.get('stored', 0) > self.ttl:
+                    expired.append(key)
+                elif key.startswith('cell:'):
+                    cell = GridCell.from_dict(data)
+                    self._cells[cell.grid] = cell
+                    self._index_polygon(cell)
+                elif key.startswith('point:'):
+                    self._points[key[6:]] = data['grid']
+            for key in expired:
+                self._backend.delete(key)
+            self._loaded = True
+            LOGGER.debug(f'NWS grid index {self._backend.location}: {len(self._cells)} cells, '
+                         f'{len(self._points)} points, {len(expired)} expired')
+
+
+# =========================================================================================================
+@dataclass
+class GridForecast():
+    """Parsed forecasts for a grid cell, shared by every Forecast in the cell (read-only)"""
+    grid: str
+    daily: Tuple[ForecastPeriod, ...]
+    hourly: HourlyTable
+    daily_hash: int = None      # hash of the response bodies, unchanged body = same parsed forecast
+    hourly_hash: int = None
+    fetched: float = field(default_factory=time.time)
+
+
+class GridForecastStore:
+    """
+    Grid-keyed forecast store (in-memory, LRU).
+
+    Args:
+        max_cells (int, optional): Max cells held. Defaults to 5000.
+        max_age (float, optional): Seconds a cell's forecast is shared. Defaults to 60.
+    """
+    def __init__(self, max_cells: int = 5000, max_age: float = 60.0):
+        self.max_cells = max(1, max_cells)
+        self.max_age = max_age
+        self._forecasts: 'OrderedDict[str, GridForecast]' = OrderedDict()
+        self._locks: Dict[str, threading.Lock] = {}
+        self._async_locks: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Lock]]' = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._forecasts)
+
+    def get(self, grid: str, max_age: float = None) -> Union[GridForecast, None]:
+        """Forecast for grid if fetched within max_age seconds (default: store max_age)"""
+        max_age = self.max_age if max_age is None else max_age
+        with self._lock:
+            forecast = self._forecasts.get(grid)
+            if forecast is None or time.time() - forecast.fetched > max_age:
+                return None
+            self._forecasts.move_to_end(grid)
+            return forecast
+
+    def peek(self, grid: str) -> Union[GridForecast, None]:
+        """Forecast for grid regardless of age (no LRU update)"""
+        with self._lock:
+            return self._forecasts.get(grid)
+
+    def put(self, grid: str, daily: Tuple[ForecastPeriod, ...], hourly: HourlyTable,
+            daily_hash: int = None, hourly_hash: int = None) -> GridForecast:
+        forecast = GridForecast(grid, daily, hourly, daily_hash, hourly_hash)
+        with self._lock:
+            self._forecasts[grid] = forecast
+            self._forecasts.move_to_end(grid)
+            while len(self._forecasts) > self.max_cells:
+                self._forecasts.popitem(last=False)
+        return forecast
+
+    def lock(self, grid: str) -> threading.Lock:
+        """Per-cell lock, so concurrent refreshes of a cell fetch once"""
+        with self._lock:
+            return self._locks.setdefault(grid, threading.Lock())
+
+    def async_lock(self, grid: str) -> asyncio.Lock:
+        """Per-cell asyncio lock (of the running event loop), so concurrent async refreshes of a cell fetch once"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            return self._async_locks.setdefault(loop, {}).setdefault(grid, asyncio.Lock())
+
+    def discard(self, grid: str):
+        with self._lock:
+            self._forecasts.pop(grid, None)
@@ -16,24 +16,35 @@ import pathlib
 from dataclasses import dataclass
 from datetime import datetime as dt
 
-import requests
 from loguru import logger as LOGGER
 
-import dt_tools.net.net_helper as nh
-from dt_tools.misc.census_geoloc import Census_GeoLocation
+from dt_tools.misc import async_http, http_helper
+from dt_tools.misc.census_geoloc import AsyncCensusGeoLocation, Census_GeoLocation
 from dt_tools.misc.helpers import ApiTokenHelper
 from dt_tools.misc.sun import Sun
 from dt_tools.misc.weather.common import AQI_DESC, WeatherLocation, WeatherSymbols
 
 
 class CURRENT_WEATHER_SETTINGS:
-    API_KEY = ApiTokenHelper.get_api_token(ApiTokenHelper.API_WEATHER_INFO)
-    API_AVAILABLE = False if API_KEY is None else True
+    # API token is resolved on first use (see api_key())
+    _API_KEY: str = None
+    _API_KEY_RESOLVED: bool = False
     BASE_URL = "http://api.weatherapi.com/v1" # 1 million calls per month
     CURRENT_URI = "current.json"
     FORECAST_URI = "forecast.json"
     SEARCH_URI = "search.json"
 
+    @classmethod
+    def api_key(cls) -> str:
+        if not cls._API_KEY_RESOLVED:
+            cls._API_KEY = ApiTokenHelper.get_api_token(ApiTokenHelper.API_WEATHER_INFO)
+            cls._API_KEY_RESOLVED = True
+        return cls._API_KEY
+
+    @classmethod
+    def api_available(cls) -> bool:
+        return cls.api_key() is not None
+
 @dataclass
 class CurrentConditions():
     """
@@ -66,7 +77,7 @@ class CurrentConditions():
     _disabled: bool = True
 
     def __post_init__(self):
-        if not CURRENT_WEATHER_SETTINGS.API_AVAILABLE:
+        if not CURRENT_WEATHER_SETTINGS.api_available():
             msg = f'No API Token set for {CURRENT_WEATHER_SETTINGS.BASE_URL}.\n'
             msg += 'Use "set_api_tokens" to cache FREE API token.'
             raise ConnectionError(msg)
@@ -82,7 +93,7 @@ class CurrentConditions():
         Returns:
             bool: True if location successfully set.
         """
-        if CURRENT_WEATHER_SETTINGS.API_AVAILABLE:
+        if CURRENT_WEATHER_SETTINGS.api_available():
             self.location = WeatherLocation(lat, lon)
             return self.refresh()
     
@@ -103,7 +114,7 @@ class CurrentConditions():
         Returns:
             bool: True if address is resolved and GeoLocation identified, else False
         """
-        # if CURRENT_WEATHER_SETTINGS.API_AVAILABLE:
+        # if CURRENT_WEATHER_SETTINGS.api_available():
         #     geo_locs = GeoLocation.lookup_address(street=street, city=city, state=state, zipcd=zipcd)
         #     if len(geo_locs) > 0:
         #         loc = geo_locs[0]
@@ -130,7 +141,7 @@ class CurrentConditions():
             bool: True if address is resolved and GeoLocation identified, else False
         """
         from dt_tools.misc.geoloc import GeoLocation as GeoLoc
-        if CURRENT_WEATHER_SETTINGS.API_AVAILABLE:
+        if CURRENT_WEATHER_SETTINGS.api_available():
             geo = GeoLoc()
             if geo.get_location_via_address_string(address):
                 self.location = WeatherLocation(latitude=geo.lat, longitude=geo.lon, location_name=address)
@@ -151,7 +162,8 @@ class CurrentConditions():
         Returns:
             bool: True if IP is resovled to GeoLocation, else False
         """
-        if CURRENT_WEATHER_SETTINGS.API_AVAILABLE:
+        if CURRENT_WEATHER_SETTINGS.api_available():
+            import dt_tools.net.net_helper as nh  # heavy import (scapy), only load when needed
             if ip is None:
                 lat, lon = nh.get_lat_lon_for_ip(ip=nh.get_wan_ip()) # self._get_lat_lon_from_ip(nh.get_wan_ip())
             else:
@@ -248,6 +260,27 @@ class CurrentConditions():
         """
         Refresh weather data if stale.  Default is 15 monutes.
         """
+        if not self._is_stale(elapsed_mins):
+            return False
+
+        target_url = self._current_url()
+        try:
+            resp = http_helper.get(target_url)
+            if self._process_response(target_url, resp):
+                if self.sunrise is None:
+                    self._set_sun_times()
+                return True
+        except Exception as ex:
+            self._process_exception(target_url, ex)
+
+        return False
+
+    def _set_sun_times(self):
+        sun = Sun(self.location.latitude, self.location.longitude)
+        self.sunrise = sun.get_gps_sunrise()
+        self.sunset  = sun.get_gps_sunset()
+
+    def _is_stale(self, elapsed_mins: int) -> bool:
         if self.location is None or not self.location.is_initialized():
             raise ValueError('ABORT - Weather location is NOT initialized.')
         
@@ -263,31 +296,29 @@ class CurrentConditions():
         except Exception as ex:
             LOGGER.trace(f'no prior weather {ex}')
             LOGGER.debug('- Weather being refreshed, last update Unknown')
+        return True
 
-        target_url=f'{CURRENT_WEATHER_SETTINGS.BASE_URL}/{CURRENT_WEATHER_SETTINGS.CURRENT_URI}?key={CURRENT_WEATHER_SETTINGS.API_KEY}&q={self.lat_long}&aqi=yes'
+    def _current_url(self) -> str:
+        target_url=f'{CURRENT_WEATHER_SETTINGS.BASE_URL}/{CURRENT_WEATHER_SETTINGS.CURRENT_URI}?key={CURRENT_WEATHER_SETTINGS.api_key()}&q={self.lat_long}&aqi=yes'
         LOGGER.debug(f'WEATHER url: {target_url}')
-        try:
-            resp = requests.get(target_url)
-            if resp.status_code == 200:
-                LOGGER.debug(json.dumps(resp.json(), indent=2))
-                self._load_current_conditions(resp.json())
-                self._disabled = False
-                if self.sunrise is None:
-                    sun = Sun(self.location.latitude, self.location.longitude)
-                    self.sunrise = sun.get_gps_sunrise()
-                    self.sunset  = sun.get_gps_sunset()
-                return True
+        return target_url
+
+    def _process_exception(self, target_url: str, ex: Exception):
+        LOGGER.warning('Unable to call weather api')
+        LOGGER.warning(f'  URL   : {target_url}')
+        LOGGER.warning(f'  ERROR : {repr(ex)}')
+        self._connect_retries += 1
+        if self._connect_retries > 3:
+            LOGGER.error('Unable to reconnect to weather, disabled feature.')
+            self._disabled = True
+
+    def _process_response(self, target_url: str, resp) -> bool:
+        if resp.status_code == 200:
+            LOGGER.debug(json.dumps(resp.json(), indent=2))
+            self._load_current_conditions(resp.json())
+            self._disabled = False
+            return True
 
-        except Exception as ex:
-            LOGGER.warning('Unable to call weather api')
-            LOGGER.warning(f'  URL   : {target_url}')
-            LOGGER.warning(f'  ERROR : {repr(ex)}')
-            self._connect_retries += 1
-            if self._connect_retries > 3:
-                LOGGER.error('Unable to reconnect to weather, disabled feature.')
-                self._disabled = True
-            return False
-                
         LOGGER.error(f'Request URL: {target_url}')
         LOGGER.error(f'Response status_code: {resp.status_code}')
         self._disabled = True
@@ -324,6 +355,113 @@ class CurrentConditions():
         self.last_update = dt.now()
         
     
+# =========================================================================================================    
+class AsyncCurrentConditions(CurrentConditions):
+    """
+    asyncio version of CurrentConditions.
+
+    Location setters and refresh are coroutines, network calls use the shared async
+    http session (see dt_tools.misc.async_http).  Requires aiohttp.
+
+    Example::
+
+        async def main():
+            weather = AsyncCurrentConditions()
+            if await weather.set_location_via_lat_lon(30.0694, -81.5515):
+                print(weather.to_string())
+            await async_http.close_session()
+
+    """
+    async def set_location_via_lat_lon(self, lat: float, lon: float) -> bool:
+        """
+        Set weather location based on Geolocation
+
+        Args:
+            lat (float): Latitude
+            lon (float): Longitude
+
+        Returns:
+            bool: True if location successfully set.
+        """
+        if CURRENT_WEATHER_SETTINGS.api_available():
+            self.location = WeatherLocation(lat, lon)
+            return await self.refresh()
+    
+        return False
+
+    async def set_location_via_census_address(self, street: str, city: str = None, state: str = None, zipcd: str = None) -> bool:
+        """
+        Set location based on address: street, city, state or street, zipcd
+
+        See CurrentConditions.set_location_via_census_address()
+        """
+        geo_locs = await AsyncCensusGeoLocation.lookup_address(street=street, city=city, state=state, zipcd=zipcd)
+        if len(geo_locs) > 0:
+            loc = geo_locs[0]
+            self.location = WeatherLocation(latitude=loc.latitude, longitude=loc.longitude, location_name=loc.address)
+            return await self.refresh()
+        return False
+
+    async def set_location_via_address(self, address: str) -> bool:
+        """
+        Set location based on address string
+
+        See CurrentConditions.set_location_via_address()
+        """
+        from dt_tools.misc.geoloc import AsyncGeoLocation
+        if CURRENT_WEATHER_SETTINGS.api_available():
+            geo = AsyncGeoLocation()
+            if await geo.get_location_via_address_string(address):
+                self.location = WeatherLocation(latitude=geo.lat, longitude=geo.lon, location_name=address)
+                return await self.refresh()
+    
+        return False
+
+    async def set_location_via_ip(self, ip: str = None) -> bool:
+        """
+        Set location based on IP address
+
+        See CurrentConditions.set_location_via_ip()
+        """
+        from dt_tools.misc.geoloc import AsyncGeoLocation
+        if CURRENT_WEATHER_SETTINGS.api_available():
+            geo = AsyncGeoLocation()
+            if await geo.get_location_via_ip(ip):
+                self.location = WeatherLocation(geo.lat, geo.lon)
+                return await self.refresh()
+    
+        return False
+
+    async def refresh(self, ignore_cache: bool = False) -> bool:
+        """
+        Refresh current weather
+
+        Args:
+            ignore_cache (bool, optional): Refresh even if data is not stale. Defaults to False.
+
+        Returns:
+            bool: True if weather was refreshed.
+        """
+        if ignore_cache:
+            return await self._refresh_if_stale(elapsed_mins=0)
+        return await self._refresh_if_stale()
+
+    async def _refresh_if_stale(self, elapsed_mins: int = 15) -> bool:
+        if not self._is_stale(elapsed_mins):
+            return False
+
+        target_url = self._current_url()
+        try:
+            resp = await async_http.get(target_url)
+            if self._process_response(target_url, resp):
+                if self.sunrise is None:
+                    self._set_sun_times()
+                return True
+        except Exception as ex:
+            self._process_exception(target_url, ex)
+
+        return False
+
     
 if __name__ == "__main__":
     import dt_tools.logger.logging_helper as lh
@@ -0,0 +1,476 @@
+"""
+weather_fleet.py - shared refresh scheduler for many weather locations
+
+WeatherFleet owns the current conditions, forecast and alerts for a set of locations
+(ie. a dashboard tracking thousands of sites) and keeps them fresh:
+
+- One feed per location and kind (current, forecast, alerts).  Locations that round to
+  the same lat/lon share feeds, and refresh requests for a feed that is already queued
+  or in flight are coalesced.
+- Refresh intervals are jittered (and initial refreshes can be spread out), so feeds
+  do not all come due at the same moment.
+- Refreshes run on a bounded worker pool, ordered by due time.  Failed refreshes are
+  retried with exponential backoff (capped at the refresh interval).
+- Each refresh builds a new data object (CurrentConditions, Forecast, LocationAlerts)
+  and publishes it.  snapshot() returns an immutable view of the latest published data,
+  readers never wait on the network or see a half-refreshed object.
+
+Example::
+
+    from dt_tools.misc.weather.weather_fleet import WeatherFleet
+
+    fleet = WeatherFleet(max_workers=8)
+    loc_id = fleet.add_location(30.0694, -81.5515, name='Fruit Cove', kinds=('forecast', 'alerts'))
+    fleet.start()
+    ...
+    state = fleet.snapshot().get(loc_id)
+    if state.forecast is not None:
+        print(state.forecast.forecast_for_today().short_forecast)
+    fleet.stop()
+
+"""
+import heapq
+import itertools
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Tuple, Union
+
+from loguru import logger as LOGGER
+
+from dt_tools.misc.weather.common import WeatherLocation
+
+CURRENT = 'current'
+FORECAST = 'forecast'
+ALERTS = 'alerts'
+KINDS = (CURRENT, FORECAST, ALERTS)
+
+
+# =========================================================================================================
+@dataclass(frozen=True)
+class LocationState():
+    """
+    Published weather data for a location (read-only, replaced on every refresh).
+
+    updated and errors are keyed by kind, data objects are None until the first
+    successful refresh.
+    """
+    location_id: str
+    latitude: float
+    longitude: float
+    name: str = ''
+    current: Any = None     # CurrentConditions
+    forecast: Any = None    # Forecast
+    alerts: Any = None      # LocationAlerts
+    updated: Mapping[str, datetime] = field(default_factory=lambda: MappingProxyType({}))
+    errors: Mapping[str, str] = field(default_factory=lambda: MappingProxyType({}))
+
+    def age(self, kind: str) -> Union[float, None]:
+        """Seconds since kind was last refreshed, None if never"""
+        updated = self.updated.get(kind)
+        return None if updated is None else (datetime.now() - updated).total_seconds()
+
+
+@dataclass(frozen=True)
+class FleetSnapshot():
+    """Consistent view of every location at one point in time"""
+    version: int
+    taken: datetime
+    states: Mapping[str, LocationState]
+
+    def get(self, location_id: str) -> Union[LocationState, None]:
+        return self.states.get(location_id)
+
+    def __iter__(self) -> Iterator[LocationState]:
+        return iter(self.states.values())
+
+    def __len__(self) -> int:
+        return len(self.states)
+
+
+@dataclass
+class FleetMetrics():
+    """Scheduler counters (times in seconds)"""
+    locations: int = 0
+    feeds: int = 0
+    queued: int = 0
+    in_flight: int = 0
+    refreshes: int = 0
+    failures: int = 0
+    coalesced: int = 0
+    max_in_flight: int = 0
+    total_lag: float = 0.0
+    max_lag: float = 0.0
+    total_refresh: float = 0.0
+
+    @property
+    def avg_lag(self) -> float:
+        started = self.refreshes + self.failures
+        return 0.0 if started == 0 else self.total_lag / started
+
+    @property
+    def avg_refresh(self) -> float:
+        started = self.refreshes + self.failures
+        return 0.0 if started == 0 else self.total_refresh / started
+
+    def to_string(self) -> str:
+        return (f'locations: {self.locations}  feeds: {self.feeds}  queued: {self.queued}  in flight: {self.in_flight} '
+                f'(max {self.max_in_flight})  refreshes: {self.refreshes}  failures: {self.failures}  coalesced: {self.coalesced}  '
+                f'lag avg: {self.avg_lag*1000:.1f}ms  max: {self.max_lag*1000:.1f}ms  refresh avg: {self.avg_refresh*1000:.1f}ms')
+
+
+# Fetcher: fn(state) -> new data object for the feed's kind (None or exception = failed)
+Fetcher = Callable[[LocationState], Any]
+
+
+def fetch_current(state: LocationState) -> Any:
+    """Default CURRENT fetcher (weatherapi.com via CurrentConditions)"""
+    from dt_tools.misc.weather.weather import CurrentConditions
+    current = CurrentConditions()
+    current.location = WeatherLocation(state.latitude, state.longitude, location_name=state.name or None)
+    return current if current.refresh(ignore_cache=True) else None
+
+def fetch_forecast(state: LocationState) -> Any:
+    """Default FORECAST fetcher (NWS via Forecast)"""
+    from dt_tools.misc.weather.weather_forecast_alert import Forecast
+    forecast = Forecast(state.latitude, state.longitude, friendly_name=state.name)
+    return forecast if forecast._valid_payload else None
+
+def fetch_alerts(state: LocationState) -> Any:
+    """Default ALERTS fetcher (NWS via LocationAlerts), reuses the location's forecast metadata"""
+    from dt_tools.misc.weather.weather_forecast_alert import LocationAlerts
+    alerts = LocationAlerts(state.latitude, state.longitude, friendly_name=state.name, weather=state.forecast)
+    return alerts if alerts._valid_payload else None
+
+
+@dataclass
+class _Feed():
+    location_id: str
+    kind: str
+    interval: float
+    generation: int = 0
+    due: float = 0.0
+    in_flight: bool = False
+    pending: bool = False       # refresh requested while in flight
+    failures: int = 0
+
+
+# =========================================================================================================
+class WeatherFleet:
+    """
+    Refresh scheduler for many weather locations.
+
+    Args:
+        max_workers (int, optional): Concurrent refreshes. Defaults to 8.
+        intervals (Dict[str, float], optional): Refresh interval (seconds) by kind.
+            Defaults to REFRESH_INTERVALS.
+        jitter (float, optional): Interval jitter, fraction of the interval (+/-). Defaults to 0.1.
+        initial_spread (float, optional): Spread first refreshes over this many seconds. Defaults to 0.
+        fetchers (Dict[str, Fetcher], optional): Override data fetchers by kind.
+        on_update (Callable[[LocationState, str], Any], optional): Called (on a worker thread)
+            after kind is refreshed for a location.
+    """
+    REFRESH_INTERVALS = {CURRENT: 900.0, FORECAST: 600.0, ALERTS: 600.0}
+    RETRY_MIN = 30.0
+    ID_PRECISION = 4    # lat/lon decimals, locations within ~10m share feeds
+
+    def __init__(self, max_workers: int = 8, intervals: Dict[str, float] = None, jitter: float = 0.1,
+                 initial_spread: float = 0.0, fetchers: Dict[str, Fetcher] = None,
+                 on_update: Callable[[LocationState, str], Any] = None):
+        self.max_workers = max(1, max_workers)
+        self.intervals = {**self.REFRESH_INTERVALS, **(intervals or {})}
+        self.jitter = max(0.0, min(jitter, 0.9))
+        self.initial_spread = max(0.0, initial_spread)
+        self.fetchers: Dict[str, Fetcher] = {CURRENT: fetch_current, FORECAST: fetch_forecast, ALERTS: fetch_alerts}
+        self.fetchers.update(fetchers or {})
+        self.on_update = on_update
+
+        self._cond = threading.Condition()
+        self._states: Dict[str, LocationState] = {}
+        self._feeds: Dict[Tuple[str, str], _Feed] = {}
+        self._heap: List[Tuple[float, int, Tuple[str, str], int]] = []  # (due, seq, feed key, generation)
+        self._seq = itertools.count()
+        self._version = 0
+        self._snapshot: FleetSnapshot = None
+        self._metrics = FleetMetrics()
+        self._submitted = 0     # scheduler refreshes submitted and not finished (<= max_workers)
+        self._executor: ThreadPoolExecutor = None
+        self._scheduler: threading.Thread = None
+        self._stopping = False
+
+    # -- Locations ------------------------------------------------------------------------------
+    @classmethod
+    def location_id(cls, lat: float, lon: float) -> str:
+        return f'{round(float(lat), cls.ID_PRECISION)},{round(float(lon), cls.ID_PRECISION)}'
+
+    def add_location(self, lat: float, lon: float, name: str = '', kinds: Iterable[str] = KINDS) -> str:
+        """
+        Track a location, its feeds are scheduled for refresh.
+
+        Adding a location already tracked (same rounded lat/lon) adds any new kinds and
+        shares the existing feeds.
+
+        Returns:
+            str: Location id (key for snapshot().get()).
+        """
+        location_id = self.location_id(lat, lon)
+        now = time.monotonic()
+        with self._cond:
+            if location_id not in self._states:
+                self._states[location_id] = LocationState(location_id, float(lat), float(lon), name)
+                self._changed()
+            for kind in kinds:
+                if kind not in self.fetchers:
+                    raise ValueError(f'Unknown weather kind [{kind}], expected one of {", ".join(self.fetchers)}')
+                key = (location_id, kind)
+                if key in self._feeds:
+                    self._metrics.coalesced += 1
+                    continue
+                feed = _Feed(location_id, kind, self.intervals.get(kind, self.REFRESH_INTERVALS[FORECAST]))
+                self._feeds[key] = feed
+                self._schedule(feed, now + random.uniform(0.0, self.initial_spread))
+            self._cond.notify_all()
+        return location_id
+
+    def add_locations(self, sites: Iterable[Tuple[float, float]], kinds: Iterable[str] = KINDS) -> List[str]:
+        """Track many (lat, lon) or (lat, lon, name) sites, return their location ids"""
+        kinds = tuple(kinds)
+        return [self.add_location(*site, kinds=kinds) if len(site) > 2 else self.add_location(site[0], site[1], kinds=kinds)
+                for site in sites]
+
+    def remove_location(self, location_id: str) -> bool:
+        """Stop tracking a location, return True if it was tracked"""
+        with self._cond:
+            if self._states.pop(location_id, None) is None:
+                return False
+            for key in [key for key in self._feeds if key[0] == location_id]:
+                del self._feeds[key]
+            self._changed()
+            return True
+
+    def request_refresh(self, location_id: str, kind: str = None) -> int:
+        """
+        Refresh a location now (all kinds, or kind), ahead of its schedule.
+
+        Requests for a feed already in flight are coalesced into one follow-up refresh.
+
+        Returns:
+            int: Number of feeds scheduled.
+        """
+        now = time.monotonic()
+        scheduled = 0
+        with self._cond:
+            for key, feed in self._feeds.items():
+                if key[0] != location_id or (kind is not None and key[1] != kind):
+                    continue
+                if feed.in_flight:
+                    self._metrics.coalesced += feed.pending
+                    feed.pending = True
+                elif feed.due <= now:
+                    self._metrics.coalesced += 1
+                else:
+                    self._schedule(feed, now)
+                    scheduled += 1
+            self._cond.notify_all()
+        return scheduled
+
+    # -- Reading --------------------------------------------------------------------------------
+    def snapshot(self) -> FleetSnapshot:
+        """Latest published data for all locations (does not block on refreshes)"""
+        with self._cond:
+            if self._snapshot is None:
+                self._snapshot = FleetSnapshot(self._version, datetime.now(), MappingProxyType(dict(self._states)))
+            return self._snapshot
+
+    def get(self, location_id: str) -> Union[LocationState, None]:
+        """Latest published data for one location"""
+        with self._cond:
+            return self._states.get(location_id)
+
+    def metrics(self) -> FleetMetrics:
+        """Return a copy of the scheduler counters"""
+        with self._cond:
+            metrics = FleetMetrics(**vars(self._metrics))
+            metrics.locations = len(self._states)
+            metrics.feeds = len(self._feeds)
+            metrics.queued = sum(1 for feed in self._feeds.values() if not feed.in_flight and feed.due <= time.monotonic())
+        return metrics
+
+    # -- Scheduling -----------------------------------------------------------------------------
+    def start(self):
+        """Start the scheduler thread (refreshes run in the background until stop())"""
+        with self._cond:
+            if self._scheduler is not None and self._scheduler.is_alive():
+                return
+            self._stopping = False
+            self._start_executor()
+            self._scheduler = threading.Thread(target=self._run, name='weather-fleet', daemon=True)
+            self._scheduler.start()
+        LOGGER.debug(f'WeatherFleet started, {len(self._feeds)} feeds, {self.max_workers} workers.')
+
+    def stop(self, wait: bool = True):
+        """Stop the scheduler, in-flight refreshes are finished (wait=True) or abandoned"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            scheduler, self._scheduler = self._scheduler, None
+            executor, self._executor = self._executor, None
+        if scheduler is not None and wait:
+            scheduler.join()
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def refresh_due(self, timeout: float = None) -> int:
+        """
+        Refresh every feed that is due and wait for them (no scheduler thread needed).
+
+        Returns:
+            int: Number of feeds refreshed successfully.
+        """
+        now = time.monotonic()
+        with self._cond:
+            self._start_executor()
+            feeds = [feed for feed in self._feeds.values() if not feed.in_flight and feed.due <= now]
+            for feed in feeds:
+                feed.in_flight = True
+                feed.generation += 1
+            executor = self._executor
+        futures = [executor.submit(self._refresh_feed, feed, now, False) for feed in sorted(feeds, key=lambda item: item.due)]
+        return sum(1 for future in futures if future.result(timeout))
+
+    def wait_idle(self, timeout: float = None) -> bool:
+        """Block until no refresh is due or in flight (True) or timeout (False)"""
+        def idle() -> bool:
+            now = time.monotonic()
+            return not any(feed.in_flight or feed.due <= now for feed in self._feeds.values())
+        with self._cond:
+            return self._cond.wait_for(idle, timeout)
+
+    # ---------------------------------------------------------------------------------
+    def _start_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='weather-fleet')
+
+    def _changed(self):
+        self._version += 1
+        self._snapshot = None
+
+    def _jittered(self, interval: float) -> float:
+        return interval * (1.0 + random.uniform(-self.jitter, self.jitter))
+
+    def _schedule(self, feed: _Feed, due: float):
+        feed.generation += 1
+        feed.due = due
+        heapq.heappush(self._heap, (due, next(self._seq), (feed.location_id, feed.kind), feed.generation))
+
+    def _next_due(self) -> Union[_Feed, float, None]:
+        # Due feed, else seconds until the next one (None if nothing scheduled)
+        while self._heap:
+            due, _, key, generation = self._heap[0]
+            feed = self._feeds.get(key)
+            if feed is None or feed.generation != generation or feed.in_flight:
+                heapq.heappop(self._heap)   # removed, rescheduled or already running
+                continue
+            wait = due - time.monotonic()
+            if wait > 0:
+                return wait
+            heapq.heappop(self._heap)
+            return feed
+        return None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopping:
+                        return
+                    if self._submitted >= self.max_workers:
+                        self._cond.wait()
+                        continue
+                    next_due = self._next_due()
+                    if isinstance(next_due, _Feed):
+                        break
+                    self._cond.wait(next_due)
+                feed = next_due
+                feed.in_flight = True
+                self._submitted += 1
+                executor = self._executor
+            executor.submit(self._refresh_feed, feed, feed.due, True)
+
+    def _refresh_feed(self, feed: _Feed, due: float, scheduled: bool) -> bool:
+        start = time.monotonic()
+        with self._cond:
+            state = self._states.get(feed.location_id)
+            self._metrics.in_flight += 1
+            self._metrics.max_in_flight = max(self._metrics.max_in_flight, self._metrics.in_flight)
+        data, error = None, None
+        if state is not None:
+            try:
+                data = self.fetchers[feed.kind](state)
+                if data is None:
+                    error = 'refresh failed'
+            except Exception as ex:
+                error = repr(ex)
+                LOGGER.debug(f'WeatherFleet {feed.kind} refresh failed for {feed.location_id} - {error}')
+        end = time.monotonic()
+
+        with self._cond:
+            metrics = self._metrics
+            metrics.in_flight -= 1
+            self._submitted -= scheduled
+            metrics.total_lag += max(0.0, start - due)
+            metrics.max_lag = max(metrics.max_lag, start - due)
+            metrics.total_refresh += end - start
+            feed.in_flight = False
+            state = self._states.get(feed.location_id)
+            if state is None or self._feeds.get((feed.location_id, feed.kind)) is not feed:
+                self._cond.notify_all()    # removed while refreshing
+                return False
+
+            if error is None:
+                metrics.refreshes += 1
+                feed.failures = 0
+                updated = MappingProxyType({**state.updated, feed.kind: datetime.now()})
+                errors = MappingProxyType({kind: msg for kind, msg in state.errors.items() if kind != feed.kind})
+                state = replace(state, updated=updated, errors=errors, **{feed.kind: data})
+                next_due = end + self._jittered(feed.interval)
+            else:
+                metrics.failures += 1
+                feed.failures += 1
+                state = replace(state, errors=MappingProxyType({**state.errors, feed.kind: error}))
+                backoff = min(feed.interval, self.RETRY_MIN * 2 ** (feed.failures - 1))
+                next_due = end + self._jittered(backoff)
+            self._states[feed.location_id] = state
+            self._changed()
+            if feed.pending:
+                feed.pending = False
+                next_due = end
+            self._schedule(feed, next_due)
+            self._cond.notify_all()
+
+        if error is None and self.on_update is not None:
+            try:
+                self.on_update(state, feed.kind)
+            except Exception as ex:
+                LOGGER.warning(f'WeatherFleet on_update callback failed - {repr(ex)}')
+        return error is None
+
+
+if __name__ == "__main__":
+    import dt_tools.logger.logging_helper as lh
+
+    lh.configure_logger(log_level="INFO", brightness=False)
+    sites = [(30.0694, -81.5515, 'Fruit Cove, FL'), (46.7867, -92.1005, 'Duluth, MN'),
+             (39.7392, -104.9903, 'Denver, CO'), (45.5152, -122.6784, 'Portland, OR')]
+    fleet = WeatherFleet(max_workers=4)
+    fleet.add_locations(sites, kinds=(FORECAST, ALERTS))
+    fleet.refresh_due()
+    for state in fleet.snapshot():
+        today = None if state.forecast is None else state.forecast.forecast_for_today()
+        LOGGER.success(f'{state.name}: {"n/a" if today is None else today.short_forecast}  '
+                       f'alerts: {"n/a" if state.alerts is None else state.alerts.alert_count}')
+    LOGGER.info(fleet.metrics().to_string())
@@ -9,17 +9,41 @@ NOTE:
 
     - Endpoint only support US locations (including )
 
+Responses are cached (see dt_tools.misc.http_cache): NWS max-age is honoured and stale
+responses are revalidated with conditional requests (304 = body reused).  The /points
+metadata for a location (forecast URLs, city, state) is persisted, so a forecast refresh
+skips the /points call (see Forecast.configure_points_cache()).
+
+Forecasts are shared per NWS grid cell (see dt_tools.misc.weather.nws_grid): locations in
+the same cell share one parsed forecast, and a new location inside a known cell resolves
+without a /points call (see Forecast.configure_grid()).  Forecast payloads are parsed
+once per cell into compact period records and a columnar hourly table (see
+dt_tools.misc.weather.forecast_periods), the raw JSON is only loaded on request
+(Forecast.daily_json() / hourly_json()).
+
+Alerts for many locations can be served from one bulk /alerts/active feed indexed by
+zone and polygon (see dt_tools.misc.weather.nws_alerts and
+LocationAlerts.configure_alert_engine()).
+
 """
 import json
+import pathlib
 import textwrap
+import threading
 from abc import ABC
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Tuple, Union
+from typing import Callable, Dict, List, Tuple, Union
 
-import requests
 from loguru import logger as LOGGER
 
+from dt_tools.misc.geoloc_cache import SqliteCacheBackend
+from dt_tools.misc.http_cache import HttpCache
+from dt_tools.misc.ttl_cache import TTLCache
+from dt_tools.misc.weather.alert_feed import AlertChange, AlertChangeFeed
+from dt_tools.misc.weather.nws_alerts import AlertEngine, location_zones
+from dt_tools.misc.weather.forecast_periods import ForecastPeriod, HourlyTable, parse_periods
+from dt_tools.misc.weather.nws_grid import GridForecast, GridForecastStore, GridIndex, cell_payload
 from dt_tools.misc.weather.common import ForecastType, States, Unknown, WeatherLocation
 from dt_tools.console.console_helper import ConsoleHelper as ch
 from dt_tools.console.console_helper import ColorFG
@@ -32,11 +56,11 @@ URL_ALERT_TEMPLATE="https://api.weather.gov/alerts/active?point={latitude},{long
 @dataclass
 class ForecastDay():
 
-    def __init__(self, lat:float, lon:float, city:str, state: str, payload: dict):
+    def __init__(self, lat:float, lon:float, city:str, state: str, payload: Union[dict, ForecastPeriod]):
         self.location = WeatherLocation(latitude=lat, longitude=lon)
         self.city = city
         self.state = state
-        self.payload: dict = payload
+        self.period: ForecastPeriod = payload if isinstance(payload, ForecastPeriod) else ForecastPeriod.from_payload(payload)
 
     def to_string(self) -> str:
         text = f'{self.name}\n'
@@ -62,15 +86,18 @@ class ForecastDay():
     def state_full(self) -> str:
         return States.translate_state_code(self.state)
     
+    @property
+    def payload(self) -> dict:
+        """NWS period dict, rebuilt from the parsed period"""
+        return self.period.to_dict()
+
     @property
     def _valid_forecast_day(self) -> bool:
-        if len(self.payload.keys()) > 0:
-            return True
-        return False
+        return self.period.start is not None
     
     @property
     def name(self) -> str:
-        return self.payload.get('name', Unknown.STR)
+        return self._known(self.period.name, Unknown.STR)
     
     @ property
     def lat_lon(self) -> str:
@@ -78,46 +105,53 @@ class ForecastDay():
     
     @property
     def timeframe(self) -> str:
-        if self._valid_forecast_day:
-            tm_start = datetime.fromisoformat(self.payload.get('startTime'))
-            tm_end   = datetime.fromisoformat(self.payload.get('endTime'))
-            t_start = datetime.strftime(tm_start, "%a %I:%M %p")
-            t_end   = datetime.strftime(tm_end, "%a %I:%M %p")
+        if self._valid_forecast_day and self.period.end is not None:
+            t_start = datetime.strftime(self.period.start, "%a %I:%M %p")
+            t_end   = datetime.strftime(self.period.end, "%a %I:%M %p")
             return f'{t_start} thru {t_end}'
         return Unknown.STR
     
     @property
     def temperature(self) -> int:
-        return self.payload.get('temperature', Unknown.INT)     
+        return self._known(self.period.temperature, Unknown.INT)
     @property
     def temperature_unit(self) -> str:
-        return self.payload.get('temperatureUnit', Unknown.STR)
+        return self._known(self.period.temperature_unit, Unknown.STR)
     @property
     def temperature_trend(self) -> str:
-        return self.payload.get('temperatureTrend', Unknown.STR)
+        return self._known(self.period.temperature_trend, Unknown.STR)
     @property
     def percipitation_pct(self) -> int:
-        return self.payload.get('probabilityOfPrecipitation', {'value': Unknown.INT}).get('value', Unknown.INT)
+        return self._known(self.period.precipitation_pct, Unknown.INT)
     @property
     def wind_speed(self) -> str:
-        return self.payload.get('windSpeed', Unknown.STR)
+        return self._known(self.period.wind_speed, Unknown.STR)
     @property
     def wind_direction(self) -> str:
-        return self.payload.get('windDirection', Unknown.STR)
+        return self._known(self.period.wind_direction, Unknown.STR)
     @property
     def icon(self) -> str:
-        return self.payload.get('icon', Unknown.STR)
+        return self._known(self.period.icon, Unknown.STR)
     @property
     def short_forecast(self) -> str:
-        return self.payload.get('shortForecast', Unknown.STR)
+        return self._known(self.period.short_forecast, Unknown.STR)
     @property
     def detailed_forecast(self) -> str:
-        return self.payload.get('detailedForecast', Unknown.STR)
+        return self._known(self.period.detailed_forecast, Unknown.STR)
+
+    @staticmethod
+    def _known(value, unknown):
+        return unknown if value is None else value
     
 
 
 # =========================================================================================================    
 class AbstractEndpoint(ABC):
+    HTTP_CACHE_MAX_ENTRIES = 1000           # NWS responses held in memory
+    HTTP_CACHE_RETAIN_JSON = False          # bodies only, forecasts are parsed once into compact periods
+    _HTTP_CACHE: HttpCache = None
+    _HTTP_CACHE_LOCK = threading.Lock()
+
     def __init__(self, lat: float, lon: float, friendly_name: str = ''):
         self.location = WeatherLocation(latitude=lat, longitude=lon)
         self._friendly_name: str = friendly_name
@@ -164,15 +198,45 @@ class AbstractEndpoint(ABC):
     
     def _translate_state(self, state: str) -> str:
         return States.translate_state_code(state)
+
+    @classmethod
+    def http_cache(cls) -> HttpCache:
+        """Return the (shared) NWS response cache, created on first use"""
+        if AbstractEndpoint._HTTP_CACHE is None:
+            with AbstractEndpoint._HTTP_CACHE_LOCK:
+                if AbstractEndpoint._HTTP_CACHE is None:
+                    AbstractEndpoint._HTTP_CACHE = HttpCache(max_entries=cls.HTTP_CACHE_MAX_ENTRIES,
+                                                                     retain_json=cls.HTTP_CACHE_RETAIN_JSON)
+        return AbstractEndpoint._HTTP_CACHE
+
+    @classmethod
+    def configure_http_cache(cls, max_entries: int = None) -> HttpCache:
+        """
+        Replace the NWS response cache.
+
+        Args:
+            max_entries (int, optional): Max responses held, 0 disables caching. Defaults to HTTP_CACHE_MAX_ENTRIES.
+
+        Returns:
+            HttpCache: The new cache.
+        """
+        cache = HttpCache(max_entries=cls.HTTP_CACHE_MAX_ENTRIES if max_entries is None else max_entries,
+                          retain_json=cls.HTTP_CACHE_RETAIN_JSON)
+        with AbstractEndpoint._HTTP_CACHE_LOCK:
+            AbstractEndpoint._HTTP_CACHE = cache
+        return cache
     
     def refresh_if_needed(self, force: bool = False) -> bool:
         '''Return true if refresh needed and successful else false'''
-        if self._last_update is None or (datetime.now() - self._last_update).total_seconds() > 600.0:
+        if self._refresh_due(force):
             self._valid_payload = self._refresh()
             if self._valid_payload:
                 self._last_update = datetime.now()
             return self._valid_payload
         return False
+
+    def _refresh_due(self, force: bool = False) -> bool:
+        return force or self._last_update is None or (datetime.now() - self._last_update).total_seconds() > 600.0
     
     @classmethod
     def _refresh(self) -> bool:
@@ -180,8 +244,13 @@ class AbstractEndpoint(ABC):
         raise NotImplementedError('_refresh()')
 
     def _call_endpoint(self, URL: str) -> Tuple[int, dict]:
+        return self._process_endpoint_response(self._get(URL))
+
+    def _get(self, URL: str):
         LOGGER.debug(f'Calling: {URL}')
-        resp = requests.get(URL)
+        return self.http_cache().get(URL)
+
+    def _process_endpoint_response(self, resp) -> Tuple[int, dict]:
         LOGGER.debug(f'  returns: {resp.status_code}')
         if resp.status_code != 200:
             self._json_error = resp.json()
@@ -206,39 +275,251 @@ class Forecast(AbstractEndpoint):
         print(today.short_forecast)
 
     """
+    POINTS_MAX_SIZE = 10000                 # /points payloads held in memory
+    POINTS_TTL = 30 * 86400.0               # seconds, location -> forecast URL metadata
+    POINTS_DB = pathlib.Path('~').expanduser().absolute() / ".IpHelper" / "nws_cache.db"
+    _POINTS_CACHE: TTLCache = None
+    _POINTS_CACHE_LOCK = threading.Lock()
+    GRID_MAX_AGE = 60.0                     # seconds a cell's forecast is shared without an HTTP call
+    GRID_MAX_CELLS = 5000                   # cell forecasts held in memory
+    GRID_POLYGON_LOOKUP = True              # resolve new points by known cell polygons
+    _GRID_INDEX: GridIndex = None
+    _GRID_STORE: GridForecastStore = None
+    _GRID_LOCK = threading.Lock()
+
     def __init__(self, lat: float, lon: float, friendly_name: str = '', base_only: bool = False):
         super().__init__(lat, lon, friendly_name)
-        self._url = URL_BASE_TEMPLATE.replace('{latitude}', str(lat)).replace('{longitude}', str(lon))
-
-        self._json_base: dict = {}
-        self._json_daily_forecast:   dict = {}
-        self._json_hourly_forecast: dict = {}
+        self._init_payloads()
         if self._refresh(base_only):
             self._valid_payload = True
             self._last_update = datetime.now()
 
+    def _init_payloads(self):
+        self._url = URL_BASE_TEMPLATE.replace('{latitude}', str(self.location.latitude)).replace('{longitude}', str(self.location.longitude))
+        self._json_base: dict = {}
+        self._daily: Tuple[ForecastPeriod, ...] = ()
+        self._hourly: HourlyTable = None
+        self._grid: str = None
+
+    @property
+    def grid(self) -> Union[str, None]:
+        """NWS grid cell (office/x,y) of the location"""
+        return self._grid
+
+    def _load_base(self, payload: dict):
+        self._json_base = payload
+        self._daily = ()
+        self._hourly = None
+        if self._city is None:
+            self._city = self._json_base['properties']['relativeLocation']['properties']['city']
+            self._state = self._json_base['properties']['relativeLocation']['properties']['state']
             
     def _refresh(self, base_only: bool = False) -> bool:
         self._json_error = {}
-        rc, payload =  self._call_endpoint(self._url)
+        rc, payload = self._cached_points()
+        if rc != 200:
+            rc, payload = self._call_endpoint(self._url)
+            self._store_points(rc, payload)
         if rc == 200:
-            self._json_base = payload
-            self._json_daily_forecast = {}
-            self._json_hourly_forecast = {}
-            if self._city is None:
-                self._city = self._json_base['properties']['relativeLocation']['properties']['city']
-                self._state = self._json_base['properties']['relativeLocation']['properties']['state']
+            self._load_base(payload)
             if not base_only:
-                forecast_url = payload['properties']['forecast']
-                hourly_forecast_url = payload['properties']['forecastHourly']
-                rc, payload = self._call_endpoint(forecast_url)
-                if rc == 200:
-                    self._json_daily_forecast = payload
-                    rc, payload = self._call_endpoint(hourly_forecast_url)
-                    if rc == 200:
-                        self._json_hourly_forecast = payload
+                shared = self._shared_forecast(payload)
+                if shared is None:
+                    with self.grid_store().lock(self._grid):
+                        shared = self._shared_forecast(payload)
+                        if shared is None:
+                            daily = self._get(payload['properties']['forecast'])
+                            hourly = self._get(payload['properties']['forecastHourly']) if daily.status_code == 200 else None
+                            rc, shared = self._store_forecast(daily, hourly)
+                if shared is not None:
+                    self._daily = shared.daily
+                    self._hourly = shared.hourly
 
         return (rc == 200)
+
+    @classmethod
+    def points_cache(cls) -> TTLCache:
+        """Return the (shared) /points metadata cache, persisted to POINTS_DB, created on first use"""
+        if Forecast._POINTS_CACHE is None:
+            with Forecast._POINTS_CACHE_LOCK:
+                if Forecast._POINTS_CACHE is None:
+                    try:
+                        backend = SqliteCacheBackend(cls.POINTS_DB, table='nws_points')
+                    except Exception as ex:
+                        LOGGER.warning(f'Unable to open {cls.POINTS_DB}, /points cache is in-memory only - {repr(ex)}')
+                        backend = None
+                    Forecast._POINTS_CACHE = TTLCache(max_size=cls.POINTS_MAX_SIZE, ttl=cls.POINTS_TTL, backend=backend)
+        return Forecast._POINTS_CACHE
+
+    @classmethod
+    def configure_points_cache(cls, max_size: int = None, ttl: float = None, persist: bool = True,
+                               db_file: Union[str, pathlib.Path] = None) -> TTLCache:
+        """
+        Replace the /points metadata cache.
+
+        Args:
+            max_size (int, optional): Max in-memory entries. Defaults to POINTS_MAX_SIZE.
+            ttl (float, optional): Seconds location metadata is reused. Defaults to POINTS_TTL.
+            persist (bool, optional): Persist entries to a sqlite db. Defaults to True.
+            db_file (str|Path, optional): sqlite file when persisting. Defaults to POINTS_DB.
+
+        Returns:
+            TTLCache: The new cache.
+        """
+        backend = None
+        if persist:
+            backend = SqliteCacheBackend(db_file or cls.POINTS_DB, table='nws_points')
+        cache = TTLCache(max_size=cls.POINTS_MAX_SIZE if max_size is None else max_size,
+                         ttl=cls.POINTS_TTL if ttl is None else ttl, backend=backend)
+        if backend is not None:
+            LOGGER.debug(f'NWS points cache: {backend.location}, {cache.purge_expired()} expired entries removed')
+        with Forecast._POINTS_CACHE_LOCK:
+            Forecast._POINTS_CACHE = cache
+        return cache
+
+    @classmethod
+    def grid_index(cls) -> GridIndex:
+        """Return the (shared) point -> grid cell index, persisted to POINTS_DB, created on first use"""
+        if Forecast._GRID_INDEX is None:
+            cls.configure_grid()
+        return Forecast._GRID_INDEX
+
+    @classmethod
+    def grid_store(cls) -> GridForecastStore:
+        """Return the (shared) grid-keyed forecast store"""
+        if Forecast._GRID_STORE is None:
+            cls.configure_grid()
+        return Forecast._GRID_STORE
+
+    @classmethod
+    def configure_grid(cls, max_age: float = None, max_cells: int = None, polygon_lookup: bool = None,
+                       persist: bool = True, db_file: Union[str, pathlib.Path] = None) -> GridIndex:
+        """
+        Replace the grid cell index and forecast store.
+
+        Args:
+            max_age (float, optional): Seconds a cell's forecast is shared. Defaults to GRID_MAX_AGE.
+            max_cells (int, optional): Cell forecasts held in memory. Defaults to GRID_MAX_CELLS.
+            polygon_lookup (bool, optional): Resolve new points by cell polygon. Defaults to GRID_POLYGON_LOOKUP.
+            persist (bool, optional): Persist the index to a sqlite db. Defaults to True.
+            db_file (str|Path, optional): sqlite file when persisting. Defaults to POINTS_DB.
+
+        Returns:
+            GridIndex: The new index.
+        """
+        backend = None
+        if persist:
+            try:
+                backend = SqliteCacheBackend(db_file or cls.POINTS_DB, table='nws_grids')
+            except Exception as ex:
+                LOGGER.warning(f'Unable to open {db_file or cls.POINTS_DB}, grid index is in-memory only - {repr(ex)}')
+        index = GridIndex(backend, ttl=cls.POINTS_TTL,
+                          polygon_lookup=cls.GRID_POLYGON_LOOKUP if polygon_lookup is None else polygon_lookup)
+        store = GridForecastStore(max_cells=cls.GRID_MAX_CELLS if max_cells is None else max_cells,
+                                  max_age=cls.GRID_MAX_AGE if max_age is None else max_age)
+        with Forecast._GRID_LOCK:
+            Forecast._GRID_INDEX = index
+            Forecast._GRID_STORE = store
+        return index
+
+    def _cached_points(self) -> Tuple[int, dict]:
+        hit, payload = self.points_cache().lookup(self._url)
+        if hit and payload is not None:
+            LOGGER.debug(f'NWS points cache hit: {self._url}')
+            return 200, payload
+        # Not seen before, a known grid cell may contain the point
+        cell = self.grid_index().resolve(self.latitude, self.longitude)
+        if cell is not None and cell.base:
+            # cell-level fields only, zones are resolved per point (see zones())
+            LOGGER.debug(f'NWS grid index hit: {self._url} -> {cell.grid}')
+            return 200, cell_payload(cell.base)
+        return 0, {}
+
+    def zones(self) -> Tuple[str, ...]:
+        """
+        UGC codes (forecast zone, county, fire weather zone) of the location.
+
+        A base resolved from the grid index has cell-level fields only, the point's own
+        /points payload is then fetched (once, it is cached like any /points result).
+        """
+        zones = location_zones(self._json_base)
+        if not zones and self._json_base:
+            rc, payload = self._process_endpoint_response(self.http_cache().get(self._url))
+            self._store_points(rc, payload)
+            if rc == 200:
+                self._json_base = payload
+                zones = location_zones(payload)
+        return zones
+
+    def _store_points(self, rc: int, payload: dict):
+        if rc == 200:
+            self.points_cache().put(self._url, payload)
+            self.grid_index().add_point(self.latitude, self.longitude, payload)
+
+    def _shared_forecast(self, payload: dict) -> Union[GridForecast, None]:
+        # Grid key falls back to the forecast URL when /points has no grid id
+        self._grid = GridIndex.grid_key(payload) or payload['properties']['forecast']
+        shared = self.grid_store().get(self._grid)
+        if shared is not None:
+            self.grid_index().stats.shared += 1
+        return shared
+
+    def _store_forecast(self, daily, hourly) -> Tuple[int, Union[GridForecast, None]]:
+        # Parse the daily/hourly responses once per cell, unchanged content (fresh or 304) re-uses the parsed periods
+        resp = daily if daily.status_code != 200 else hourly
+        if resp.status_code != 200:
+            rc, _ = self._process_endpoint_response(resp)
+            if rc in (301, 404):
+                # Grid assignments change occasionally, re-resolve /points on the next refresh
+                LOGGER.debug(f'Forecast returned {rc}, dropping cached points/grid for {self._url}')
+                self.points_cache().delete(self._url)
+                self.grid_index().drop(self._grid)
+                self.grid_store().discard(self._grid)
+            return rc, None
+
+        LOGGER.debug('  returns: 200')
+        previous = self.grid_store().peek(self._grid)
+        daily_hash, hourly_hash = hash(daily.content), hash(hourly.content)
+        if previous is not None and previous.daily_hash == daily_hash:
+            daily_periods = previous.daily
+        else:
+            daily_payload = daily.json()
+            self.grid_index().set_polygon(self._grid, daily_payload.get('geometry'))
+            daily_periods = parse_periods(daily_payload)
+        if previous is not None and previous.hourly_hash == hourly_hash:
+            hourly_table = previous.hourly
+        else:
+            hourly_table = HourlyTable.from_payload(hourly.json())
+        self.grid_index().stats.fetched += 1
+        return 200, self.grid_store().put(self._grid, daily_periods, hourly_table, daily_hash, hourly_hash)
+
+    @property
+    def daily_periods(self) -> Tuple[ForecastPeriod, ...]:
+        """Parsed daily forecast periods (shared by the grid cell, read-only)"""
+        return self._daily
+
+    @property
+    def hourly(self) -> Union[HourlyTable, None]:
+        """Parsed hourly forecast, columnar (shared by the grid cell, read-only)"""
+        return self._hourly
+
+    def daily_json(self) -> dict:
+        """Raw NWS daily forecast payload, on request (from the HTTP cache, else fetched)"""
+        return self._raw_json('forecast')
+
+    def hourly_json(self) -> dict:
+        """Raw NWS hourly forecast payload, on request (from the HTTP cache, else fetched)"""
+        return self._raw_json('forecastHourly')
+
+    def _raw_json(self, key: str) -> dict:
+        url = self._json_base.get('properties', {}).get(key)
+        if url is None:
+            return {}
+        cached = self.http_cache().lookup(url)
+        if cached is not None:
+            return json.loads(cached.content)
+        rc, payload = self._process_endpoint_response(self.http_cache().get(url))
+        return payload if rc == 200 else {}
     
     def forecast_for_future_day(self, days_in_future: int, time_of_day: ForecastType = ForecastType.DAY) -> Union[ForecastDay, None]:
         """
@@ -255,8 +536,7 @@ class Forecast(AbstractEndpoint):
         #       Possible that entry 0 is night (not day)
         if self._valid_payload:
             idx = (days_in_future * 2) + time_of_day.value
-            payload = self._json_daily_forecast['properties']['periods'][idx]
-            return ForecastDay(self.latitude, self.longitude, self.city, self.state, payload)
+            return ForecastDay(self.latitude, self.longitude, self.city, self.state, self._daily[idx])
         LOGGER.warning(f'ForecastFutureDay({days_in_future}, {time_of_day.name}) - Invalid payload!')
         return None
     
@@ -285,32 +565,213 @@ class Forecast(AbstractEndpoint):
         return self.forecast_for_future_day(1, time_of_day)
 
 
+# =========================================================================================================    
+class AsyncForecast(Forecast):
+    """
+    asyncio version of Forecast.
+
+    Create via the create() coroutine (the constructor does no network I/O).  Network
+    calls use the shared async http session (see dt_tools.misc.async_http).  Requires aiohttp.
+
+    Example::
+
+        forecasts = await asyncio.gather(*(AsyncForecast.create(lat, lon) for lat, lon in sites))
+        print(forecasts[0].forecast_for_today().short_forecast)
+
+    """
+    def __init__(self, lat: float, lon: float, friendly_name: str = ''):
+        AbstractEndpoint.__init__(self, lat, lon, friendly_name)
+        self._init_payloads()
+
+    @classmethod
+    async def create(cls, lat: float, lon: float, friendly_name: str = '', base_only: bool = False) -> 'AsyncForecast':
+        """
+        Create and populate a forecast for lat/lon.
+
+        Args:
+            lat (float): Latitude
+            lon (float): Longitude
+            friendly_name (str, optional): Location name. Defaults to ''.
+            base_only (bool, optional): Only retrieve location metadata (no forecasts). Defaults to False.
+
+        Returns:
+            AsyncForecast: Forecast object
+        """
+        forecast = cls(lat, lon, friendly_name)
+        if await forecast._refresh(base_only):
+            forecast._valid_payload = True
+            forecast._last_update = datetime.now()
+        return forecast
+
+    async def refresh_if_needed(self, force: bool = False) -> bool:
+        '''Return true if refresh needed and successful else false'''
+        if self._refresh_due(force):
+            self._valid_payload = await self._refresh()
+            if self._valid_payload:
+                self._last_update = datetime.now()
+            return self._valid_payload
+        return False
+
+    async def _refresh(self, base_only: bool = False) -> bool:
+        self._json_error = {}
+        rc, payload = self._cached_points()
+        if rc != 200:
+            rc, payload = await self._call_endpoint(self._url)
+            self._store_points(rc, payload)
+        if rc == 200:
+            self._load_base(payload)
+            if not base_only:
+                shared = self._shared_forecast(payload)
+                if shared is None:
+                    async with self.grid_store().async_lock(self._grid):
+                        shared = self._shared_forecast(payload)
+                        if shared is None:
+                            daily = await self._get(payload['properties']['forecast'])
+                            hourly = await self._get(payload['properties']['forecastHourly']) if daily.status_code == 200 else None
+                            rc, shared = self._store_forecast(daily, hourly)
+                if shared is not None:
+                    self._daily = shared.daily
+                    self._hourly = shared.hourly
+
+        return (rc == 200)
+
+    async def _call_endpoint(self, URL: str) -> Tuple[int, dict]:
+        return self._process_endpoint_response(await self._get(URL))
+
+    async def _get(self, URL: str):
+        LOGGER.debug(f'Calling: {URL}')
+        return await self.http_cache().get_async(URL)
+
+
 # =========================================================================================================    
 class LocationAlerts(AbstractEndpoint):
-    def __init__(self, lat: float, lon: float, friendly_name: str = '', weather: Forecast = None):
+    """
+    Active weather alerts for a location.
+
+    By default each location polls /alerts/active?point=lat,lon.  Once an AlertEngine is
+    configured (configure_alert_engine(), or the engine argument), alerts are answered
+    from the engine's bulk /alerts/active index using the location's forecast zone and
+    county, with no per-location alert request.
+
+    Each refresh is diffed against the previous one: changes lists the alerts that are
+    new, updated or expired, and subscribe() / change_feed.stream() deliver them as
+    they happen.  Locations share one feed (alert_change_feed()) unless change_feed is
+    passed, subscribe to it once for every location.
+
+    Example:
+
+        LocationAlerts.configure_alert_engine(area='FL')
+        alerts = LocationAlerts(30.0694,-81.5515) # Fruit Cove, Florida
+        print(alerts.to_string())
+
+    """
+    _ALERT_ENGINE: AlertEngine = None
+    _ALERT_ENGINE_LOCK = threading.Lock()
+    _CHANGE_FEED: AlertChangeFeed = None
+
+    def __init__(self, lat: float, lon: float, friendly_name: str = '', weather: Forecast = None, engine: AlertEngine = None,
+                 change_feed: AlertChangeFeed = None):
         super().__init__(lat, lon, friendly_name)
 
         self.loc_id = f'{lat}|{lon}'
         self._weather: Forecast = weather if weather is not None else Forecast(lat, lon, base_only=True)
         self._url = URL_ALERT_TEMPLATE.replace('{latitude}', str(lat)).replace('{longitude}', str(lon))
+        self._engine: AlertEngine = engine
         self._json_alert = {}
+        self._alerts: List[dict] = []
+        self._alert_idx: Dict[str, int] = {}
+        self._change_feed = change_feed if change_feed is not None else self.alert_change_feed()
+        self._changes: List[AlertChange] = []
         self.refresh_if_needed(force=True)
         self._city = self._weather.city
         self._state = self._weather.state
 
         # self._speak_accent: ACCENT = ACCENT.UnitedStates
 
+    @classmethod
+    def alert_engine(cls) -> Union[AlertEngine, None]:
+        """Return the shared bulk alert engine, None if not configured (per-location polling)"""
+        return LocationAlerts._ALERT_ENGINE
+
+    @classmethod
+    def configure_alert_engine(cls, area: Union[str, List[str]] = None, max_age: float = 60.0,
+                               enabled: bool = True) -> Union[AlertEngine, None]:
+        """
+        Answer alerts for every LocationAlerts from one bulk /alerts/active feed.
+
+        Args:
+            area (str | List[str], optional): State/marine area code(s). Defaults to None (whole country).
+            max_age (float, optional): Seconds between feed checks. Defaults to 60.
+            enabled (bool, optional): False reverts to per-location polling. Defaults to True.
+
+        Returns:
+            AlertEngine: The new engine (None if disabled).
+        """
+        engine = AlertEngine(area=area, max_age=max_age, http_cache=cls.http_cache()) if enabled else None
+        with LocationAlerts._ALERT_ENGINE_LOCK:
+            LocationAlerts._ALERT_ENGINE = engine
+        return engine
+
+    @classmethod
+    def alert_change_feed(cls) -> AlertChangeFeed:
+        """Return the shared alert change feed (keyed by loc_id), created on first use"""
+        if LocationAlerts._CHANGE_FEED is None:
+            with LocationAlerts._ALERT_ENGINE_LOCK:
+                if LocationAlerts._CHANGE_FEED is None:
+                    LocationAlerts._CHANGE_FEED = AlertChangeFeed()
+        return LocationAlerts._CHANGE_FEED
+
+    @property
+    def engine(self) -> Union[AlertEngine, None]:
+        return self._engine if self._engine is not None else self.alert_engine()
+
+    def _refresh_due(self, force: bool = False) -> bool:
+        # Engine lookups are in-memory, the engine decides when the feed is re-checked
+        return self.engine is not None or super()._refresh_due(force)
+
     def _refresh(self) -> bool:
         self._json_error = {}
+        engine = self.engine
+        if engine is not None:
+            zones = self._weather.zones()
+            features = engine.features_for(self.latitude, self.longitude, zones)
+            if engine.loaded:
+                self._set_alerts({'features': features})
+            return engine.loaded
+
         rc, payload =  self._call_endpoint(self._url)
         if rc == 200:
-            self._json_alert = payload
+            self._set_alerts(payload)
     
         return (rc == 200)
+
+    def _set_alerts(self, payload: dict):
+        # Alert properties are extracted once per refresh, accessors do not walk the raw json
+        self._json_alert = payload
+        self._alerts = [feature.get('properties', {}) for feature in payload.get('features', [])]
+        self._alert_idx = {}
+        for idx, props in enumerate(self._alerts):
+            self._alert_idx.setdefault(props.get('id'), idx)
+        self._changes = self._change_feed.update(self._alerts, key=self.loc_id)
+
+    @property
+    def changes(self) -> List[AlertChange]:
+        """Alerts new, updated or expired by the last refresh (see alert_feed)"""
+        return self._changes
+
+    @property
+    def change_feed(self) -> AlertChangeFeed:
+        """Change feed of this location (key: loc_id)"""
+        return self._change_feed
+
+    def subscribe(self, callback: Callable[[AlertChange], None]) -> Callable[[], None]:
+        """Call callback(change) for alert changes on later refreshes, returns an unsubscribe function"""
+        loc_id = self.loc_id
+        return self._change_feed.subscribe(lambda change: callback(change) if change.key == loc_id else None)
     
     @property
     def alert_count(self) -> int:
-        return len(self._json_alert.get('features',''))
+        return len(self._alerts)
     
     def alert_id(self, alert_num: int) -> str:
         return self._get_property(alert_num, 'id')
@@ -339,13 +800,7 @@ class LocationAlerts(AbstractEndpoint):
         return self._get_property(alert_num, 'instruction')
 
     def get_alert_idx(self, id: str) -> int:
-        idx = -1
-        for cnt in range(0, len(self._json_alert['features'])):
-            if id == self.alert_id(cnt):
-                idx = cnt
-                break
-    
-        return idx
+        return self._alert_idx.get(id, -1)
     
     def to_string(self) -> str:
         output = 'ALERTS-\n'
@@ -397,8 +852,7 @@ class LocationAlerts(AbstractEndpoint):
     def _get_property(self, alert_num: int, key: str) -> str:
         val = Unknown.STR
         if alert_num < self.alert_count:
-            props: dict = self._json_alert['features'][alert_num]['properties']
-            val = props.get(key, Unknown.STR)
+            val = self._alerts[alert_num].get(key, Unknown.STR)
             if val is None:
                 val = Unknown.STR
         return val
@@ -0,0 +1,297 @@
+"""
+Offline ZIP / postal code centroid index.
+
+Zip -> location is static data, so instead of a geocode API call per lookup a
+postal code file is compiled once (build_zip_index) into a compact array index
+(same memory-mapped format as the gazetteer): codes are a sorted fixed width byte
+array, a lookup is a binary search, a bulk lookup is one vectorized searchsorted.
+
+Supported sources:
+
+- GeoNames postal code dump (ie. US.txt / allCountries.txt from download.geonames.org/export/zip)
+- CSV with a header of zip, lat, lon and optionally city, county, state, country
+- US Census ZCTA Gazetteer file (ie. 2020_Gaz_zcta_national.txt, tab separated).  This
+  file has no place names (centroids only), see GeoLocation.get_location_via_zip.
+
+Names are stored in the geocode API's format: US state codes are expanded to the state
+name ('FL' -> 'Florida') and US counties carry their 'County' suffix.  ZipPlace.country is
+the ISO code, ZipPlace.country_name the API's country name (the ISO code for countries
+not in COUNTRY_NAMES).
+
+Example::
+
+    from dt_tools.misc import zip_index
+
+    zip_index.build_zip_index('~/Downloads/US.txt')           # -> ~/.IpHelper/zip_index.idx
+    zips = zip_index.get_zip_index()
+    place = zips.lookup('32081')                              # ZipPlace(zip='32081', lat=30.12, ...)
+    places = zips.lookup_many(['32081', '10001', '99999'])    # [ZipPlace, ZipPlace, None]
+
+GeoLocation.get_location_via_zip uses the shared index (if one exists) and only calls
+the geocode API for codes it does not know.
+"""
+import csv
+import pathlib
+import re
+import threading
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Tuple, Union
+
+from loguru import logger as LOGGER
+
+from dt_tools.misc.gazetteer import StringTable, read_array_index, string_arrays, write_array_index
+
+if TYPE_CHECKING:
+    import numpy as np
+
+DEFAULT_INDEX = pathlib.Path('~').expanduser().absolute() / ".IpHelper" / 'zip_index.idx'
+DEFAULT_COUNTRY = 'US'
+
+# Country names as the geocode API (OpenStreetMap) displays them
+COUNTRY_NAMES = {'US': 'United States', 'PR': 'Puerto Rico', 'CA': 'Canada', 'MX': 'México', 'GB': 'United Kingdom',
+                 'FR': 'France', 'DE': 'Deutschland', 'ES': 'España', 'IT': 'Italia', 'NL': 'Nederland',
+                 'AU': 'Australia', 'JP': '日本'}
+
+_US_STATE_NAMES = {
+    'AL': 'Alabama', 'AK': 'Alaska', 'AS': 'American Samoa', 'AZ': 'Arizona', 'AR': 'Arkansas', 'CA': 'California',
+    'CO': 'Colorado', 'CT': 'Connecticut', 'DE': 'Delaware', 'DC': 'District of Columbia', 'FL': 'Florida',
+    'GA': 'Georgia', 'GU': 'Guam', 'HI': 'Hawaii', 'ID': 'Idaho', 'IL': 'Illinois', 'IN': 'Indiana', 'IA': 'Iowa',
+    'KS': 'Kansas', 'KY': 'Kentucky', 'LA': 'Louisiana', 'ME': 'Maine', 'MD': 'Maryland', 'MA': 'Massachusetts',
+    'MI': 'Michigan', 'MN': 'Minnesota', 'MS': 'Mississippi', 'MO': 'Missouri', 'MT': 'Montana', 'NE': 'Nebraska',
+    'NV': 'Nevada', 'NH': 'New Hampshire', 'NJ': 'New Jersey', 'NM': 'New Mexico', 'NY': 'New York',
+    'NC': 'North Carolina', 'ND': 'North Dakota', 'MP': 'Northern Mariana Islands', 'OH': 'Ohio', 'OK': 'Oklahoma',
+    'OR': 'Oregon', 'PA': 'Pennsylvania', 'PR': 'Puerto Rico', 'RI': 'Rhode Island', 'SC': 'South Carolina',
+    'SD': 'South Dakota', 'TN': 'Tennessee', 'TX': 'Texas', 'UT': 'Utah', 'VT': 'Vermont', 'VI': 'United States Virgin Islands',
+    'VA': 'Virginia', 'WA': 'Washington', 'WV': 'West Virginia', 'WI': 'Wisconsin', 'WY': 'Wyoming'}
+_US_COUNTY_SUFFIXES = ('County', 'Parish', 'Borough', 'Census Area', 'Municipality', 'Municipio', 'city', 'City')
+
+_MAGIC = b'DTZIP01\n'
+_KEY_DTYPE = 'S16'
+_US_ZIP = re.compile(r'^(\d{5})(-?\d{4})?$')
+
+
+# ============================================================================================
+@dataclass(frozen=True)
+class ZipPlace():
+    """Centroid of a postal code"""
+    zip: str
+    country: str                    # ISO country code
+    lat: float
+    lon: float
+    city: str
+    county: str
+    state: str
+
+    @property
+    def country_name(self) -> str:
+        """Country name as displayed by the geocode API (the ISO code if not in COUNTRY_NAMES)"""
+        return COUNTRY_NAMES.get(self.country, self.country)
+
+    @property
+    def has_names(self) -> bool:
+        """False for centroid only entries (ie. Census ZCTA source)"""
+        return self.city is not None or self.state is not None
+
+
+def zip_key(zip: str, country_cd: str = None) -> str:
+    """Normalized 'CC:CODE' key, ie. ('32081-1234', None) -> 'US:32081'"""
+    country_cd = (country_cd or DEFAULT_COUNTRY).strip().upper()
+    code = str(zip).strip().upper().replace(' ', '')
+    if country_cd == 'US':
+        match = _US_ZIP.match(code)
+        if match:
+            code = match.group(1)
+    return f'{country_cd}:{code}'
+
+
+# ============================================================================================
+class ZipIndex:
+    """
+    Memory-mapped postal code index (see build_zip_index).
+
+    Args:
+        index_file (str|Path, optional): Index file. Defaults to DEFAULT_INDEX.
+
+    Raises:
+        ValueError: index_file is not a zip index.
+    """
+    def __init__(self, index_file: Union[str, pathlib.Path] = None):
+        self.index_file = pathlib.Path(index_file or DEFAULT_INDEX).expanduser()
+        self._header, arrays = read_array_index(self.index_file, _MAGIC)
+        self._keys: 'np.ndarray' = arrays['key']
+        self._lat: 'np.ndarray' = arrays['lat']
+        self._lon: 'np.ndarray' = arrays['lon']
+        self._city: 'np.ndarray' = arrays['city']
+        self._county: 'np.ndarray' = arrays['county']
+        self._state: 'np.ndarray' = arrays['state']
+        self._strings = StringTable(arrays['text'], arrays['text_offsets'])
+        LOGGER.trace(f'Zip index opened with {len(self)} codes [{self.index_file}]')
+
+    def __len__(self) -> int:
+        return int(self._keys.size)
+
+    def __contains__(self, zip: str) -> bool:
+        return self.index_of(zip) >= 0
+
+    def index_of(self, zip: str, country_cd: str = None) -> int:
+        """Index of a postal code, -1 if unknown"""
+        key = zip_key(zip, country_cd).encode('UTF-8')
+        idx = int(self._keys.searchsorted(key))
+        return idx if idx < self._keys.size and self._keys[idx] == key else -1
+
+    def lookup(self, zip: str, country_cd: str = None) -> Union[ZipPlace, None]:
+        """
+        Centroid of a postal code.
+
+        Args:
+            zip (str): Postal code (US zip+4 is accepted).
+            country_cd (str, optional): ISO country code. Defaults to DEFAULT_COUNTRY.
+
+        Returns:
+            ZipPlace: Postal code centroid, None if unknown.
+        """
+        idx = self.index_of(zip, country_cd)
+        return None if idx < 0 else self.place(idx)
+
+    def lookup_index(self, zips: Iterable[str], country_cd: str = None) -> 'np.ndarray':
+        """Index (-1 if unknown) of many postal codes, one vectorized binary search"""
+        import numpy as np
+
+        encoded = [zip_key(zip, country_cd).encode('UTF-8') for zip in zips]
+        keys = np.array(encoded, dtype=_KEY_DTYPE).reshape(-1)
+        if keys.size == 0 or self._keys.size == 0:
+            return np.full(keys.size, -1, dtype=np.int64)
+        idx = np.minimum(np.searchsorted(self._keys, keys), self._keys.size - 1)
+        # keys longer than the key width were truncated, they can not be in the index
+        known = (self._keys[idx] == keys) & (np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)) <= keys.itemsize)
+        return np.where(known, idx, -1).astype(np.int64)
+
+    def lookup_many(self, zips: Iterable[str], country_cd: str = None) -> List[Union[ZipPlace, None]]:
+        """Centroids (None if unknown) of many postal codes, see lookup_index()"""
+        return [None if idx < 0 else self.place(idx) for idx in self.lookup_index(zips, country_cd).tolist()]
+
+    def place(self, idx: int) -> ZipPlace:
+        """Postal code at index idx (see lookup_index)"""
+        country, code = self._keys[idx].decode('UTF-8').split(':', 1)
+        return ZipPlace(zip=code, country=country, lat=float(self._lat[idx]), lon=float(self._lon[idx]),
+                        city=self._strings[self._city[idx]], county=self._strings[self._county[idx]],
+                        state=self._strings[self._state[idx]])
+
+
+# ============================================================================================
+def _api_names(country: str, county: str, state: str) -> Tuple[str, str]:
+    '''(county, state) in the geocode API's format'''
+    if country == 'US':
+        state = _US_STATE_NAMES.get((state or '').upper(), state)
+        if county and not county.endswith(_US_COUNTY_SUFFIXES):
+            county = f'{county} County'
+    return county, state
+
+def _census_rows(source, first_line: str) -> Iterator[tuple]:
+    columns = [col.strip() for col in first_line.rstrip('\n').split('\t')]
+    for line in source:
+        row = dict(zip(columns, (token.strip() for token in line.rstrip('\n').split('\t'))))
+        yield row['GEOID'], 'US', float(row['INTPTLAT']), float(row['INTPTLONG']), None, None, None
+
+def _geonames_rows(source, first_line: str) -> Iterator[tuple]:
+    for line in (first_line, *source):
+        tokens = line.rstrip('\n').split('\t')
+        if len(tokens) < 11 or not tokens[9] or not tokens[10]:
+            continue
+        # admin name1 (state name), admin code1 when the name is missing
+        yield tokens[1], tokens[0], float(tokens[9]), float(tokens[10]), tokens[2] or None, tokens[5] or None, tokens[3] or tokens[4] or None
+
+def _csv_rows(source, first_line: str, country_cd: str) -> Iterator[tuple]:
+    for row in csv.DictReader((first_line, *source)):
+        row = {key.strip().lower(): (value or '').strip() for key, value in row.items() if key}
+        yield (row['zip'], row.get('country') or country_cd, float(row['lat']), float(row['lon']),
+               row.get('city') or None, row.get('county') or None, row.get('state') or None)
+
+def _source_rows(source_file: pathlib.Path, country_cd: str) -> Iterator[tuple]:
+    with source_file.open(encoding='UTF-8', errors='replace', newline='') as source:
+        first_line = source.readline()
+        if 'INTPTLAT' in first_line:
+            yield from _census_rows(source, first_line)
+        elif '\t' not in first_line and 'zip' in first_line.lower():
+            yield from _csv_rows(source, first_line, country_cd)
+        else:
+            yield from _geonames_rows(source, first_line)
+
+def build_zip_index(source_files: Union[str, pathlib.Path, Iterable[Union[str, pathlib.Path]]],
+                    index_file: Union[str, pathlib.Path] = None, country_cd: str = DEFAULT_COUNTRY) -> int:
+    """
+    Compile postal code source file(s) into an index (see module doc for formats).
+
+    When a code appears more than once (ie. GeoNames lists a code per place name),
+    the first entry is kept.  County and state names are stored in the geocode API's
+    format (see module doc).
+
+    Args:
+        source_files (str|Path|Iterable): ZCTA, GeoNames or CSV postal code file(s).
+        index_file (str|Path, optional): Index to write. Defaults to DEFAULT_INDEX.
+        country_cd (str, optional): Country of CSV rows without a country column. Defaults to DEFAULT_COUNTRY.
+
+    Returns:
+        int: Number of postal codes indexed.
+    """
+    import numpy as np
+
+    if isinstance(source_files, (str, pathlib.Path)):
+        source_files = [source_files]
+    source_files = [pathlib.Path(source_file).expanduser() for source_file in source_files]
+    index_file = pathlib.Path(index_file or DEFAULT_INDEX).expanduser()
+
+    strings: Dict[str, int] = {}
+
+    def string_id(text: str) -> int:
+        return -1 if not text else strings.setdefault(text, len(strings))
+
+    rows: Dict[bytes, Tuple[float, float, int, int, int]] = {}
+    for source_file in source_files:
+        for code, country, lat, lon, city, county, state in _source_rows(source_file, country_cd):
+            key = zip_key(code, country).encode('UTF-8')
+            if key not in rows and len(key) <= np.dtype(_KEY_DTYPE).itemsize:
+                county, state = _api_names(country.upper(), county, state)
+                rows[key] = (lat, lon, string_id(city), string_id(county), string_id(state))
+
+    keys = sorted(rows)
+    arrays = {'key': np.array(keys, dtype=_KEY_DTYPE).reshape(-1),
+              'lat': np.array([rows[key][0] for key in keys], dtype='<f4'),
+              'lon': np.array([rows[key][1] for key in keys], dtype='<f4'),
+              'city': np.array([rows[key][2] for key in keys], dtype='<i4'),
+              'county': np.array([rows[key][3] for key in keys], dtype='<i4'),
+              'state': np.array([rows[key][4] for key in keys], dtype='<i4'),
+              **string_arrays(strings)}
+    write_array_index(index_file, _MAGIC, {'sources': [str(source_file) for source_file in source_files],
+                                           'codes': len(keys)}, arrays)
+    LOGGER.info(f'Zip index {index_file}: {len(keys)} codes from {", ".join(str(file) for file in source_files)}')
+    return len(keys)
+
+
+# ============================================================================================
+_ZIP_INDEX: ZipIndex = None
+_ZIP_INDEX_LOADED = False
+_ZIP_INDEX_LOCK = threading.Lock()
+
+def get_zip_index() -> Union[ZipIndex, None]:
+    """Return the shared zip index (DEFAULT_INDEX, opened on first use), None if there is no index"""
+    global _ZIP_INDEX, _ZIP_INDEX_LOADED
+    if not _ZIP_INDEX_LOADED:
+        with _ZIP_INDEX_LOCK:
+            if not _ZIP_INDEX_LOADED:
+                if DEFAULT_INDEX.exists():
+                    try:
+                        _ZIP_INDEX = ZipIndex(DEFAULT_INDEX)
+                    except Exception as ex:
+                        LOGGER.warning(f'Unable to open zip index {DEFAULT_INDEX} - {repr(ex)}')
+                _ZIP_INDEX_LOADED = True
+    return _ZIP_INDEX
+
+def set_zip_index(index: Union[ZipIndex, str, pathlib.Path, None]):
+    """Replace the shared zip index (a ZipIndex, an index file, or None to disable)"""
+    global _ZIP_INDEX, _ZIP_INDEX_LOADED
+    if index is not None and not isinstance(index, ZipIndex):
+        index = ZipIndex(index)
+    with _ZIP_INDEX_LOCK:
+        _ZIP_INDEX = index
+        _ZIP_INDEX_LOADED = True